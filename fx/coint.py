@@ -8,59 +8,68 @@ import numpy as np
 import pandas as pd
 import warnings
 warnings.filterwarnings("ignore")
-import statsmodels.api as sm
 from statsmodels.tsa.stattools import coint
 
+from ols import half_life, simple_ols
+
 
 def calculate_half_life(spread):
-    """Half-life de reversión vía AR(1): Δs = α + β·s_{t-1}. HL = -ln2/β."""
-    ts = pd.Series(np.asarray(spread, dtype=float))
-    lag = ts.shift(1)
-    ret = ts - lag
-    valid = lag.notna() & ret.notna()
-    y = ret[valid].values
-    X = lag[valid].values
-    if len(y) < 10:
-        return float("nan")
+    """Half-life de reversión vía AR(1): Δs = α + β·s_{t-1}. HL = -ln2/β (forma cerrada, ols.py)."""
     try:
-        res = sm.OLS(y, sm.add_constant(X)).fit()
-        beta = res.params[1]
-        if beta >= 0:
-            return float("nan")
-        return float(round(-np.log(2) / beta, 1))
+        return float(half_life(np.asarray(spread, dtype=float).ravel(), decimals=1))
     except Exception:
         return float("nan")
 
 
-def calculate_hurst_exponent(spread, min_bars=40):
-    """Hurst vía R/S. Aplicar sobre DIFERENCIAS del spread. H<0.5 = mean-reverting."""
-    ts = np.asarray(spread, dtype=float)
-    n = len(ts)
+def hurst_exponent_batch(spreads, min_bars=40):
+    """
+    Hurst R/S de cada fila de spreads (B×n) a la vez: por lag, los bloques se
+    ven como (B, n_bloques, lag) con reshape. Bit a bit igual que el bucle
+    por bloques (copia de program/func_coint_batch.hurst_batch).
+    """
+    X = np.atleast_2d(np.asarray(spreads, dtype=float))
+    B, n = X.shape
+    out = np.full(B, np.nan)
     if n < min_bars:
-        return float("nan")
+        return out
     lag_fracs = [0.05, 0.08, 0.12, 0.18, 0.25, 0.35, 0.45]
     lags = sorted(set(max(4, int(n * f)) for f in lag_fracs))
     lags = [l for l in lags if l <= n // 2]
     if len(lags) < 3:
-        return float("nan")
-    log_lags, log_rs = [], []
-    for lag in lags:
+        return out
+    log_rs = np.full((B, len(lags)), np.nan)
+    used = np.zeros((B, len(lags)), dtype=bool)
+    for li, lag in enumerate(lags):
         nch = n // lag
         if nch < 2:
             continue
-        rs = []
-        for k in range(nch):
-            ch = ts[k * lag:(k + 1) * lag]
-            m = np.mean(ch); s = np.std(ch)
-            if s < 1e-10:
-                continue
-            dev = np.cumsum(ch - m)
-            rs.append((dev.max() - dev.min()) / s)
-        if len(rs) >= 2:
-            log_lags.append(np.log(lag)); log_rs.append(np.log(np.mean(rs)))
-    if len(log_lags) < 3:
-        return float("nan")
-    return float(np.clip(np.polyfit(log_lags, log_rs, 1)[0], 0.0, 1.0))
+        ch = X[:, :nch * lag].reshape(B, nch, lag)
+        s = ch.std(axis=2)
+        dev = np.cumsum(ch - ch.mean(axis=2, keepdims=True), axis=2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = (dev.max(axis=2) - dev.min(axis=2)) / s
+        ok = ~(s < 1e-10)
+        cnt = ok.sum(axis=1)
+        m = rs.mean(axis=1)
+        for b in np.flatnonzero((cnt < nch) & (cnt >= 2)):
+            m[b] = np.mean(rs[b][ok[b]])
+        used[:, li] = cnt >= 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_rs[used[:, li], li] = np.log(m[used[:, li]])
+    log_lags = np.log(np.asarray(lags, dtype=float))
+    fit = (used.sum(axis=1) >= 3) & np.isfinite(np.where(used, log_rs, 0.0)).all(axis=1)
+    patterns, group = np.unique(used[fit], axis=0, return_inverse=True)
+    rows = np.flatnonzero(fit)
+    for g, pattern in enumerate(patterns):
+        sel = rows[np.asarray(group).ravel() == g]
+        slope = np.polyfit(log_lags[pattern], log_rs[sel][:, pattern].T, 1)[0]
+        out[sel] = np.clip(slope, 0.0, 1.0)
+    return out
+
+
+def calculate_hurst_exponent(spread, min_bars=40):
+    """Hurst vía R/S. Aplicar sobre DIFERENCIAS del spread. H<0.5 = mean-reverting."""
+    return float(hurst_exponent_batch(np.asarray(spread, dtype=float).ravel(), min_bars)[0])
 
 
 def calculate_cointegration(series_1, series_2):
@@ -75,7 +84,7 @@ def calculate_cointegration(series_1, series_2):
     try:
         res = coint(s1, s2)
         ct, p, cv = res[0], res[1], res[2][1]
-        model = sm.OLS(s1, s2).fit()
+        model = simple_ols(s1, s2, intercept=False)
         hr = float(model.params[0])
         r2 = float(model.rsquared)
         spread = s1 - hr * s2
@@ -101,6 +101,15 @@ def _cache_path(market: str, resolution: str, n_bars: int) -> Path:
     return CACHE_DIR / f"{safe}_{resolution}_{n_bars}.json"
 
 
+def _price_store(resolution: str):
+    """Almacén columnar compartido (func_price_store) de INDEXER, o None."""
+    try:
+        from func_price_store import get_price_store, indexer_source
+        return get_price_store(resolution, source=indexer_source(INDEXER))
+    except Exception:
+        return None
+
+
 def fetch_candles(market: str, resolution: str = "1HOUR", n_bars: int = 720,
                   use_cache: bool = True, cache_max_age_h: float = 6.0) -> Optional[list]:
     """
@@ -108,11 +117,28 @@ def fetch_candles(market: str, resolution: str = "1HOUR", n_bars: int = 720,
     Cachea el resultado localmente para no re-descargar en el grid search.
     Retorna lista de floats (close prices), ordenada de más vieja a más nueva.
     Retorna None si hay error irrecuperable.
+
+    2026-10-18: la caché es el almacén columnar compartido con el bot
+    (func_price_store). Si ya tiene n_bars velas y la última es más joven que
+    cache_max_age_h, no hay red; si sólo está vieja, se descargan únicamente
+    las velas posteriores a la última guardada. Los JSON de backtest_cache/
+    quedan como fallback si el almacén no se puede abrir.
     """
+    store = _price_store(resolution)
     cache_file = _cache_path(market, resolution, n_bars)
 
+    # Calcular rango de fechas: desde hace N horas hasta ahora
+    to_dt   = datetime.now(timezone.utc)
+    from_dt = to_dt - timedelta(hours=n_bars + 10)  # +10 para margen
+
     # Intentar leer caché si existe y no está vencida
-    if use_cache and cache_file.exists():
+    if use_cache and store is not None:
+        info = store.info(market)
+        if info and info["rows"] >= n_bars:
+            if time.time() - info["last_ts"] < cache_max_age_h * 3600.0:
+                return store.read(market, last_n=n_bars)[1].tolist()
+            from_dt = datetime.fromtimestamp(info["last_ts"], tz=timezone.utc)  # sólo lo nuevo
+    elif use_cache and cache_file.exists():
         age_h = (time.time() - cache_file.stat().st_mtime) / 3600.0
         if age_h < cache_max_age_h:
             try:
@@ -121,10 +147,6 @@ def fetch_candles(market: str, resolution: str = "1HOUR", n_bars: int = 720,
             except Exception:
                 pass
 
-    # Calcular rango de fechas: desde hace N horas hasta ahora
-    to_dt   = datetime.now(timezone.utc)
-    from_dt = to_dt - timedelta(hours=n_bars + 10)  # +10 para margen
-
     # dYdX indexer devuelve max 100 velas por request → paginar
     all_candles = []
     batch_size  = 100
@@ -142,8 +164,6 @@ def fetch_candles(market: str, resolution: str = "1HOUR", n_bars: int = 720,
             resp.raise_for_status()
             candles = resp.json().get("candles", [])
         except Exception as e:
-            if not all_candles:
-                return None
             break
 
         if not candles:
@@ -162,6 +182,9 @@ def fetch_candles(market: str, resolution: str = "1HOUR", n_bars: int = 720,
         time.sleep(0.1)  # rate limit
 
     if not all_candles:
+        # Red caída: mejor el histórico local (aunque vencido) que nada.
+        if use_cache and store is not None and store.info(market):
+            return store.read(market, last_n=n_bars)[1].tolist()
         return None
 
     # Deduplicar y ordenar de más viejo a más nuevo
@@ -175,9 +198,20 @@ def fetch_candles(market: str, resolution: str = "1HOUR", n_bars: int = 720,
 
     unique.sort(key=lambda x: x["startedAt"])
 
+    if store is not None:
+        try:
+            store.write(market,
+                        [datetime.fromisoformat(c["startedAt"].replace("Z", "+00:00")).timestamp()
+                         for c in unique],
+                        [float(c["close"]) for c in unique])
+            if use_cache:
+                return store.read(market, last_n=n_bars)[1].tolist()
+        except Exception:
+            pass
+
     closes = [float(c["close"]) for c in unique[-n_bars:]]
 
-    if use_cache:
+    if use_cache and store is None:
         try:
             with open(cache_file, "w") as f:
                 json.dump(closes, f)
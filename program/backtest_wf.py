@@ -24,7 +24,8 @@ orderbook histórico). Ajusta --cost-bps-per-leg al spread real de los pares que
 operas (mainnet altcoins: 40-200 bps). Con --cost-bps-per-leg 0 obtienes el
 límite superior irreal (sólo para comparar con el backtest viejo).
 
-SOLO LECTURA / offline (descarga candles del indexer con caché). No opera.
+SOLO LECTURA / offline (descarga candles del indexer al almacén columnar
+func_price_store, compartido con el bot). No opera.
 
 Uso:
     python3 backtest_wf.py --bars 2160 --train 336 --test 168 --cost-bps-per-leg 40
@@ -32,7 +33,6 @@ Uso:
 """
 
 import argparse
-import json
 import time
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
@@ -56,6 +56,8 @@ from func_cointegration import (
     calculate_cointegration, calculate_half_life,
     calculate_hurst_exponent, calculate_zscore,
 )
+from func_candles import candle_ts
+from func_price_store import get_price_store, ts_to_iso
 from func_strategy import (
     hedge_weighted_sizes, hedge_notionals, estimate_round_trip_cost,
     spread_convergence_progress,
@@ -63,8 +65,6 @@ from func_strategy import (
 
 SCRIPT_DIR = Path(__file__).parent
 CSV_PATH = SCRIPT_DIR / "cointegrated_pairs.csv"
-CACHE_DIR = SCRIPT_DIR / "backtest_cache"
-CACHE_DIR.mkdir(exist_ok=True)
 BARS_PER_YEAR = 24 * 365  # 1HOUR
 
 _SESSION = requests.Session()  # reutiliza conexiones (mucho más rápido)
@@ -73,18 +73,28 @@ _SESSION = requests.Session()  # reutiliza conexiones (mucho más rápido)
 # ─────────────────────────────────────────────────────────────────────────────
 # Candles con timestamp (para alineación correcta, Q6)
 # ─────────────────────────────────────────────────────────────────────────────
+def _store_series(store, market, from_dt):
+    ts, closes = store.read(market, start=from_dt.timestamp())
+    return [(ts_to_iso(t), float(c)) for t, c in zip(ts, closes)]
+
+
 def fetch_candles_ts(market, n_bars=2160, cache_max_age_h=12.0):
-    cache_file = CACHE_DIR / f"{market.replace('-', '_')}_1HOUR_{n_bars}_wf.json"
-    if cache_file.exists():
-        age_h = (time.time() - cache_file.stat().st_mtime) / 3600.0
-        if age_h < cache_max_age_h:
-            try:
-                return json.load(open(cache_file))
-            except Exception:
-                pass
+    """
+    [(startedAt, close)] de las últimas ~n_bars velas de 1h.
 
+    2026-10-18: caché = almacén columnar compartido con el bot
+    (func_price_store). Con historia suficiente y fresca no hay red; con
+    historia vieja sólo se descargan las velas posteriores a la última guardada.
+    """
+    store = get_price_store("1HOUR")
     to_dt = datetime.now(timezone.utc)
     from_dt = to_dt - timedelta(hours=n_bars + 10)
+    stop_dt = from_dt
+    info = store.info(market)
+    if info and info["rows"] >= n_bars:
+        if time.time() - info["last_ts"] < cache_max_age_h * 3600.0:
+            return _store_series(store, market, from_dt)
+        stop_dt = datetime.fromtimestamp(info["last_ts"], tz=timezone.utc)
     out = {}
     current_to = to_dt
     base = INDEXER.rstrip("/")
@@ -117,17 +127,18 @@ def fetch_candles_ts(market, n_bars=2160, cache_max_age_h=12.0):
             out[c["startedAt"]] = float(c["close"])
         oldest = min(c["startedAt"] for c in candles)
         current_to = datetime.fromisoformat(oldest.replace("Z", "+00:00")) - timedelta(seconds=1)
-        if current_to < from_dt:
+        if current_to < stop_dt:
             break
         time.sleep(0.05)
-    if not out:
+    if out:
+        series = sorted(out.items())  # [(ts, close)]
+        try:
+            store.write(market, [candle_ts(t) for t, _ in series], [c for _, c in series])
+        except Exception:
+            return series
+    if not store.info(market):
         return None
-    series = sorted(out.items())  # [(ts, close)]
-    try:
-        json.dump(series, open(cache_file, "w"))
-    except Exception:
-        pass
-    return series
+    return _store_series(store, market, from_dt)
 
 
 def prefetch_markets(markets, n_bars, workers=6):
@@ -193,7 +204,7 @@ def train_select(p1_train, p2_train):
         return False, None, None
     try:
         coint_flag, hedge_ratio, half_life, r_sq, p_val = calculate_cointegration(
-            list(p1_train), list(p2_train)
+            p1_train, p2_train
         )
     except Exception:
         return False, None, None
@@ -0,0 +1,98 @@
+"""
+bench_hurst.py
+==============
+Micro-benchmark del exponente de Hurst R/S: bucle por bloques original
+(reproducido aquí como referencia) vs func_coint_batch.hurst_batch, que
+procesa todos los bloques de un lag — y todos los spreads — con un reshape.
+
+Comprueba además que los resultados son idénticos bit a bit.
+
+Uso:
+    cd program/
+    python bench_hurst.py                  # 500 spreads × 399 barras
+    python bench_hurst.py --spreads 2000 --bars 999 --repeat 5
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault("API_KEY", "bench")   # constants.py lo exige
+
+from func_coint_batch import hurst_batch
+
+
+def hurst_loop(spread, min_bars=40) -> float:
+    """calculate_hurst_exponent hasta 2026-10-18 (bucle Python por bloques)."""
+    ts = np.array(spread, dtype=float)
+    n = len(ts)
+    if n < min_bars:
+        return float('nan')
+    lag_fractions = [0.05, 0.08, 0.12, 0.18, 0.25, 0.35, 0.45]
+    lags = sorted(set(max(4, int(n * f)) for f in lag_fractions))
+    lags = [l for l in lags if l <= n // 2]
+    if len(lags) < 3:
+        return float('nan')
+    log_lags = []
+    log_rs = []
+    for lag in lags:
+        n_chunks = n // lag
+        if n_chunks < 2:
+            continue
+        rs_chunk = []
+        for k in range(n_chunks):
+            chunk = ts[k * lag: (k + 1) * lag]
+            mean_c = np.mean(chunk)
+            std_c = np.std(chunk)
+            if std_c < 1e-10:
+                continue
+            devs = np.cumsum(chunk - mean_c)
+            R = devs.max() - devs.min()
+            rs_chunk.append(R / std_c)
+        if len(rs_chunk) >= 2:
+            log_lags.append(np.log(lag))
+            log_rs.append(np.log(np.mean(rs_chunk)))
+    if len(log_lags) < 3:
+        return float('nan')
+    poly = np.polyfit(log_lags, log_rs, 1)
+    return float(np.clip(poly[0], 0.0, 1.0))
+
+
+def _best(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hurst R/S: bucle vs reshape por lotes")
+    parser.add_argument("--spreads", type=int, default=500)
+    parser.add_argument("--bars", type=int, default=399, help="longitud (diferencias de 400 velas)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    X = rng.normal(size=(args.spreads, args.bars))
+    X[0, : args.bars // 3] = 0.0                      # bloques planos: ruta de máscara
+
+    t_loop, ref = _best(lambda: np.array([hurst_loop(x) for x in X]), args.repeat)
+    t_one, one = _best(lambda: np.array([hurst_batch(x)[0] for x in X]), args.repeat)
+    t_batch, batch = _best(lambda: hurst_batch(X), args.repeat)
+
+    same = np.array_equal(ref, one, equal_nan=True) and np.array_equal(ref, batch, equal_nan=True)
+    print(f"Hurst R/S — {args.spreads} spreads × {args.bars} barras (mejor de {args.repeat})")
+    print(f"  bucle por bloques:        {t_loop * 1e3:9.1f} ms")
+    print(f"  reshape, spread a spread: {t_one * 1e3:9.1f} ms   x{t_loop / t_one:5.1f}")
+    print(f"  reshape, lote 2-D:        {t_batch * 1e3:9.1f} ms   x{t_loop / t_batch:5.1f}")
+    print(f"  resultados idénticos bit a bit: {'sí' if same else 'NO'}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,9 +4,9 @@ close_all.py — Cierre manual controlado de todas las posiciones abiertas en dY
 Reemplaza ABORT_ALL_POSITIONS=True. Úsalo SOLO cuando quieras limpiar manualmente.
 
 Uso:
-    python close_all.py           # cierra todo y limpia bot_agents.json
+    python close_all.py           # cierra todo y limpia el registro de pares
     python close_all.py --dry-run # muestra qué cerraría sin ejecutar
-    python close_all.py --keep-json  # cierra en dYdX pero no toca bot_agents.json
+    python close_all.py --keep-json  # cierra en dYdX pero no toca el registro de pares
 
 Qué hace:
     1. Conecta a dYdX
@@ -14,13 +14,13 @@ Qué hace:
     3. Pide confirmación (excepto con --yes)
     4. Cierra cada posición con reduce_only=True (MARKET IOC)
     5. Espera confirmación de fill
-    6. Limpia bot_agents.json (elimina registros cuyas posiciones ya no existen)
+    6. Limpia el registro de pares (func_position_store, antes bot_agents.json):
+       elimina registros cuyas posiciones ya no existen
     7. Envía resumen por Telegram
 """
 
 import asyncio
 import argparse
-import json
 import os
 import sys
 
@@ -34,8 +34,7 @@ from func_utils import format_number
 from v4_proto.dydxprotocol.clob.order_pb2 import Order
 from constants import WALLET_ADDRESS, UNMANAGED_IGNORE_MARKETS, TAKER_FEE_BPS
 from func_pnl import leg_pnl
-
-JSON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot_agents.json")
+from func_position_store import get_position_store
 
 
 def _sf(x, d=0.0):
@@ -126,7 +125,7 @@ def emit_synthetic_trade_closed_for_pair(record: dict, positions: dict, closed_m
     to audit_run.py and session_summary accounting.
 
     The pair is considered closed if AT LEAST one of its legs was closed.
-    We compute pnl_gross using the entry prices stored in bot_agents.json
+    We compute pnl_gross using the entry prices stored in the position store
     and the oracle prices at close (captured before the orders went out).
     """
     m1 = record.get("market_1", "")
@@ -210,11 +209,8 @@ def clean_bot_agents_json(closed_markets: set, positions: dict):
     Also emits a synthetic trade_closed event per affected pair so that
     audit_run.py and session_summary include close_all PnL.
     """
-    try:
-        with open(JSON_PATH, "r") as f:
-            records = json.load(f)
-    except Exception:
-        records = []
+    store = get_position_store()
+    records = store.all()
 
     kept = []
     removed = 0
@@ -237,11 +233,10 @@ def clean_bot_agents_json(closed_markets: set, positions: dict):
         else:
             kept.append(r)
 
-    tmp = JSON_PATH + ".tmp"
-    with open(tmp, "w") as f:
-        json.dump(kept, f, indent=2)
-    os.replace(tmp, JSON_PATH)
-    print(f"  bot_agents.json: removed {removed} records, kept {len(kept)}")
+    # Sólo se borran las filas de los pares cerrados (el bot puede seguir
+    # escribiendo en el store desde su proceso).
+    store.apply(records, kept)
+    print(f"  position store: removed {removed} records, kept {len(kept)}")
     return removed
 
 
@@ -309,7 +304,7 @@ async def run(args):
 
     # ── Clean JSON ──
     if not dry_run and not keep_json and closed_ok:
-        print("\nCleaning bot_agents.json...")
+        print("\nCleaning position store...")
         clean_bot_agents_json(set(closed_ok), positions)
 
     # ── Telegram summary ──
@@ -343,7 +338,7 @@ def main():
     parser.add_argument("--yes", "-y", action="store_true",
                         help="Skip confirmation prompt")
     parser.add_argument("--keep-json", action="store_true",
-                        help="Don't modify bot_agents.json after closing")
+                        help="Don't modify the position store after closing")
     parser.add_argument("--skip", nargs="*", default=[],
                         help="Additional markets to skip (space-separated, e.g. BTC-USD ETH-USD)")
     args = parser.parse_args()
@@ -1,3 +1,5 @@
+import os
+
 from decouple import config
 
 # ===== Loop / Cadencia =====
@@ -396,6 +398,19 @@ USD_MIN_COLLATERAL = 150     # 2026-07-10: 70 → 150. Bot pausa nuevas entries
 #     0 → desactivado (sin filtro, escanea todos)
 MAX_COINT_PAIRS_TO_SCAN = 150
 
+# 2026-10-18: la fase 1 pide velas y spreads UNA vez por mercado único y en
+# paralelo (antes: 3 awaits en serie por par). Semáforo propio del scan; el
+# RateGovernor del IndexerClient sigue admitiendo cada request.
+ENTRY_PREFETCH_CONCURRENCY = 16
+
+# 2026-10-18: scan incremental (func_entry_cache). Entre scans sólo se
+# recalculan los pares con un mercado "sucio": vela nueva, oracle movido más
+# de ENTRY_DIRTY_ORACLE_BPS o top del libro distinto. Recálculo completo al
+# cambiar el CSV y, como red de seguridad, cada ENTRY_DIRTY_MAX_AGE_S.
+ENTRY_DIRTY_SCAN_ENABLED = True
+ENTRY_DIRTY_ORACLE_BPS = 5.0
+ENTRY_DIRTY_MAX_AGE_S = 900
+
 # Thresholds - Closing
 CLOSE_AT_ZSCORE_CROSS = True
 
@@ -419,6 +434,18 @@ SL_COOLDOWN_ENABLED = True
 SL_COOLDOWN_MIN_HOURS = 2.0          # mínimo 2h de cooldown tras SL
 SL_COOLDOWN_HALFLIFE_MULT = 0.75     # o 75% del half_life si es mayor
 
+# ===== Pair-level failure cooldown =====
+# 2026-10-18: movidos aquí desde func_entry_pairs; func_cooldowns los necesita
+# para migrar pair_fail_cooldowns.json al registro en memoria.
+# Si un par falla PAIR_FAIL_COOLDOWN_THRESHOLD veces seguidas (fills=0 o partial
+# en ambas legs), se marca en cooldown por PAIR_FAIL_COOLDOWN_HOURS horas.
+PAIR_FAIL_COOLDOWN_THRESHOLD = 3    # fallos consecutivos antes de cooldown
+PAIR_FAIL_COOLDOWN_HOURS = 4.0      # horas de cooldown tras threshold
+
+# Cooldown de un par tras una apertura mala (func_position_guard). Aquí y no en
+# el guard para que func_cooldowns pueda migrar pair_cooldowns.json.
+COOLDOWN_MINUTES_AFTER_BAD_OPEN = 180
+
 # Wallet Address
 #testnet: WALLET_ADDRESS = "dydx1napkzyjp3rauk5p787r9sfhvs74r8e357a30n5"
 WALLET_ADDRESS = "dydx1svqmveffvuan4p3w6r3kgc474hn07nqdrdue48"
@@ -453,6 +480,69 @@ NODE = NODE_MAINNET if MODE == "PRODUCTION" else NODE_TESTNET
 INDEXER = INDEXER_MAINNET if MODE == "PRODUCTION" else INDEXER_TESTNET
 WEBSOCKET = WEBSOCKET_MAINNET if MODE == "PRODUCTION" else WEBSOCKET_TESTNET
 
+# ===== Indexer HTTP transport =====
+# Un único httpx.AsyncClient por IndexerClient (keep-alive + HTTP/2 si `h2`
+# está instalado). Antes cada GET abría y cerraba su propia conexión → un
+# handshake TCP+TLS completo por vela/orderbook/subaccount. Con el pool las
+# conexiones se reutilizan entre el scan de entrada y el loop de exits.
+INDEXER_HTTP2 = True
+INDEXER_MAX_CONNECTIONS = 20
+INDEXER_MAX_KEEPALIVE_CONNECTIONS = 10
+INDEXER_KEEPALIVE_EXPIRY_S = 30.0
+
+# ===== Indexer rate governor (AIMD) =====
+# Un único governor por proceso regula TODO el tráfico al indexer (velas,
+# orderbooks, subaccount, fills). Reemplaza los sleeps/backoffs a mano
+# (BATCH_SIZE=3 + BATCH_SLEEP=1.5 en construct_market_prices, 0.05s + 0.5/1/2s
+# en get_candles_recent). Sube +1 de concurrencia cada N respuestas limpias y
+# recorta ×0.5 ante 429/5xx (respetando Retry-After).
+INDEXER_RATE_PER_S = 8.0          # ritmo inicial (requests/s)
+INDEXER_RATE_MAX_PER_S = 40.0     # techo del ritmo adaptativo
+INDEXER_MAX_IN_FLIGHT = 16        # techo de concurrencia (≤ INDEXER_MAX_CONNECTIONS)
+
+# ===== Tick snapshot (func_tick) =====
+# perpetualMarkets + subaccount se leen UNA vez por iteración del loop y se
+# comparten entre exits, KPIs, risk-off, reconcile, entradas y funding.
+# Cada orden enviada invalida el subaccount. Edad máxima tolerada del dato:
+TICK_SNAPSHOT_MAX_AGE_S = 15.0
+
+# ===== Indexer WebSocket (AsyncIndexerSocket) =====
+# Stream push del indexer sobre asyncio (el IndexerSocket del SDK bloquea el
+# loop con run_forever). Reconexión con backoff exponencial, re-suscripción
+# automática y detección de huecos en message_id → mensaje "resync".
+INDEXER_WS_PING_INTERVAL_S = 20.0
+INDEXER_WS_IDLE_TIMEOUT_S = 60.0    # sin frames en este tiempo → reconectar
+INDEXER_WS_RECONNECT_MAX_S = 30.0   # techo del backoff de reconexión
+INDEXER_STREAM_ENABLED = True       # False → todo por REST, como antes
+
+# ===== Order books locales (func_orderbook) =====
+# Libros L2 mantenidos por v4_orderbook: spread y top-of-book sin round trip.
+# Un mercado se suscribe la primera vez que se consulta; por encima del tope
+# se desuscribe el menos usado (LRU) y ese mercado vuelve a REST.
+ORDERBOOK_STREAM_MAX_MARKETS = 60
+
+# ===== Velas en streaming (func_candles) =====
+# Un ring buffer por mercado (RESOLUTION), sembrado una vez por REST y
+# actualizado por v4_candles. get_candles_recent devuelve una vista sin copia.
+CANDLE_RING_CAPACITY = 100          # = limit del fetch REST
+CANDLE_STREAM_MAX_MARKETS = 160     # universo top-150 pares ≈ <160 mercados
+
+# ===== Estado de cuenta en streaming (func_account) =====
+# v4_subaccounts: posiciones, órdenes por clientId y fills por orderId.
+# El audit espera el fill por push hasta este timeout antes de caer al
+# polling REST de siempre (get_real_fill_details con backoff).
+ACCOUNT_STREAM_FILL_TIMEOUT_S = 10.0
+
+# ===== Almacén columnar de velas (func_price_store) =====
+# Histórico (ts, close) por mercado en disco, append-only y leído por memmap.
+# Lo comparten construct_market_prices, los backtests y diagnose_coint.
+PRICE_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "price_store")
+# construct_market_prices: ventana de la tabla de cointegración (= 4 × 100h
+# de get_ISO_times) y top-up incremental (sólo velas posteriores a la última
+# guardada). False → re-descarga completa en cada refresh, como antes.
+PRICE_HISTORY_BARS = 400
+PRICE_REFRESH_INCREMENTAL = True
+
 UNMANAGED_CLOSE_MAX_ATTEMPTS = 2
 UNMANAGED_ALERT_COOLDOWN_SECONDS = 300
 
@@ -472,6 +562,27 @@ UNMANAGED_ALERT_COOLDOWN_SECONDS = 300
 # Ejemplos permitidos: WIF/ENA (1.81), AVAX/ENS (1.44), LINK/MANA (107)
 HEDGE_RATIO_LOG_MAX = 3.5    # máximo log10 del |hedge ratio|
 
+# PRICE RATIO: filtro contra pares con asimetría extrema de precio.
+# 50 era el valor inicial (commit 37659ea).
+#
+# 2026-05-26: subido de 50 a 200. Análisis del log 2026-05-25 mostró que
+# MAX=50 filtraba 33 de 144 pares del CSV (23%) — incluyendo pares con
+# precios diversos pero hedge_ratio sano (ya protegido por HEDGE_RATIO_LOG_MAX
+# = 3.5). MAX=200 permite pares hasta ratio 200 (ej. SOL $150 / mid-cap $1).
+# Pares con ratio > 200 (mostly BTC/altcoin nano-cap) siguen filtrados, lo
+# cual es correcto: ahí el min order size de dYdX hace imposible operar.
+# La protección real contra pares espurios sigue siendo HEDGE_RATIO_LOG_MAX.
+# 2026-10-18: también lo aplica la etapa 1 de func_cointegration (último
+# precio de la matriz), así el CSV ya no trae pares que el scan descartaría.
+MAX_PRICE_RATIO = 200.0
+
+# RETURN CORRELATION (etapa 1 de func_cointegration): pares cuya correlación
+# de retornos horarios no llega a este mínimo no se someten al test ADF.
+# Conservador a propósito: en crypto casi todo correlaciona >0.3 con el
+# mercado; lo que cae por debajo son pares sin relación económica cuyo
+# "cointegración" sería espuria. 0 = desactivado.
+COINT_MIN_RETURN_CORR = 0.3
+
 # HURST EXPONENT: filtra spreads que NO son mean-reverting.
 # IMPORTANTE: se aplica a las DIFERENCIAS del spread (diff = spread[t] - spread[t-1]).
 # Sobre las diferencias, un spread mean-reverting tiene autocorrelación negativa → H < 0.5.
@@ -485,6 +596,30 @@ HEDGE_RATIO_LOG_MAX = 3.5    # máximo log10 del |hedge ratio|
 HURST_MAX = 0.52             # rechazar spread si H_diff >= este valor (sobre diferencias)
 HURST_MIN_BARS = 40          # mínimo de barras para calcular Hurst confiablemente
 
+# Refresh de cointegración en un pool de procesos (store_cointegration_results_async):
+# la matriz de precios va a shared memory y los pares se reparten en chunks.
+COINT_POOL_WORKERS = 0       # 0 = automático (nº de CPUs - 1, mínimo 1)
+COINT_CHUNK_PAIRS = 2000     # pares por tarea del pool (progreso tras cada chunk)
+
+# Cointegración incremental entre refreshes (func_coint_rls): sumas suficientes
+# por par actualizadas con cada vela nueva; sólo los pares cuyo Dickey-Fuller
+# aproximado cruza COINT_RLS_RETEST_T se re-testean en exacto y se reescriben
+# en el CSV. Olvido λ: peso λ^edad (0.9975 → memoria efectiva ≈ 400 velas,
+# la ventana de PRICE_HISTORY_BARS). 1.0 = sin olvido.
+COINT_RLS_ENABLED = True
+COINT_RLS_INTERVAL_MIN = 60  # cada cuánto se traen velas nuevas y se actualiza
+COINT_RLS_FORGETTING = 0.9975
+COINT_RLS_RETEST_T = -3.34   # ≈ valor crítico 5% Engle-Granger (N=2, ~400 obs)
+
+# Hedge ratio dinámico (func_kalman): filtro de Kalman por par, actualizado con
+# cada vela cerrada en el mismo ciclo que la cointegración incremental y tras
+# cada refresh completo; persistente en kalman_hedges.json. La entrada usa el β
+# actual en vez del estático del CSV (si el estado está caliente y en rango).
+# δ = varianza relativa del random walk de β por vela (1e-6 → ~0.1%/vela).
+KALMAN_HEDGE_ENABLED = True
+KALMAN_HEDGE_DELTA = 1e-6
+KALMAN_HEDGE_MIN_BARS = 100  # velas aplicadas antes de usar el β del filtro
+
 # ===== Market Blacklist =====
 # Mercados que jamás deben usarse como leg en ningún par.
 # Criterio de inclusión: profit_factor < 0.5 en backtests de ≥3 trades,
@@ -2,8 +2,9 @@
 diagnose_coint.py
 =================
 Diagnóstico rápido del proceso de cointegración SIN conectar a dYdX.
-Usa el df_market_prices guardado en un archivo pickle (si existe),
-o lo reconstruye leyendo el CSV actual de precios históricos.
+Usa las últimas PRICE_HISTORY_BARS velas del almacén columnar (func_price_store,
+lo llena cada refresh de cointegración del bot); si está vacío, el pickle
+legacy market_prices.pkl (si existe).
 
 Si el CSV está vacío, reabre desde la perspectiva de los filtros:
   ¿cuántos pares pasan el test de cointegración?
@@ -189,19 +190,25 @@ def main():
     if args.csv_only:
         return
 
-    # Try to load saved prices pickle first (fast)
-    if os.path.exists(PRICES_PICKLE):
+    # 2026-10-18: almacén columnar primero (mismo histórico que usa el bot)
+    from constants import PRICE_HISTORY_BARS
+    from func_price_store import get_price_store
+    store = get_price_store()
+    if store.markets():
+        df_prices = store.frame(last_n=PRICE_HISTORY_BARS)
+        df_prices = df_prices.dropna(axis=1)
+        print(f"\nLoaded {len(df_prices.columns)} markets × {len(df_prices)} candles from {store.path}")
+        simulate_filters(df_prices)
+    elif os.path.exists(PRICES_PICKLE):
         import pandas as pd
         print(f"\nLoading market prices from {PRICES_PICKLE}...")
         df_prices = pd.read_pickle(PRICES_PICKLE)
         print(f"Loaded {len(df_prices.columns)} markets × {len(df_prices)} candles")
         simulate_filters(df_prices)
     else:
-        print(f"\n⚠️  No prices pickle found at {PRICES_PICKLE}")
-        print("To run the full filter simulation, save market prices first:")
-        print("  In main.py, after construct_market_prices(), add:")
-        print("    df_market_prices.to_pickle('market_prices.pkl')")
-        print("  Then rerun the bot once and run this script.")
+        print(f"\n⚠️  Price store is empty ({store.path}) and no legacy pickle found")
+        print("To run the full filter simulation, let the bot run one cointegration")
+        print("refresh (or python force_coint_refresh.py) and rerun this script.")
         print("\nFor now, run with --csv-only to inspect the current CSV:")
         print("  python diagnose_coint.py --csv-only")
 
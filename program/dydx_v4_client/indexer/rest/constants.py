@@ -68,6 +68,32 @@ class TradingRewardAggregationPeriod:
 
 # API Defaults
 DEFAULT_API_TIMEOUT = 3_000
+DEFAULT_HTTP2 = True
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+# Rate governor defaults (AIMD on 429/5xx)
+DEFAULT_GOVERNOR_RATE = 8.0
+DEFAULT_GOVERNOR_BURST = 8.0
+DEFAULT_GOVERNOR_MIN_RATE = 0.5
+DEFAULT_GOVERNOR_MAX_RATE = 40.0
+DEFAULT_GOVERNOR_INITIAL_CONCURRENCY = 4
+DEFAULT_GOVERNOR_MIN_CONCURRENCY = 1
+DEFAULT_GOVERNOR_MAX_CONCURRENCY = 16
+DEFAULT_GOVERNOR_INCREASE_EVERY = 20
+DEFAULT_GOVERNOR_DECREASE_FACTOR = 0.5
+DEFAULT_GOVERNOR_MAX_RETRIES = 3
+DEFAULT_GOVERNOR_BACKOFF_BASE = 0.5
+DEFAULT_GOVERNOR_BACKOFF_MAX = 8.0
+
+# Indexer websocket defaults (AsyncIndexerSocket)
+DEFAULT_WS_PING_INTERVAL = 20.0
+DEFAULT_WS_PING_TIMEOUT = 20.0
+DEFAULT_WS_IDLE_TIMEOUT = 60.0
+DEFAULT_WS_RECONNECT_BASE = 0.5
+DEFAULT_WS_RECONNECT_MAX = 30.0
+DEFAULT_WS_MAX_QUEUE = 10_000
 MAX_MEMO_CHARACTERS = 256
 SHORT_BLOCK_WINDOW = 20
 SHORT_BLOCK_FORWARD = 15
@@ -1,25 +1,86 @@
-from typing import Optional
+from typing import Dict, Optional
 
-from .constants import DEFAULT_API_TIMEOUT
+from .constants import (
+    DEFAULT_API_TIMEOUT,
+    DEFAULT_HTTP2,
+    DEFAULT_KEEPALIVE_EXPIRY,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+)
 from .modules.account import AccountClient
 from .modules.markets import MarketsClient
 from .modules.status import StatusClient
 from .modules.vaults import MegaVaultClient
 from .modules.affiliate import AffiliateClient
+from .shared.governor import RateGovernor
+from .shared.rest import HttpPool
 
 
 class IndexerClient:
     """
     Client for Indexer
+
+    All modules share a single pooled HTTP connection (keep-alive, HTTP/2 when
+    available) and a single adaptive rate governor, so every caller in the
+    process draws from the same request budget. Call `aclose()` (or use
+    `async with`) when done.
     """
 
-    def __init__(self, host: str, api_timeout: Optional[float] = None):
+    def __init__(
+        self,
+        host: str,
+        api_timeout: Optional[float] = None,
+        http2: bool = DEFAULT_HTTP2,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        governor: Optional[RateGovernor] = None,
+    ):
         api_timeout = api_timeout or DEFAULT_API_TIMEOUT
-        self._markets = MarketsClient(host, api_timeout)
-        self._account = AccountClient(host, api_timeout)
-        self._status = StatusClient(host, api_timeout)
-        self._megavault = MegaVaultClient(host, api_timeout)
-        self._affiliates = AffiliateClient(host, api_timeout)
+        self._pool = HttpPool(
+            api_timeout,
+            http2=http2,
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+            governor=governor,
+        )
+        self._markets = MarketsClient(host, api_timeout, pool=self._pool)
+        self._account = AccountClient(host, api_timeout, pool=self._pool)
+        self._status = StatusClient(host, api_timeout, pool=self._pool)
+        self._megavault = MegaVaultClient(host, api_timeout, pool=self._pool)
+        self._affiliates = AffiliateClient(host, api_timeout, pool=self._pool)
+
+    async def __aenter__(self) -> "IndexerClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """
+        Close the shared HTTP connection pool.
+        """
+        await self._pool.aclose()
+
+    def http_stats(self, reset: bool = False) -> Dict[str, Dict[str, float]]:
+        """
+        Per-endpoint request counters since start (or since the last reset).
+
+        Returns:
+            {endpoint: {count, errors, avg_ms, max_ms}}
+        """
+        snapshot = self._pool.stats.snapshot()
+        if reset:
+            self._pool.stats.reset()
+        return snapshot
+
+    @property
+    def governor(self) -> RateGovernor:
+        """
+        The rate governor shared by all modules of this client.
+        """
+        return self._pool.governor
 
     @property
     def markets(self) -> MarketsClient:
@@ -0,0 +1,184 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from dydx_v4_client.indexer.rest.constants import (
+    DEFAULT_GOVERNOR_BACKOFF_BASE,
+    DEFAULT_GOVERNOR_BACKOFF_MAX,
+    DEFAULT_GOVERNOR_BURST,
+    DEFAULT_GOVERNOR_DECREASE_FACTOR,
+    DEFAULT_GOVERNOR_INCREASE_EVERY,
+    DEFAULT_GOVERNOR_INITIAL_CONCURRENCY,
+    DEFAULT_GOVERNOR_MAX_CONCURRENCY,
+    DEFAULT_GOVERNOR_MAX_RATE,
+    DEFAULT_GOVERNOR_MAX_RETRIES,
+    DEFAULT_GOVERNOR_MIN_CONCURRENCY,
+    DEFAULT_GOVERNOR_MIN_RATE,
+    DEFAULT_GOVERNOR_RATE,
+)
+
+THROTTLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class RateGovernor:
+    """
+    Adaptive admission control for all requests of one IndexerClient.
+
+    Two limits apply to every request:
+      - a token bucket (`rate` requests/second, up to `burst` at once)
+      - a concurrency cap (requests in flight)
+
+    Both follow AIMD: after `increase_every` consecutive clean responses the
+    concurrency cap grows by 1 and the rate by `rate_step`; a 429/5xx halves
+    them (`decrease_factor`) and pauses new admissions for a backoff period
+    (or the server's Retry-After), so callers converge on the indexer's real
+    limit instead of hand-tuned sleeps.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_GOVERNOR_RATE,
+        burst: float = DEFAULT_GOVERNOR_BURST,
+        min_rate: float = DEFAULT_GOVERNOR_MIN_RATE,
+        max_rate: float = DEFAULT_GOVERNOR_MAX_RATE,
+        initial_concurrency: int = DEFAULT_GOVERNOR_INITIAL_CONCURRENCY,
+        min_concurrency: int = DEFAULT_GOVERNOR_MIN_CONCURRENCY,
+        max_concurrency: int = DEFAULT_GOVERNOR_MAX_CONCURRENCY,
+        increase_every: int = DEFAULT_GOVERNOR_INCREASE_EVERY,
+        decrease_factor: float = DEFAULT_GOVERNOR_DECREASE_FACTOR,
+        max_retries: int = DEFAULT_GOVERNOR_MAX_RETRIES,
+        backoff_base: float = DEFAULT_GOVERNOR_BACKOFF_BASE,
+        backoff_max: float = DEFAULT_GOVERNOR_BACKOFF_MAX,
+    ):
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.rate = min(max(float(rate), self.min_rate), self.max_rate)
+        self.rate_step = max(self.rate / 10.0, 0.1)
+        self.burst = float(burst)
+        self.min_concurrency = int(min_concurrency)
+        self.max_concurrency = int(max_concurrency)
+        self.concurrency = min(
+            max(int(initial_concurrency), self.min_concurrency), self.max_concurrency
+        )
+        self.increase_every = int(increase_every)
+        self.decrease_factor = float(decrease_factor)
+        self.max_retries = int(max_retries)
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._in_flight = 0
+        self._clean_streak = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._cond: Optional[asyncio.Condition] = None
+
+        self.throttled = 0
+        self.admitted = 0
+
+    def _condition(self) -> asyncio.Condition:
+        # Created lazily so the governor binds to the loop that first uses it.
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._last_refill = now
+
+    def _admission_delay(self, now: float) -> float:
+        """
+        Seconds until a request may be admitted; 0.0 means admit now.
+        """
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._refill(now)
+        if self._tokens < 1.0:
+            return (1.0 - self._tokens) / self.rate
+        return 0.0
+
+    async def acquire(self) -> None:
+        cond = self._condition()
+        async with cond:
+            while True:
+                if self._in_flight >= self.concurrency:
+                    delay = 1.0
+                else:
+                    delay = self._admission_delay(time.monotonic())
+                    if delay <= 0:
+                        break
+                try:
+                    await asyncio.wait_for(cond.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._tokens -= 1.0
+            self._in_flight += 1
+            self.admitted += 1
+
+    async def release(self, status_code: Optional[int], retry_after: Optional[float] = None) -> None:
+        """
+        Return the slot and feed the outcome back. `status_code` is None for
+        transport errors, which neither grow nor shrink the limits.
+        """
+        # State is updated before touching the lock so a cancelled caller
+        # can never leak an in-flight slot.
+        self._in_flight = max(0, self._in_flight - 1)
+        if status_code in THROTTLE_STATUS_CODES:
+            self._on_throttle(retry_after)
+        elif status_code is not None and status_code < 400:
+            self._on_success()
+        cond = self._condition()
+        async with cond:
+            cond.notify_all()
+
+    def _on_success(self) -> None:
+        self._clean_streak += 1
+        if self._clean_streak >= self.increase_every:
+            self._clean_streak = 0
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self.rate = min(self.max_rate, self.rate + self.rate_step)
+
+    def _on_throttle(self, retry_after: Optional[float]) -> None:
+        now = time.monotonic()
+        self.throttled += 1
+        self._clean_streak = 0
+        # A burst of 429s from requests that were already in flight is one
+        # congestion signal, not N: cut at most once per backoff window.
+        if now - self._last_decrease >= self.backoff_base:
+            self._last_decrease = now
+            self.concurrency = max(
+                self.min_concurrency, int(self.concurrency * self.decrease_factor)
+            )
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        pause = retry_after if retry_after is not None else self.backoff_base
+        self._paused_until = max(self._paused_until, now + min(pause, self.backoff_max))
+        self._tokens = min(self._tokens, 0.0)
+
+    def retry_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Backoff before retry number `attempt` (0-based) of a throttled request.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return min(self.backoff_base * (2 ** attempt), self.backoff_max)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "rate": round(self.rate, 2),
+            "concurrency": self.concurrency,
+            "in_flight": self._in_flight,
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+        }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
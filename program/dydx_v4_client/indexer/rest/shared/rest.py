@@ -1,25 +1,226 @@
+import asyncio
+import time
 from typing import Any, Dict, Optional
 
 import httpx
 
-from dydx_v4_client.indexer.rest.constants import DEFAULT_API_TIMEOUT
+from dydx_v4_client.indexer.rest.constants import (
+    DEFAULT_API_TIMEOUT,
+    DEFAULT_HTTP2,
+    DEFAULT_KEEPALIVE_EXPIRY,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+)
+from dydx_v4_client.indexer.rest.shared.governor import (
+    THROTTLE_STATUS_CODES,
+    RateGovernor,
+    parse_retry_after,
+)
 from dydx_v4_client.indexer.rest.utils.request_helpers import generate_query_path
 
 
+def _h2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def endpoint_key(request_path: str) -> str:
+    """
+    Collapse a request path into its endpoint family for latency counters,
+    e.g. "/v4/candles/perpetualMarkets/BTC-USD" -> "/v4/candles".
+    """
+    parts = [p for p in request_path.split("?", 1)[0].split("/") if p]
+    return "/" + "/".join(parts[:2])
+
+
+class RequestStats:
+    """
+    Per-endpoint request counters: count, errors, total and max latency.
+    """
+
+    def __init__(self):
+        self._by_endpoint: Dict[str, Dict[str, float]] = {}
+
+    def _entry(self, endpoint: str) -> Dict[str, float]:
+        entry = self._by_endpoint.get(endpoint)
+        if entry is None:
+            entry = {"count": 0, "errors": 0, "coalesced": 0, "total_s": 0.0, "max_s": 0.0}
+            self._by_endpoint[endpoint] = entry
+        return entry
+
+    def record_coalesced(self, endpoint: str) -> None:
+        self._entry(endpoint)["coalesced"] += 1
+
+    def record(self, endpoint: str, elapsed_s: float, ok: bool) -> None:
+        entry = self._entry(endpoint)
+        entry["count"] += 1
+        if not ok:
+            entry["errors"] += 1
+        entry["total_s"] += elapsed_s
+        if elapsed_s > entry["max_s"]:
+            entry["max_s"] = elapsed_s
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns {endpoint: {count, errors, coalesced, avg_ms, max_ms}}.
+        """
+        out = {}
+        for endpoint, e in self._by_endpoint.items():
+            count = e["count"] or 1
+            out[endpoint] = {
+                "count": e["count"],
+                "errors": e["errors"],
+                "coalesced": e["coalesced"],
+                "avg_ms": round(e["total_s"] / count * 1000.0, 1),
+                "max_ms": round(e["max_s"] * 1000.0, 1),
+            }
+        return out
+
+    def reset(self) -> None:
+        self._by_endpoint.clear()
+
+
+class HttpPool:
+    """
+    Long-lived httpx.AsyncClient shared by every RestClient of one IndexerClient.
+
+    Keeps TCP/TLS connections alive between requests (and multiplexes them over
+    HTTP/2 when the optional `h2` package is installed), instead of paying a
+    fresh handshake per call. The underlying client is created lazily on first
+    use and must be released with `aclose()`.
+
+    Every request is admitted through a shared RateGovernor; throttled GETs
+    (429/5xx) are retried here so callers need no retry loops of their own.
+
+    GETs are single-flight: concurrent callers asking for the same URL await
+    one shared request and receive the same decoded JSON object, which must
+    therefore be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        api_timeout: Optional[float] = None,
+        http2: bool = DEFAULT_HTTP2,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        governor: Optional[RateGovernor] = None,
+    ):
+        self.api_timeout = api_timeout or DEFAULT_API_TIMEOUT
+        self.http2 = bool(http2) and _h2_available()
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.stats = RequestStats()
+        self.governor = governor if governor is not None else RateGovernor(
+            max_concurrency=max_connections
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[str, "asyncio.Task"] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.api_timeout,
+            )
+        return self._client
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client is None or self._client.is_closed
+
+    async def request(
+        self, method: str, url: str, endpoint: str, retry: bool = False, **kwargs
+    ) -> httpx.Response:
+        attempt = 0
+        while True:
+            await self.governor.acquire()
+            t0 = time.perf_counter()
+            status_code = None
+            retry_after = None
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                status_code = response.status_code
+                if status_code in THROTTLE_STATUS_CODES:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            finally:
+                self.stats.record(
+                    endpoint,
+                    time.perf_counter() - t0,
+                    status_code is not None and status_code < 400,
+                )
+                await self.governor.release(status_code, retry_after)
+            if (
+                retry
+                and status_code in THROTTLE_STATUS_CODES
+                and attempt < self.governor.max_retries
+            ):
+                await asyncio.sleep(self.governor.retry_delay(attempt, retry_after))
+                attempt += 1
+                continue
+            response.raise_for_status()
+            return response
+
+    async def get_json(self, url: str, endpoint: str, **kwargs) -> Any:
+        """
+        GET `url` and decode JSON, sharing one in-flight request between all
+        concurrent callers of the same URL.
+        """
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_json(url, endpoint, **kwargs))
+            self._inflight[url] = task
+            task.add_done_callback(lambda t, u=url: self._on_fetch_done(u, t))
+        else:
+            self.stats.record_coalesced(endpoint)
+        # shield: a cancelled caller must not cancel the fetch other callers await.
+        return await asyncio.shield(task)
+
+    async def _fetch_json(self, url: str, endpoint: str, **kwargs) -> Any:
+        response = await self.request("GET", url, endpoint, retry=True, **kwargs)
+        return response.json()
+
+    def _on_fetch_done(self, url: str, task: "asyncio.Task") -> None:
+        if self._inflight.get(url) is task:
+            del self._inflight[url]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller went away
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
 class RestClient:
-    def __init__(self, host: str, api_timeout: Optional[float] = None):
+    def __init__(
+        self,
+        host: str,
+        api_timeout: Optional[float] = None,
+        pool: Optional[HttpPool] = None,
+    ):
         if host.endswith("/"):
             self.host = host[:-1]
         else:
             self.host = host
         self.api_timeout = api_timeout or DEFAULT_API_TIMEOUT
+        # Standalone clients (faucet, scripts) own a private pool.
+        self._owns_pool = pool is None
+        self.pool = pool if pool is not None else HttpPool(self.api_timeout)
 
     async def get(self, request_path: str, params: Dict = {}) -> Dict[str, Any]:
         url = f"{self.host}{generate_query_path(request_path, params)}"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, timeout=self.api_timeout)
-            response.raise_for_status()
-            return response.json()
+        return await self.pool.get_json(
+            url, endpoint_key(request_path), timeout=self.api_timeout
+        )
 
     async def post(
         self,
@@ -29,9 +230,19 @@ class RestClient:
         headers: Dict = {},
     ) -> httpx.Response:
         url = f"{self.host}{generate_query_path(request_path, params)}"
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url, json=body, headers=headers, timeout=self.api_timeout
-            )
-            response.raise_for_status()
-            return response
+        return await self.pool.request(
+            "POST",
+            url,
+            endpoint_key(request_path),
+            json=body,
+            headers=headers,
+            timeout=self.api_timeout,
+        )
+
+    async def aclose(self) -> None:
+        """
+        Close the connection pool if this client owns it. Clients created by
+        IndexerClient share its pool and are closed through IndexerClient.aclose().
+        """
+        if self._owns_pool:
+            await self.pool.aclose()
@@ -0,0 +1,292 @@
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import websockets
+from websockets.asyncio.client import connect as ws_connect
+
+from dydx_v4_client.indexer.rest.constants import (
+    DEFAULT_WS_IDLE_TIMEOUT,
+    DEFAULT_WS_MAX_QUEUE,
+    DEFAULT_WS_PING_INTERVAL,
+    DEFAULT_WS_PING_TIMEOUT,
+    DEFAULT_WS_RECONNECT_BASE,
+    DEFAULT_WS_RECONNECT_MAX,
+)
+from dydx_v4_client.indexer.socket.websocket import (
+    Candles,
+    Markets,
+    OrderBook,
+    Subaccounts,
+    Trades,
+)
+
+RESYNC = "resync"
+
+_CLOSED = object()
+
+
+class _Resync(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AsyncIndexerSocket:
+    """
+    asyncio client for the indexer websocket, with the same channel API as
+    IndexerSocket (`order_book`, `trades`, `markets`, `candles`, `subaccounts`).
+
+    Usage:
+        socket = AsyncIndexerSocket(url)
+        socket.order_book.subscribe(id="BTC-USD")
+        await socket.connect()
+        async for message in socket:
+            ...
+
+    Subscriptions are remembered and replayed after every reconnect, so
+    callers subscribe once. The connection is dropped and re-established
+    (exponential backoff with jitter) when:
+      - the server closes it or the transport fails,
+      - no frame arrives for `idle_timeout` seconds (pings are handled by
+        the `websockets` library every `ping_interval`),
+      - a `message_id` is skipped (the indexer numbers every message of a
+        connection consecutively, so a gap means lost updates),
+      - the consumer falls `max_queue` messages behind.
+
+    Before reconnecting a `{"type": "resync", "reason": ...}` message is
+    yielded: state built from the stream (order books, positions) is stale
+    until the fresh `subscribed` snapshots arrive.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        ping_interval: Optional[float] = DEFAULT_WS_PING_INTERVAL,
+        ping_timeout: Optional[float] = DEFAULT_WS_PING_TIMEOUT,
+        idle_timeout: Optional[float] = DEFAULT_WS_IDLE_TIMEOUT,
+        reconnect_base: float = DEFAULT_WS_RECONNECT_BASE,
+        reconnect_max: float = DEFAULT_WS_RECONNECT_MAX,
+        max_queue: int = DEFAULT_WS_MAX_QUEUE,
+        check_sequence: bool = True,
+        **connect_kwargs,
+    ):
+        self.url = url
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.idle_timeout = idle_timeout
+        self.reconnect_base = float(reconnect_base)
+        self.reconnect_max = float(reconnect_max)
+        self.check_sequence = check_sequence
+        self.connect_kwargs = connect_kwargs
+
+        self.order_book = OrderBook(self)
+        self.trades = Trades(self)
+        self.markets = Markets(self)
+        self.candles = Candles(self)
+        self.subaccounts = Subaccounts(self)
+
+        self._subscriptions: Dict[Tuple[str, Optional[str]], str] = {}
+        self._inbox: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._outgoing: asyncio.Queue = asyncio.Queue()
+        self._ws = None
+        self._task: Optional[asyncio.Task] = None
+        self._connected: Optional[asyncio.Event] = None
+        self._closing = False
+        self._last_message_id: Optional[int] = None
+
+        self.stats = {
+            "connects": 0,
+            "reconnects": 0,
+            "messages": 0,
+            "gaps": 0,
+            "overflows": 0,
+            "last_message_ts": 0.0,
+        }
+
+    # ── channel API ────────────────────────────────────────────────────────
+    def send(self, message: str) -> None:
+        """
+        Called by the channel objects. Subscriptions are recorded for replay
+        on reconnect; the frame itself is sent now if a connection is open.
+        """
+        payload = json.loads(message)
+        key = (payload.get("channel"), payload.get("id"))
+        if payload.get("type") == "subscribe":
+            self._subscriptions[key] = message
+        elif payload.get("type") == "unsubscribe":
+            self._subscriptions.pop(key, None)
+        if self._ws is not None:
+            self._outgoing.put_nowait(message)
+
+    @property
+    def subscriptions(self) -> Dict[Tuple[str, Optional[str]], str]:
+        return dict(self._subscriptions)
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected is not None and self._connected.is_set()
+
+    # ── lifecycle ──────────────────────────────────────────────────────────
+    async def connect(self) -> "AsyncIndexerSocket":
+        """
+        Start the background connection task and return immediately; use
+        `wait_connected()` to block until the first handshake completes.
+        """
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._connected = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+        return self
+
+    async def wait_connected(self, timeout: Optional[float] = None) -> bool:
+        if self._connected is None:
+            return False
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._put_closed()
+
+    async def __aenter__(self) -> "AsyncIndexerSocket":
+        return await self.connect()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def __aiter__(self) -> "AsyncIndexerSocket":
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        item = await self._inbox.get()
+        if item is _CLOSED:
+            self._put_closed()  # let any other iterator stop too
+            raise StopAsyncIteration
+        return item
+
+    # ── connection loop ────────────────────────────────────────────────────
+    async def _run(self) -> None:
+        attempt = 0
+        while not self._closing:
+            reason = "disconnect"
+            try:
+                async with ws_connect(
+                    self.url,
+                    ping_interval=self.ping_interval,
+                    ping_timeout=self.ping_timeout,
+                    max_size=None,
+                    **self.connect_kwargs,
+                ) as ws:
+                    self.stats["connects"] += 1
+                    self._last_message_id = None
+                    while not self._outgoing.empty():
+                        self._outgoing.get_nowait()
+                    replay = list(self._subscriptions.values())
+                    self._ws = ws
+                    for message in replay:
+                        await ws.send(message)
+                    sender = asyncio.ensure_future(self._send_loop(ws))
+                    try:
+                        await self._recv_loop(ws)
+                    finally:
+                        sender.cancel()
+                # _recv_loop only returns when the server closed cleanly.
+            except _Resync as e:
+                reason = e.reason
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                reason = f"disconnect: {type(e).__name__}"
+            finally:
+                self._ws = None
+                if self._connected is not None:
+                    self._connected.clear()
+
+            if self._closing:
+                break
+            if self._connected_once:
+                attempt = 0
+            self.stats["reconnects"] += 1
+            self._deliver_resync(reason)
+            delay = min(self.reconnect_base * (2 ** attempt), self.reconnect_max)
+            attempt += 1
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+    @property
+    def _connected_once(self) -> bool:
+        # A connection that got past the handshake resets the backoff.
+        return self._last_message_id is not None
+
+    async def _send_loop(self, ws) -> None:
+        while True:
+            message = await self._outgoing.get()
+            await ws.send(message)
+
+    async def _recv_loop(self, ws) -> None:
+        while True:
+            try:
+                raw = await asyncio.wait_for(ws.recv(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                raise _Resync("idle")
+            except websockets.ConnectionClosedOK:
+                return
+            message = json.loads(raw)
+            self.stats["messages"] += 1
+            self.stats["last_message_ts"] = time.time()
+            self._check_sequence(message)
+            if message.get("type") == "connected" and self._connected is not None:
+                self._connected.set()
+            self._deliver(message)
+
+    def _check_sequence(self, message: Dict[str, Any]) -> None:
+        message_id = message.get("message_id")
+        if not isinstance(message_id, int):
+            return
+        last = self._last_message_id
+        self._last_message_id = message_id
+        if (
+            self.check_sequence
+            and last is not None
+            and message.get("type") != "connected"
+            and message_id != last + 1
+        ):
+            self.stats["gaps"] += 1
+            raise _Resync(f"gap: message_id {last} -> {message_id}")
+
+    # ── delivery ───────────────────────────────────────────────────────────
+    def _deliver(self, message: Dict[str, Any]) -> None:
+        try:
+            self._inbox.put_nowait(message)
+        except asyncio.QueueFull:
+            # The consumer fell behind: dropping one update silently would
+            # corrupt any book built from the stream, so start over.
+            self.stats["overflows"] += 1
+            self._drain_inbox()
+            raise _Resync("overflow")
+
+    def _deliver_resync(self, reason: str) -> None:
+        if self._inbox.full():
+            self._drain_inbox()
+        self._inbox.put_nowait({"type": RESYNC, "reason": reason})
+
+    def _drain_inbox(self) -> None:
+        while not self._inbox.empty():
+            self._inbox.get_nowait()
+
+    def _put_closed(self) -> None:
+        if self._inbox.full():
+            self._drain_inbox()
+        self._inbox.put_nowait(_CLOSED)
@@ -121,4 +121,8 @@ class IndexerSocket(websocket.WebSocketApp):
         )
 
     async def connect(self, sslopt={"cert_reqs": ssl.CERT_NONE}) -> None:
+        """
+        Blocks in `run_forever` until the socket closes, so it stalls any
+        running event loop. Use AsyncIndexerSocket from asyncio code.
+        """
         self.run_forever(sslopt=sslopt)
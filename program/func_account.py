@@ -0,0 +1,238 @@
+# func_account.py
+"""
+Estado de la cuenta (subaccount 0) alimentado por el canal v4_subaccounts.
+
+Problema que resuelve:
+  get_real_fill_details dormía 1.2s y luego hacía 4 llamadas REST (fills y
+  orders, con y sin ticker) por clientId; BotAgent.audit_with_retry lo repetía
+  con backoff (hasta ~60s), y get_live_positions se sondeaba tras cada commit
+  con sleeps de 2-3s. La confirmación de un fill tardaba 3-10s de polling.
+
+Diseño:
+  - AccountState: posiciones abiertas (market → dict), órdenes por id con
+    índice clientId → id, fills por orderId (deduplicados por fill id).
+    El snapshot `subscribed` siembra posiciones y órdenes abiertas; cada
+    `channel_data` (un mensaje por bloque con orders + fills + positions)
+    se fusiona encima.
+  - wait_for_order(client_id, market, timeout): future que se resuelve en
+    cuanto la orden llega a estado terminal (FILLED / CANCELED /
+    BEST_EFFORT_CANCELED) con todas sus filas de fill, devolviendo el mismo
+    dict que summarize_order_fills. Timeout → None y el llamador usa REST.
+  - Un "resync" deja el estado no-sincronizado (posiciones no se sirven) hasta
+    el nuevo snapshot; los fills perdidos en el corte los cubre el fallback REST.
+"""
+
+import asyncio
+from collections import deque
+
+from constants import WALLET_ADDRESS, TAKER_FEE_BPS
+from func_fill_audit import summarize_order_fills
+
+TERMINAL_ORDER_STATUSES = frozenset({"FILLED", "CANCELED", "BEST_EFFORT_CANCELED"})
+_MAX_TRACKED_ORDERS = 2000
+
+
+def _sf(x, d=0.0):
+    try:
+        return float(x)
+    except Exception:
+        return d
+
+
+class AccountState:
+    channel = "v4_subaccounts"
+
+    def __init__(self, stream, address: str = WALLET_ADDRESS, subaccount_number: int = 0):
+        self.stream = stream
+        self.address = address.strip()
+        self.subaccount_number = int(subaccount_number)
+        self.synced = False
+        self.positions = {}           # market → position dict
+        self.orders = {}              # order id → order dict
+        self.order_by_client = {}     # clientId (str) → order id
+        self.fills_by_order = {}      # order id → {fill id: fill}
+        self._order_ids = deque()     # orden de llegada, para acotar memoria
+        self._waiters = {}            # clientId → [(market, future), ...]
+        self.stats = {"messages": 0, "fills": 0, "resolved": 0, "timeouts": 0}
+        stream.register(self.channel, self)
+        stream.socket.subaccounts.subscribe(self.address, self.subaccount_number)
+
+    @property
+    def is_live(self) -> bool:
+        return self.synced and self.stream.is_live
+
+    # ── stream handlers ──────────────────────────────────────────────────
+    def on_message(self, message: dict):
+        if message.get("id") != f"{self.address}/{self.subaccount_number}":
+            return
+        mtype = message.get("type")
+        contents = message.get("contents")
+        if mtype == "subscribed" and isinstance(contents, dict):
+            sub = contents.get("subaccount") or {}
+            self.positions = {
+                m: dict(p) for m, p in (sub.get("openPerpetualPositions") or {}).items()
+                if abs(_sf(p.get("size"))) > 0
+            }
+            for order in contents.get("orders") or ():
+                self._apply_order(order)
+            self.synced = True
+        elif mtype in ("channel_data", "channel_batch_data"):
+            batch = contents if isinstance(contents, list) else [contents]
+            for c in batch:
+                if isinstance(c, dict):
+                    self._apply_update(c)
+        else:
+            return
+        self.stats["messages"] += 1
+        self._resolve_waiters()
+
+    def on_resync(self, reason: str):
+        self.synced = False
+
+    def _apply_update(self, contents: dict):
+        for pos in contents.get("perpetualPositions") or ():
+            market = pos.get("market")
+            if not market:
+                continue
+            if str(pos.get("status", "OPEN")).upper() != "OPEN" or abs(_sf(pos.get("size"))) <= 0:
+                self.positions.pop(market, None)
+            else:
+                self.positions[market] = {**self.positions.get(market, {}), **pos}
+        for order in contents.get("orders") or ():
+            self._apply_order(order)
+        for fill in contents.get("fills") or ():
+            order_id = str(fill.get("orderId") or "")
+            fill_id = str(fill.get("id") or "")
+            if not order_id or not fill_id:
+                continue
+            self.fills_by_order.setdefault(order_id, {})[fill_id] = fill
+            self.stats["fills"] += 1
+
+    def _apply_order(self, order: dict):
+        order_id = str(order.get("id") or "")
+        if not order_id:
+            return
+        if order_id not in self.orders:
+            self._order_ids.append(order_id)
+            while len(self._order_ids) > _MAX_TRACKED_ORDERS:
+                old = self._order_ids.popleft()
+                old_order = self.orders.pop(old, {})
+                self.fills_by_order.pop(old, None)
+                self.order_by_client.pop(str(old_order.get("clientId") or ""), None)
+        merged = {**self.orders.get(order_id, {}), **order}
+        self.orders[order_id] = merged
+        client_id = str(merged.get("clientId") or "")
+        if client_id:
+            self.order_by_client[client_id] = order_id
+
+    # ── queries ──────────────────────────────────────────────────────────
+    def order_result(self, client_id, market: str):
+        """
+        summarize_order_fills() de la orden si ya es terminal y tiene todas sus
+        filas de fill; None si aún no (o si el stream no la ha visto).
+        """
+        order_id = self.order_by_client.get(str(client_id))
+        if order_id is None:
+            return None
+        order = self.orders[order_id]
+        if str(order.get("status") or "").upper() not in TERMINAL_ORDER_STATUSES:
+            return None
+        fills = list(self.fills_by_order.get(order_id, {}).values())
+        filled = sum(_sf(f.get("size")) for f in fills)
+        if filled + 1e-12 < _sf(order.get("totalFilled")):
+            return None          # filas de fill aún en camino
+        return summarize_order_fills(
+            client_id, market, [order], fills, taker_fee_rate=TAKER_FEE_BPS,
+        )
+
+    async def wait_for_order(self, client_id, market: str, timeout: float):
+        """Espera a que la orden sea terminal; None si vence el timeout."""
+        result = self.order_result(client_id, market)
+        if result is not None:
+            return result
+        fut = asyncio.get_running_loop().create_future()
+        key = str(client_id)
+        self._waiters.setdefault(key, []).append((market, fut))
+        try:
+            return await asyncio.wait_for(fut, timeout=timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            return None
+        finally:
+            waiters = self._waiters.get(key, [])
+            if (market, fut) in waiters:
+                waiters.remove((market, fut))
+            if not waiters:
+                self._waiters.pop(key, None)
+
+    def _resolve_waiters(self):
+        for client_id, waiters in list(self._waiters.items()):
+            for market, fut in waiters:
+                if fut.done():
+                    continue
+                result = self.order_result(client_id, market)
+                if result is not None:
+                    fut.set_result(result)
+                    self.stats["resolved"] += 1
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "synced": self.synced, "positions": len(self.positions),
+                "orders": len(self.orders), "waiting": len(self._waiters)}
+
+
+_ACCOUNT = None
+
+
+def install_account_state(stream, **kwargs):
+    global _ACCOUNT
+    _ACCOUNT = AccountState(stream, **kwargs)
+    return _ACCOUNT
+
+
+def get_account_state():
+    return _ACCOUNT
+
+
+def stream_order_result(client_id, market: str):
+    """Resultado terminal de la orden según el stream, o None."""
+    if _ACCOUNT is None:
+        return None
+    return _ACCOUNT.order_result(client_id, market)
+
+
+async def wait_for_order(client_id, market: str, timeout: float):
+    """
+    Espera push del fill/cancel de la orden. None si no hay stream de cuenta
+    vivo o vence el timeout — el llamador debe caer a REST.
+    """
+    if _ACCOUNT is None or not _ACCOUNT.stream.is_live:
+        return None
+    return await _ACCOUNT.wait_for_order(client_id, market, timeout)
+
+
+async def await_orders_settled(orders, fallback_s: float):
+    """
+    Sustituto de los `asyncio.sleep(N)` "para que el indexer refleje la orden":
+    con stream de cuenta vivo vuelve en cuanto todas las (client_id, market)
+    son terminales (o a los fallback_s como máximo); sin stream, duerme fallback_s.
+    """
+    if _ACCOUNT is None or not _ACCOUNT.is_live:
+        await asyncio.sleep(fallback_s)
+        return
+    await asyncio.gather(*[
+        _ACCOUNT.wait_for_order(cid, market, fallback_s) for cid, market in orders
+    ])
+
+
+def stream_order_seen(client_id):
+    """True si el stream de cuenta (vivo) ya vio la orden; None si no hay stream."""
+    if _ACCOUNT is None or not _ACCOUNT.is_live:
+        return None
+    return str(client_id) in _ACCOUNT.order_by_client
+
+
+def stream_positions():
+    """{market: position} del stream si está sincronizado y vivo; si no, None."""
+    if _ACCOUNT is None or not _ACCOUNT.is_live:
+        return None
+    return _ACCOUNT.positions
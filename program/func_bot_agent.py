@@ -26,6 +26,7 @@ from func_private import (
     cancel_order_by_client_id,
 )
 from func_position_guard import get_live_positions
+from func_account import wait_for_order, await_orders_settled
 from func_public import get_market_spread_bps
 from constants import (
     SPREAD_GATE_MAX_PCT_OF_EDGE,
@@ -34,6 +35,7 @@ from constants import (
     MARKET_MAX_SLIPPAGE_BPS_ENTRY,
     MARKET_MAX_SLIPPAGE_BPS_FLATTEN,
     MAX_ENTRY_LEG_SPREAD_BPS,
+    ACCOUNT_STREAM_FILL_TIMEOUT_S,
 )
 
 # Techo DURO de liquidez: el ceiling efectivo de entrada es el MÁS ESTRECHO
@@ -188,6 +190,24 @@ class BotAgent:
         # con cap=1, así que es asumible).
         retries = self.audit_retries if retries is None else int(retries)
 
+        # 2026-10-18: con el stream v4_subaccounts el fill/cancel llega por push;
+        # sólo si no llega en ACCOUNT_STREAM_FILL_TIMEOUT_S se cae al polling REST.
+        streamed = await wait_for_order(client_id, market, timeout=ACCOUNT_STREAM_FILL_TIMEOUT_S)
+        if streamed is not None:
+            log_event({
+                "type": "audit",
+                "trace_id": self.trace_id,
+                "market": market,
+                "client_id": client_id,
+                "attempt": 0,
+                "retries": retries,
+                "source": "stream",
+                "status": (streamed.get("status_label") or "").upper(),
+                "filled_size": _sf(streamed.get("filled_size", 0)),
+                "fee_total": _sf(streamed.get("fee_total", 0)),
+            })
+            return streamed
+
         last = None
         base_delay = 0.6     # antes 0.35 → primer poll un poco mas tardío
         max_delay = 5.0      # antes 3.0  → polls 5,5,5,5,... una vez en el cap
@@ -728,7 +748,7 @@ class BotAgent:
                 })
                 try:
                     await cancel_order_by_client_id(self.node, cid)
-                    await asyncio.sleep(2.0)  # let cancel propagate
+                    await await_orders_settled([(cid, market)], 2.0)  # let cancel propagate
                 except Exception as ce:
                     log_event({
                         "type": "best_effort_cancel_error",
@@ -747,8 +767,14 @@ class BotAgent:
         # hacemos POLL con reintentos para captar el fill retrasado y NO
         # abandonar una posición viva.
         if "BEST_EFFORT_OPENED" in (status_m1, status_m2):
+            _be_orders = [
+                (cid, mkt) for st, cid, mkt in (
+                    (status_m1, cid_m1, self.market_1),
+                    (status_m2, cid_m2, self.market_2),
+                ) if st == "BEST_EFFORT_OPENED"
+            ]
             for _be_attempt in range(4):
-                await asyncio.sleep(2.0)
+                await await_orders_settled(_be_orders, 2.0)
                 try:
                     real_pos = await get_live_positions(self.indexer, min_usd=0.5)
                 except Exception as be:
@@ -804,7 +830,7 @@ class BotAgent:
             # como orphan para que el reconcile la cierre 30-60s después (peor
             # precio + "ENTRY BLOCKED" + ensucia stats con un falso trade).
             try:
-                await asyncio.sleep(2.0)
+                await await_orders_settled([(cid_m1, self.market_1), (cid_m2, self.market_2)], 2.0)
                 final_pos = await get_live_positions(self.indexer, min_usd=0.5)
                 stuck = []
                 for mkt, ref_px in ((self.market_1, self.base_price), (self.market_2, self.quote_price)):
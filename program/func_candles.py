@@ -0,0 +1,236 @@
+# func_candles.py
+"""
+Ring buffers de velas alimentados por el canal v4_candles.
+
+Problema que resuelve:
+  get_candles_recent volvía a bajar 100 velas de 1h por mercado cada vez que
+  vencía su TTL de 60s, aunque sólo cambiara la vela en curso. El loop de
+  exits, el scan de entradas y risk_off_close_worst_pair pasan todos por ahí.
+
+Diseño:
+  - CandleRing: ventana fija de `capacity` velas (timestamp, close) en arrays
+    float64 contiguos de 3×capacity. Una vela nueva se escribe al final y la
+    ventana avanza; al llegar al borde se compactan las últimas velas al
+    inicio (un memmove cada 2×capacity velas). closes() devuelve una VISTA
+    (sin copia, sólo-lectura) en orden cronológico. La vela en curso se
+    sobrescribe in place, así que una vista ya entregada ve el precio vivo;
+    una vela nueva nunca pisa una vista ya entregada antes de `capacity`
+    velas (a diferencia de un anillo circular, que pisaría el slot más viejo).
+  - CandleStreamManager: un anillo por mercado pedido, sembrado UNA vez por
+    REST (get_candles_recent) y luego actualizado por el stream. Suscripción
+    perezosa + LRU como los order books.
+  - Huecos: si el stream se corta (resync) o llega una vela que salta más de
+    una resolución, el anillo queda `stale`. El snapshot `subscribed` de la
+    reconexión rellena el hueco si lo cubre; si no, la siguiente llamada a
+    get_candles_recent re-siembra por REST.
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from constants import RESOLUTION, CANDLE_STREAM_MAX_MARKETS, CANDLE_RING_CAPACITY
+from func_stream import LruSubscriptions
+
+RESOLUTION_SECONDS = {
+    "1MIN": 60,
+    "5MINS": 300,
+    "15MINS": 900,
+    "30MINS": 1800,
+    "1HOUR": 3600,
+    "4HOURS": 14400,
+    "1DAY": 86400,
+}
+
+
+def candle_ts(started_at: str) -> float:
+    """startedAt ISO ("2026-10-18T10:00:00.000Z") → epoch seconds."""
+    return datetime.fromisoformat(started_at.replace("Z", "+00:00")).timestamp()
+
+
+class CandleRing:
+    def __init__(self, capacity: int = CANDLE_RING_CAPACITY, resolution_s: float = 3600):
+        self.capacity = int(capacity)
+        self.resolution_s = float(resolution_s)
+        self.stale = False
+        self._alloc()
+
+    def _alloc(self):
+        size = 3 * self.capacity
+        self._ts = np.zeros(size, dtype=np.float64)
+        self._close = np.zeros(size, dtype=np.float64)
+        self._start = 0           # vela más vieja de la ventana
+        self._end = 0             # una pasada la más nueva
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def last_ts(self):
+        if self._end == self._start:
+            return None
+        return self._ts[self._end - 1]
+
+    def _push(self, ts: float, close: float):
+        if self._end == len(self._ts):
+            keep = min(self._end - self._start, self.capacity - 1)
+            src = self._end - keep
+            self._ts[:keep] = self._ts[src:self._end]
+            self._close[:keep] = self._close[src:self._end]
+            self._start, self._end = 0, keep
+        self._ts[self._end] = ts
+        self._close[self._end] = close
+        self._end += 1
+        if self._end - self._start > self.capacity:
+            self._start += 1
+
+    def seed(self, ts, closes):
+        """Reemplaza el contenido con velas cronológicas (REST)."""
+        # Arrays nuevos: las vistas entregadas antes siguen intactas.
+        self._alloc()
+        for t, c in list(zip(ts, closes))[-self.capacity:]:
+            self._push(float(t), float(c))
+        self.stale = False
+
+    def update(self, ts: float, close: float) -> bool:
+        """
+        Aplica una vela del stream. Devuelve False si no encaja (hueco o vela
+        antigua fuera de la ventana); un hueco deja el anillo `stale`.
+        """
+        last = self.last_ts
+        if last is None:
+            return False
+        if ts == last:
+            self._close[self._end - 1] = close
+            return True
+        if ts > last:
+            if ts - last > self.resolution_s * 1.5:
+                self.stale = True
+                return False
+            self._push(ts, close)
+            return True
+        # Vela ya cerrada dentro de la ventana (p.ej. corrección): in place.
+        window = self._ts[self._start:self._end]
+        i = int(np.searchsorted(window, ts))
+        if i < len(window) and window[i] == ts:
+            self._close[self._start + i] = close
+            return True
+        return False
+
+    def merge(self, candles):
+        """
+        Funde un lote cronológico [(ts, close), ...] (snapshot tras reconectar).
+        Limpia `stale` sólo si el lote empalma con la ventana sin hueco.
+        """
+        if not candles:
+            return
+        last = self.last_ts
+        if last is None or candles[0][0] > last + self.resolution_s * 1.5:
+            return
+        self.stale = False
+        for ts, close in candles:
+            self.update(ts, close)
+
+    def closes(self) -> np.ndarray:
+        view = self._close[self._start:self._end]
+        view.flags.writeable = False
+        return view
+
+    def timestamps(self) -> np.ndarray:
+        view = self._ts[self._start:self._end]
+        view.flags.writeable = False
+        return view
+
+
+def _parse_candles(raw):
+    """Velas de la API (dicts, orden arbitrario) → [(ts, close)] cronológico."""
+    out = []
+    for candle in raw or ():
+        try:
+            out.append((candle_ts(candle["startedAt"]), float(candle["close"])))
+        except Exception:
+            continue
+    out.sort()
+    return out
+
+
+class CandleStreamManager:
+    channel = "v4_candles"
+
+    def __init__(self, stream, resolution: str = RESOLUTION,
+                 capacity: int = CANDLE_RING_CAPACITY,
+                 max_markets: int = CANDLE_STREAM_MAX_MARKETS):
+        self.stream = stream
+        self.resolution = resolution
+        self.capacity = int(capacity)
+        from dydx_v4_client.indexer.candles_resolution import CandlesResolution
+        res = CandlesResolution(resolution)
+        self._rings = LruSubscriptions(
+            max_markets,
+            factory=lambda m: CandleRing(self.capacity, RESOLUTION_SECONDS[resolution]),
+            subscribe=lambda m: stream.socket.candles.subscribe(id=m, resolution=res),
+            unsubscribe=lambda m: stream.socket.candles.unsubscribe(id=m, resolution=res),
+        )
+        self.stats = {"hits": 0, "misses": 0, "seeds": 0, "gaps": 0}
+        stream.register(self.channel, self)
+
+    def closes(self, market: str):
+        """Vista de cierres al día, o None si hay que ir a REST (y sembrar)."""
+        ring = self._rings.want(market)
+        if len(ring) and not ring.stale and self.stream.is_live:
+            self.stats["hits"] += 1
+            return ring.closes()
+        self.stats["misses"] += 1
+        return None
+
+    def seed(self, market: str, candles):
+        """Siembra (o re-siembra tras un hueco) con velas REST [(ts, close)]."""
+        ring = self._rings.get(market)
+        if ring is not None and candles:
+            ring.seed([t for t, _ in candles], [c for _, c in candles])
+            self.stats["seeds"] += 1
+
+    def on_message(self, message: dict):
+        market, _, resolution = str(message.get("id", "")).partition("/")
+        if resolution != self.resolution:
+            return
+        ring = self._rings.get(market)
+        if ring is None:
+            return
+        mtype = message.get("type")
+        contents = message.get("contents")
+        if mtype == "subscribed":
+            candles = contents.get("candles") if isinstance(contents, dict) else None
+            ring.merge(_parse_candles(candles))
+        elif mtype in ("channel_data", "channel_batch_data"):
+            batch = contents if isinstance(contents, list) else [contents]
+            was_stale = ring.stale
+            for ts, close in _parse_candles(batch):
+                ring.update(ts, close)
+            if ring.stale and not was_stale:
+                self.stats["gaps"] += 1
+        elif mtype == "unsubscribed":
+            ring.stale = True
+
+    def on_resync(self, reason: str):
+        for ring in self._rings.values():
+            ring.stale = True
+
+    def snapshot(self) -> dict:
+        live = sum(1 for r in self._rings.values() if len(r) and not r.stale)
+        return {**self.stats, "subscribes": self._rings.subscribes,
+                "evictions": self._rings.evictions,
+                "rings": len(self._rings), "live": live}
+
+
+_MANAGER = None
+
+
+def install_candle_manager(stream, **kwargs):
+    global _MANAGER
+    _MANAGER = CandleStreamManager(stream, **kwargs)
+    return _MANAGER
+
+
+def get_candle_manager():
+    return _MANAGER
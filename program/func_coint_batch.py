@@ -0,0 +1,264 @@
+# func_coint_batch.py
+"""
+Motor Engle-Granger por lotes sobre la matriz de precios alineada.
+
+Problema que resuelve:
+  store_cointegration_results recorría los N·(N−1)/2 pares (~7.000 con 119
+  mercados) convirtiendo columnas a listas y llamando, por par, a
+  statsmodels coint() (OLS + adfuller con 18 regresiones de selección de
+  lag) más dos sm.OLS. Minutos de CPU; con 300 mercados, ~45.000 pares.
+
+Diseño (mismos números que calculate_cointegration, dentro de tolerancia):
+  - Hedge ratio sin intercepto y su R² (no centrado) para TODOS los pares a
+    la vez desde la matriz de Gram G = PᵀP:  hr = G_ij / G_jj,
+    R² = G_ij² / (G_ii·G_jj).
+  - Regresión de cointegración CON constante (la de coint, trend="c") desde
+    la covarianza de precios centrados; R² ≥ 1−100·√eps → colineal
+    (t = −inf, p = 0, como statsmodels).
+  - ADF sobre los residuos por bloques de `block` pares: los regresores
+    [nivel, Δe_{t−1..t−maxlag}] de todo el bloque se apilan en un tensor
+    (B, n, K) y las K regresiones anidadas de la selección por AIC salen de
+    UNA matriz XᵀX por par (subbloques k×k). Luego se re-estima con el lag
+    elegido sobre su propia muestra (igual que adfuller) agrupando pares por
+    lag, y se toma el t del coeficiente del nivel.
+  - p-valor MacKinnon (1994) vectorizado con las tablas de statsmodels
+    (N=2, "c"); valor crítico 5% de mackinnoncrit (constante para un T dado).
+  - Half-life: AR(1) con constante del spread sin intercepto, en forma
+    cerrada (β = cov(Δs, s₋₁) / var(s₋₁)), redondeada como calculate_half_life.
+  - Hurst R/S (hurst_batch): por lag, los bloques de TODOS los spreads se ven
+    como un tensor (B, n_bloques, lag) con reshape; media, std y cumsum por el
+    último eje. Mismo orden de operaciones que calculate_hurst_exponent → mismo
+    resultado bit a bit (ver bench_hurst.py).
+  - z-score de la última vela (zscore_batch) de todos los spreads del scan
+    de entrada a la vez: sólo dependen de las últimas window+1 velas, así que
+    basta la cola de cada spread (calculate_zscore queda como referencia).
+"""
+
+import numpy as np
+from scipy.stats import norm
+
+from func_ols import half_life
+
+_SQRTEPS = np.sqrt(np.finfo(np.double).eps)
+
+
+def adf_maxlag(nobs: int) -> int:
+    """maxlag por defecto de adfuller (Schwert) para regression="n"."""
+    return int(min(nobs // 2 - 1, np.ceil(12.0 * np.power(nobs / 100.0, 1 / 4.0))))
+
+
+def mackinnonp_vec(teststat, N: int = 2, regression: str = "c") -> np.ndarray:
+    """statsmodels mackinnonp aplicado elemento a elemento (sin bucle Python)."""
+    from statsmodels.tsa.adfvalues import (
+        _tau_maxs, _tau_mins, _tau_stars, _tau_smallps, _tau_largeps,
+    )
+    t = np.asarray(teststat, dtype=np.float64)
+    with np.errstate(invalid="ignore"):         # ±inf: resuelto por los topes de abajo
+        small = np.polyval(np.asarray(_tau_smallps[regression][N - 1])[::-1], t)
+        large = np.polyval(np.asarray(_tau_largeps[regression][N - 1])[::-1], t)
+    p = norm.cdf(np.where(t <= _tau_stars[regression][N - 1], small, large))
+    p = np.where(t > _tau_maxs[regression][N - 1], 1.0, p)
+    p = np.where(t < _tau_mins[regression][N - 1], 0.0, p)
+    return np.where(np.isnan(t), np.nan, p)
+
+
+def _solve(a, b):
+    """Sistemas apilados; pseudo-inversa si alguno es singular."""
+    try:
+        return np.linalg.solve(a, b[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        return (np.linalg.pinv(a) @ b[..., None])[..., 0]
+
+
+def _adf_design(e, d, lag):
+    """
+    Regresores de adfuller(regression="n") con `lag` lags para residuos
+    e (T×B) y sus diferencias d ((T−1)×B): X (B, n, lag+1), y (B, n).
+    """
+    T = e.shape[0]
+    n = T - 1 - lag
+    cols = [e[lag:T - 1]] + [d[lag - k:T - 1 - k] for k in range(1, lag + 1)]
+    X = np.stack(cols, axis=-1).transpose(1, 0, 2)
+    y = d[lag:].T
+    return X, y
+
+
+def adf_tstat_batch(e: np.ndarray, maxlag: int = None):
+    """
+    t-stat ADF (regression="n", autolag="aic") de cada columna de e (T×B).
+    Devuelve (tstat[B], usedlag[B]).
+    """
+    e = np.asarray(e, dtype=np.float64)
+    T, B = e.shape
+    if maxlag is None:
+        maxlag = adf_maxlag(T)
+    d = np.diff(e, axis=0)
+
+    # Selección de lag: todas las regresiones con la MISMA muestra (n fijo).
+    X, y = _adf_design(e, d, maxlag)
+    n = X.shape[1]
+    XtX = X.transpose(0, 2, 1) @ X
+    Xty = (X.transpose(0, 2, 1) @ y[..., None])[..., 0]
+    yty = np.einsum("bn,bn->b", y, y)
+    aic = np.empty((maxlag + 1, B))
+    for k in range(1, maxlag + 2):
+        beta = _solve(XtX[:, :k, :k], Xty[:, :k])
+        ssr = np.maximum(yty - np.einsum("bk,bk->b", beta, Xty[:, :k]), 1e-300)
+        aic[k - 1] = n * np.log(ssr / n) + 2 * k
+    bestlag = np.argmin(aic, axis=0)            # empate → lag menor, como adfuller
+
+    tstat = np.full(B, np.nan)
+    for lag in np.unique(bestlag):
+        sel = np.flatnonzero(bestlag == lag)
+        X, y = _adf_design(e[:, sel], d[:, sel], int(lag))
+        n, k = X.shape[1], X.shape[2]
+        XtX = X.transpose(0, 2, 1) @ X
+        Xty = (X.transpose(0, 2, 1) @ y[..., None])[..., 0]
+        beta = _solve(XtX, Xty)
+        resid = y - (X @ beta[..., None])[..., 0]
+        s2 = np.einsum("bn,bn->b", resid, resid) / (n - k)
+        e0 = np.zeros((len(sel), k))
+        e0[:, 0] = 1.0
+        inv00 = _solve(XtX, e0)[:, 0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tstat[sel] = beta[:, 0] / np.sqrt(s2 * inv00)
+    return tstat, bestlag
+
+
+def half_life_batch(spread: np.ndarray) -> np.ndarray:
+    """calculate_half_life de cada columna de spread (T×B), en forma cerrada."""
+    return half_life(np.asarray(spread, dtype=np.float64))
+
+
+def zscore_batch(spread: np.ndarray, window: int) -> dict:
+    """
+    Última vela de cada columna de spread (T×B) con las mismas ventanas que la
+    fase 1 de open_positions:
+      z         = calculate_zscore(s)[-1] (media y std muestral de las últimas
+                  `window` velas)
+      mean_prev = rolling(window).mean().shift(1)[-1] (media congelada previa)
+      mean, std = np.mean / np.std (ddof=0) de las últimas `window` velas
+      last      = s[-1]
+    NaN donde faltan velas (T < window o window+1, o NaN dentro de la ventana).
+    """
+    S = np.asarray(spread, dtype=np.float64)
+    T, B = S.shape
+    nan = np.full(B, np.nan)
+    if T < window:
+        return {"z": nan, "mean_prev": nan, "mean": nan, "std": nan,
+                "last": S[-1] if T else nan}
+    tail = S[-window:]
+    mean = tail.mean(axis=0)
+    std = tail.std(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (S[-1] - mean) / tail.std(axis=0, ddof=1)
+    mean_prev = S[-window - 1:-1].mean(axis=0) if T > window else nan
+    return {"z": z, "mean_prev": mean_prev, "mean": mean, "std": std, "last": S[-1]}
+
+
+_HURST_LAG_FRACTIONS = (0.05, 0.08, 0.12, 0.18, 0.25, 0.35, 0.45)
+
+
+def hurst_batch(spreads, min_bars: int = 40) -> np.ndarray:
+    """
+    calculate_hurst_exponent de cada fila de spreads (B×n, o 1-D → B=1).
+    Devuelve H[B] en [0, 1] o NaN (pocos datos, o valores no finitos).
+    """
+    X = np.atleast_2d(np.asarray(spreads, dtype=np.float64))
+    B, n = X.shape
+    out = np.full(B, np.nan)
+    if n < min_bars:
+        return out
+    lags = sorted(set(max(4, int(n * f)) for f in _HURST_LAG_FRACTIONS))
+    lags = [l for l in lags if l <= n // 2]
+    if len(lags) < 3:
+        return out
+
+    log_rs = np.full((B, len(lags)), np.nan)
+    used = np.zeros((B, len(lags)), dtype=bool)
+    for li, lag in enumerate(lags):
+        n_chunks = n // lag
+        if n_chunks < 2:
+            continue
+        chunks = X[:, :n_chunks * lag].reshape(B, n_chunks, lag)
+        mean_c = chunks.mean(axis=2, keepdims=True)
+        std_c = chunks.std(axis=2)
+        devs = np.cumsum(chunks - mean_c, axis=2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = (devs.max(axis=2) - devs.min(axis=2)) / std_c
+        ok = ~(std_c < 1e-10)                       # bloques planos no cuentan
+        count = ok.sum(axis=1)
+        mean_rs = rs.mean(axis=1)
+        for b in np.flatnonzero((count < n_chunks) & (count >= 2)):
+            mean_rs[b] = np.mean(rs[b][ok[b]])
+        used[:, li] = count >= 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_rs[used[:, li], li] = np.log(mean_rs[used[:, li]])
+
+    # H = pendiente de log(R/S) = H·log(lag) + C; un polyfit por patrón de lags.
+    log_lags = np.log(np.asarray(lags, dtype=np.float64))
+    fit = (used.sum(axis=1) >= 3) & np.isfinite(np.where(used, log_rs, 0.0)).all(axis=1)
+    patterns, group = np.unique(used[fit], axis=0, return_inverse=True)
+    rows = np.flatnonzero(fit)
+    for g, pattern in enumerate(patterns):
+        sel = rows[np.asarray(group).ravel() == g]
+        slope = np.polyfit(log_lags[pattern], log_rs[sel][:, pattern].T, 1)[0]
+        out[sel] = np.clip(slope, 0.0, 1.0)
+    return out
+
+
+def batch_engle_granger(prices, pairs=None, block: int = 256) -> dict:
+    """
+    Engle-Granger para los pares (i, j) de columnas de `prices` (T×N);
+    por defecto todos los i < j en el orden del bucle original.
+
+    Devuelve arrays por par: i, j, coint_t, p_value, crit_5, coint_flag,
+    hedge_ratio, r_squared, half_life.
+    """
+    from statsmodels.tsa.adfvalues import mackinnoncrit
+
+    P = np.asarray(prices, dtype=np.float64)
+    T, N = P.shape
+    if pairs is None:
+        i, j = np.triu_indices(N, k=1)
+    else:
+        i, j = (np.asarray(x, dtype=np.intp) for x in pairs)
+
+    # Hedge ratio sin intercepto (calculate_cointegration) y su R² no centrado.
+    G = P.T @ P
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hedge_ratio = G[i, j] / G[j, j]
+        r_squared = G[i, j] ** 2 / (G[i, i] * G[j, j])
+
+    # Regresión de cointegración de coint(): y0 ~ const + y1.
+    Pc = P - P.mean(axis=0)
+    C = Pc.T @ Pc
+    with np.errstate(divide="ignore", invalid="ignore"):
+        b = C[i, j] / C[j, j]
+        rsq_c = C[i, j] ** 2 / (C[i, i] * C[j, j])
+    flat = (C[i, i] <= 0) | (C[j, j] <= 0)
+    b = np.where(flat, 0.0, b)              # serie constante: par no testeable
+    collinear = ~flat & (rsq_c >= 1 - 100 * _SQRTEPS)
+
+    coint_t = np.full(len(i), np.nan)
+    half_life = np.full(len(i), np.nan)
+    maxlag = adf_maxlag(T)
+    for start in range(0, len(i), block):
+        sl = slice(start, start + block)
+        ib, jb = i[sl], j[sl]
+        resid = Pc[:, ib] - Pc[:, jb] * b[sl]
+        coint_t[sl], _ = adf_tstat_batch(resid, maxlag)
+        half_life[sl] = half_life_batch(P[:, ib] - P[:, jb] * hedge_ratio[sl])
+
+    coint_t[collinear] = -np.inf
+    p_value = mackinnonp_vec(coint_t, N=2, regression="c")
+    crit_5 = float(mackinnoncrit(N=2, regression="c", nobs=T - 1)[1])
+    coint_flag = (p_value < 0.05) & (coint_t < crit_5) & ~flat
+    coint_t[flat] = np.nan
+    p_value[flat] = 1.0
+    return {
+        "i": i, "j": j,
+        "coint_t": coint_t, "p_value": p_value, "crit_5": crit_5,
+        "coint_flag": coint_flag,
+        "hedge_ratio": hedge_ratio, "r_squared": r_squared, "half_life": half_life,
+    }
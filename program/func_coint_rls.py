@@ -0,0 +1,284 @@
+# func_coint_rls.py
+"""
+Cointegración incremental: estadísticos suficientes por par, actualizados
+barra a barra (mínimos cuadrados recursivos con olvido exponencial).
+
+Problema que resuelve:
+  Cada refresh (COINTEGRATION_REFRESH_HOURS) recalculaba TODOS los pares desde
+  cero aunque sólo hubieran llegado unas pocas velas horarias nuevas. Entre
+  refreshes el CSV envejecía: un par que dejaba de cointegrar seguía
+  operándose hasta 6h, y uno nuevo no entraba hasta el siguiente batch.
+
+Diseño:
+  - PairRLS guarda, por par (i, j) = (base, quote), sumas ponderadas con
+    olvido λ (peso λ^edad; λ=1 → sin olvido):
+      * niveles: W, Σx, Σy, Σx², Σxy, Σy²  → hedge ratio sin intercepto
+        (el de calculate_cointegration) y con intercepto (el de coint()).
+      * AR(1) del spread: z_t = (y_{t-1}, x_{t-1}, Δy_t, Δx_t), Σz y Σzzᵀ.
+        Cualquier spread y − h·x es lineal en z, así que su regresión
+        Δs = α + ρ·s_{t-1} sale de estas sumas para el h que sea.
+    Todo en arrays (pares en el primer eje): update() de una vela es O(1)
+    por par y vectorizado.
+  - hedge_ratio(), half_life() (misma fórmula que calculate_half_life) y
+    df_tstat(): Dickey-Fuller con constante y sin lags sobre el residuo de la
+    regresión con intercepto → aproximación del estadístico de coint().
+  - Re-test exacto sólo cuando el estadístico cruza COINT_RLS_RETEST_T
+    respecto al lado en que estaba en el último test exacto (flagged()). El
+    aproximado se calibra en cada test exacto: t_offset = t_exacto − t_aprox,
+    y se compara df_tstat() + t_offset.
+  - refresh_incremental(df): actualiza con las velas nuevas de la tabla de
+    construct_market_prices, re-testea con el cribado exacto (etapa 2 de
+    func_cointegration) los pares marcados y reescribe sus filas del CSV.
+    Estado persistido en coint_rls.npz junto al almacén de velas.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from constants import COINT_RLS_FORGETTING, COINT_RLS_RETEST_T
+
+_LN2 = np.log(2)
+
+
+def _iso_to_ts(index) -> np.ndarray:
+    return pd.to_datetime(pd.Index(index), utc=True).asi8 / 1e9
+
+
+class PairRLS:
+    def __init__(self, markets, i, j, lam: float = COINT_RLS_FORGETTING):
+        self.markets = list(markets)
+        self.i = np.asarray(i, dtype=np.intp)
+        self.j = np.asarray(j, dtype=np.intp)
+        self.lam = float(lam)
+        P = len(self.i)
+        self.lvl = np.zeros((P, 6))          # W, Σx, Σy, Σx², Σxy, Σy²
+        self.zw = np.zeros(P)                # Σw de las filas AR(1)
+        self.z1 = np.zeros((P, 4))           # Σz
+        self.z2 = np.zeros((P, 4, 4))        # Σzzᵀ
+        self.last_px = np.full(len(self.markets), np.nan)
+        self.last_ts = float("nan")
+        self.t_offset = np.zeros(P)                  # t exacto − t aproximado del último test
+        self.tested_side = np.zeros(P, dtype=bool)   # t < umbral en el último test exacto
+
+    @property
+    def pairs(self):
+        return self.i, self.j
+
+    # ── construcción ─────────────────────────────────────────────────────
+    @classmethod
+    def from_prices(cls, markets, ts, prices, pairs=None, lam: float = COINT_RLS_FORGETTING):
+        """Estado inicial desde una matriz T×N (pesos λ^(T-1-t), en bloque)."""
+        P = np.asarray(prices, dtype=np.float64)
+        if pairs is None:
+            pairs = np.triu_indices(P.shape[1], k=1)
+        self = cls(markets, *pairs, lam=lam)
+        T = P.shape[0]
+        if T == 0:
+            return self
+        w = self.lam ** np.arange(T - 1, -1, -1, dtype=np.float64)
+        y, x = P[:, self.i], P[:, self.j]
+        ok = ~(np.isnan(x) | np.isnan(y))
+        wl = np.where(ok, w[:, None], 0.0)
+        y0, x0 = np.where(ok, y, 0.0), np.where(ok, x, 0.0)
+        self.lvl = np.stack([wl.sum(0), (wl * x0).sum(0), (wl * y0).sum(0),
+                             (wl * x0 * x0).sum(0), (wl * x0 * y0).sum(0),
+                             (wl * y0 * y0).sum(0)], axis=1)
+        if T > 1:
+            z = np.stack([y[:-1], x[:-1], y[1:] - y[:-1], x[1:] - x[:-1]], axis=-1)   # (T-1, P, 4)
+            okz = ~np.isnan(z).any(axis=-1)
+            wz = np.where(okz, w[1:, None], 0.0)
+            z = np.where(okz[..., None], z, 0.0)
+            self.zw = wz.sum(0)
+            self.z1 = np.einsum("tp,tpk->pk", wz, z)
+            self.z2 = np.einsum("tp,tpk,tpl->pkl", wz, z, z)
+        for n in range(P.shape[1]):
+            col = P[:, n]
+            seen = np.flatnonzero(~np.isnan(col))
+            if len(seen):
+                self.last_px[n] = col[seen[-1]]
+        self.last_ts = float(ts[-1])
+        self.tested_side = self.df_tstat() < COINT_RLS_RETEST_T
+        return self
+
+    # ── actualización ────────────────────────────────────────────────────
+    def update(self, ts: float, row) -> None:
+        """Una vela nueva (precios por mercado, NaN = no llegó)."""
+        row = np.asarray(row, dtype=np.float64)
+        y, x = row[self.i], row[self.j]
+        ok = ~(np.isnan(x) | np.isnan(y))
+        if ok.any():
+            lam = self.lam
+            lv = np.stack([np.ones_like(x), x, y, x * x, x * y, y * y], axis=1)
+            self.lvl = np.where(ok[:, None], lam * self.lvl + lv, self.lvl)
+
+            py, px = self.last_px[self.i], self.last_px[self.j]
+            z = np.stack([py, px, y - py, x - px], axis=1)
+            okz = ok & ~np.isnan(z).any(axis=1)
+            z = np.where(okz[:, None], z, 0.0)
+            self.zw = np.where(okz, lam * self.zw + 1.0, self.zw)
+            self.z1 = np.where(okz[:, None], lam * self.z1 + z, self.z1)
+            self.z2 = np.where(okz[:, None, None],
+                               lam * self.z2 + z[:, :, None] * z[:, None, :], self.z2)
+        seen = ~np.isnan(row)
+        self.last_px[seen] = row[seen]
+        self.last_ts = float(ts)
+
+    def update_many(self, ts, prices) -> int:
+        """Velas con ts > last_ts de una matriz alineada; devuelve cuántas entraron."""
+        ts = np.asarray(ts, dtype=np.float64)
+        new = np.flatnonzero(~(ts <= self.last_ts))
+        for t in new:
+            self.update(ts[t], prices[t])
+        return len(new)
+
+    # ── estadísticos (vectorizados, O(1) por par) ────────────────────────
+    def hedge_ratio(self) -> np.ndarray:
+        """OLS sin intercepto de y sobre x (calculate_cointegration)."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.lvl[:, 4] / self.lvl[:, 3]
+
+    def _coint_slope(self) -> np.ndarray:
+        """Pendiente de la regresión con intercepto de coint()."""
+        W, Sx, Sy, Sxx, Sxy, _ = self.lvl.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (Sxy - Sx * Sy / W) / (Sxx - Sx * Sx / W)
+
+    def _ar1(self, h):
+        """(ρ, var(s_{t-1})·W, ssr, n) de Δs = α + ρ·s_{t-1} para s = y − h·x."""
+        a = np.stack([np.ones_like(h), -h, np.zeros_like(h), np.zeros_like(h)], axis=1)
+        c = np.stack([np.zeros_like(h), np.zeros_like(h), np.ones_like(h), -h], axis=1)
+        W = self.zw
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ma, mc = (self.z1 * a).sum(1) / W, (self.z1 * c).sum(1) / W
+            saa = np.einsum("pk,pkl,pl->p", a, self.z2, a) - W * ma * ma
+            sca = np.einsum("pk,pkl,pl->p", c, self.z2, a) - W * mc * ma
+            scc = np.einsum("pk,pkl,pl->p", c, self.z2, c) - W * mc * mc
+            rho = sca / saa
+            ssr = np.maximum(scc - rho * sca, 0.0)
+        return rho, saa, ssr, W
+
+    def half_life(self) -> np.ndarray:
+        """Half-life del spread sin intercepto (misma fórmula que calculate_half_life)."""
+        rho, _, _, n = self._ar1(self.hedge_ratio())
+        with np.errstate(divide="ignore", invalid="ignore"):
+            hl = np.round(-_LN2 / rho, 0)
+        return np.where((rho < 0) & (n >= 10), hl, np.nan)
+
+    def df_tstat(self) -> np.ndarray:
+        """Dickey-Fuller (constante, 0 lags) sobre el residuo de coint(): aproximado."""
+        rho, saa, ssr, n = self._ar1(self._coint_slope())
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = rho / np.sqrt(ssr / (n - 2) / saa)
+        return np.where(n > 2, t, np.nan)
+
+    def flagged(self, threshold: float = COINT_RLS_RETEST_T) -> np.ndarray:
+        """Índices de pares cuyo t calibrado cruzó el umbral desde el último test exacto."""
+        t = self.df_tstat() + self.t_offset
+        return np.flatnonzero((t < threshold) != self.tested_side)
+
+    def mark_tested(self, idx, exact_t, threshold: float = COINT_RLS_RETEST_T) -> None:
+        """Registra el t exacto (coint()) de los pares idx recién testeados."""
+        exact_t = np.asarray(exact_t, dtype=np.float64)
+        approx = self.df_tstat()[idx]
+        self.t_offset[idx] = np.where(np.isfinite(exact_t - approx), exact_t - approx, 0.0)
+        self.tested_side[idx] = exact_t < threshold
+
+    # ── persistencia ─────────────────────────────────────────────────────
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, markets=np.array(self.markets), i=self.i, j=self.j,
+                 lam=self.lam, lvl=self.lvl, zw=self.zw, z1=self.z1, z2=self.z2,
+                 last_px=self.last_px, last_ts=self.last_ts, t_offset=self.t_offset,
+                 tested_side=self.tested_side)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """Estado guardado, o None si no existe / está corrupto."""
+        try:
+            with np.load(path, allow_pickle=False) as f:
+                self = cls(f["markets"].tolist(), f["i"], f["j"], lam=float(f["lam"]))
+                for key in ("lvl", "zw", "z1", "z2", "last_px", "t_offset", "tested_side"):
+                    setattr(self, key, f[key].copy())
+                self.last_ts = float(f["last_ts"])
+            return self
+        except Exception:
+            return None
+
+
+def default_state_path() -> str:
+    from func_price_store import get_price_store
+    return os.path.join(get_price_store().path, "coint_rls.npz")
+
+
+def _calibrate(state, prices, idx) -> None:
+    """Test exacto (Engle-Granger por lotes) de los pares idx → mark_tested."""
+    from func_coint_batch import batch_engle_granger
+
+    if len(idx):
+        eg = batch_engle_granger(prices, (state.i[idx], state.j[idx]))
+        state.mark_tested(idx, eg["coint_t"])
+
+
+def seed_coint_state(df_market_prices, path: str = None) -> PairRLS:
+    """
+    Reinicia el estado tras un refresh completo: pares = supervivientes de la
+    etapa 1 sobre la misma tabla. Los pares del CSV se calibran con su t
+    exacto; el resto parte del aproximado.
+    """
+    import func_cointegration as fc
+
+    markets = df_market_prices.columns.to_list()
+    prices = df_market_prices.to_numpy(dtype=float)
+    i, j, _ = fc._prefilter_pairs(prices)
+    state = PairRLS.from_prices(markets, _iso_to_ts(df_market_prices.index), prices, (i, j))
+    try:
+        csv = pd.read_csv(fc.CSV_PATH, index_col=0)
+        listed = set(zip(csv["base_market"], csv["quote_market"]))
+    except Exception:
+        listed = set()
+    in_csv = np.array([(markets[a], markets[b]) in listed for a, b in zip(state.i, state.j)],
+                      dtype=bool)
+    _calibrate(state, prices, np.flatnonzero(in_csv))
+    state.save(path or default_state_path())
+    return state
+
+
+def refresh_incremental(df_market_prices, path: str = None) -> dict:
+    """
+    Velas nuevas → RLS → re-test exacto de los pares que cruzaron el umbral →
+    sus filas del CSV se reescriben (fuera si ya no pasan, dentro si pasan).
+    Si cambió el universo de mercados, re-siembra sin tocar el CSV.
+    """
+    import func_cointegration as fc
+
+    path = path or default_state_path()
+    markets = df_market_prices.columns.to_list()
+    state = PairRLS.load(path)
+    if state is None or state.markets != markets:
+        seed_coint_state(df_market_prices, path)
+        return {"reseeded": True, "new_bars": 0, "retested": 0, "added": 0, "removed": 0}
+
+    prices = df_market_prices.to_numpy(dtype=float)
+    new_bars = state.update_many(_iso_to_ts(df_market_prices.index), prices)
+    flagged = state.flagged()
+    added = removed = 0
+    if len(flagged):
+        i, j = state.i[flagged], state.j[flagged]
+        rows, _, coint_t = fc._screen_pairs(prices, markets, (i, j), return_t=True)
+        keys = {(markets[a], markets[b]) for a, b in zip(i, j)}
+        try:
+            current = pd.read_csv(fc.CSV_PATH, index_col=0).to_dict("records")
+        except Exception:
+            current = []
+        kept = [r for r in current if (r["base_market"], r["quote_market"]) not in keys]
+        before = {(r["base_market"], r["quote_market"]) for r in current} & keys
+        after = {(r["base_market"], r["quote_market"]) for r in rows}
+        added, removed = len(after - before), len(before - after)
+        fc._write_coint_csv(kept + rows)
+        state.mark_tested(flagged, coint_t)       # mismo t exacto del screening, sin repetir EG
+    state.save(path)
+    return {"reseeded": False, "new_bars": new_bars, "retested": int(len(flagged)),
+            "added": added, "removed": removed}
@@ -3,7 +3,6 @@ import pandas as pd
 import numpy as np
 import warnings
 warnings.filterwarnings('ignore')   # silencia divide-by-zero, etc.
-import statsmodels.api as sm
 from statsmodels.tsa.stattools import coint
 # Suppress CollinearityWarning — near-collinear pairs fail coint_flag anyway;
 # the warning is noise in production logs.
@@ -12,7 +11,12 @@ try:
     warnings.filterwarnings('ignore', category=CollinearityWarning)
 except ImportError:
     pass
-from constants import MAX_HALF_LIFE, WINDOW, HEDGE_RATIO_LOG_MAX, HURST_MAX, HURST_MIN_BARS
+from constants import (
+    MAX_HALF_LIFE, WINDOW, HEDGE_RATIO_LOG_MAX, HURST_MAX, HURST_MIN_BARS,
+    COINT_POOL_WORKERS, COINT_CHUNK_PAIRS, COINT_MIN_RETURN_CORR, MAX_PRICE_RATIO,
+)
+from func_coint_batch import batch_engle_granger, hurst_batch
+from func_ols import half_life, simple_ols
 
 # Absolute path for the cointegrated pairs CSV — avoids fragile relative paths.
 CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cointegrated_pairs.csv")
@@ -27,48 +31,16 @@ def calculate_hurst_exponent(spread) -> float:
     H > 0.5 → persistente / trending (divergirá más)
 
     Retorna float en [0, 1], o np.nan si no hay suficientes datos.
-    """
-    ts = np.array(spread, dtype=float)
-    n = len(ts)
-    if n < HURST_MIN_BARS:
-        return float('nan')
 
-    # Usar fracciones del total para los lags de análisis
-    lag_fractions = [0.05, 0.08, 0.12, 0.18, 0.25, 0.35, 0.45]
-    lags = sorted(set(max(4, int(n * f)) for f in lag_fractions))
-    lags = [l for l in lags if l <= n // 2]
-
-    if len(lags) < 3:
-        return float('nan')
-
-    log_lags = []
-    log_rs   = []
-
-    for lag in lags:
-        # Dividir en bloques no solapados de tamaño `lag`
-        n_chunks = n // lag
-        if n_chunks < 2:
-            continue
-        rs_chunk = []
-        for k in range(n_chunks):
-            chunk = ts[k * lag : (k + 1) * lag]
-            mean_c = np.mean(chunk)
-            std_c  = np.std(chunk)
-            if std_c < 1e-10:
-                continue
-            devs = np.cumsum(chunk - mean_c)
-            R    = devs.max() - devs.min()
-            rs_chunk.append(R / std_c)
-        if len(rs_chunk) >= 2:
-            log_lags.append(np.log(lag))
-            log_rs.append(np.log(np.mean(rs_chunk)))
-
-    if len(log_lags) < 3:
-        return float('nan')
+    Lags = fracciones del total (5%…45%); por lag, R/S medio de los bloques no
+    solapados de tamaño `lag` (se saltan los bloques planos); H es la pendiente
+    del log-log fit log(R/S) = H·log(lag) + C.
 
-    # H es la pendiente del log-log fit: log(R/S) = H·log(lag) + C
-    poly = np.polyfit(log_lags, log_rs, 1)
-    return float(np.clip(poly[0], 0.0, 1.0))
+    2026-10-18: el cálculo vive en func_coint_batch.hurst_batch (reshape por
+    lag, varios spreads a la vez); mismo resultado bit a bit que el bucle
+    por bloques anterior.
+    """
+    return float(hurst_batch(np.array(spread, dtype=float).ravel(), HURST_MIN_BARS)[0])
 
 
 def calculate_half_life(spread):
@@ -86,28 +58,12 @@ def calculate_half_life(spread):
     (para evitar NaN), lo que introducía un punto duplicado y sesgaba β hacia
     valores más negativos → subestimaba la half-life y aceptaba pares lentos.
     Ahora se usa dropna() correctamente.
-    """
-    ts = pd.Series(np.array(spread, dtype=float))
-    spread_lag = ts.shift(1)
-    spread_ret = ts - spread_lag
-
-    # Descartar el primer par (NaN por el shift) sin introducir datos falsos
-    valid = spread_lag.notna() & spread_ret.notna()
-    y = spread_ret[valid].values
-    X = spread_lag[valid].values
-
-    if len(y) < 10:
-        return float('nan')
 
+    2026-10-18: β en forma cerrada (func_ols.half_life) en vez de
+    pd.Series + sm.OLS con constante; misma half-life redondeada.
+    """
     try:
-        X_const = sm.add_constant(X)
-        res = sm.OLS(y, X_const).fit()
-        beta = res.params[1]
-        if beta >= 0:
-            # Spread no mean-reverts (β ≥ 0 → explosivo o random walk)
-            return float('nan')
-        halflife = round(-np.log(2) / beta, 0)
-        return halflife
+        return half_life(np.array(spread, dtype=float).ravel())
     except Exception:
         return float('nan')
 
@@ -141,7 +97,9 @@ def calculate_cointegration(series_1, series_2):
         # and z-scores. Adding an intercept shifts the β to a "true" OLS
         # slope but produces spreads with longer dynamics that break the
         # half-life filter and don't improve signal quality for this strategy.
-        model = sm.OLS(series_1, series_2).fit()
+        # 2026-10-18: func_ols.simple_ols (forma cerrada, R² no centrado como
+        # sm.OLS sin constante) en vez de sm.OLS.
+        model = simple_ols(series_1, series_2, intercept=False)
         hedge_ratio = model.params[0]
         r_squared = float(model.rsquared)
 
@@ -153,122 +111,206 @@ def calculate_cointegration(series_1, series_2):
     except Exception:
         return 0, 0, 0, 0.0, 1.0
 
-# Store cointegration results
-def store_cointegration_results(df_market_prices):
-
-    # Initialize
-    markets = df_market_prices.columns.to_list()
+def _new_coint_stats() -> dict:
+    """Contadores de [COINT DIAGNOSTICS]; se suman entre chunks/procesos."""
+    return {
+        "tested": 0,           # all i < j pairs of the price matrix
+        "pre_corr": 0,         # stage 1: return correlation < COINT_MIN_RETURN_CORR
+        "pre_hedge": 0,        # stage 1: hedge ratio outside [10^-LOG_MAX, 10^LOG_MAX]
+        "pre_price_ratio": 0,  # stage 1: last price ratio > MAX_PRICE_RATIO
+        "coint_tested": 0,     # stage 2: pairs that reach the ADF test
+        "coint_pass": 0,       # passed p_value and t_check
+        "hl_negative": 0,      # half_life <= 0 (explosive spread) or nan
+        "hl_too_short": 0,     # half_life <= 3h (too fast, likely noise)
+        "hl_too_long": 0,      # half_life > MAX_HALF_LIFE
+        "hedge_filtered": 0,   # hedge ratio outside [10^-LOG_MAX, 10^LOG_MAX]
+        "hurst_filtered": 0,   # Hurst exponent >= HURST_MAX (spread is trending)
+        "half_lives": [],      # collect all valid half-lives for distribution
+        "hurst_values": [],    # for distribution diagnostic
+        "r_squared": [],       # R² distribution of hedge ratio OLS fits
+    }
+
+
+def _merge_coint_stats(total: dict, part: dict) -> dict:
+    for key, value in part.items():
+        total[key] = total[key] + value
+    return total
+
+
+def _prefilter_pairs(prices):
+    """
+    Etapa 1 (2026-10-18): cribas vectorizadas sobre TODOS los pares i < j,
+    antes del ADF. La gran mayoría de pares falla la cointegración, pero cada
+    uno pagaba el test completo; los filtros baratos iban después.
+      - correlación de retornos horarios < COINT_MIN_RETURN_CORR
+      - hedge ratio OLS sin intercepto (forma cerrada, el mismo que usa la
+        etapa 2) fuera de [10^-HEDGE_RATIO_LOG_MAX, 10^HEDGE_RATIO_LOG_MAX]
+      - ratio de último precio > MAX_PRICE_RATIO (el scan de entrada lo
+        descartaría igualmente)
+    Cada par cuenta en el primer filtro que falla. Devuelve (i, j, contadores)
+    con los supervivientes en el orden de triu_indices.
+    """
+    P = np.asarray(prices, dtype=np.float64)
+    stats = _new_coint_stats()
+    i, j = np.triu_indices(P.shape[1], k=1)
+    stats["tested"] = len(i)
+    if not len(i):
+        return i, j, stats
+
+    keep = np.ones(len(i), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if COINT_MIN_RETURN_CORR > 0 and P.shape[0] > 2:
+            R = np.diff(P, axis=0) / P[:-1]
+            R = R - R.mean(axis=0)
+            C = R.T @ R
+            sd = np.sqrt(np.diag(C))
+            corr = C[i, j] / (sd[i] * sd[j])
+            bad = ~(corr >= COINT_MIN_RETURN_CORR)          # NaN (serie plana) → fuera
+            stats["pre_corr"] = int(bad.sum())
+            keep &= ~bad
+
+        G = P.T @ P
+        hedge_ratio = G[i, j] / G[j, j]
+        bad = keep & ~((hedge_ratio > 0)
+                       & (np.abs(np.log10(np.abs(hedge_ratio))) <= HEDGE_RATIO_LOG_MAX))
+        stats["pre_hedge"] = int(bad.sum())
+        keep &= ~bad
+
+        last = np.abs(P[-1])
+        ratio = np.maximum(last[i], last[j]) / np.maximum(1e-12, np.minimum(last[i], last[j]))
+        bad = keep & (ratio > MAX_PRICE_RATIO)
+        stats["pre_price_ratio"] = int(bad.sum())
+        keep &= ~bad
+    return i[keep], j[keep], stats
+
+
+def _screen_pairs(prices, markets, pairs=None, return_t=False):
+    """
+    Etapa 2: Engle-Granger por lotes + filtros (half-life, hedge ratio, Hurst)
+    sobre los pares (i, j) de columnas de `prices` (todos los i < j por
+    defecto; normalmente los supervivientes de _prefilter_pairs).
+    Devuelve (filas del CSV, contadores); con return_t=True añade el t de
+    coint() de cada par, en el orden de `pairs`.
+    """
     criteria_met_pairs = []
-
-    # Diagnostic counters
-    n_tested = 0
-    n_coint_pass = 0       # passed p_value and t_check
-    n_hl_negative = 0      # half_life <= 0 (explosive spread) or nan
-    n_hl_too_short = 0     # half_life <= 3h (too fast, likely noise)
-    n_hl_too_long = 0      # half_life > MAX_HALF_LIFE
-    n_hedge_filtered = 0   # hedge ratio outside [10^-LOG_MAX, 10^LOG_MAX]
-    n_hurst_filtered = 0   # Hurst exponent >= HURST_MAX (spread is trending)
-    half_lives_seen = []   # collect all valid half-lives for distribution
-    hurst_values_seen = [] # for distribution diagnostic
-    r_squared_seen = []    # R² distribution of hedge ratio OLS fits
+    candidates = []        # pasan half-life y hedge ratio; Hurst en bloque al final
+    stats = _new_coint_stats()
+    if len(markets) < 2 or (pairs is not None and not len(pairs[0])):
+        if return_t:
+            return criteria_met_pairs, stats, np.empty(0)
+        return criteria_met_pairs, stats
 
     # Find cointegrated pairs
-    for index, base_market in enumerate(markets[:-1]):
-        series_1 = df_market_prices[base_market].values.astype(float).tolist()
-
-        for quote_market in markets[index+1:]:
-            series_2 = df_market_prices[quote_market].values.astype(float).tolist()
-
-            try:
-                n_tested += 1
-                coint_flag, hedge_ratio, half_life, r_sq, p_val = calculate_cointegration(series_1, series_2)
-
-                if coint_flag == 1:
-                    n_coint_pass += 1
-                    if not np.isnan(r_sq):
-                        r_squared_seen.append(r_sq)
-
-                    # ── Filter 1: Half-life ─────────────────────────────────
-                    # calculate_half_life now returns nan when β≥0 (non-reverting)
-                    if np.isnan(half_life) or half_life <= 0:
-                        n_hl_negative += 1
-                        continue
-                    elif half_life <= 3:
-                        n_hl_too_short += 1
-                        continue
-                    elif half_life > MAX_HALF_LIFE:
-                        n_hl_too_long += 1
-                        continue
-
-                    # ── Filter 2: Hedge ratio sanity ────────────────────────
-                    # Ratios extremos (ej: BTC/SHIB = 12.8B) indican que los dos
-                    # activos tienen precios en unidades muy diferentes → el
-                    # z-score no tiene significado económico real y el sizing
-                    # resultante es impracticable.
-                    if hedge_ratio <= 0 or abs(np.log10(abs(hedge_ratio))) > HEDGE_RATIO_LOG_MAX:
-                        n_hedge_filtered += 1
-                        continue
-
-                    # ── Filter 3: Hurst exponent (mean-reversion check) ─────
-                    # Aplicar sobre DIFERENCIAS del spread, no el nivel.
-                    # Spreads cointegrados son AR(1) con phi≈1; en nivel todos
-                    # parecen trending (H>0.8). Al diferenciar:
-                    #   half_life=4h  → H_diff≈0.265  (fuerte mean-reversion)
-                    #   half_life=24h → H_diff≈0.488  (borderline)
-                    #   random walk   → H_diff≈0.579  (rechazado si ≥ HURST_MAX=0.52)
-                    s1_arr = np.array(series_1, dtype=float)
-                    s2_arr = np.array(series_2, dtype=float)
-                    spread_arr = s1_arr - (hedge_ratio * s2_arr)
-                    hurst = calculate_hurst_exponent(np.diff(spread_arr))
-
-                    if not np.isnan(hurst):
-                        hurst_values_seen.append(hurst)
-                        if hurst >= HURST_MAX:
-                            n_hurst_filtered += 1
-                            continue
-
-                    # ── Passes all filters ──────────────────────────────────
-                    half_lives_seen.append(half_life)
-                    criteria_met_pairs.append({
-                        "base_market": base_market,
-                        "quote_market": quote_market,
-                        "hedge_ratio": hedge_ratio,
-                        "half_life": half_life,
-                        "hurst": round(hurst, 3) if not np.isnan(hurst) else None,
-                        "r_squared": round(r_sq, 4) if not np.isnan(r_sq) else None,
-                    })
-
-            except Exception as e:
-                print(f"Error calculating cointegration results: {e}")
+    eg = batch_engle_granger(prices, pairs)
+    stats["coint_tested"] = len(eg["i"])
+    for k in np.flatnonzero(eg["coint_flag"]):
+        try:
+            base_market = markets[eg["i"][k]]
+            quote_market = markets[eg["j"][k]]
+            series_1 = prices[:, eg["i"][k]]
+            series_2 = prices[:, eg["j"][k]]
+            hedge_ratio = float(eg["hedge_ratio"][k])
+            half_life = float(eg["half_life"][k])
+            r_sq = float(eg["r_squared"][k])
+            stats["coint_pass"] += 1
+            if not np.isnan(r_sq):
+                stats["r_squared"].append(r_sq)
+
+            # ── Filter 1: Half-life ─────────────────────────────────
+            # calculate_half_life now returns nan when β≥0 (non-reverting)
+            if np.isnan(half_life) or half_life <= 0:
+                stats["hl_negative"] += 1
+                continue
+            elif half_life <= 3:
+                stats["hl_too_short"] += 1
+                continue
+            elif half_life > MAX_HALF_LIFE:
+                stats["hl_too_long"] += 1
                 continue
 
-    # ── Diagnostic summary ────────────────────────────────────────────────────
-    n_pairs_found = len(criteria_met_pairs)
+            # ── Filter 2: Hedge ratio sanity ────────────────────────
+            # Ratios extremos (ej: BTC/SHIB = 12.8B) indican que los dos
+            # activos tienen precios en unidades muy diferentes → el
+            # z-score no tiene significado económico real y el sizing
+            # resultante es impracticable.
+            if hedge_ratio <= 0 or abs(np.log10(abs(hedge_ratio))) > HEDGE_RATIO_LOG_MAX:
+                stats["hedge_filtered"] += 1
+                continue
+
+            candidates.append((base_market, quote_market, hedge_ratio, half_life, r_sq,
+                               series_1 - (hedge_ratio * series_2)))
+
+        except Exception as e:
+            print(f"Error calculating cointegration results: {e}")
+            continue
+
+    # ── Filter 3: Hurst exponent (mean-reversion check) ─────────────────
+    # Aplicar sobre DIFERENCIAS del spread, no el nivel.
+    # Spreads cointegrados son AR(1) con phi≈1; en nivel todos
+    # parecen trending (H>0.8). Al diferenciar:
+    #   half_life=4h  → H_diff≈0.265  (fuerte mean-reversion)
+    #   half_life=24h → H_diff≈0.488  (borderline)
+    #   random walk   → H_diff≈0.579  (rechazado si ≥ HURST_MAX=0.52)
+    # 2026-10-18: todos los candidatos en una sola llamada (hurst_batch).
+    hursts = ()
+    if candidates:
+        spreads = np.stack([c[5] for c in candidates])
+        hursts = hurst_batch(np.diff(spreads, axis=1), HURST_MIN_BARS)
+    for (base_market, quote_market, hedge_ratio, half_life, r_sq, _), hurst in zip(candidates, hursts):
+        hurst = float(hurst)
+        if not np.isnan(hurst):
+            stats["hurst_values"].append(hurst)
+            if hurst >= HURST_MAX:
+                stats["hurst_filtered"] += 1
+                continue
+
+        # ── Passes all filters ──────────────────────────────────────────
+        stats["half_lives"].append(half_life)
+        criteria_met_pairs.append({
+            "base_market": base_market,
+            "quote_market": quote_market,
+            "hedge_ratio": hedge_ratio,
+            "half_life": half_life,
+            "hurst": round(hurst, 3) if not np.isnan(hurst) else None,
+            "r_squared": round(r_sq, 4) if not np.isnan(r_sq) else None,
+        })
+    if return_t:
+        return criteria_met_pairs, stats, eg["coint_t"]
+    return criteria_met_pairs, stats
+
+
+def _print_coint_diagnostics(stats: dict, n_pairs_found: int):
     print(f"\n[COINT DIAGNOSTICS]")
-    print(f"  Pairs tested:              {n_tested}")
-    print(f"  Passed coint test:         {n_coint_pass}")
-    print(f"  → HL negative/explosive:   {n_hl_negative}")
-    print(f"  → HL ≤ 3h (noise):         {n_hl_too_short}")
-    print(f"  → HL > {MAX_HALF_LIFE}h (slow):      {n_hl_too_long}")
-    print(f"  → Hedge ratio extreme:     {n_hedge_filtered}  (|log10(hr)| > {HEDGE_RATIO_LOG_MAX})")
-    print(f"  → Hurst ≥ {HURST_MAX} (trending): {n_hurst_filtered}")
+    print(f"  Pairs tested:              {stats['tested']}")
+    print(f"  Stage 1 (vectorized prefilters):")
+    print(f"  → Return corr < {COINT_MIN_RETURN_CORR}:      {stats['pre_corr']}")
+    print(f"  → Hedge ratio extreme:     {stats['pre_hedge']}  (|log10(hr)| > {HEDGE_RATIO_LOG_MAX})")
+    print(f"  → Price ratio > {MAX_PRICE_RATIO:.0f}:       {stats['pre_price_ratio']}")
+    print(f"  Stage 2 (ADF / half-life / Hurst):")
+    print(f"  Pairs coint-tested:        {stats['coint_tested']}")
+    print(f"  Passed coint test:         {stats['coint_pass']}")
+    print(f"  → HL negative/explosive:   {stats['hl_negative']}")
+    print(f"  → HL ≤ 3h (noise):         {stats['hl_too_short']}")
+    print(f"  → HL > {MAX_HALF_LIFE}h (slow):      {stats['hl_too_long']}")
+    print(f"  → Hedge ratio extreme:     {stats['hedge_filtered']}  (|log10(hr)| > {HEDGE_RATIO_LOG_MAX})")
+    print(f"  → Hurst ≥ {HURST_MAX} (trending): {stats['hurst_filtered']}")
     print(f"  → Passed ALL filters ✓:    {n_pairs_found}")
-    if half_lives_seen:
-        arr = np.array(half_lives_seen)
+    if stats["half_lives"]:
+        arr = np.array(stats["half_lives"])
         arr_pos = arr[arr > 0]
         if len(arr_pos):
             print(f"  HL distribution (final pairs):")
             print(f"    min={arr_pos.min():.0f}h  p25={np.percentile(arr_pos,25):.0f}h  "
                   f"median={np.median(arr_pos):.0f}h  p75={np.percentile(arr_pos,75):.0f}h  "
                   f"max={arr_pos.max():.0f}h")
-    if hurst_values_seen:
-        ha = np.array(hurst_values_seen)
+    if stats["hurst_values"]:
+        ha = np.array(stats["hurst_values"])
         print(f"  Hurst distribution (coint-passing spreads):")
         print(f"    min={ha.min():.3f}  p25={np.percentile(ha,25):.3f}  "
               f"median={np.median(ha):.3f}  p75={np.percentile(ha,75):.3f}  "
               f"max={ha.max():.3f}")
-    if r_squared_seen:
-        ra = np.array(r_squared_seen)
+    if stats["r_squared"]:
+        ra = np.array(stats["r_squared"])
         print(f"  R² distribution (hedge ratio OLS fit quality, coint-passing):")
         print(f"    min={ra.min():.3f}  p25={np.percentile(ra,25):.3f}  "
               f"median={np.median(ra):.3f}  p75={np.percentile(ra,75):.3f}  "
@@ -278,25 +320,155 @@ def store_cointegration_results(df_market_prices):
             print(f"    ⚠️  {low_r2} pares con R²<0.80 (hedge ratio poco confiable)")
     print()
 
+
+def _write_coint_csv(criteria_met_pairs):
+    """
+    2026-10-18: escritura atómica (tmp + os.replace): el loop de entradas
+    nunca lee un CSV a medio escribir durante un refresh.
+    """
     # ── Create and save DataFrame ─────────────────────────────────────────────
     # Sorted by half_life ascending: fastest mean-reverting pairs tried first.
     df_criteria_met = pd.DataFrame(criteria_met_pairs)
     if not df_criteria_met.empty:
-        df_criteria_met.sort_values("half_life", ascending=True, inplace=True)
+        df_criteria_met.sort_values("half_life", ascending=True, inplace=True, kind="stable")
         df_criteria_met.reset_index(drop=True, inplace=True)
         # Ensure column order (hurst optional — old CSVs won't have it)
         cols = ["base_market", "quote_market", "hedge_ratio", "half_life", "hurst", "r_squared"]
         cols = [c for c in cols if c in df_criteria_met.columns]
         df_criteria_met = df_criteria_met[cols]
-    df_criteria_met.to_csv(CSV_PATH, index=True)
+    tmp_path = CSV_PATH + ".tmp"
+    df_criteria_met.to_csv(tmp_path, index=True)
+    os.replace(tmp_path, CSV_PATH)
     del df_criteria_met
 
+
+def _save_coint_csv(criteria_met_pairs, stats: dict):
+    """Diagnóstico + CSV."""
+    n_pairs_found = len(criteria_met_pairs)
+    _print_coint_diagnostics(stats, n_pairs_found)
+    _write_coint_csv(criteria_met_pairs)
+
     print(f"Cointegrated pairs successfully saved to {CSV_PATH}.")
     print(f"Total usable pairs: {n_pairs_found}")
     return "saved"
 
 
+# Store cointegration results
+def store_cointegration_results(df_market_prices):
+    """
+    2026-10-18: el test Engle-Granger de TODOS los pares sale de
+    func_coint_batch.batch_engle_granger (álgebra matricial sobre la matriz
+    de precios; mismos números que calculate_cointegration, que queda como
+    referencia por par). Los filtros sólo recorren los pares que pasan la
+    cointegración. Antes del ADF, _prefilter_pairs descarta en bloque los
+    pares que no pueden pasar los filtros baratos. Síncrono: desde el loop
+    del bot usar
+    store_cointegration_results_async.
+    """
+    markets = df_market_prices.columns.to_list()
+    prices = df_market_prices.to_numpy(dtype=float)
+    i, j, stats = _prefilter_pairs(prices)
+    criteria_met_pairs, stage2 = _screen_pairs(prices, markets, (i, j))
+    return _save_coint_csv(criteria_met_pairs, _merge_coint_stats(stats, stage2))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Refresh en un pool de procesos (2026-10-18)
+# ─────────────────────────────────────────────────────────────────────────────
+# store_cointegration_results es CPU puro: lanzado como task asyncio congelaba
+# el event loop (exits cada 30s, hard stops) durante todo el cálculo. Aquí la
+# matriz de precios va a shared memory (los workers la mapean sin copiarla),
+# los pares se reparten en chunks de COINT_CHUNK_PAIRS y cada chunk devuelve
+# sus filas + contadores en cuanto termina (progreso incremental). El loop
+# sólo espera futures; el CSV se escribe al final con os.replace.
+
+def _screen_chunk_worker(shm_name, shape, markets, i, j):
+    """Worker del pool: mapea la matriz compartida y criba un chunk de pares."""
+    from multiprocessing import resource_tracker, shared_memory
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        # El dueño del segmento es el proceso padre (él hace unlink).
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    prices = None
+    try:
+        prices = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        return _screen_pairs(prices, markets, (i, j))
+    finally:
+        del prices                     # soltar la vista antes de close()
+        shm.close()
 
 
+def _coint_workers(workers=None) -> int:
+    if workers is None:
+        workers = COINT_POOL_WORKERS
+    if workers <= 0:
+        workers = max(1, (os.cpu_count() or 2) - 1)
+    return int(workers)
 
 
+async def store_cointegration_results_async(df_market_prices, workers: int = None,
+                                            chunk_pairs: int = None, on_progress=None):
+    """
+    store_cointegration_results en un ProcessPoolExecutor (spawn), sin
+    bloquear el event loop. on_progress(stats_parciales, chunks_hechos,
+    chunks_totales) se llama al terminar cada chunk. Si el pool no puede
+    arrancar, cae al cálculo síncrono en un thread.
+    """
+    import asyncio
+    import multiprocessing as mp
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    markets = df_market_prices.columns.to_list()
+    prices = np.ascontiguousarray(df_market_prices.to_numpy(dtype=float))
+    if len(markets) < 2:
+        return await asyncio.to_thread(store_cointegration_results, df_market_prices)
+    chunk_pairs = int(chunk_pairs or COINT_CHUNK_PAIRS)
+    i_all, j_all, stats = _prefilter_pairs(prices)
+    if not len(i_all):
+        return await asyncio.to_thread(_save_coint_csv, [], stats)
+    chunks = [(i_all[s:s + chunk_pairs], j_all[s:s + chunk_pairs])
+              for s in range(0, len(i_all), chunk_pairs)]
+
+    try:
+        shm = shared_memory.SharedMemory(create=True, size=max(prices.nbytes, 1))
+    except Exception as e:
+        print(f"[COINT] shared memory unavailable ({e}); computing in a thread", flush=True)
+        return await asyncio.to_thread(store_cointegration_results, df_market_prices)
+    try:
+        np.ndarray(prices.shape, dtype=np.float64, buffer=shm.buf)[:] = prices
+        loop = asyncio.get_running_loop()
+        results = [None] * len(chunks)
+        done = 0
+        try:
+            pool = ProcessPoolExecutor(max_workers=min(_coint_workers(workers), len(chunks)),
+                                       mp_context=mp.get_context("spawn"))
+        except Exception as e:
+            print(f"[COINT] process pool unavailable ({e}); computing in a thread", flush=True)
+            return await asyncio.to_thread(store_cointegration_results, df_market_prices)
+
+        async def _run(n, i, j):
+            return n, await asyncio.wrap_future(pool.submit(
+                _screen_chunk_worker, shm.name, prices.shape, markets, i, j))
+
+        try:
+            tasks = [_run(n, i, j) for n, (i, j) in enumerate(chunks)]
+            for fut in asyncio.as_completed(tasks):
+                n, (rows, part) = await fut
+                results[n] = rows
+                _merge_coint_stats(stats, part)
+                done += 1
+                if on_progress is not None:
+                    on_progress(stats, done, len(chunks))
+        finally:
+            # Sin esperar: una cancelación no debe bloquear el event loop.
+            pool.shutdown(wait=False, cancel_futures=True)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # Orden de filas idéntico al cálculo síncrono (chunks en orden de pares).
+    criteria_met_pairs = [row for rows in results for row in rows]
+    return await loop.run_in_executor(None, _save_coint_csv, criteria_met_pairs, stats)
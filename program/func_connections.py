@@ -3,6 +3,8 @@ import random
 from decouple import config
 from dydx_v4_client.node.client import NodeClient
 from dydx_v4_client.indexer.rest.indexer_client import IndexerClient
+from dydx_v4_client.indexer.rest.shared.governor import RateGovernor
+from dydx_v4_client.indexer.socket.async_websocket import AsyncIndexerSocket
 from dydx_v4_client.network import make_testnet, make_mainnet
 from dydx_v4_client.wallet import Wallet
 from constants import (
@@ -13,6 +15,16 @@ INDEXER,
 WEBSOCKET,
 MODE,
 LOCAL_SEQUENCE_MANAGEMENT,
+INDEXER_HTTP2,
+INDEXER_MAX_CONNECTIONS,
+INDEXER_MAX_KEEPALIVE_CONNECTIONS,
+INDEXER_KEEPALIVE_EXPIRY_S,
+INDEXER_RATE_PER_S,
+INDEXER_RATE_MAX_PER_S,
+INDEXER_MAX_IN_FLIGHT,
+INDEXER_WS_PING_INTERVAL_S,
+INDEXER_WS_IDLE_TIMEOUT_S,
+INDEXER_WS_RECONNECT_MAX_S,
 )
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -45,6 +57,16 @@ else:
 CUSTOM_TESTNET = CUSTOM_NETWORK
 
 
+# Indexer websocket (asyncio). Se suscriben canales y luego `await socket.connect()`.
+def make_indexer_socket():
+        return AsyncIndexerSocket(
+            CUSTOM_NETWORK.websocket_indexer,
+            ping_interval=INDEXER_WS_PING_INTERVAL_S,
+            idle_timeout=INDEXER_WS_IDLE_TIMEOUT_S,
+            reconnect_max=INDEXER_WS_RECONNECT_MAX_S,
+        )
+
+
 # Connect to DYDX
 async def connect_dydx():
         node = None
@@ -56,7 +78,18 @@ async def connect_dydx():
             node = await NodeClient.connect(CUSTOM_NETWORK.node)
 
             #print(f"👁️ Conectando al Indexer (Datos)... chain_id={CUSTOM_NETWORK.node.chain_id}")
-            indexer = IndexerClient(CUSTOM_NETWORK.rest_indexer)
+            indexer = IndexerClient(
+                CUSTOM_NETWORK.rest_indexer,
+                http2=INDEXER_HTTP2,
+                max_connections=INDEXER_MAX_CONNECTIONS,
+                max_keepalive_connections=INDEXER_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=INDEXER_KEEPALIVE_EXPIRY_S,
+                governor=RateGovernor(
+                    rate=INDEXER_RATE_PER_S,
+                    max_rate=INDEXER_RATE_MAX_PER_S,
+                    max_concurrency=INDEXER_MAX_IN_FLIGHT,
+                ),
+            )
 
             wallet = await Wallet.from_mnemonic(node, API_KEY, WALLET_ADDRESS)
 
@@ -0,0 +1,218 @@
+# func_cooldowns.py
+"""
+Registro de cooldowns por par, en memoria y con TTL.
+
+Problema que resuelve:
+  _is_pair_in_fail_cooldown leía y parseaba pair_fail_cooldowns.json por CADA
+  par de la fase 1 (hasta 150 lecturas por scan) y a veces lo reescribía a
+  mitad del scan para limpiar entradas vencidas. func_exit_pairs escribía el
+  mismo fichero por su cuenta (_write_sl_cooldown) y func_position_guard
+  mantenía otro paralelo (pair_cooldowns.json).
+
+Diseño:
+  - CooldownRegistry: {(tipo, par): (until, datos)} → consulta O(1), más un
+    min-heap de vencimientos. Expiración perezosa: cada consulta saca del heap
+    lo ya vencido (las entradas del heap que ya no coinciden con el registro
+    —re-escrito después— se descartan sin más). until = inf → sin vencimiento.
+  - Tipos usados: "fails" (fallos de ejecución consecutivos; al llegar a
+    PAIR_FAIL_COOLDOWN_THRESHOLD vence a last_fail + PAIR_FAIL_COOLDOWN_HOURS,
+    y al vencer el contador vuelve a 0), "sl" (cooldown post-SL de
+    func_exit_pairs) y "bad_open" (func_position_guard).
+  - Persistencia write-behind en un journal append-only (cooldowns.jsonl):
+    la memoria se actualiza primero y luego se añade UNA línea por cambio con
+    un único os.write sobre un fd O_APPEND (una línea corta no se intercala ni
+    queda a medias con otra). Al arrancar se reproduce el journal y se compacta
+    (sólo entradas vivas, tmp + os.replace). Una línea final truncada por un
+    corte se ignora.
+  - Migración única: si no hay journal se importan los cooldowns vigentes de
+    pair_fail_cooldowns.json y los "bad_open" de pair_cooldowns.json (vencen
+    a ts + COOLDOWN_MINUTES_AFTER_BAD_OPEN).
+"""
+
+import heapq
+import json
+import math
+import os
+import time
+from datetime import datetime
+
+from constants import (
+    PAIR_FAIL_COOLDOWN_THRESHOLD, PAIR_FAIL_COOLDOWN_HOURS, COOLDOWN_MINUTES_AFTER_BAD_OPEN,
+)
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+JOURNAL_PATH = os.path.join(_DIR, "cooldowns.jsonl")
+LEGACY_PAIR_FAIL_PATH = os.path.join(_DIR, "pair_fail_cooldowns.json")
+LEGACY_BAD_OPEN_PATH = os.path.join(_DIR, "pair_cooldowns.json")
+
+# Compactar cuando el journal tiene más de N líneas por entrada viva.
+_COMPACT_RATIO = 4
+_COMPACT_MIN_LINES = 256
+
+
+def pair_key(m1, m2) -> str:
+    """Clave independiente del orden de las legs (la de los ficheros anteriores)."""
+    return "/".join(sorted([str(m1), str(m2)]))
+
+
+def _iso_ts(s) -> float:
+    return datetime.fromisoformat(str(s).replace("Z", "+00:00")).timestamp()
+
+
+def _load_legacy(path: str) -> dict:
+    """{par: registro} de un fichero JSON anterior ({} si falta o no se puede leer)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+class CooldownRegistry:
+    def __init__(self, path: str = JOURNAL_PATH, legacy_path: str = LEGACY_PAIR_FAIL_PATH,
+                 legacy_bad_open_path: str = LEGACY_BAD_OPEN_PATH):
+        self.path = path
+        self._entries = {}     # (kind, key) -> (until, data)
+        self._heap = []        # (until, kind, key)
+        self._lines = 0
+        self._fd = None
+        if os.path.exists(path):
+            self._replay()
+        else:
+            self._migrate(legacy_path, legacy_bad_open_path)
+        self.compact()
+
+    # ── Consultas ────────────────────────────────────────────────────────
+    def get(self, kind: str, key: str, now: float = None):
+        """Datos de la entrada si sigue vigente, si no None."""
+        now = time.time() if now is None else now
+        self.expire(now)
+        entry = self._entries.get((kind, key))
+        if entry is None or entry[0] <= now:
+            return None
+        return entry[1]
+
+    def remaining(self, kind: str, key: str, now: float = None) -> float:
+        """Segundos hasta el vencimiento (0 si no hay entrada vigente)."""
+        now = time.time() if now is None else now
+        if self.get(kind, key, now) is None:
+            return 0.0
+        return self._entries[(kind, key)][0] - now
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ── Escrituras ───────────────────────────────────────────────────────
+    def put(self, kind: str, key: str, expires: float = math.inf, **data):
+        """Crea/reemplaza la entrada; vence en el epoch `expires` (inf → nunca)."""
+        until = float(expires)
+        self._entries[(kind, key)] = (until, data)
+        if math.isfinite(until):
+            heapq.heappush(self._heap, (until, kind, key))
+        self._append({"op": "put", "kind": kind, "key": key,
+                      "until": until if math.isfinite(until) else None, "data": data})
+
+    def delete(self, kind: str, key: str):
+        if self._entries.pop((kind, key), None) is not None:
+            self._append({"op": "del", "kind": kind, "key": key})
+
+    def expire(self, now: float = None) -> int:
+        """Elimina lo vencido (perezoso: sólo mira la cima del heap)."""
+        now = time.time() if now is None else now
+        n = 0
+        while self._heap and self._heap[0][0] <= now:
+            until, kind, key = heapq.heappop(self._heap)
+            entry = self._entries.get((kind, key))
+            if entry is not None and entry[0] == until:
+                del self._entries[(kind, key)]
+                n += 1
+        return n
+
+    # ── Journal ──────────────────────────────────────────────────────────
+    def _append(self, record: dict):
+        try:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            os.write(self._fd, (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8"))
+            self._lines += 1
+        except OSError:
+            return
+        if self._lines > max(_COMPACT_MIN_LINES, _COMPACT_RATIO * len(self._entries)):
+            self.compact()
+
+    def _replay(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue                      # línea truncada por un corte
+                k = (rec.get("kind"), rec.get("key"))
+                if rec.get("op") == "put":
+                    until = math.inf if rec.get("until") is None else float(rec["until"])
+                    self._entries[k] = (until, rec.get("data") or {})
+                elif rec.get("op") == "del":
+                    self._entries.pop(k, None)
+        self._heap = [(u, k, key) for (k, key), (u, _) in self._entries.items() if math.isfinite(u)]
+        heapq.heapify(self._heap)
+        self.expire()
+
+    def _migrate(self, legacy_path: str, legacy_bad_open_path: str):
+        for key, rec in _load_legacy(legacy_path).items():
+            try:
+                if rec.get("sl_cooldown_until"):
+                    self._entries[("sl", key)] = (_iso_ts(rec["sl_cooldown_until"]), {
+                        "until": rec["sl_cooldown_until"], "hours": rec.get("sl_cooldown_hours"),
+                        "ts": rec.get("sl_ts")})
+                count = int(rec.get("consecutive_fails", 0) or 0)
+                if count > 0:
+                    last = _iso_ts(rec["last_fail_ts"])
+                    until = (last + PAIR_FAIL_COOLDOWN_HOURS * 3600.0
+                             if count >= PAIR_FAIL_COOLDOWN_THRESHOLD else math.inf)
+                    self._entries[("fails", key)] = (until, {"count": count, "last_fail_ts": last})
+            except Exception:
+                continue
+        for key, rec in _load_legacy(legacy_bad_open_path).items():
+            try:
+                until = _iso_ts(rec["ts"]) + COOLDOWN_MINUTES_AFTER_BAD_OPEN * 60.0
+                self._entries[("bad_open", key)] = (until, {"ts": rec["ts"], "reason": str(rec.get("reason", ""))})
+            except Exception:
+                continue
+        self._heap = [(u, k, key) for (k, key), (u, _) in self._entries.items() if math.isfinite(u)]
+        heapq.heapify(self._heap)
+        self.expire()
+
+    def compact(self):
+        """Reescribe el journal sólo con las entradas vivas (tmp + os.replace)."""
+        self.expire()
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                for (kind, key), (until, data) in self._entries.items():
+                    f.write(json.dumps({"op": "put", "kind": kind, "key": key,
+                                        "until": until if math.isfinite(until) else None,
+                                        "data": data}, separators=(",", ":")) + "\n")
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            os.replace(tmp, self.path)
+            self._lines = len(self._entries)
+        except OSError:
+            pass
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+_REGISTRY = None
+
+
+def get_cooldown_registry() -> CooldownRegistry:
+    """Registro del proceso; el primer acceso reproduce (y compacta) el journal."""
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = CooldownRegistry()
+    return _REGISTRY
@@ -0,0 +1,128 @@
+# func_entry_cache.py
+"""
+Scan de entrada incremental: sólo se recalculan los pares cuyos mercados
+cambiaron desde que se calculó su fila.
+
+Problema que resuelve:
+  open_positions corre cada EXIT_CHECK_SECONDS y re-evaluaba los ~150 pares
+  del universo aunque, con RESOLUTION = "1HOUR", casi ninguna entrada había
+  cambiado: mismas velas cerradas, mismo precio, mismo libro.
+
+Diseño:
+  - Cada fila guardada lleva el estado de sus dos legs con el que se calculó:
+    oracle price y top del libro (bid/ask) del stream v4_orderbook (sin
+    stream no se puede observar gratis: cuenta la regla del oracle).
+  - Un par está SUCIO si no tiene fila, si cambió su hedge ratio (filtro de
+    Kalman) o si alguna de sus legs, respecto a SU fila, movió el oracle más
+    de ENTRY_DIRTY_ORACLE_BPS o cambió el top del libro. La referencia es por
+    par, no por mercado: recalcular C/B no renueva la de A/B aunque compartan
+    B, y un par filtrado un rato (cooldown, leg viva, fuera del top N) vuelve
+    comparándose con el estado de su propia fila. Sólo los pares sucios piden
+    velas/spread y entran en la matriz de z-scores; el resto reutiliza su fila.
+  - Un par cuyas velas no llegaron no guarda fila: se reintenta en el
+    próximo scan.
+  - Recálculo completo (todo sucio) cuando empieza una vela nueva (frontera
+    de RESOLUTION), cuando cambia el universo (CSV nuevo) y, como red de
+    seguridad, cada ENTRY_DIRTY_MAX_AGE_S.
+"""
+
+import time
+
+import numpy as np
+
+from constants import (
+    RESOLUTION, ENTRY_DIRTY_SCAN_ENABLED, ENTRY_DIRTY_ORACLE_BPS, ENTRY_DIRTY_MAX_AGE_S,
+)
+from func_candles import RESOLUTION_SECONDS
+from func_orderbook import live_book
+
+# Columnas de la fila guardada por par (orden de EntryScanCache.rows).
+PAIR_FIELDS = ("hedge", "n1", "n2", "z", "mean_prev", "mean", "std", "last")
+
+
+def _book_top(market: str):
+    book = live_book(market)
+    return book.best() if book is not None else None
+
+
+class EntryScanCache:
+    def __init__(self):
+        self.universe = None
+        self.bar_id = None
+        self.full_ts = 0.0
+        self.spreads = {}    # mercado -> spread bps
+        self.pairs = {}      # índice de par en el universo -> fila PAIR_FIELDS
+        self.legs = {}       # índice de par -> ((oracle, top), (oracle, top)) de base y quote al calcular la fila
+
+    def begin_scan(self, universe, now: float = None) -> bool:
+        """Resetea el estado si toca recálculo completo; True en ese caso."""
+        now = time.time() if now is None else now
+        bar_id = int(now // RESOLUTION_SECONDS.get(RESOLUTION, 3600))
+        if (not ENTRY_DIRTY_SCAN_ENABLED or universe is not self.universe or bar_id != self.bar_id
+                or now - self.full_ts >= ENTRY_DIRTY_MAX_AGE_S):
+            self.__init__()
+            self.universe, self.bar_id, self.full_ts = universe, bar_id, now
+            return True
+        return False
+
+    def stale_pairs(self, universe, pair_ids: np.ndarray, hedges: np.ndarray,
+                    oracle: np.ndarray) -> np.ndarray:
+        """
+        Máscara sobre pair_ids: sin fila guardada, con otro hedge ratio o con
+        alguna leg movida respecto al estado con que se calculó su fila.
+        """
+        tops = {}
+        stale = np.zeros(len(pair_ids), dtype=bool)
+        for j, k in enumerate(pair_ids):
+            k = int(k)
+            row = self.pairs.get(k)
+            if row is None or row[0] != hedges[j]:
+                stale[j] = True
+                continue
+            for i, (px, top) in zip((universe.base_idx[k], universe.quote_idx[k]), self.legs[k]):
+                m = universe.markets[i]
+                if m not in tops:
+                    tops[m] = _book_top(m)
+                # not <=: un oracle NaN (ahora o al guardar) cuenta como movido
+                if not abs(oracle[i] / px - 1.0) * 1e4 <= ENTRY_DIRTY_ORACLE_BPS or tops[m] != top:
+                    stale[j] = True
+                    break
+        return stale
+
+    def store(self, universe, oracle: np.ndarray, spreads: dict,
+              pair_ids, hedges, n1, n2, zs: dict):
+        """
+        Guarda las filas de los pares recién recalculados con el estado de sus
+        legs. Los pares sin velas en alguna leg (prefetch fallido) no se guardan.
+        """
+        self.spreads.update(spreads)
+        tops = {}
+        for j, k in enumerate(pair_ids):
+            if n1[j] <= 0 or n2[j] <= 0:
+                continue
+            k = int(k)
+            legs = []
+            for i in (universe.base_idx[k], universe.quote_idx[k]):
+                m = universe.markets[i]
+                if m not in tops:
+                    tops[m] = _book_top(m)
+                legs.append((float(oracle[i]), tops[m]))
+            self.legs[k] = tuple(legs)
+            self.pairs[k] = (float(hedges[j]), int(n1[j]), int(n2[j]),
+                             *(float(zs[f][j]) for f in PAIR_FIELDS[3:]))
+
+    def rows(self, pair_ids) -> np.ndarray:
+        """
+        Filas guardadas de pair_ids como matriz (len(pair_ids), len(PAIR_FIELDS)).
+        Un par sin fila sale con n1 = n2 = 0 (sin velas) y el resto NaN.
+        """
+        empty = (np.nan, 0, 0) + (np.nan,) * (len(PAIR_FIELDS) - 3)
+        return np.array([self.pairs.get(int(k), empty) for k in pair_ids],
+                        dtype=np.float64).reshape(len(pair_ids), len(PAIR_FIELDS))
+
+
+_CACHE = EntryScanCache()
+
+
+def get_entry_scan_cache() -> EntryScanCache:
+    return _CACHE
@@ -7,34 +7,41 @@ from constants import (
     MIN_EDGE_FEE_MULTIPLE,
     MARKET_BLACKLIST,
     HEDGE_RATIO_LOG_MAX,
+    MAX_PRICE_RATIO,
     MAX_TRADES_PER_MARKET,
     MAX_HEDGE_NOTIONAL_IMBALANCE_PCT,
+    KALMAN_HEDGE_ENABLED,
+    ENTRY_PREFETCH_CONCURRENCY,
+    PAIR_FAIL_COOLDOWN_THRESHOLD, PAIR_FAIL_COOLDOWN_HOURS,
 )
 from func_utils import format_number
 from func_public import get_candles_recent, get_market_spread_bps, get_funding_rates
-from func_cointegration import calculate_zscore, CSV_PATH as COINT_CSV_PATH
+from func_tick import get_markets_map, get_subaccount_obj
+from func_cointegration import CSV_PATH as COINT_CSV_PATH
+from func_kalman import get_hedge_registry
+from func_pair_universe import get_pair_universe
+from func_entry_cache import get_entry_scan_cache, PAIR_FIELDS
+from func_coint_batch import zscore_batch
+from func_cooldowns import get_cooldown_registry, pair_key
+from func_position_store import get_position_store
 from datetime import datetime, timezone
-from constants import WALLET_ADDRESS
 from func_bot_agent import BotAgent
 from func_logging import log_event
 from func_strategy import hedge_weighted_sizes, hedge_notionals
 
-import pandas as pd
-import json
-import os
+import asyncio
 import math
 import uuid
 import numpy as np
 
-JSON_PATH = os.path.join(os.path.dirname(__file__), "bot_agents.json")
 
 # ── Pair-level failure cooldown ───────────────────────────────────────────────
 # Si un par falla PAIR_FAIL_COOLDOWN_THRESHOLD veces seguidas (fills=0 o partial
 # en ambas legs), se marca en cooldown por PAIR_FAIL_COOLDOWN_HOURS horas.
 # Esto evita spamear el mismo par ilíquido en cada ciclo.
-PAIR_FAIL_COOLDOWN_PATH = os.path.join(os.path.dirname(__file__), "pair_fail_cooldowns.json")
-PAIR_FAIL_COOLDOWN_THRESHOLD = 3    # fallos consecutivos antes de cooldown
-PAIR_FAIL_COOLDOWN_HOURS = 4.0      # horas de cooldown tras threshold
+# 2026-10-18: el estado vive en func_cooldowns (registro en memoria + journal);
+# antes se releía pair_fail_cooldowns.json por cada par del scan. Umbral y
+# horas están ahora en constants.
 PAIR_FAIL_RESET_ON_SUCCESS = True   # resetear contador si hay LIVE
 
 # ── Market concentration limit ────────────────────────────────────────────────
@@ -56,6 +63,8 @@ PAIR_FAIL_RESET_ON_SUCCESS = True   # resetear contador si hay LIVE
 # Key format: "BASE-USD|QUOTE-USD" (mismo orden que el CSV).
 _RUNTIME_NAN_PAIRS: set = set()
 
+_NO_CANDLES = np.empty(0)   # mercado sin velas en el prefetch del scan
+
 
 def runtime_nan_pairs_stats():
     """Diagnostic helper."""
@@ -68,95 +77,48 @@ def runtime_nan_pairs_clear():
 
 
 def _pair_key(m1, m2):
-    return "/".join(sorted([str(m1), str(m2)]))
-
-
-def _load_pair_fails():
-    try:
-        with open(PAIR_FAIL_COOLDOWN_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
-
-
-def _save_pair_fails(data):
-    tmp = PAIR_FAIL_COOLDOWN_PATH + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-    os.replace(tmp, PAIR_FAIL_COOLDOWN_PATH)
+    return pair_key(m1, m2)
 
 
 def _is_pair_in_fail_cooldown(m1, m2):
-    data = _load_pair_fails()
+    reg = get_cooldown_registry()
     key = _pair_key(m1, m2)
-    rec = data.get(key)
-    if not rec:
-        return False
-
-    now_utc = datetime.now(timezone.utc)
+    now = datetime.now(timezone.utc).timestamp()
 
     # ── Check post-SL cooldown (set by func_exit_pairs._write_sl_cooldown) ──
-    sl_until_str = rec.get("sl_cooldown_until", "")
-    if sl_until_str:
-        try:
-            sl_until = datetime.fromisoformat(sl_until_str.replace("Z", "+00:00"))
-            if now_utc < sl_until:
-                remaining_h = (sl_until - now_utc).total_seconds() / 3600.0
-                log_event({
-                    "type": "signal_skip",
-                    "reason": "sl_cooldown",
-                    "pair": key,
-                    "remaining_hours": round(remaining_h, 2),
-                    "until": sl_until_str,
-                })
-                return True
-            else:
-                # Expired — clear it
-                rec.pop("sl_cooldown_until", None)
-                rec.pop("sl_cooldown_hours", None)
-                rec.pop("sl_ts", None)
-                data[key] = rec
-                _save_pair_fails(data)
-        except Exception:
-            pass
+    sl = reg.get("sl", key, now)
+    if sl is not None:
+        log_event({
+            "type": "signal_skip",
+            "reason": "sl_cooldown",
+            "pair": key,
+            "remaining_hours": round(reg.remaining("sl", key, now) / 3600.0, 2),
+            "until": sl.get("until", ""),
+        })
+        return True
 
     # ── Check execution-failure cooldown (consecutive fails) ──────────────
-    count = rec.get("consecutive_fails", 0)
-    if count < PAIR_FAIL_COOLDOWN_THRESHOLD:
-        return False
-    ts_str = rec.get("last_fail_ts", "")
-    try:
-        last_fail = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
-        age_h = (now_utc - last_fail).total_seconds() / 3600.0
-        if age_h >= PAIR_FAIL_COOLDOWN_HOURS:
-            # Cooldown expired — reset counter
-            data[key] = {"consecutive_fails": 0, "last_fail_ts": ts_str}
-            _save_pair_fails(data)
-            return False
-        return True
-    except Exception:
-        return False
+    # Al llegar al umbral la entrada "fails" vence a last_fail + HOURS; vencida,
+    # el registro la descarta y el contador vuelve a 0.
+    rec = reg.get("fails", key, now)
+    return rec is not None and int(rec.get("count", 0)) >= PAIR_FAIL_COOLDOWN_THRESHOLD
 
 
 def _record_pair_fail(m1, m2):
-    data = _load_pair_fails()
+    reg = get_cooldown_registry()
     key = _pair_key(m1, m2)
-    rec = data.get(key, {"consecutive_fails": 0})
-    rec["consecutive_fails"] = int(rec.get("consecutive_fails", 0)) + 1
-    rec["last_fail_ts"] = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
-    data[key] = rec
-    _save_pair_fails(data)
-    return rec["consecutive_fails"]
+    now = datetime.now(timezone.utc).timestamp()
+    rec = reg.get("fails", key, now) or {}
+    count = int(rec.get("count", 0)) + 1
+    until = now + PAIR_FAIL_COOLDOWN_HOURS * 3600.0 if count >= PAIR_FAIL_COOLDOWN_THRESHOLD else math.inf
+    reg.put("fails", key, until, count=count, last_fail_ts=now)
+    return count
 
 
 def _record_pair_success(m1, m2):
     if not PAIR_FAIL_RESET_ON_SUCCESS:
         return
-    data = _load_pair_fails()
-    key = _pair_key(m1, m2)
-    if key in data:
-        data[key] = {"consecutive_fails": 0, "last_fail_ts": data[key].get("last_fail_ts", "")}
-        _save_pair_fails(data)
+    get_cooldown_registry().delete("fails", _pair_key(m1, m2))
 
 
 def _sf(x, d=0.0):
@@ -168,8 +130,7 @@ def _sf(x, d=0.0):
 
 
 async def _get_subaccount(indexer):
-    resp = await indexer.account.get_subaccount(WALLET_ADDRESS, 0)
-    return resp.get("subaccount", {}) or {}
+    return await get_subaccount_obj(indexer)
 
 
 async def _get_live_markets_with_position(indexer):
@@ -183,17 +144,60 @@ async def _get_live_markets_with_position(indexer):
     return live
 
 
+async def _prefetch_scan_data(indexer, candle_markets, spread_markets):
+    """
+    Velas y spread (bps) de cada mercado único del scan, en paralelo acotado
+    por ENTRY_PREFETCH_CONCURRENCY. Un mercado que falla simplemente no
+    aparece en el dict (la fase 1 lo trata como sin datos).
+    """
+    sem = asyncio.Semaphore(max(1, int(ENTRY_PREFETCH_CONCURRENCY)))
+    candles, spreads = {}, {}
+
+    async def _candles(m):
+        async with sem:
+            candles[m] = await get_candles_recent(indexer, m)
+
+    async def _spread(m):
+        async with sem:
+            spreads[m] = await get_market_spread_bps(indexer, m)
+
+    await asyncio.gather(*[_candles(m) for m in sorted(candle_markets)],
+                         *[_spread(m) for m in sorted(spread_markets)],
+                         return_exceptions=True)
+    return candles, spreads
+
+
+def _spread_tails(candles_by_market, bases, quotes, hedges, bars):
+    """
+    Matriz bars×B con las últimas `bars` velas de base − hedge·quote de cada
+    par, desde una matriz de precios alineada por el final (una columna por
+    mercado único; NaN delante si un mercado tiene menos velas).
+    """
+    col = {m: k for k, m in enumerate(sorted(set(bases) | set(quotes)))}
+    P = np.full((bars, len(col)), np.nan)
+    for m, k in col.items():
+        tail = np.asarray(candles_by_market.get(m, _NO_CANDLES), dtype=np.float64)[-bars:]
+        if len(tail):
+            P[bars - len(tail):, k] = tail
+    bi = [col[b] for b in bases]
+    qi = [col[q] for q in quotes]
+    return P[:, bi] - np.asarray(hedges, dtype=np.float64) * P[:, qi]
+
+
+# 2026-10-18: los pares abiertos viven en func_position_store (SQLite); se
+# mantienen los nombres por los llamadores.
 def _load_open_pairs_from_json():
     try:
-        with open(JSON_PATH, "r") as f:
-            data = json.load(f)
-        return data if data else []
+        return get_position_store().all()
     except Exception:
         return []
 
 
 def _count_open_pairs_from_json():
-    return len(_load_open_pairs_from_json())
+    try:
+        return get_position_store().count()
+    except Exception:
+        return 0
 
 
 async def open_positions(
@@ -225,7 +229,8 @@ async def open_positions(
     import time as _time
     _scan_t0 = _time.time()
     _phase_t = {"setup": 0.0, "csv_load": 0.0, "markets": 0.0, "funding": 0.0,
-                "prefilter": 0.0, "phase1": 0.0, "phase2": 0.0}
+                "prefilter": 0.0, "prefetch": 0.0, "zscore": 0.0, "phase1": 0.0,
+                "phase2": 0.0}
     _phase_last = _scan_t0
 
     def _mark(phase):
@@ -272,11 +277,14 @@ async def open_positions(
     # ── 3. Live markets with a position (avoid duplicating legs) ──────────
     live_markets = await _get_live_markets_with_position(indexer)
 
-    # ── 4. Load cointegrated pairs CSV ────────────────────────────────────
-    if not os.path.exists(COINT_CSV_PATH):
+    # ── 4. Pair universe (cointegrated_pairs.csv) ─────────────────────────
+    # 2026-10-18: antes pd.read_csv en cada scan. func_pair_universe guarda el
+    # CSV como columnas NumPy y sólo lo relee cuando cambia su mtime; los
+    # filtros de abajo son máscaras booleanas sobre esas columnas.
+    universe = get_pair_universe(COINT_CSV_PATH)
+    if universe is None:
         print(f"[ENTRY] cointegrated_pairs.csv not found. Run FIND_COINTEGRATED=True first.")
         return 0
-    df = pd.read_csv(COINT_CSV_PATH)
     _mark("setup")
 
     # ── 4b. Filter to top-N pairs by quality score (2026-05-26) ────────────
@@ -290,36 +298,26 @@ async def open_positions(
     #
     # Score formula: r_squared × (24 / max(1, half_life)) × (1 / max(0.1, hurst))
     # Higher = better. Top N kept for actual scanning.
+    # 2026-10-18: la puntuación se precalcula al cargar el universo.
     try:
         from constants import MAX_COINT_PAIRS_TO_SCAN
     except ImportError:
         MAX_COINT_PAIRS_TO_SCAN = 150  # safe default
 
-    _csv_total = len(df)
+    _csv_total = len(universe)
+    sel = np.arange(_csv_total)
     if _csv_total > int(MAX_COINT_PAIRS_TO_SCAN) and MAX_COINT_PAIRS_TO_SCAN > 0:
-        def _coint_quality(row):
-            try:
-                r2 = float(row.get("r_squared", 0) or 0)
-                hl = float(row.get("half_life", 24) or 24)
-                hr = float(row.get("hurst", 0.5) or 0.5)
-                return r2 * (24.0 / max(1.0, hl)) * (1.0 / max(0.1, hr))
-            except Exception:
-                return 0.0
-        df = df.copy()
-        df["_quality"] = df.apply(_coint_quality, axis=1)
-        df = df.sort_values("_quality", ascending=False).head(int(MAX_COINT_PAIRS_TO_SCAN)).reset_index(drop=True)
-        df = df.drop(columns=["_quality"])
+        sel = universe.top_n(int(MAX_COINT_PAIRS_TO_SCAN))
         log_event({
             "type": "universe_filtered",
             "csv_total": _csv_total,
             "kept_top_n": int(MAX_COINT_PAIRS_TO_SCAN),
-            "actual_kept": len(df),
+            "actual_kept": len(sel),
         }, print_terminal=False)
 
     _mark("csv_load")
     # ── 5. Market metadata (one API call) ─────────────────────────────────
-    markets_response = await indexer.markets.get_perpetual_markets()
-    markets = markets_response.get("markets", {}) or {}
+    markets = await get_markets_map(indexer)
     _mark("markets")
 
     # ── 6. Fetch funding rates upfront (one API call for all markets) ──────
@@ -333,6 +331,7 @@ async def open_positions(
             }, print_terminal=False)
         except Exception as fe:
             log_event({"type": "funding_rates_fetch_error", "error": str(fe)})
+    _mark("funding")
 
     # ── 7. Load existing open pairs state ─────────────────────────────────
     bot_agents = _load_open_pairs_from_json()
@@ -342,17 +341,9 @@ async def open_positions(
         val = m_data.get("minOrderSize") or m_data.get("stepSize")
         return float(val) if val else 0.0
 
-    # MAX_PRICE_RATIO: filtro contra pares con asimetría extrema de precio.
-    # 50 era el valor inicial (commit 37659ea).
-    #
-    # 2026-05-26: subido de 50 a 200. Análisis del log 2026-05-25 mostró que
-    # MAX=50 filtraba 33 de 144 pares del CSV (23%) — incluyendo pares con
-    # precios diversos pero hedge_ratio sano (ya protegido por HEDGE_RATIO_LOG_MAX
-    # = 3.5). MAX=200 permite pares hasta ratio 200 (ej. SOL $150 / mid-cap $1).
-    # Pares con ratio > 200 (mostly BTC/altcoin nano-cap) siguen filtrados, lo
-    # cual es correcto: ahí el min order size de dYdX hace imposible operar.
-    # La protección real contra pares espurios sigue siendo HEDGE_RATIO_LOG_MAX.
-    MAX_PRICE_RATIO = 200.0
+    # MAX_PRICE_RATIO (constants.py): filtro contra pares con asimetría
+    # extrema de precio. 2026-10-18: movido a constants; la generación del CSV
+    # (func_cointegration, etapa 1) aplica el mismo límite.
 
     # ──────────────────────────────────────────────────────────────────────
     # 7b. PRE-FILTER del CSV (2026-06-02)
@@ -372,45 +363,38 @@ async def open_positions(
     # _RUNTIME_NAN_PAIRS es module-level, se llena durante el scan cuando
     # detectamos z=NaN, y persiste mientras el proceso vive. Se limpia en
     # cada reload del CSV (cuando FIND_COINTEGRATED regenera).
-    _prefilter_dropped_price_ratio = 0
-    _prefilter_dropped_nan         = 0
-    _prefilter_dropped_no_market   = 0
-    _df_filtered_rows = []
-    for _, _row in df.iterrows():
-        _b = _row["base_market"]
-        _q = _row["quote_market"]
-        _pair_key = f"{_b}|{_q}"
-        if _pair_key in _RUNTIME_NAN_PAIRS:
-            _prefilter_dropped_nan += 1
-            continue
-        if _b not in markets or _q not in markets:
-            _prefilter_dropped_no_market += 1
-            continue
+    #
+    # 2026-10-18: máscaras sobre el universo. El oracle price se lee una vez
+    # por mercado (NaN si falta o no es numérico → "no_market").
+    _oracle = np.full(len(universe.markets), np.nan)
+    for _i in np.flatnonzero(universe.market_mask(markets.keys())):
         try:
-            _bp = float(markets[_b]["oraclePrice"])
-            _qp = float(markets[_q]["oraclePrice"])
-            _ratio = max(_bp, _qp) / max(1e-12, min(_bp, _qp))
-            if _ratio > MAX_PRICE_RATIO:
-                _prefilter_dropped_price_ratio += 1
-                continue
+            _oracle[_i] = float(markets[universe.markets[_i]]["oraclePrice"])
         except Exception:
-            _prefilter_dropped_no_market += 1
-            continue
-        _df_filtered_rows.append(_row)
-    if _df_filtered_rows:
-        df = pd.DataFrame(_df_filtered_rows).reset_index(drop=True)
+            pass
+    if _RUNTIME_NAN_PAIRS:
+        _nan_rt = np.fromiter(
+            (f"{universe.base(k)}|{universe.quote(k)}" in _RUNTIME_NAN_PAIRS for k in sel),
+            dtype=bool, count=len(sel),
+        )
     else:
-        df = df.iloc[0:0]   # empty but preserves columns
+        _nan_rt = np.zeros(len(sel), dtype=bool)
+    _bp = _oracle[universe.base_idx[sel]]
+    _qp = _oracle[universe.quote_idx[sel]]
+    _no_market = ~_nan_rt & ~(np.isfinite(_bp) & np.isfinite(_qp))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        _ratio = np.fmax(_bp, _qp) / np.maximum(1e-12, np.fmin(_bp, _qp))
+    _bad_ratio = ~_nan_rt & ~_no_market & (_ratio > MAX_PRICE_RATIO)
+    sel = sel[~(_nan_rt | _no_market | _bad_ratio)]
 
     log_event({
         "type": "csv_prefiltered",
-        "csv_after_prefilter": len(df),
-        "dropped_price_ratio": _prefilter_dropped_price_ratio,
-        "dropped_nan_runtime": _prefilter_dropped_nan,
-        "dropped_no_market": _prefilter_dropped_no_market,
+        "csv_after_prefilter": len(sel),
+        "dropped_price_ratio": int(_bad_ratio.sum()),
+        "dropped_nan_runtime": int(_nan_rt.sum()),
+        "dropped_no_market": int(_no_market.sum()),
         "runtime_nan_set_size": len(_RUNTIME_NAN_PAIRS),
     }, print_terminal=False)
-    _mark("funding")  # funding is reflected here pre-prefilter; prefilter is fast
     _mark("prefilter")
 
     # ══════════════════════════════════════════════════════════════════════
@@ -432,57 +416,168 @@ async def open_positions(
     _max_z_seen         = 0.0   # highest |z| seen (even if below threshold)
     _best_low_z_pair    = ""    # pair closest to threshold
 
+    # ── Cheap filters as masks over the universe (no API calls) ───────────
+    # 2026-10-18: blacklist, hedge ratio, posiciones vivas y cooldown se
+    # evalúan sobre `sel` de una vez; cada contador cuenta los pares que
+    # llegan vivos a su filtro (mismo orden que el bucle por fila anterior).
+    _alive = np.ones(len(sel), dtype=bool)
+
+    _m = universe.pair_mask(universe.market_mask(MARKET_BLACKLIST), sel)
+    for _k in sel[_m]:
+        log_event({"type": "signal_skip", "reason": "market_blacklisted",
+                   "base": universe.base(_k), "quote": universe.quote(_k)}, print_terminal=False)
+    _skip_blacklist = int(_m.sum())
+    _alive &= ~_m
+
+    # ── Hedge ratio sanity check (belt-and-suspenders if CSV is stale) ──
+    # Ratios extremos como BTC/SHIB (12.8B) no tienen sentido económico:
+    # el sizing de la leg barata sería microscópico y el z-score espurio.
+    _hr_csv = universe.hedge_ratio[sel]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        _m = _alive & ~((_hr_csv > 0) & (np.abs(np.log10(np.abs(_hr_csv))) <= HEDGE_RATIO_LOG_MAX))
+    for _k in sel[_m]:
+        log_event({"type": "signal_skip", "reason": "hedge_ratio_extreme",
+                   "base": universe.base(_k), "quote": universe.quote(_k),
+                   "hedge_ratio": float(universe.hedge_ratio[_k])}, print_terminal=False)
+    _skip_hedge_ratio = int(_m.sum())
+    _alive &= ~_m
+
+    _m = _alive & universe.pair_mask(universe.market_mask(live_markets), sel)
+    _skip_live = int(_m.sum())
+    _alive &= ~_m
+
+    for _j in np.flatnonzero(_alive):
+        _b, _q = universe.base(sel[_j]), universe.quote(sel[_j])
+        if _is_pair_in_fail_cooldown(_b, _q):
+            _skip_cooldown += 1
+            _alive[_j] = False
+            log_event({"type": "signal_skip", "reason": "pair_fail_cooldown",
+                       "base": _b, "quote": _q}, print_terminal=False)
+
+    _cand = sel[_alive]
+    _bases = [universe.base(k) for k in _cand]
+    _quotes = [universe.quote(k) for k in _cand]
+
+    # El hedge ratio es el que usará la entrada: el dinámico del filtro de
+    # Kalman (func_kalman) si el par tiene estado caliente, si no el del CSV.
+    _hedge_live = universe.hedge_ratio[_cand].copy()
+    if KALMAN_HEDGE_ENABLED:
+        _registry = get_hedge_registry()
+        for _j, (_b, _q) in enumerate(zip(_bases, _quotes)):
+            _hr = _registry.current_hedge_ratio(_b, _q)
+            if _hr is not None:
+                _hedge_live[_j] = _hr
+
+    # ── 7c. Dirty set (2026-10-18, func_entry_cache) ──────────────────────
+    # Sólo se recalculan los pares con alguna leg movida desde que se calculó
+    # su fila (oracle > ENTRY_DIRTY_ORACLE_BPS o top del libro distinto), con
+    # otro hedge ratio o sin resultado guardado; vela nueva → todos. El resto
+    # reutiliza su fila.
+    _scan_cache = get_entry_scan_cache()
+    _scan_cache.begin_scan(universe)
+    _stale = _scan_cache.stale_pairs(universe, _cand, _hedge_live, _oracle)
+    _st = np.flatnonzero(_stale)
+    _dirty_m = np.union1d(universe.base_idx[_cand[_st]], universe.quote_idx[_cand[_st]])
+    _st_bases = [_bases[j] for j in _st]
+    _st_quotes = [_quotes[j] for j in _st]
+
+    # ── 7d. Prefetch concurrente de velas y spreads (2026-10-18) ──────────
+    # Antes la fase 1 hacía await de get_candles_recent ×2 y de
+    # get_market_spread_bps por par, en serie: cientos de round trips en un
+    # scan en frío. Ahora se recogen los mercados únicos de los pares a
+    # recalcular, se piden todos en paralelo y la fase 1 puntúa sólo con
+    # datos en memoria.
+    candles_by_market, spread_by_market = await _prefetch_scan_data(
+        indexer, set(_st_bases) | set(_st_quotes), set(_st_bases)
+    )
+    _mark("prefetch")
+
+    # ── 7e. z-score matricial de los pares a recalcular (2026-10-18) ──────
+    # Antes, por candidato: pd.Series + calculate_zscore (dos rolling y un
+    # rolling(1) inútil) + otro rolling(WINDOW).mean().shift(1) + np.std/mean.
+    # Ahora los spreads se apilan en una matriz (sólo las últimas WINDOW+1
+    # velas, que es todo lo que usan) y zscore_batch saca z, media congelada
+    # previa y media/std en unas pocas operaciones NumPy.
+    _zs_new = zscore_batch(
+        _spread_tails(candles_by_market, _st_bases, _st_quotes, _hedge_live[_st], WINDOW + 1), WINDOW
+    )
+    # Velas disponibles por par (el spread exige series de igual longitud).
+    _n_bars = {m: len(c) for m, c in candles_by_market.items()}
+    _scan_cache.store(
+        universe, _oracle, spread_by_market, _cand[_st], _hedge_live[_st],
+        [_n_bars.get(m, 0) for m in _st_bases], [_n_bars.get(m, 0) for m in _st_quotes], _zs_new,
+    )
+    _rows = _scan_cache.rows(_cand)
+    _zs = {f: _rows[:, c] for c, f in enumerate(PAIR_FIELDS)}
+    _n1 = _zs["n1"]
+    _n2 = _zs["n2"]
+    _z = _zs["z"]
+    _bad_candles = ~((_n1 > 0) & (_n1 == _n2))
+
+    # 2026-05-26: guard against NaN/Inf z-score.
+    # calculate_zscore divides (x - rolling_mean) / rolling_std. When the
+    # spread is constant (or warmup window not full), std=0 → z=NaN.
+    # Without this guard, NaN slipped past the |z| < THRESH check (because
+    # NaN comparisons are always False), reached the candidates list, and
+    # showed up as "edge=$0.00 < required=$5.00 z=nan" in the log over
+    # and over for the same pair, wasting scan cycles.
+    _not_finite = ~_bad_candles & ~np.isfinite(_z)
+    for _j in np.flatnonzero(_not_finite):
+        # 2026-06-02: añadir a runtime cache para skip futuro en pre-filter
+        _RUNTIME_NAN_PAIRS.add(f"{_bases[_j]}|{_quotes[_j]}")
+        log_event({
+            "type": "signal_skip",
+            "reason": "zscore_not_finite",
+            "base": _bases[_j],
+            "quote": _quotes[_j],
+            "z_score": "nan" if math.isnan(_z[_j]) else "inf",
+            "runtime_nan_set_now": len(_RUNTIME_NAN_PAIRS),
+        }, print_terminal=False)
+
+    _finite = ~_bad_candles & ~_not_finite
+    _absz = np.where(_finite, np.abs(np.nan_to_num(_z)), 0.0)
+    if _finite.any() and _absz.max() > 0:
+        _j = int(np.argmax(_absz))
+        _max_z_seen = float(_absz[_j])
+        _best_low_z_pair = f"{_bases[_j]}/{_quotes[_j]}"
+    _low_z = _finite & (_absz < ZSCORE_THRESH)
+    # Ventana previa completa para la media congelada de la entrada.
+    _short = _finite & ~_low_z & ((_n1 < WINDOW + 1) | ~np.isfinite(_zs["mean_prev"]))
+    _skip_candles = int((_bad_candles | _not_finite | _short).sum())
+    _skip_low_z = int(_low_z.sum())
+    _mark("zscore")
+
     # Track how many candidates per market in this scan cycle
     # (prevents ARKM-USD appearing in 9 candidates when only 1 can be traded)
     _market_candidate_count: dict = {}
 
-    for _, row in df.iterrows():
-        base_market = row["base_market"]
-        quote_market = row["quote_market"]
-        hedge_ratio = float(row["hedge_ratio"])
-        half_life = row.get("half_life")
-
-        # ── Cheap filters (no API calls) ────────────────────────────────
-        if base_market in MARKET_BLACKLIST or quote_market in MARKET_BLACKLIST:
-            _skip_blacklist += 1
-            log_event({"type": "signal_skip", "reason": "market_blacklisted",
-                       "base": base_market, "quote": quote_market}, print_terminal=False)
-            continue
-
-        # ── Hedge ratio sanity check (belt-and-suspenders if CSV is stale) ──
-        # Ratios extremos como BTC/SHIB (12.8B) no tienen sentido económico:
-        # el sizing de la leg barata sería microscópico y el z-score espurio.
-        if hedge_ratio <= 0 or abs(np.log10(abs(hedge_ratio))) > HEDGE_RATIO_LOG_MAX:
-            _skip_hedge_ratio += 1
-            log_event({"type": "signal_skip", "reason": "hedge_ratio_extreme",
-                       "base": base_market, "quote": quote_market,
-                       "hedge_ratio": hedge_ratio}, print_terminal=False)
-            continue
+    for _j in np.flatnonzero(_finite & ~_low_z & ~_short):
+        _k = _cand[_j]
+        base_market = _bases[_j]
+        quote_market = _quotes[_j]
+        half_life = float(universe.half_life[_k])
+        z_score = float(_z[_j])
 
-        if base_market not in markets or quote_market not in markets:
-            _skip_invalid += 1
-            log_event({"type": "signal_skip", "reason": "invalid_market",
-                       "base": base_market, "quote": quote_market}, print_terminal=False)
-            continue
-        if base_market in live_markets or quote_market in live_markets:
-            _skip_live += 1
-            continue
+        # 2026-10-18: hedge ratio dinámico. El filtro de Kalman (func_kalman) se
+        # actualiza con cada vela cerrada; si el par tiene estado caliente su β
+        # sustituye al del CSV para spread, z-score y sizing (la posición guarda
+        # el β usado, que exit/risk-off siguen aplicando). Resuelto en 7d.
+        hedge_ratio_csv = float(universe.hedge_ratio[_k])
+        hedge_ratio = float(_hedge_live[_j])
 
         # ── Market concentration limit ───────────────────────────────────
         # Si un mercado ya aparece MAX_TRADES_PER_MARKET veces como candidato
         # en este scan, saltamos pares adicionales con ese mercado.
         # Evita que ARKM-USD (presente en 9+ pares del CSV) bloquee todo
         # el capital cuando ya hay 1 candidato con ARKM.
+        # 2026-10-18: es un conteo acumulado (depende de qué pares anteriores
+        # acabaron siendo candidatos), así que se aplica aquí, sobre los pares
+        # que ya superaron las máscaras y el umbral de z.
         b_count = _market_candidate_count.get(base_market, 0)
         q_count = _market_candidate_count.get(quote_market, 0)
         if b_count >= MAX_TRADES_PER_MARKET or q_count >= MAX_TRADES_PER_MARKET:
             _skip_concentration += 1
             continue
-        if _is_pair_in_fail_cooldown(base_market, quote_market):
-            _skip_cooldown += 1
-            log_event({"type": "signal_skip", "reason": "pair_fail_cooldown",
-                       "base": base_market, "quote": quote_market}, print_terminal=False)
-            continue
 
         try:
             base_price = float(markets[base_market]["oraclePrice"])
@@ -506,88 +601,31 @@ async def open_positions(
                       print_terminal=False)
             continue
 
-        # ── Candle fetch + z-score (main API cost per candidate) ─────────
-        series_1 = await get_candles_recent(indexer, base_market)
-        series_2 = await get_candles_recent(indexer, quote_market)
-
-        if not (len(series_1) > 0 and len(series_1) == len(series_2)):
-            _skip_candles += 1
-            continue
-
-        spread = series_1 - (hedge_ratio * series_2)
-
-        try:
-            z_score = float(calculate_zscore(spread).values.tolist()[-1])
-        except Exception:
-            _skip_candles += 1
-            continue
-
-        # 2026-05-26: guard against NaN/Inf z-score.
-        # calculate_zscore divides (x - rolling_mean) / rolling_std. When the
-        # spread is constant (or warmup window not full), std=0 → z=NaN.
-        # Without this guard, NaN slipped past the |z| < THRESH check (because
-        # NaN comparisons are always False), reached the candidates list, and
-        # showed up as "edge=$0.00 < required=$5.00 z=nan" in the log over
-        # and over for the same pair, wasting scan cycles.
-        if not math.isfinite(z_score):
-            _skip_candles += 1
-            # 2026-06-02: añadir a runtime cache para skip futuro en pre-filter
-            _RUNTIME_NAN_PAIRS.add(f"{base_market}|{quote_market}")
-            log_event({
-                "type": "signal_skip",
-                "reason": "zscore_not_finite",
-                "base": base_market,
-                "quote": quote_market,
-                "z_score": "nan" if math.isnan(z_score) else "inf",
-                "runtime_nan_set_now": len(_RUNTIME_NAN_PAIRS),
-            }, print_terminal=False)
-            continue
-
-        if abs(z_score) > _max_z_seen:
-            _max_z_seen = abs(z_score)
-            _best_low_z_pair = f"{base_market}/{quote_market}"
-
-        if abs(z_score) < ZSCORE_THRESH:
-            _skip_low_z += 1
-            continue
-
         # ── Spread quality diagnostics ───────────────────────────────────
-        spread_std = float(np.std(spread[-WINDOW:]) if len(spread) >= WINDOW else np.std(spread))
-        spread_mean = float(np.mean(spread[-WINDOW:]) if len(spread) >= WINDOW else np.mean(spread))
+        # (z finito ⇒ al menos WINDOW velas: media/std de las últimas WINDOW)
+        spread_std = float(_zs["std"][_j])
+        spread_mean = float(_zs["mean"][_j])
 
-        # ── Hedge ratio drift check (CSV vs live OLS) ────────────────────
+        # ── Hedge ratio drift check (CSV vs Kalman) ──────────────────────
         # Detecta si el hedge ratio del CSV sigue siendo válido hoy.
-        # Un drift >30% indica que la relación de precios cambió — el z-score
-        # puede estar mal escalado y la posición puede no ser market-neutral.
-        try:
-            _hr_live = float(np.polyfit(series_2.values, series_1.values, 1)[0])
-            _hr_drift_pct = abs(_hr_live - hedge_ratio) / max(abs(hedge_ratio), 1e-10) * 100.0
+        # Un drift >30% indica que la relación de precios cambió desde el
+        # último refresh. 2026-10-18: hr_live es el β del filtro de Kalman
+        # (antes un ajuste OLS por candidato en cada scan).
+        if hedge_ratio != hedge_ratio_csv:
+            _hr_drift_pct = abs(hedge_ratio - hedge_ratio_csv) / max(abs(hedge_ratio_csv), 1e-10) * 100.0
             if _hr_drift_pct > 30.0:
                 log_event({
                     "type": "hedge_ratio_drift_warning",
                     "base": base_market,
                     "quote": quote_market,
-                    "hr_csv": round(hedge_ratio, 6),
-                    "hr_live": round(_hr_live, 6),
+                    "hr_csv": round(hedge_ratio_csv, 6),
+                    "hr_live": round(hedge_ratio, 6),
                     "drift_pct": round(_hr_drift_pct, 2),
                     "z_score": round(z_score, 3),
                 })
-        except Exception:
-            pass
-
-        spread_s = pd.Series(spread)
-        if len(spread_s) < WINDOW + 1:
-            _skip_candles += 1
-            continue
-
-        spread_last = float(spread_s.iloc[-1])
-        spread_mean_prev_s = spread_s.rolling(WINDOW).mean().shift(1)
-        spread_mean_prev = float(spread_mean_prev_s.iloc[-1])
-
-        if not math.isfinite(spread_mean_prev):
-            _skip_candles += 1
-            continue
 
+        spread_last = float(_zs["last"][_j])
+        spread_mean_prev = float(_zs["mean_prev"][_j])
         spread_dev = abs(spread_last - spread_mean_prev)
 
         # The signal is defined on spread = P1 - hedge_ratio * P2.  Replicate
@@ -644,8 +682,8 @@ async def open_positions(
                       print_terminal=False)
             continue
 
-        # ── Spread bps for scoring (lightweight orderbook call) ───────────
-        spread_bps = await get_market_spread_bps(indexer, base_market)
+        # ── Spread bps for scoring (from the prefetch) ───────────────────
+        spread_bps = _scan_cache.spreads.get(base_market)
         if spread_bps is None:
             spread_bps = 100.0  # conservative default when unavailable
 
@@ -658,6 +696,7 @@ async def open_positions(
             "base_market": base_market,
             "quote_market": quote_market,
             "hedge_ratio": hedge_ratio,
+            "hedge_ratio_csv": hedge_ratio_csv,
             "half_life": half_life,
             "z_score": z_score,
             "spread_dev": spread_dev,
@@ -689,14 +728,15 @@ async def open_positions(
         candidates.sort(key=lambda c: c["score"], reverse=True)
 
     # ── Phase 1 summary (always printed to terminal) ───────────────────────
-    _total_csv = len(df)
+    _total_csv = len(sel)
     _phase1_summary = (
         f"[ENTRY] Phase1: {_total_csv} CSV pairs → "
         f"blacklist={_skip_blacklist} hedge={_skip_hedge_ratio} invalid={_skip_invalid} "
         f"live={_skip_live} concentration={_skip_concentration} "
         f"cooldown={_skip_cooldown} price_ratio={_skip_price_r} candles={_skip_candles} "
         f"low_z={_skip_low_z}(max|z|={_max_z_seen:.2f} @ {_best_low_z_pair}) "
-        f"min_size={_skip_min_size} → candidates={len(candidates)}"
+        f"min_size={_skip_min_size} → candidates={len(candidates)} "
+        f"(recomputed {len(_st)}/{len(_cand)} pairs)"
     )
     print(_phase1_summary, flush=True)
 
@@ -928,8 +968,7 @@ async def open_positions(
             bot_open_dict["entry_spread_target"] = float(cand["entry_spread_target"])
 
             bot_agents.append(bot_open_dict)
-            with open(JSON_PATH, "w") as f:
-                json.dump(bot_agents, f, indent=2)
+            get_position_store().insert(bot_open_dict)
 
             opened_count += 1
             open_pairs += 1
@@ -1007,8 +1046,7 @@ async def open_positions(
             bot_open_dict["needs_reconcile"] = True
             bot_open_dict["opened_at"] = bot_open_dict.get("opened_at") or datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
             bot_agents.append(bot_open_dict)
-            with open(JSON_PATH, "w") as f:
-                json.dump(bot_agents, f, indent=2)
+            get_position_store().insert(bot_open_dict)
             send_message(f"⚠️ ORPHAN: {base_market}/{quote_market}. Guardado para cleanup.")
             log_event({
                 "type": "orphan_saved",
@@ -1043,6 +1081,8 @@ async def open_positions(
     # 2026-06-02: emit scan_timing para audit_run.py
     _mark("phase2")
     _scan_total_s = _time.time() - _scan_t0
+    print("[ENTRY] timing: total={:.2f}s ".format(_scan_total_s)
+          + " ".join(f"{k}={v:.2f}s" for k, v in _phase_t.items()), flush=True)
     log_event({
         "type": "scan_timing",
         "scan_total_s": round(_scan_total_s, 3),
@@ -1051,6 +1091,11 @@ async def open_positions(
         "phase_markets_s":   round(_phase_t.get("markets", 0), 3),
         "phase_funding_s":   round(_phase_t.get("funding", 0), 3),
         "phase_prefilter_s": round(_phase_t.get("prefilter", 0), 3),
+        "phase_prefetch_s":  round(_phase_t.get("prefetch", 0), 3),
+        "phase_zscore_s":    round(_phase_t.get("zscore", 0), 3),
+        "prefetch_markets":  len(candles_by_market) if 'candles_by_market' in locals() else 0,
+        "dirty_markets":     len(_dirty_m) if '_dirty_m' in locals() else 0,
+        "recomputed_pairs":  len(_st) if '_st' in locals() else 0,
         "phase_phase1_s":    round(_phase_t.get("phase1", 0), 3),
         "phase_phase2_s":    round(_phase_t.get("phase2", 0), 3),
         "candidates": len(candidates) if 'candidates' in locals() else 0,
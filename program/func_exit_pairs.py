@@ -24,6 +24,8 @@ from constants import (
 )
 from func_utils import format_number
 from func_public import get_candles_recent, get_market_spread_bps
+from func_tick import get_markets_map, get_subaccount_obj
+from func_orderbook import live_book
 from func_cointegration import calculate_zscore
 from func_private import (
     place_market_order, close_pair_maker_with_fallback, get_real_fill_details,
@@ -31,19 +33,17 @@ from func_private import (
 )
 from constants import MAKER_EXIT_ENABLED, MAKER_EXIT_TIMEOUT_S
 from func_logging import log_event
+from func_cooldowns import get_cooldown_registry, pair_key
+from func_position_store import get_position_store
 from func_strategy import (
     spread_convergence_progress, fee_with_fallback, conservative_close_price,
 )
 from v4_proto.dydxprotocol.clob.order_pb2 import Order
 
-import json
 import asyncio
-import os
 import numpy as np
 from datetime import datetime, timezone
 
-JSON_PATH = os.path.join(os.path.dirname(__file__), "bot_agents.json")
-
 # ─── Hard Stop-Loss ──────────────────────────────────────────────────────────
 # Pulled from constants.py so they're in one place.
 USE_HARD_SL = True
@@ -64,13 +64,13 @@ KEEP_RECONCILE_RECORDS = True
 TAKER_FEE_BPS = 0.0005
 
 # ── Post-SL cooldown writer ───────────────────────────────────────────────────
-# Reutiliza el mismo pair_fail_cooldowns.json que usa func_entry_pairs.py,
-# añadiendo un campo "sl_cooldown_until" con timestamp ISO para bloquear re-entrada.
-_SL_COOLDOWN_PATH = os.path.join(os.path.dirname(__file__), "pair_fail_cooldowns.json")
+# Entrada "sl" en el registro de func_cooldowns (el mismo que consulta
+# func_entry_pairs._is_pair_in_fail_cooldown) para bloquear re-entrada.
+# 2026-10-18: antes reescribía pair_fail_cooldowns.json entero en cada SL.
 
 
 def _pair_key_exit(m1: str, m2: str) -> str:
-    return "/".join(sorted([str(m1), str(m2)]))
+    return pair_key(m1, m2)
 
 
 def _write_sl_cooldown(m1: str, m2: str, half_life: float):
@@ -78,12 +78,6 @@ def _write_sl_cooldown(m1: str, m2: str, half_life: float):
     if not SL_COOLDOWN_ENABLED:
         return
     try:
-        try:
-            with open(_SL_COOLDOWN_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except Exception:
-            data = {}
-
         cooldown_hours = max(
             float(SL_COOLDOWN_MIN_HOURS),
             float(half_life) * float(SL_COOLDOWN_HALFLIFE_MULT) if half_life and half_life > 0 else 0.0
@@ -92,16 +86,12 @@ def _write_sl_cooldown(m1: str, m2: str, half_life: float):
         until_iso = datetime.fromtimestamp(until_dt, tz=timezone.utc).isoformat().replace("+00:00", "Z")
 
         key = _pair_key_exit(m1, m2)
-        rec = data.get(key, {})
-        rec["sl_cooldown_until"] = until_iso
-        rec["sl_cooldown_hours"] = round(cooldown_hours, 2)
-        rec["sl_ts"] = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
-        data[key] = rec
-
-        tmp = _SL_COOLDOWN_PATH + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-        os.replace(tmp, _SL_COOLDOWN_PATH)
+        get_cooldown_registry().put(
+            "sl", key, until_dt,
+            until=until_iso,
+            hours=round(cooldown_hours, 2),
+            ts=datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        )
 
         log_event({
             "type": "sl_cooldown_set",
@@ -252,7 +242,18 @@ async def _close_single_live_leg(node, indexer, wallet, markets, market, live_si
 
 
 async def _get_exit_spreads_cached(indexer, position, m1, m2, now_utc, ttl_seconds=300):
-    """Read both live spreads, reusing a short-lived value across exit loops."""
+    """Read both live spreads, reusing a short-lived value across exit loops.
+
+    With both books streamed (func_orderbook) the read is free, so the TTL is
+    skipped and the current spreads are always used.
+    """
+    book_1, book_2 = live_book(m1), live_book(m2)
+    if book_1 is not None and book_2 is not None:
+        spread_1, spread_2 = book_1.spread_bps(), book_2.spread_bps()
+        position["exit_liquidity_checked_at"] = now_utc.isoformat().replace("+00:00", "Z")
+        position["exit_spread_1_bps"] = spread_1
+        position["exit_spread_2_bps"] = spread_2
+        return spread_1, spread_2
     checked_at = _parse_opened_at(position.get("exit_liquidity_checked_at"))
     if checked_at is not None:
         age_s = (now_utc - checked_at).total_seconds()
@@ -328,21 +329,22 @@ async def _refresh_estimated_entry_fills(indexer, position, now_utc, ttl_seconds
 
 
 async def manage_trade_exits(node, indexer, wallet):
+    # 2026-10-18: registros desde func_position_store. `loaded` es la foto sin
+    # tocar; al final sólo se escriben las filas que esta pasada cambió o cerró.
     try:
-        with open(JSON_PATH, "r") as f:
-            open_positions_list = json.load(f)
+        store = get_position_store()
+        loaded = store.all()
+        open_positions_list = store.all()
     except Exception:
         return "complete"
 
     if not open_positions_list:
         return "complete"
 
-    markets_resp = await indexer.markets.get_perpetual_markets()
-    markets = markets_resp.get("markets", {}) or {}
+    markets = await get_markets_map(indexer)
 
     try:
-        account_resp = await indexer.account.get_subaccount(WALLET_ADDRESS, 0)
-        subaccount = account_resp.get("subaccount", {}) or {}
+        subaccount = await get_subaccount_obj(indexer)
         positions = (
             subaccount.get("openPerpetualPositions", {})
             or subaccount.get("perpetualPositions", {})
@@ -1272,8 +1274,7 @@ async def manage_trade_exits(node, indexer, wallet):
             kept_count += 1
             save_output.append(position)
 
-    with open(JSON_PATH, "w") as f:
-        json.dump(save_output, f, indent=2)
+    store.apply(loaded, save_output)
 
     log_event({
         "type": "exit_summary",
@@ -0,0 +1,194 @@
+# func_kalman.py
+"""
+Hedge ratio dinámico por par (filtro de Kalman), actualizado vela a vela y
+persistente entre reinicios.
+
+Problema que resuelve:
+  El bot operaba con el hedge_ratio ESTÁTICO del CSV (el del último refresh
+  de cointegración) y la fase 1 de open_positions re-ajustaba un np.polyfit
+  por candidato sólo para loguear hedge_ratio_drift_warning. Entre refreshes
+  el ratio derivaba y el z-score quedaba mal escalado.
+
+Modelo (sin intercepto, como calculate_cointegration):
+    y_t = β_t · x_t + ε_t        ε ~ N(0, R)   (R adaptativo: EWMA de ε²)
+    β_t = β_{t-1} + w_t          w ~ N(0, q·β²) (ruido relativo: misma
+                                 escala para BTC/ETH que para memecoins)
+  Cada vela cerrada: predict + update escalar, O(1).
+  Sólo el β: el z-score de entrada, salida y risk-off sigue siendo el de
+  ventana WINDOW sobre velas (calculate_zscore / zscore_batch), para que
+  entrada y salida midan el mismo z.
+
+Estado:
+  - KalmanHedge: un par (β, P, R, nº de velas, ts de la última vela
+    aplicada). to_dict/from_dict para el JSON.
+  - HedgeRegistry: {"BASE|QUOTE": KalmanHedge} en kalman_hedges.json
+    (tmp + os.replace). update_from_frame() aplica las velas CERRADAS nuevas
+    de la tabla de construct_market_prices; un par nuevo arranca del ratio del
+    CSV y se calienta con la historia de la tabla.
+  - current_hedge_ratio(): lo que usa la entrada; None si el par no tiene
+    estado caliente (→ ratio del CSV, como antes).
+"""
+
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from constants import (
+    WINDOW, RESOLUTION, HEDGE_RATIO_LOG_MAX,
+    KALMAN_HEDGE_DELTA, KALMAN_HEDGE_MIN_BARS,
+)
+from func_candles import RESOLUTION_SECONDS
+
+STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kalman_hedges.json")
+
+
+def pair_key(base: str, quote: str) -> str:
+    return f"{base}|{quote}"
+
+
+class KalmanHedge:
+    __slots__ = ("beta", "P", "R", "n", "last_ts")
+
+    def __init__(self, beta: float, P: float = None, R: float = None, n: int = 0,
+                 last_ts: float = None):
+        self.beta = float(beta)
+        self.P = float(P) if P is not None else 100.0 * KALMAN_HEDGE_DELTA * self.beta ** 2
+        self.R = R
+        self.n = int(n)
+        self.last_ts = last_ts
+
+    def update(self, y: float, x: float, ts: float = None) -> float:
+        """Una vela cerrada (y = base, x = quote). Devuelve la innovación."""
+        P = self.P + KALMAN_HEDGE_DELTA * self.beta ** 2
+        e = y - self.beta * x
+        if self.R is None:
+            self.R = max(e * e, 1e-12 * y * y, 1e-300)
+        S = x * x * P + self.R
+        K = P * x / S
+        self.beta += K * e
+        self.P = (1.0 - K * x) * P
+        alpha = 2.0 / (WINDOW + 1.0)
+        self.R = (1.0 - alpha) * self.R + alpha * e * e
+        self.n += 1
+        if ts is not None:
+            self.last_ts = float(ts)
+        return e
+
+    @property
+    def is_warm(self) -> bool:
+        return self.n >= KALMAN_HEDGE_MIN_BARS
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        return cls(**{k: d.get(k) for k in cls.__slots__ if k in d})
+
+
+class HedgeRegistry:
+    def __init__(self, path: str = STATE_PATH):
+        self.path = path
+        self.states = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            self.states = {k: KalmanHedge.from_dict(v) for k, v in raw.items()}
+        except Exception:
+            self.states = {}
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({k: s.to_dict() for k, s in self.states.items()}, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    def get(self, base: str, quote: str):
+        return self.states.get(pair_key(base, quote))
+
+    def update_pair(self, base: str, quote: str, ts, y, x, seed_beta: float) -> int:
+        """Aplica las velas con ts > last_ts (NaN se saltan). Devuelve cuántas."""
+        key = pair_key(base, quote)
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = KalmanHedge(seed_beta)
+        start = 0 if state.last_ts is None else int(np.searchsorted(ts, state.last_ts, side="right"))
+        applied = 0
+        for t in range(start, len(ts)):
+            if math.isfinite(y[t]) and math.isfinite(x[t]) and x[t] != 0:
+                state.update(float(y[t]), float(x[t]))
+                applied += 1
+            state.last_ts = float(ts[t])
+        return applied
+
+    def update_from_frame(self, df_market_prices, pairs, now: float = None) -> dict:
+        """
+        pairs: [(base, quote, hedge_ratio_csv)]. Sólo velas cerradas (la vela
+        en curso del almacén se reescribe hasta cerrar). Se olvidan sólo los
+        pares que ya no están en `pairs`; uno cuya leg falta en esta tabla (columna
+        NaN/plana descartada un ciclo) conserva su estado.
+        """
+        import pandas as pd
+
+        res_s = RESOLUTION_SECONDS.get(RESOLUTION, 3600)
+        now = time.time() if now is None else now
+        ts = pd.to_datetime(df_market_prices.index, utc=True).asi8 / 1e9
+        closed = ts < (now // res_s) * res_s
+        ts = ts[closed]
+        wanted = set()
+        bars = 0
+        for base, quote, seed_beta in pairs:
+            wanted.add(pair_key(base, quote))
+            if base not in df_market_prices.columns or quote not in df_market_prices.columns:
+                continue
+            y = df_market_prices[base].to_numpy(dtype=float)[closed]
+            x = df_market_prices[quote].to_numpy(dtype=float)[closed]
+            bars += self.update_pair(base, quote, ts, y, x, seed_beta)
+        dropped = [k for k in self.states if k not in wanted]
+        for k in dropped:
+            del self.states[k]
+        self.save()
+        return {"pairs": len(wanted), "bars": bars, "dropped": len(dropped)}
+
+    def current_hedge_ratio(self, base: str, quote: str):
+        """β actual si el estado está caliente y dentro de HEDGE_RATIO_LOG_MAX; si no, None."""
+        state = self.get(base, quote)
+        if state is None or not state.is_warm:
+            return None
+        b = state.beta
+        if not math.isfinite(b) or b <= 0 or abs(math.log10(b)) > HEDGE_RATIO_LOG_MAX:
+            return None
+        return b
+
+
+_REGISTRY = None
+
+
+def get_hedge_registry() -> HedgeRegistry:
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = HedgeRegistry()
+    return _REGISTRY
+
+
+def update_hedges_from_csv(df_market_prices, csv_path: str = None) -> dict:
+    """
+    Actualiza los β de los pares del CSV de cointegración con la tabla de precios.
+    Si el CSV no se puede leer (falta, escritura a medias, columna rota) el
+    registro no se toca ni se guarda: un fallo de lectura no olvida estados.
+    """
+    import pandas as pd
+    from func_cointegration import CSV_PATH
+
+    try:
+        csv = pd.read_csv(csv_path or CSV_PATH, index_col=0)
+        pairs = list(zip(csv["base_market"], csv["quote_market"], csv["hedge_ratio"].astype(float)))
+    except Exception as e:
+        return {"pairs": 0, "bars": 0, "dropped": 0, "error": f"csv unreadable: {e}"}
+    return get_hedge_registry().update_from_frame(df_market_prices, pairs)
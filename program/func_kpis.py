@@ -5,7 +5,7 @@ Cleaner account KPIs for dYdX v4.
 What this does:
 - reads the real account snapshot from dYdX
 - values open positions with oracle prices
-- compares exchange exposure vs bot_agents.json tracking
+- compares exchange exposure vs the bot's tracked pairs (func_position_store)
 - sends ONE compact message
 - avoids noisy / misleading fields such as marginUsed when it is unreliable
 """
@@ -13,14 +13,10 @@ What this does:
 from __future__ import annotations
 
 from typing import Any, Dict, Optional
-import json
-import os
-
 from func_messaging import send_message
 from func_logging import log_event
-from constants import WALLET_ADDRESS
-
-JSON_PATH = os.path.join(os.path.dirname(__file__), "bot_agents.json")
+from func_tick import get_markets_map, get_subaccount_obj
+from func_position_store import get_position_store
 
 
 def _to_float(x: Any, default: float = 0.0) -> float:
@@ -46,9 +42,7 @@ def _safe_div(a: float, b: float, default: float = 0.0) -> float:
 
 def _load_bot_agents() -> list:
     try:
-        with open(JSON_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data if isinstance(data, list) else []
+        return get_position_store().all()
     except Exception:
         return []
 
@@ -62,8 +56,7 @@ async def send_account_kpis(indexer, send_telegram: bool = True) -> Optional[Dic
     """
     try:
         # 1) Subaccount snapshot
-        resp = await indexer.account.get_subaccount(WALLET_ADDRESS, 0)
-        sub = resp.get("subaccount", {}) if isinstance(resp, dict) else {}
+        sub = await get_subaccount_obj(indexer)
 
         equity = _to_float(sub.get("equity"))
         free = _to_float(sub.get("freeCollateral"))
@@ -78,8 +71,7 @@ async def send_account_kpis(indexer, send_telegram: bool = True) -> Optional[Dic
 
         # 3) Market prices
         try:
-            mk_resp = await indexer.markets.get_perpetual_markets()
-            markets = mk_resp.get("markets", {}) if isinstance(mk_resp, dict) else {}
+            markets = await get_markets_map(indexer)
         except Exception:
             markets = {}
 
@@ -118,7 +110,7 @@ async def send_account_kpis(indexer, send_telegram: bool = True) -> Optional[Dic
             if px > 0:
                 notional += abs(size) * px
 
-        # 4) Compare against bot_agents.json
+        # 4) Compare against the tracked pairs
         bot_agents = _load_bot_agents()
         tracked_pairs_json = len(bot_agents)
 
@@ -237,20 +229,17 @@ async def send_positions_status(indexer) -> None:
     Ayuda a decidir manualmente si esperar o cerrar cada par.
 
     Fuente:
-      - bot_agents.json (entry_z, best_z, opened_at)
+      - position store (entry_z, best_z, opened_at)
       - dYdX indexer (unrealizedPnl actual, positions)
     """
     from datetime import datetime, timezone
 
     try:
-        with open(JSON_PATH, "r") as f:
-            pairs = json.load(f) or []
-        pairs = [p for p in pairs if isinstance(p, dict)]
+        pairs = [p for p in _load_bot_agents() if isinstance(p, dict)]
 
         # Fetch positions del indexer siempre (para mensaje sea pares o no)
         try:
-            resp = await indexer.account.get_subaccount(WALLET_ADDRESS.strip(), 0)
-            sub = resp.get("subaccount", {}) or {}
+            sub = await get_subaccount_obj(indexer)
             live_positions = sub.get("openPerpetualPositions", {}) or {}
             equity = _to_float(sub.get("equity"), 0.0)
             free = _to_float(sub.get("freeCollateral"), 0.0)
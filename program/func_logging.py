@@ -1,10 +1,19 @@
 import os
 import json
 import gzip
+import time
+import queue
+import atexit
 import shutil
 import datetime
+import threading
 from pathlib import Path
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 # =========================
 # CONFIG
 # =========================
@@ -17,6 +26,26 @@ LOG_FILE = LOG_DIR / "bot_run.log.jsonl"
 MAX_LOG_SIZE_MB = 20
 MAX_BACKUPS = 5
 
+# 2026-10-18: escritura en segundo plano. log_event sólo encola (O(1)); un
+# hilo escribe por lotes con el fichero abierto, hace flush cada
+# LOG_FLUSH_INTERVAL_S y rota por tamaño. Cola acotada: por encima de
+# LOG_SHED_AT (fracción llena) se descartan los tipos de LOG_SHED_EVENTS (el
+# signal_skip por par: 55K en 4 días), y con la cola llena cualquier evento.
+# Los descartes se cuentan por tipo y se escriben como un evento log_dropped.
+LOG_QUEUE_MAX = 100_000
+LOG_BATCH_MAX = 5_000
+LOG_FLUSH_INTERVAL_S = 0.5
+LOG_SHED_AT = 0.8
+LOG_SHED_EVENTS = {"signal_skip"}
+LOG_SHUTDOWN_TIMEOUT_S = 5.0
+
+# 2026-10-18: en el hilo escritor la rotación es sólo un rename. Compresión,
+# índice del segmento y poda a MAX_BACKUPS los hace otro hilo (log-compress).
+# Índice: <stem>.index.jsonl junto al log, una línea por segmento comprimido
+# (fichero, rango first_ts/last_ts, eventos por tipo) → find_segments().
+LOG_COMPRESSION = "gzip"      # "gzip" | "zstd" (requiere zstandard; si falta, gzip)
+LOG_ZSTD_LEVEL = 10
+
 # Solo estos eventos se imprimen por defecto en terminal
 PRINT_EVENTS = {
     "entry_signal",
@@ -43,45 +72,418 @@ def _safe_json_dumps(data):
     return json.dumps(data, ensure_ascii=False, default=str)
 
 
-def _should_rotate() -> bool:
+def _log_parts(log_file: Path):
+    """bot_run.log.jsonl → (dir, "bot_run", "log.jsonl")."""
+    stem, _, suffix = log_file.name.partition(".")
+    return log_file.parent, stem, suffix
+
+
+def _index_path(log_file: Path = None) -> Path:
+    log_dir, stem, _ = _log_parts(Path(log_file or LOG_FILE))
+    return log_dir / f"{stem}.index.jsonl"
+
+
+def _rotate_logs(log_file: Path = None, segment: dict = None):
+    """Rotación del hot path: sólo rename. Devuelve la ruta del segmento o None."""
+    log_file = Path(log_file or LOG_FILE)
+    log_dir, stem, suffix = _log_parts(log_file)
     try:
-        if not LOG_FILE.exists():
-            return False
-        size_mb = LOG_FILE.stat().st_size / (1024 * 1024)
-        return size_mb >= MAX_LOG_SIZE_MB
-    except Exception:
-        return False
+        if not log_file.exists() or log_file.stat().st_size == 0:
+            return None
+
+        # Con microsegundos: la poda ordena por nombre, y un nombre de un
+        # segmento ya podado no debe reutilizarse para uno nuevo.
+        timestamp = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
+        rotated_plain = log_dir / f"{stem}_{timestamp}.{suffix}"
+        n = 0
+        while rotated_plain.exists() or any(log_dir.glob(f"{rotated_plain.name}.*")):
+            n += 1
+            rotated_plain = log_dir / f"{stem}_{timestamp}_{n}.{suffix}"
+
+        log_file.rename(rotated_plain)
+        _get_segment_worker().submit(rotated_plain, log_file, segment)
+        return rotated_plain
+
+    except Exception as e:
+        print(f"[LOG] Rotation error: {e}")
+        return None
 
 
-def _rotate_logs():
+# =========================
+# SEGMENTS (compresión, índice, poda)
+# =========================
+def _new_segment(seed_bytes: int = 0) -> dict:
+    return {"first_ts": None, "last_ts": None, "events": 0, "types": {}, "seed_bytes": int(seed_bytes)}
+
+
+def _count_event(segment: dict, event: dict):
+    t = str(event.get("type", "?"))
+    segment["types"][t] = segment["types"].get(t, 0) + 1
+    segment["events"] += 1
+    ts = event.get("ts")
+    if ts:
+        if segment["first_ts"] is None:
+            segment["first_ts"] = ts
+        segment["last_ts"] = ts
+
+
+def _scan_segment(path: Path, limit: int = None) -> dict:
+    """Resumen leyendo el fichero (sólo para lo que el escritor no vio: arranque, huérfanos)."""
+    segment = _new_segment()
+    with open(path, "rb") as f:
+        data = f.read() if limit is None else f.read(limit)
+    for line in data.splitlines():
+        try:
+            _count_event(segment, json.loads(line))
+        except Exception:
+            continue
+    return segment
+
+
+def _merge_segments(head: dict, tail: dict) -> dict:
+    out = _new_segment()
+    for seg in (head, tail):
+        for t, c in seg["types"].items():
+            out["types"][t] = out["types"].get(t, 0) + c
+        out["events"] += seg["events"]
+    out["first_ts"] = head["first_ts"] or tail["first_ts"]
+    out["last_ts"] = tail["last_ts"] or head["last_ts"]
+    return out
+
+
+class _SegmentWorker:
+    """Hilo log-compress: comprime segmentos rotados, los indexa y poda a MAX_BACKUPS."""
+
+    def __init__(self):
+        self.q = queue.Queue()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, plain: Path, log_file: Path, segment: dict = None):
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="log-compress", daemon=True)
+            self._thread.start()
+        self.q.put((Path(plain), Path(log_file), segment))
+
+    def wait(self, timeout: float = LOG_SHUTDOWN_TIMEOUT_S) -> bool:
+        """Espera a que se procesen los segmentos pendientes."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self.q.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            item = self.q.get()
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            try:
+                _compress_segment(*item)
+            except Exception as e:
+                print(f"[LOG] segment compression error: {e}")
+
+
+def _compress_segment(plain: Path, log_file: Path, segment: dict = None):
+    log_dir, stem, suffix = _log_parts(log_file)
+    if not plain.exists():
+        return                                    # ya procesado (encolado dos veces)
+    if segment is None:
+        segment = _scan_segment(plain)
+    elif segment.get("seed_bytes"):
+        # Lo escrito antes de abrir el fichero (reinicio del bot) no pasó por el contador.
+        segment = _merge_segments(_scan_segment(plain, segment["seed_bytes"]), segment)
+
+    codec = "zstd" if LOG_COMPRESSION == "zstd" and zstandard is not None else "gzip"
+    out = plain.with_name(plain.name + (".zst" if codec == "zstd" else ".gz"))
+    tmp = out.with_name(out.name + ".tmp")
+    with open(plain, "rb") as f_in:
+        if codec == "zstd":
+            with open(tmp, "wb") as f_out:
+                zstandard.ZstdCompressor(level=LOG_ZSTD_LEVEL).copy_stream(f_in, f_out)
+        else:
+            with gzip.open(tmp, "wb") as f_out:
+                shutil.copyfileobj(f_in, f_out)
+    os.replace(tmp, out)
+    raw_bytes = plain.stat().st_size
+    plain.unlink(missing_ok=True)
+
+    entry = {
+        "file": out.name,
+        "codec": codec,
+        "first_ts": segment["first_ts"],
+        "last_ts": segment["last_ts"],
+        "events": segment["events"],
+        "types": segment["types"],
+        "bytes": raw_bytes,
+        "compressed_bytes": out.stat().st_size,
+        "rotated_at": _utc_ts(),
+    }
+    index = _index_path(log_file)
+    with open(index, "a", encoding="utf-8") as f:
+        f.write(_safe_json_dumps(entry) + "\n")
+
+    # cleanup old logs
+    backups = sorted(list(log_dir.glob(f"{stem}_*.{suffix}.gz")) + list(log_dir.glob(f"{stem}_*.{suffix}.zst")))
+    removed = set()
+    for old_file in backups[: max(0, len(backups) - MAX_BACKUPS)]:
+        try:
+            old_file.unlink(missing_ok=True)
+            removed.add(old_file.name)
+        except Exception:
+            pass
+    if removed:
+        entries = [e for e in read_segment_index(log_file) if e.get("file") not in removed]
+        tmp_index = index.with_name(index.name + ".tmp")
+        with open(tmp_index, "w", encoding="utf-8") as f:
+            for e in entries:
+                f.write(_safe_json_dumps(e) + "\n")
+        os.replace(tmp_index, index)
+
+
+def _recover_segments(log_file: Path = None):
+    """Segmentos rotados que quedaron sin comprimir (corte durante la compresión)."""
+    log_file = Path(log_file or LOG_FILE)
+    log_dir, stem, suffix = _log_parts(log_file)
+    for plain in sorted(log_dir.glob(f"{stem}_*.{suffix}")):
+        _get_segment_worker().submit(plain, log_file, None)
+
+
+def read_segment_index(log_file: Path = None) -> list:
+    """Entradas del índice de segmentos comprimidos (más antiguo primero)."""
+    entries = []
     try:
-        if not LOG_FILE.exists() or LOG_FILE.stat().st_size == 0:
+        with open(_index_path(log_file), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def find_segments(since: str = None, until: str = None, types=None, log_file: Path = None) -> list:
+    """
+    Segmentos comprimidos que pueden contener eventos en [since, until] (ISO, como
+    el campo ts) y de alguno de `types`. El log activo no está en el índice.
+    """
+    log_file = Path(log_file or LOG_FILE)
+    wanted = set(types) if types else None
+    out = []
+    for e in read_segment_index(log_file):
+        if since and e.get("last_ts") and e["last_ts"] < since:
+            continue
+        if until and e.get("first_ts") and e["first_ts"] > until:
+            continue
+        if wanted and not wanted & set(e.get("types") or {}):
+            continue
+        path = log_file.parent / e["file"]
+        if path.exists():
+            out.append(path)
+    return out
+
+
+_SEGMENT_WORKER = None
+
+
+def _get_segment_worker() -> _SegmentWorker:
+    global _SEGMENT_WORKER
+    if _SEGMENT_WORKER is None:
+        _SEGMENT_WORKER = _SegmentWorker()
+    return _SEGMENT_WORKER
+
+
+# =========================
+# BACKGROUND WRITER
+# =========================
+_STOP = object()
+
+
+class _LogWriter:
+    """Cola acotada + hilo que escribe por lotes en `path` (append, rotación por tamaño)."""
+
+    def __init__(self, path: Path, queue_max: int = None, max_bytes: int = None):
+        self.path = Path(path)
+        self.max_bytes = int(max_bytes or MAX_LOG_SIZE_MB * 1024 * 1024)
+        self.q = queue.Queue(maxsize=int(queue_max or LOG_QUEUE_MAX))
+        self.dropped = {}                 # tipo -> eventos descartados
+        self._drop_lock = threading.Lock()
+        self._lock = threading.Lock()     # escritura síncrona tras cerrar
+        self._fh = None
+        self._size = 0
+        self._segment = None              # resumen del log activo para el índice
+        self._thread = None
+        self._pid = None
+        self._closed = False
+
+    # ── Hilo productor (asyncio) ─────────────────────────────────────────
+    def start(self):
+        if self._closed or (self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()):
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, event: dict) -> bool:
+        """Encola el evento; False si se descartó por presión."""
+        if self._closed:
+            with self._lock:                       # sin hilo: escritura directa
+                self._write([event])
+                self._flush()
+            return True
+        if (event.get("type") in LOG_SHED_EVENTS
+                and self.q.qsize() >= self.q.maxsize * LOG_SHED_AT):
+            self._drop(event)
+            return False
+        try:
+            self.q.put_nowait(event)
+            return True
+        except queue.Full:
+            self._drop(event)
+            return False
+
+    def _drop(self, event: dict):
+        t = str(event.get("type", "?"))
+        with self._drop_lock:
+            self.dropped[t] = self.dropped.get(t, 0) + 1
+
+    def flush(self, timeout: float = LOG_SHUTDOWN_TIMEOUT_S) -> bool:
+        """Espera a que todo lo encolado hasta ahora esté escrito y en el SO."""
+        if self._thread is None or not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        try:
+            self.q.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = LOG_SHUTDOWN_TIMEOUT_S):
+        """Vacía la cola y para el hilo; lo que llegue después se escribe en línea."""
+        if self._thread is not None and self._thread.is_alive():
+            try:
+                self.q.put(_STOP, timeout=timeout)
+                self._thread.join(timeout)
+            except queue.Full:
+                pass
+        self._closed = True
+        with self._lock:
+            self._write([])                        # log_dropped pendiente
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    # ── Hilo escritor ────────────────────────────────────────────────────
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                wait = max(0.0, last_flush + LOG_FLUSH_INTERVAL_S - time.monotonic())
+                try:
+                    item = self.q.get(timeout=wait)
+                except queue.Empty:
+                    item = None
+                batch, waiters, stop = [], [], False
+                while item is not None:
+                    if item is _STOP:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        batch.append(item)
+                    if stop or len(batch) >= LOG_BATCH_MAX:
+                        break
+                    try:
+                        item = self.q.get_nowait()
+                    except queue.Empty:
+                        item = None
+                self._write(batch)
+                if waiters or stop or time.monotonic() - last_flush >= LOG_FLUSH_INTERVAL_S:
+                    self._flush()
+                    last_flush = time.monotonic()
+                for w in waiters:
+                    w.set()
+                if stop:
+                    return
+            except Exception as e:
+                print(f"[LOG] writer error: {e}")
+
+    def _write(self, batch: list):
+        with self._drop_lock:
+            with_dropped, self.dropped = self.dropped, {}
+        if not batch and not with_dropped:
             return
+        if with_dropped:
+            batch = batch + [{
+                "type": "log_dropped", "counts": with_dropped,
+                "total": sum(with_dropped.values()), "ts": _utc_ts(),
+            }]
+        if self._fh is not None and self._rotated_elsewhere():
+            # Otro proceso (close_all.py) rotó el log: el handle apunta al
+            # segmento renombrado, que se comprimirá y borrará. Reabrir.
+            self._fh.close()
+            self._fh = None
+        if self._fh is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self.path, "ab", buffering=1 << 16)
+            self._size = os.fstat(self._fh.fileno()).st_size
+            self._segment = _new_segment(seed_bytes=self._size)
+        lines = []
+        for event in batch:
+            try:
+                lines.append(_safe_json_dumps(event))
+            except Exception as e:
+                event = {"type": "log_encode_error", "error": str(e), "ts": _utc_ts()}
+                lines.append(_safe_json_dumps(event))
+            _count_event(self._segment, event)
+        data = ("\n".join(lines) + "\n").encode("utf-8")   # max_bytes cuenta bytes, no caracteres
+        self._fh.write(data)
+        self._size += len(data)
+        if self._size >= self.max_bytes:
+            self._fh.close()
+            self._fh = None
+            _rotate_logs(self.path, self._segment)
+
+    def _rotated_elsewhere(self) -> bool:
+        """True si self.path ya no es el fichero del handle abierto (renombrado o borrado)."""
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._fh.fileno()).st_ino
+        except FileNotFoundError:
+            return True
 
-        timestamp = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        rotated_plain = LOG_DIR / f"bot_run_{timestamp}.log.jsonl"
-        rotated_gz = LOG_DIR / f"bot_run_{timestamp}.log.jsonl.gz"
+    def _flush(self):
+        if self._fh is not None:
+            self._fh.flush()
 
-        # rename
-        LOG_FILE.rename(rotated_plain)
 
-        # compress
-        with open(rotated_plain, "rb") as f_in, gzip.open(rotated_gz, "wb") as f_out:
-            shutil.copyfileobj(f_in, f_out)
+_WRITER = None
 
-        rotated_plain.unlink(missing_ok=True)
 
-        # cleanup old logs
-        backups = sorted(LOG_DIR.glob("bot_run_*.log.jsonl.gz"))
-        if len(backups) > MAX_BACKUPS:
-            for old_file in backups[: len(backups) - MAX_BACKUPS]:
-                try:
-                    old_file.unlink(missing_ok=True)
-                except Exception:
-                    pass
+def _get_writer() -> _LogWriter:
+    global _WRITER
+    if _WRITER is None:
+        _WRITER = _LogWriter(LOG_FILE)
+        atexit.register(shutdown_logging)
+        _recover_segments(LOG_FILE)
+    _WRITER.start()
+    return _WRITER
+
+
+def flush_logs(timeout: float = LOG_SHUTDOWN_TIMEOUT_S) -> bool:
+    """Bloquea hasta que los eventos ya emitidos estén escritos."""
+    return _WRITER.flush(timeout) if _WRITER is not None else True
 
-    except Exception as e:
-        print(f"[LOG] Rotation error: {e}")
+
+def shutdown_logging(timeout: float = LOG_SHUTDOWN_TIMEOUT_S):
+    """Vacía la cola, detiene el hilo y espera la compresión pendiente (atexit y main)."""
+    if _WRITER is not None:
+        _WRITER.close(timeout)
+    if _SEGMENT_WORKER is not None:
+        _SEGMENT_WORKER.wait(timeout)
 
 
 # =========================
@@ -96,13 +498,8 @@ def log_event(event: dict, print_terminal=None):
         if "ts" not in event:
             event["ts"] = _utc_ts()
 
-        # rotate if needed
-        if _should_rotate():
-            _rotate_logs()
-
-        # write
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(_safe_json_dumps(event) + "\n")
+        # enqueue (copia: el llamador puede seguir mutando su dict)
+        _get_writer().submit(dict(event))
 
         # terminal print control
         if print_terminal is None:
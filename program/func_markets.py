@@ -0,0 +1,167 @@
+# func_markets.py
+"""
+Tabla viva de mercados (oráculo + metadata) alimentada por el canal v4_markets.
+
+Problema que resuelve:
+  Casi cada función empezaba con indexer.markets.get_perpetual_markets() sólo
+  para leer oraclePrice, stepSize, tickSize o nextFundingRate
+  (_get_market_obj_and_oracle en cada orden, get_funding_rates,
+  close_market_actual, abort_all_positions...): cientos de KB por llamada.
+
+Diseño:
+  - MarketTable: una fila por ticker (orden de llegada).
+      * oracle: array float64 denso indexado por fila (NaN = desconocido);
+        oracle_prices() lo expone como vista junto a la lista de tickers.
+      * meta(ticker): registro INMUTABLE (MappingProxyType) con la metadata
+        del snapshot: clobPairId, atomicResolution, stepSize, tickSize,
+        stepBaseQuantums, subticksPerTick, quantumConversionExponent...
+      * info(ticker): dict con la MISMA forma que /v4/perpetualMarkets
+        (metadata + campos de trading + oraclePrice actual), para que Market()
+        y el código existente lo usen sin cambios. Compartido: sólo-lectura.
+  - Mensajes: `subscribed` trae {"markets": {...}} completo; `channel_data`
+    trae {"trading": {...}} (status, nextFundingRate, ...) y/o
+    {"oraclePrices": {ticker: {"oraclePrice": ...}}}.
+  - Sin stream vivo (o antes del snapshot) los accesores devuelven None y el
+    llamador usa el REST de siempre.
+"""
+
+from types import MappingProxyType
+
+import numpy as np
+
+
+def _sf(x, d=float("nan")):
+    try:
+        return float(x)
+    except Exception:
+        return d
+
+
+class MarketTable:
+    channel = "v4_markets"
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.synced = False
+        self._rows = {}               # ticker → fila
+        self._tickers = []
+        self._oracle = np.full(64, np.nan, dtype=np.float64)
+        self._meta = {}               # ticker → MappingProxyType
+        self._info = {}               # ticker → dict forma REST
+        self.stats = {"snapshots": 0, "oracle_updates": 0, "trading_updates": 0,
+                      "hits": 0, "misses": 0}
+        stream.register(self.channel, self)
+        stream.socket.markets.subscribe()
+
+    @property
+    def is_live(self) -> bool:
+        return self.synced and self.stream.is_live
+
+    def _row(self, ticker: str) -> int:
+        row = self._rows.get(ticker)
+        if row is None:
+            row = len(self._tickers)
+            if row >= len(self._oracle):
+                grown = np.full(2 * len(self._oracle), np.nan, dtype=np.float64)
+                grown[:row] = self._oracle[:row]
+                self._oracle = grown
+            self._rows[ticker] = row
+            self._tickers.append(ticker)
+        return row
+
+    # ── stream handlers ──────────────────────────────────────────────────
+    def on_message(self, message: dict):
+        mtype = message.get("type")
+        contents = message.get("contents")
+        if mtype == "subscribed" and isinstance(contents, dict):
+            for ticker, market in (contents.get("markets") or {}).items():
+                self._set_market(ticker, market)
+            self.synced = True
+            self.stats["snapshots"] += 1
+        elif mtype in ("channel_data", "channel_batch_data"):
+            batch = contents if isinstance(contents, list) else [contents]
+            for c in batch:
+                if isinstance(c, dict):
+                    self._apply_update(c)
+
+    def on_resync(self, reason: str):
+        self.synced = False
+
+    def _set_market(self, ticker: str, market: dict):
+        row = self._row(ticker)
+        self._meta[ticker] = MappingProxyType(dict(market))
+        self._info[ticker] = dict(market)
+        self._oracle[row] = _sf(market.get("oraclePrice"))
+
+    def _apply_update(self, contents: dict):
+        for ticker, fields in (contents.get("trading") or {}).items():
+            if not isinstance(fields, dict):
+                continue
+            if ticker not in self._info:
+                self._set_market(ticker, fields)       # mercado nuevo
+            else:
+                self._info[ticker].update(fields)
+            self.stats["trading_updates"] += 1
+        for ticker, fields in (contents.get("oraclePrices") or {}).items():
+            price = fields.get("oraclePrice") if isinstance(fields, dict) else fields
+            if price is None or ticker not in self._info:
+                continue
+            self._oracle[self._row(ticker)] = _sf(price)
+            self._info[ticker]["oraclePrice"] = price
+            self.stats["oracle_updates"] += 1
+
+    # ── queries ──────────────────────────────────────────────────────────
+    def oracle_price(self, ticker: str):
+        row = self._rows.get(ticker)
+        if row is None:
+            return None
+        px = self._oracle[row]
+        return None if np.isnan(px) else float(px)
+
+    def oracle_prices(self):
+        """(tickers, vista float64 de oráculos por fila)."""
+        n = len(self._tickers)
+        view = self._oracle[:n]
+        view.flags.writeable = False
+        return list(self._tickers), view
+
+    def meta(self, ticker: str):
+        return self._meta.get(ticker)
+
+    def info(self, ticker: str):
+        return self._info.get(ticker)
+
+    def markets_map(self) -> dict:
+        """
+        {ticker: info} con la forma de /v4/perpetualMarkets → "markets". Copia
+        superficial: el stream puede añadir mercados mientras el llamador itera
+        el dict a través de un await.
+        """
+        return dict(self._info)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "synced": self.synced, "markets": len(self._tickers)}
+
+
+_TABLE = None
+
+
+def install_market_table(stream):
+    global _TABLE
+    _TABLE = MarketTable(stream)
+    return _TABLE
+
+
+def get_market_table():
+    return _TABLE
+
+
+def live_market_table():
+    """La tabla si está sincronizada y el stream vivo; si no, None (→ REST)."""
+    if _TABLE is None:
+        return None
+    if _TABLE.is_live:
+        _TABLE.stats["hits"] += 1
+        return _TABLE
+    _TABLE.stats["misses"] += 1
+    return None
@@ -0,0 +1,89 @@
+# func_ols.py
+"""
+Kernels numéricos de regresión simple en forma cerrada (sólo numpy).
+
+Problema que resuelve:
+  calculate_half_life construía una pd.Series, la desplazaba, enmascaraba y
+  ajustaba sm.OLS con add_constant para obtener UNA pendiente AR(1);
+  calculate_cointegration hacía otro sm.OLS para el hedge ratio y su R².
+  Se llaman miles de veces por refresh y por barrido walk-forward: casi todo
+  el coste era construir DataFrames/modelos de statsmodels.
+
+Diseño:
+  - simple_ols(y, x, intercept): pendiente, intercepto, R² y std residual con
+    las fórmulas cerradas de la regresión simple. Series 1-D → escalares;
+    matrices T×B → un ajuste por columna (mismo layout que func_coint_batch).
+    Los resultados imitan a statsmodels: params = (const, pendiente) con
+    intercepto y (pendiente,) sin él; R² centrado con intercepto y NO
+    centrado sin él (como sm.OLS sin constante).
+  - ar1_beta / half_life: Δs_t = α + β·s_{t-1}; HL = −ln2/β redondeada,
+    NaN si β ≥ 0 o hay menos de 10 observaciones (calculate_half_life).
+  Mismos números que statsmodels salvo el último bit de redondeo (pinv vs
+  fórmula cerrada); la half-life redondeada coincide.
+
+fx/ols.py es una copia auditada (fx no importa nada de program/).
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+_LN2 = np.log(2)
+
+OLSFit = namedtuple("OLSFit", "params rsquared resid_std nobs")
+
+
+def simple_ols(y, x, intercept: bool = True) -> OLSFit:
+    """
+    y ~ [const +] slope·x por columna. y, x: (n,) o (n, B) (x se difunde).
+    params[0] es la constante con intercepto y la pendiente sin él.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    n = y.shape[0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if intercept:
+            x_mean = x.mean(axis=0)
+            y_mean = y.mean(axis=0)
+            xc = x - x_mean
+            yc = y - y_mean
+            slope = (xc * yc).sum(axis=0) / (xc * xc).sum(axis=0)
+            const = y_mean - slope * x_mean
+            resid = yc - slope * xc
+            tss = (yc * yc).sum(axis=0)
+            params = (const, slope)
+            k = 2
+        else:
+            slope = (x * y).sum(axis=0) / (x * x).sum(axis=0)
+            resid = y - slope * x
+            tss = (y * y).sum(axis=0)
+            params = (slope,)
+            k = 1
+        ssr = (resid * resid).sum(axis=0)
+        rsquared = 1.0 - ssr / tss
+        resid_std = np.sqrt(ssr / (n - k))
+    return OLSFit(params, rsquared, resid_std, n)
+
+
+def ar1_beta(spread) -> np.ndarray:
+    """
+    β de Δs_t = α + β·s_{t-1} por columna (NaN con menos de 10 observaciones).
+    1-D: se descartan los pares (s_{t-1}, Δs_t) con NaN, como calculate_half_life.
+    """
+    s = np.asarray(spread, dtype=np.float64)
+    lag, ret = s[:-1], np.diff(s, axis=0)
+    if s.ndim == 1:
+        valid = ~(np.isnan(lag) | np.isnan(ret))
+        lag, ret = lag[valid], ret[valid]
+    if lag.shape[0] < 10:
+        return np.full(s.shape[1:], np.nan) if s.ndim > 1 else np.float64(np.nan)
+    return simple_ols(ret, lag).params[1]
+
+
+def half_life(spread, decimals: int = 0):
+    """−ln2/β redondeada a `decimals`; NaN si β ≥ 0, no finita o pocos datos."""
+    beta = ar1_beta(spread)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hl = np.round(-_LN2 / beta, decimals)
+    out = np.where(beta < 0, hl, np.nan)
+    return float(out) if out.ndim == 0 else out
@@ -0,0 +1,209 @@
+# func_orderbook.py
+"""
+Order books L2 locales alimentados por el canal v4_orderbook.
+
+Problema que resuelve:
+  get_market_spread_bps y func_private.get_orderbook_best descargaban el
+  orderbook COMPLETO por REST sólo para leer el primer nivel. _SPREAD_CACHE
+  (60s) y _get_exit_spreads_cached (300s) existían para esconder ese coste,
+  a cambio de gates de spread y precios de salida con libros viejos.
+
+Diseño:
+  - BookSide: precios ordenados (lista + bisect) y dict precio → tamaño.
+    Mejor nivel O(1); profundidad hasta un precio límite con bisect O(log n)
+    para localizar el corte.
+  - L2Book: snapshot (`subscribed`) + deltas (`channel_data` /
+    `channel_batch_data`, tamaño "0" = borrar nivel). No sirve datos hasta
+    recibir el snapshot (`synced`).
+  - OrderBookManager: un libro por mercado pedido, suscripción perezosa la
+    primera vez que alguien consulta el mercado, LRU con tope
+    ORDERBOOK_STREAM_MAX_MARKETS (el menos usado se desuscribe).
+    Un "resync" del stream des-sincroniza todos los libros hasta el snapshot
+    de la nueva conexión.
+  - live_book(market) devuelve el libro sólo si está sincronizado y el stream
+    vivo; si no, None y el llamador usa el REST de siempre.
+"""
+
+import time
+from bisect import bisect_left, bisect_right, insort
+
+from constants import ORDERBOOK_STREAM_MAX_MARKETS
+from func_stream import LruSubscriptions
+
+
+def _level(entry):
+    """(price, size) desde {"price","size"} (snapshot) o [price, size, ...] (delta)."""
+    if isinstance(entry, dict):
+        return float(entry.get("price", 0)), float(entry.get("size", 0))
+    return float(entry[0]), float(entry[1])
+
+
+class BookSide:
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self._prices = []        # ascendente
+        self._sizes = {}
+
+    def __len__(self):
+        return len(self._prices)
+
+    def clear(self):
+        self._prices.clear()
+        self._sizes.clear()
+
+    def set(self, price: float, size: float):
+        if size <= 0:
+            if self._sizes.pop(price, None) is not None:
+                i = bisect_left(self._prices, price)
+                del self._prices[i]
+            return
+        if price not in self._sizes:
+            insort(self._prices, price)
+        self._sizes[price] = size
+
+    def best(self):
+        if not self._prices:
+            return None
+        return self._prices[-1] if self.is_bid else self._prices[0]
+
+    def best_size(self):
+        p = self.best()
+        return None if p is None else self._sizes[p]
+
+    def levels(self, n: int = 10):
+        """Los n mejores niveles como [(price, size), ...], del mejor al peor."""
+        prices = self._prices[-n:][::-1] if self.is_bid else self._prices[:n]
+        return [(p, self._sizes[p]) for p in prices]
+
+    def notional_to(self, limit_price: float) -> float:
+        """USD disponible entre el mejor nivel y limit_price (inclusive)."""
+        if self.is_bid:
+            prices = self._prices[bisect_left(self._prices, limit_price):]
+        else:
+            prices = self._prices[:bisect_right(self._prices, limit_price)]
+        return sum(p * self._sizes[p] for p in prices)
+
+
+class L2Book:
+    def __init__(self, market: str):
+        self.market = market
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.synced = False
+        self.updated_ts = 0.0
+
+    def apply_snapshot(self, contents: dict):
+        self.bids.clear()
+        self.asks.clear()
+        self._apply(contents)
+        self.synced = True
+
+    def apply_delta(self, contents):
+        if not self.synced:
+            return
+        if isinstance(contents, list):           # channel_batch_data
+            for c in contents:
+                self._apply(c)
+        else:
+            self._apply(contents)
+
+    def _apply(self, contents):
+        if not isinstance(contents, dict):
+            return
+        for entry in contents.get("bids") or ():
+            self.bids.set(*_level(entry))
+        for entry in contents.get("asks") or ():
+            self.asks.set(*_level(entry))
+        self.updated_ts = time.time()
+
+    def best(self):
+        """(best_bid, best_ask); None en el lado vacío."""
+        return self.bids.best(), self.asks.best()
+
+    def mid(self):
+        bid, ask = self.best()
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2.0
+
+    def spread_bps(self):
+        """Mismo contrato que el cálculo REST: None si falta un lado o está cruzado."""
+        bid, ask = self.best()
+        if bid is None or ask is None or bid <= 0 or ask <= 0 or bid >= ask:
+            return None
+        return (ask - bid) / ((ask + bid) / 2.0) * 10_000.0
+
+    def depth_usd(self, side: str, bps: float) -> float:
+        """Notional en `side` ("BUY" consume asks, "SELL" consume bids) a ≤ bps del mid."""
+        mid = self.mid()
+        if mid is None:
+            return 0.0
+        if side.upper() == "BUY":
+            return self.asks.notional_to(mid * (1 + bps / 10_000.0))
+        return self.bids.notional_to(mid * (1 - bps / 10_000.0))
+
+
+class OrderBookManager:
+    channel = "v4_orderbook"
+
+    def __init__(self, stream, max_markets: int = ORDERBOOK_STREAM_MAX_MARKETS):
+        self.stream = stream
+        self._books = LruSubscriptions(
+            max_markets,
+            factory=L2Book,
+            subscribe=lambda m: stream.socket.order_book.subscribe(id=m),
+            unsubscribe=lambda m: stream.socket.order_book.unsubscribe(id=m),
+        )
+        self.stats = {"hits": 0, "misses": 0}
+        stream.register(self.channel, self)
+
+    def book(self, market: str):
+        """Libro sincronizado y vivo, o None (el llamador cae a REST)."""
+        book = self._books.want(market)
+        if book.synced and self.stream.is_live:
+            self.stats["hits"] += 1
+            return book
+        self.stats["misses"] += 1
+        return None
+
+    def on_message(self, message: dict):
+        book = self._books.get(message.get("id"))
+        if book is None:
+            return
+        mtype = message.get("type")
+        if mtype == "subscribed":
+            book.apply_snapshot(message.get("contents") or {})
+        elif mtype in ("channel_data", "channel_batch_data"):
+            book.apply_delta(message.get("contents"))
+        elif mtype == "unsubscribed":
+            book.synced = False
+
+    def on_resync(self, reason: str):
+        for book in self._books.values():
+            book.synced = False
+
+    def snapshot(self) -> dict:
+        synced = sum(1 for b in self._books.values() if b.synced)
+        return {**self.stats, "subscribes": self._books.subscribes,
+                "evictions": self._books.evictions,
+                "books": len(self._books), "synced": synced}
+
+
+_MANAGER = None
+
+
+def install_orderbook_manager(stream, max_markets: int = ORDERBOOK_STREAM_MAX_MARKETS):
+    global _MANAGER
+    _MANAGER = OrderBookManager(stream, max_markets=max_markets)
+    return _MANAGER
+
+
+def get_orderbook_manager():
+    return _MANAGER
+
+
+def live_book(market: str):
+    """L2Book al día para `market`, o None si no hay stream de order books."""
+    if _MANAGER is None:
+        return None
+    return _MANAGER.book(market)
@@ -0,0 +1,114 @@
+# func_pair_universe.py
+"""
+Universo de pares columnar para el camino de entrada.
+
+Problema que resuelve:
+  open_positions hacía pd.read_csv(cointegrated_pairs.csv) en CADA scan,
+  puntuaba la calidad con df.apply(axis=1), pre-filtraba con df.iterrows()
+  reconstruyendo un DataFrame a partir de filas y volvía a recorrer
+  df.iterrows() en la fase 1. Todo por fila, en Python, con objetos pandas.
+
+Diseño:
+  - PairUniverse: el CSV como columnas NumPy. Mercados únicos en `markets`
+    (orden alfabético) y cada par como índices base_idx/quote_idx sobre esa
+    lista; hedge_ratio, half_life, hurst, r_squared y la puntuación de
+    calidad (la de 4b en open_positions) precalculada.
+  - get_pair_universe(): se carga una vez y sólo se relee cuando cambia el
+    mtime del CSV (refresh completo o incremental lo reescriben con
+    os.replace). None si el CSV no existe.
+  - Los filtros por mercado (blacklist, precios, posiciones vivas) son una
+    máscara booleana sobre `markets`; market_mask[base_idx] | ...[quote_idx]
+    la lleva a una máscara por par sin recorrer filas.
+  - Índice invertido mercado → pares (CSR: pair_ptr/pair_ids) para el scan
+    incremental: pairs_of(mercados) devuelve sólo los pares afectados.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from func_cointegration import CSV_PATH
+
+
+class PairUniverse:
+    def __init__(self, df: pd.DataFrame, mtime: float = None):
+        self.mtime = mtime
+        n = len(df)
+
+        def col(name, default):
+            if name in df.columns:
+                return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)
+            return np.full(n, default, dtype=np.float64)
+
+        bases = df["base_market"].astype(str).to_numpy() if n else np.empty(0, dtype=object)
+        quotes = df["quote_market"].astype(str).to_numpy() if n else np.empty(0, dtype=object)
+        self.markets, inverse = np.unique(np.concatenate([bases, quotes]), return_inverse=True)
+        self.base_idx = inverse[:n].astype(np.intp)
+        self.quote_idx = inverse[n:].astype(np.intp)
+        self.hedge_ratio = col("hedge_ratio", np.nan)
+        self.half_life = col("half_life", np.nan)
+        self.hurst = col("hurst", 0.5)
+        self.r_squared = col("r_squared", 0.0)
+
+        # r² × (24 / max(1, HL)) × (1 / max(0.1, H)), como la versión por fila:
+        # 0 cuenta como ausente (HL → 24, H → 0.5), max() de Python ignora un
+        # NaN en HL/H (np.fmax igual) y un r² NaN deja la calidad en NaN.
+        hl = np.where(self.half_life == 0, 24.0, self.half_life)
+        hu = np.where(self.hurst == 0, 0.5, self.hurst)
+        self.quality = self.r_squared * (24.0 / np.fmax(1.0, hl)) * (1.0 / np.fmax(0.1, hu))
+
+        # Índice invertido: pares de markets[m] = pair_ids[pair_ptr[m]:pair_ptr[m+1]].
+        legs = np.concatenate([self.base_idx, self.quote_idx])
+        order = np.argsort(legs, kind="stable")
+        self.pair_ids = np.concatenate([np.arange(n), np.arange(n)])[order].astype(np.intp)
+        self.pair_ptr = np.concatenate([[0], np.cumsum(np.bincount(legs, minlength=len(self.markets)))])
+
+    def __len__(self):
+        return len(self.base_idx)
+
+    @classmethod
+    def from_csv(cls, path: str):
+        return cls(pd.read_csv(path), os.path.getmtime(path))
+
+    def base(self, k) -> str:
+        return str(self.markets[self.base_idx[k]])
+
+    def quote(self, k) -> str:
+        return str(self.markets[self.quote_idx[k]])
+
+    def top_n(self, n: int) -> np.ndarray:
+        """Índices de los n pares de mayor calidad (NaN al final; empates en orden del CSV)."""
+        order = np.argsort(-self.quality, kind="stable")
+        return order[:n] if 0 < n < len(order) else order
+
+    def market_mask(self, names) -> np.ndarray:
+        """Máscara booleana sobre self.markets de los mercados en `names`."""
+        return np.isin(self.markets, list(names))
+
+    def pair_mask(self, market_mask: np.ndarray, sel: np.ndarray = None) -> np.ndarray:
+        """Pares (de `sel`, o todos) con base O quote en la máscara de mercados."""
+        b = self.base_idx if sel is None else self.base_idx[sel]
+        q = self.quote_idx if sel is None else self.quote_idx[sel]
+        return market_mask[b] | market_mask[q]
+
+    def pairs_of(self, market_ids) -> np.ndarray:
+        """Índices (únicos, ordenados) de los pares con alguna leg en market_ids."""
+        chunks = [self.pair_ids[self.pair_ptr[m]:self.pair_ptr[m + 1]] for m in market_ids]
+        return np.unique(np.concatenate(chunks)) if chunks else np.empty(0, dtype=np.intp)
+
+
+_UNIVERSE = None
+
+
+def get_pair_universe(path: str = None):
+    """Universo del CSV, releído sólo si su mtime cambió. None si no existe."""
+    global _UNIVERSE
+    path = path or CSV_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _UNIVERSE is None or _UNIVERSE[0] != path or _UNIVERSE[1].mtime != mtime:
+        _UNIVERSE = (path, PairUniverse.from_csv(path))
+    return _UNIVERSE[1]
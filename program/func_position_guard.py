@@ -3,20 +3,24 @@ import os
 import asyncio
 from datetime import datetime, timezone
 
-from constants import WALLET_ADDRESS, MAX_OPEN_TRADES, UNMANAGED_IGNORE_MARKETS, MARKET_MAX_SLIPPAGE_BPS_FLATTEN
+from constants import (
+    MAX_OPEN_TRADES, UNMANAGED_IGNORE_MARKETS, MARKET_MAX_SLIPPAGE_BPS_FLATTEN,
+    COOLDOWN_MINUTES_AFTER_BAD_OPEN,
+)
 from func_logging import log_event
 from func_messaging import send_message
 from func_private import place_market_order, get_real_fill_details
 from func_utils import format_number
+from func_tick import get_markets_map, get_subaccount_obj
+from func_account import stream_positions
+from func_cooldowns import get_cooldown_registry
+from func_position_store import get_position_store
 from v4_proto.dydxprotocol.clob.order_pb2 import Order
 
-JSON_PATH = os.path.join(os.path.dirname(__file__), "bot_agents.json")
-COOLDOWN_PATH = os.path.join(os.path.dirname(__file__), "pair_cooldowns.json")
 
 # Safety knobs. Keep conservative until the bot has a clean week.
 BLOCK_ENTRIES_ON_UNMANAGED_EXPOSURE = True
 BLOCK_ENTRIES_ON_ORPHAN_RECORDS = True
-COOLDOWN_MINUTES_AFTER_BAD_OPEN = 180
 MAX_REAL_OPEN_MARKETS = int(MAX_OPEN_TRADES) * 2
 MIN_POSITION_USD_TO_CARE = 5.0
 
@@ -41,8 +45,12 @@ def pair_key(m1, m2):
     return "/".join(sorted([str(m1), str(m2)]))
 
 
-def load_json_list(path=JSON_PATH):
+# 2026-10-18: sin `path` leen/escriben func_position_store (el registro de pares
+# abiertos); con `path` siguen siendo una lista JSON en fichero (tmp + rename).
+def load_json_list(path=None):
     try:
+        if path is None:
+            return get_position_store().all()
         with open(path, "r", encoding="utf-8") as f:
             data = json.load(f)
         return data if isinstance(data, list) else []
@@ -50,43 +58,32 @@ def load_json_list(path=JSON_PATH):
         return []
 
 
-def save_json_list(data, path=JSON_PATH):
+def save_json_list(data, path=None):
+    if path is None:
+        get_position_store().replace_all(data or [])
+        return
     tmp = path + ".tmp"
     with open(tmp, "w", encoding="utf-8") as f:
         json.dump(data or [], f, indent=2)
     os.replace(tmp, path)
 
 
-def load_cooldowns():
-    try:
-        with open(COOLDOWN_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data if isinstance(data, dict) else {}
-    except Exception:
-        return {}
-
-
-def save_cooldowns(data):
-    tmp = COOLDOWN_PATH + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data or {}, f, indent=2)
-    os.replace(tmp, COOLDOWN_PATH)
-
-
+# 2026-10-18: cooldowns en el registro de func_cooldowns (entrada "bad_open",
+# vence a COOLDOWN_MINUTES_AFTER_BAD_OPEN) en vez de pair_cooldowns.json.
 def set_pair_cooldown(m1, m2, reason):
-    data = load_cooldowns()
-    data[pair_key(m1, m2)] = {"ts": utc_now_iso(), "reason": str(reason)}
-    save_cooldowns(data)
+    now = datetime.now(timezone.utc).timestamp()
+    get_cooldown_registry().put(
+        "bad_open", pair_key(m1, m2), now + COOLDOWN_MINUTES_AFTER_BAD_OPEN * 60.0,
+        ts=utc_now_iso(), reason=str(reason),
+    )
 
 
 def is_pair_in_cooldown(m1, m2, minutes=COOLDOWN_MINUTES_AFTER_BAD_OPEN):
-    data = load_cooldowns()
-    rec = data.get(pair_key(m1, m2))
+    rec = get_cooldown_registry().get("bad_open", pair_key(m1, m2))
     if not rec:
         return False
     try:
-        ts = rec.get("ts", "").replace("Z", "+00:00")
-        dt = datetime.fromisoformat(ts)
+        dt = datetime.fromisoformat(rec.get("ts", "").replace("Z", "+00:00"))
         age_min = (datetime.now(timezone.utc) - dt).total_seconds() / 60.0
         return age_min < float(minutes)
     except Exception:
@@ -94,18 +91,19 @@ def is_pair_in_cooldown(m1, m2, minutes=COOLDOWN_MINUTES_AFTER_BAD_OPEN):
 
 
 async def get_subaccount(indexer):
-    resp = await indexer.account.get_subaccount(WALLET_ADDRESS, 0)
-    return resp.get("subaccount", {}) or {}
+    return await get_subaccount_obj(indexer)
 
 
 async def get_markets(indexer):
-    resp = await indexer.markets.get_perpetual_markets()
-    return resp.get("markets", {}) or {}
+    return await get_markets_map(indexer)
 
 
 async def get_live_positions(indexer, markets=None, min_usd=MIN_POSITION_USD_TO_CARE):
-    sub = await get_subaccount(indexer)
-    positions = sub.get("openPerpetualPositions", {}) or sub.get("perpetualPositions", {}) or {}
+    # 2026-10-18: posiciones del stream v4_subaccounts si está vivo (sin REST).
+    positions = stream_positions()
+    if positions is None:
+        sub = await get_subaccount(indexer)
+        positions = sub.get("openPerpetualPositions", {}) or sub.get("perpetualPositions", {}) or {}
     if markets is None:
         markets = await get_markets(indexer)
 
@@ -179,7 +177,7 @@ async def reconcile_bot_vs_dydx(indexer, drop_stale=False):
                 })
                 continue
             cleaned.append(r)
-        save_json_list(cleaned)
+        get_position_store().apply(records, cleaned)
         records = cleaned
 
     real_pair_slots = int((len(live_markets) + 1) / 2)
@@ -0,0 +1,242 @@
+# func_position_store.py
+"""
+Registro de pares abiertos en SQLite (WAL), sustituye a bot_agents.json.
+
+Problema que resuelve:
+  bot_agents.json era el sistema de registro de los pares abiertos y cada
+  módulo lo releía y lo REESCRIBÍA ENTERO por su cuenta: manage_trade_exits
+  al final de cada pasada, open_positions en cada LIVE/ORPHAN (con
+  open(JSON_PATH, "w"), no atómico), risk_off, guard, abort_all_positions,
+  close_all y el kill-switch. kpis/guard/main lo re-parseaban en cada loop.
+  Dos escritores solapados (exit + risk_off, o el bot + close_all en otro
+  proceso) se pisaban: gana la última reescritura completa.
+
+Diseño:
+  - positions.db junto al módulo, journal_mode=WAL (lectores no bloquean al
+    escritor; un corte a mitad de transacción no deja el registro a medias).
+    Tabla positions: una fila por par, clave trace_id (UNIQUE), columnas
+    indexadas market_1/market_2/pair_status y el registro completo como JSON
+    en `record` (los campos del dict no cambian). `seq` conserva el orden de
+    inserción, el mismo que tenía la lista del JSON.
+  - Escrituras por fila dentro de una transacción (BEGIN IMMEDIATE):
+    insert/upsert/delete/delete_pair, y apply(antes, después) para los
+    llamadores que trabajan sobre la lista completa: sólo toca las filas que
+    cambiaron y sólo borra las que estaban en SU snapshot (un par añadido por
+    otro escritor entre medias no se pierde).
+  - Caché de lectura en el proceso: all() devuelve copias de la lista cacheada;
+    se invalida en cada commit propio y cuando PRAGMA data_version indica que
+    otra conexión (close_all en otro proceso) hizo commit.
+  - Migración única: si la base no tiene la marca `json_migrated` se importan
+    los registros de bot_agents.json y el fichero se renombra a
+    bot_agents.json.migrated.
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(_DIR, "positions.db")
+LEGACY_JSON_PATH = os.path.join(_DIR, "bot_agents.json")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+    trace_id    TEXT NOT NULL UNIQUE,
+    market_1    TEXT,
+    market_2    TEXT,
+    pair_status TEXT,
+    record      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS positions_markets ON positions (market_1, market_2);
+CREATE INDEX IF NOT EXISTS positions_market_2 ON positions (market_2);
+CREATE INDEX IF NOT EXISTS positions_status ON positions (pair_status);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _trace_id(record: dict) -> str:
+    """Clave de la fila. Un registro sin trace_id recibe uno (y queda guardado en él)."""
+    tid = record.get("trace_id")
+    if not tid:
+        tid = record["trace_id"] = f"legacy-{uuid.uuid4().hex[:12]}"
+    return str(tid)
+
+
+def _row(record: dict):
+    return (_trace_id(record), record.get("market_1"), record.get("market_2"),
+            record.get("pair_status"), json.dumps(record))
+
+
+class PositionStore:
+    def __init__(self, path: str = DB_PATH, legacy_path: str = LEGACY_JSON_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._cache = None          # lista de registros en orden de seq
+        self._cache_version = None  # PRAGMA data_version al llenar la caché
+        self._migrate(legacy_path)
+
+    # ── Lecturas ─────────────────────────────────────────────────────────
+    def _records(self) -> list:
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._cache is None or version != self._cache_version:
+                rows = self._conn.execute("SELECT record FROM positions ORDER BY seq").fetchall()
+                self._cache = [json.loads(r[0]) for r in rows]
+                self._cache_version = version
+            return self._cache
+
+    def all(self) -> list:
+        """Todos los registros (copias: el llamador puede mutarlos)."""
+        return copy.deepcopy(self._records())
+
+    def count(self) -> int:
+        return len(self._records())
+
+    def get(self, trace_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM positions WHERE trace_id = ?", (str(trace_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_pair(self, m1: str, m2: str) -> list:
+        """Registros del par (m1, m2) en ese orden de legs."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record FROM positions WHERE market_1 = ? AND market_2 = ? ORDER BY seq",
+                (m1, m2)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    # ── Escrituras ───────────────────────────────────────────────────────
+    @contextmanager
+    def _tx(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            else:
+                self._conn.execute("COMMIT")
+            finally:
+                self._cache = None
+
+    def _upsert(self, conn, record: dict):
+        conn.execute(
+            "INSERT INTO positions (trace_id, market_1, market_2, pair_status, record) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT(trace_id) DO UPDATE SET "
+            "market_1 = excluded.market_1, market_2 = excluded.market_2, "
+            "pair_status = excluded.pair_status, record = excluded.record",
+            _row(record))
+
+    def upsert(self, record: dict):
+        """Inserta el registro o actualiza la fila con su trace_id (conserva el orden)."""
+        with self._tx() as conn:
+            self._upsert(conn, record)
+
+    insert = upsert
+
+    def delete(self, trace_id: str) -> bool:
+        with self._tx() as conn:
+            return conn.execute("DELETE FROM positions WHERE trace_id = ?", (str(trace_id),)).rowcount > 0
+
+    def delete_pair(self, m1: str, m2: str):
+        """Borra el primer registro (m1, m2); devuelve el registro borrado o None."""
+        with self._tx() as conn:
+            row = conn.execute(
+                "SELECT seq, record FROM positions WHERE market_1 = ? AND market_2 = ? ORDER BY seq LIMIT 1",
+                (m1, m2)).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM positions WHERE seq = ?", (row[0],))
+            return json.loads(row[1])
+
+    def apply(self, before: list, after: list) -> dict:
+        """
+        Lleva al store los cambios de una pasada que leyó `before` y produjo
+        `after`: borra los trace_id de before que ya no están, inserta/actualiza
+        los de after que cambiaron. Filas fuera de `before` no se tocan.
+        """
+        old = {}
+        for r in before or []:
+            if isinstance(r, dict) and r.get("trace_id"):
+                old[str(r["trace_id"])] = json.dumps(r)
+        deleted = upserted = 0
+        with self._tx() as conn:
+            keep = set()
+            for r in after or []:
+                if not isinstance(r, dict):
+                    continue
+                tid = _trace_id(r)
+                keep.add(tid)
+                if old.get(tid) != json.dumps(r):
+                    self._upsert(conn, r)
+                    upserted += 1
+            for tid in old.keys() - keep:
+                deleted += conn.execute("DELETE FROM positions WHERE trace_id = ?", (tid,)).rowcount
+        return {"deleted": deleted, "upserted": upserted}
+
+    def replace_all(self, records: list):
+        """Sustituye el contenido completo (reconciliación/limpieza), en una transacción."""
+        with self._tx() as conn:
+            conn.execute("DELETE FROM positions")
+            for r in records or []:
+                if isinstance(r, dict):
+                    self._upsert(conn, r)
+
+    def clear(self):
+        self.replace_all([])
+
+    # ── Migración ────────────────────────────────────────────────────────
+    def _migrate(self, legacy_path: str):
+        with self._lock:
+            done = self._conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        if done is not None:
+            return
+        records = []
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            records = data if isinstance(data, list) else []
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            # JSON ilegible: no marcar como migrado, se reintenta en el próximo arranque.
+            print(f"[POSITIONS] could not migrate {legacy_path}: {e}", flush=True)
+            return
+        with self._tx() as conn:
+            for r in records:
+                if isinstance(r, dict):
+                    self._upsert(conn, r)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (str(len(records)),))
+        if os.path.exists(legacy_path):
+            try:
+                os.replace(legacy_path, legacy_path + ".migrated")
+            except OSError:
+                pass
+        if records:
+            print(f"[POSITIONS] migrated {len(records)} records from {legacy_path}", flush=True)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_STORE = None
+
+
+def get_position_store() -> PositionStore:
+    """Store del proceso (el primer acceso abre la base y migra el JSON si hace falta)."""
+    global _STORE
+    if _STORE is None:
+        _STORE = PositionStore()
+    return _STORE
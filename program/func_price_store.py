@@ -0,0 +1,292 @@
+# func_price_store.py
+"""
+Almacén columnar en disco de velas (timestamp, close) por mercado, compartido
+por el bot vivo (construct_market_prices), los backtests y los diagnósticos.
+
+Problema que resuelve:
+  El histórico vivía en cuatro sitios incompatibles: market_prices.pkl
+  (re-descargado entero en cada refresh de cointegración), un JSON por
+  mercado×n_bars en backtest_cache/ (backtest.fetch_candles), otro juego de
+  *_wf.json (backtest_wf.fetch_candles_ts) y nada reutilizable entre ellos.
+
+Diseño:
+  - Un directorio por indexer y resolución: <root>/<host>/<RESOLUTION>/
+    (testnet y mainnet tienen historias distintas: nunca se mezclan).
+      * <MARKET>.ts / <MARKET>.close: float64 little-endian crudo, append-only,
+        timestamps (epoch s) estrictamente crecientes. Se leen con np.memmap
+        (sólo-lectura, sin copiar a RAM hasta que se tocan).
+      * index.json: {market: {"rows", "first_ts", "last_ts"}}. Es la fuente
+        de verdad del nº de filas: un append a medias (crash) deja bytes de
+        más al final que se ignoran y se pisan en el siguiente append.
+        Se reescribe atómicamente (tmp + os.replace).
+  - append(): sólo añade velas posteriores a last_ts; la vela con ts == last_ts
+    (la vela en curso cuando se guardó) se sobrescribe in place.
+    merge(): para velas que caen dentro del histórico (rellenar un hueco tras
+    una re-descarga completa) reescribe los ficheros del mercado.
+  - Lock de proceso (fcntl.flock) en cada escritura: bot y backtests pueden
+    escribir el mismo almacén a la vez.
+  - read(market, start, end) → vistas (ts, close) de la ventana;
+    matrix(markets, start, end) → matriz alineada por timestamp
+    (T × M, NaN donde falta el mercado, o sólo timestamps comunes);
+    frame() → el DataFrame con la forma de construct_market_prices.
+"""
+
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import numpy as np
+
+from constants import PRICE_STORE_DIR, RESOLUTION, INDEXER
+
+_DTYPE = np.dtype("<f8")
+
+
+def ts_to_iso(ts: float) -> str:
+    """epoch s → startedAt ISO del indexer ("2026-10-18T10:00:00.000Z")."""
+    return datetime.fromtimestamp(float(ts), tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def indexer_source(url: str) -> str:
+    """URL del indexer → nombre de directorio ("indexer.dydx.trade")."""
+    return urlparse(url).netloc or url.replace("/", "_")
+
+
+def _safe(market: str) -> str:
+    return market.replace("/", "_")
+
+
+def _sorted_unique(ts, closes):
+    """Ordena por ts; con timestamps repetidos gana el último."""
+    ts = np.asarray(ts, dtype=np.float64)
+    closes = np.asarray(closes, dtype=np.float64)
+    order = np.argsort(ts, kind="stable")
+    ts, closes = ts[order], closes[order]
+    keep = np.ones(len(ts), dtype=bool)
+    keep[:-1] = ts[1:] != ts[:-1]
+    return ts[keep], closes[keep]
+
+
+class CandleStore:
+    def __init__(self, root: str = PRICE_STORE_DIR, resolution: str = RESOLUTION,
+                 source: str = None):
+        self.resolution = resolution
+        self.source = source or indexer_source(INDEXER)
+        self.path = os.path.join(root, self.source, resolution)
+        os.makedirs(self.path, exist_ok=True)
+        self._index_path = os.path.join(self.path, "index.json")
+        self._index_mtime = None
+        self._index = {}
+        self._maps = {}               # market → (rows, ts memmap, close memmap)
+
+    # ── index ────────────────────────────────────────────────────────────
+    def _load_index(self):
+        try:
+            mtime = os.path.getmtime(self._index_path)
+        except OSError:
+            self._index, self._index_mtime = {}, None
+            return self._index
+        if mtime != self._index_mtime:
+            try:
+                with open(self._index_path) as f:
+                    self._index = json.load(f)
+            except Exception:
+                self._index = {}
+            self._index_mtime = mtime
+            self._maps.clear()
+        return self._index
+
+    def _write_index(self, index: dict):
+        tmp = self._index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp, self._index_path)
+        self._index = index
+        self._index_mtime = os.path.getmtime(self._index_path)
+        self._maps.clear()
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.path, ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _files(self, market: str):
+        base = os.path.join(self.path, _safe(market))
+        return base + ".ts", base + ".close"
+
+    # ── queries ──────────────────────────────────────────────────────────
+    def markets(self) -> list:
+        return sorted(self._load_index())
+
+    def info(self, market: str):
+        """{"rows", "first_ts", "last_ts"} del mercado, o None si no está."""
+        return self._load_index().get(market)
+
+    def last_ts(self, market: str):
+        meta = self.info(market)
+        return None if meta is None else meta["last_ts"]
+
+    def _columns(self, market: str):
+        meta = self._load_index().get(market)
+        if not meta or not meta["rows"]:
+            return None
+        cached = self._maps.get(market)
+        if cached is not None and cached[0] == meta["rows"]:
+            return cached[1], cached[2]
+        rows = int(meta["rows"])
+        ts_path, close_path = self._files(market)
+        ts = np.memmap(ts_path, dtype=_DTYPE, mode="r", shape=(rows,))
+        close = np.memmap(close_path, dtype=_DTYPE, mode="r", shape=(rows,))
+        self._maps[market] = (rows, ts, close)
+        return ts, close
+
+    def read(self, market: str, start: float = None, end: float = None, last_n: int = None):
+        """
+        Vistas (ts, close) con start <= ts <= end (y como mucho las últimas
+        last_n). Arrays vacíos si el mercado no está.
+        """
+        cols = self._columns(market)
+        if cols is None:
+            empty = np.empty(0, dtype=np.float64)
+            return empty, empty
+        ts, close = cols
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, side="right"))
+        if last_n is not None:
+            lo = max(lo, hi - int(last_n))
+        return ts[lo:hi], close[lo:hi]
+
+    def matrix(self, markets, start: float = None, end: float = None,
+               last_n: int = None, how: str = "outer"):
+        """
+        Matriz alineada (ts[T], prices[T, M]) de los mercados pedidos.
+        how="outer": unión de timestamps, NaN donde falta un mercado.
+        how="inner": sólo timestamps presentes en todos los mercados.
+        last_n recorta a las últimas last_n filas del resultado.
+        """
+        markets = list(markets)
+        cols = [self.read(m, start, end) for m in markets]
+        stamps = [ts for ts, _ in cols]
+        if not stamps:
+            return np.empty(0), np.empty((0, 0))
+        if how == "inner":
+            grid = stamps[0]
+            for ts in stamps[1:]:
+                grid = np.intersect1d(grid, ts, assume_unique=True)
+        else:
+            grid = np.unique(np.concatenate(stamps))
+        if last_n is not None:
+            grid = grid[-int(last_n):]
+        out = np.full((len(grid), len(markets)), np.nan, dtype=np.float64)
+        for j, (ts, close) in enumerate(cols):
+            if not len(ts) or not len(grid):
+                continue
+            pos = np.searchsorted(ts, grid)
+            pos_c = np.minimum(pos, len(ts) - 1)
+            hit = ts[pos_c] == grid
+            out[hit, j] = close[pos_c[hit]]
+        return np.asarray(grid, dtype=np.float64), out
+
+    def frame(self, markets=None, start: float = None, end: float = None,
+              last_n: int = None, how: str = "outer"):
+        """DataFrame index=startedAt ISO, una columna por mercado (float)."""
+        import pandas as pd
+        markets = self.markets() if markets is None else list(markets)
+        grid, values = self.matrix(markets, start, end, last_n=last_n, how=how)
+        df = pd.DataFrame(values, columns=markets, index=[ts_to_iso(t) for t in grid])
+        df.index.name = "datetime"
+        return df
+
+    # ── writes ───────────────────────────────────────────────────────────
+    def append(self, market: str, ts, closes) -> int:
+        """
+        Añade velas (ts, close) en cualquier orden. Sólo entran las de
+        ts > last_ts; la de ts == last_ts reescribe el close guardado.
+        Devuelve el nº de filas nuevas.
+        """
+        ts, closes = _sorted_unique(ts, closes)
+        if not len(ts):
+            return 0
+
+        with self._locked():
+            index = dict(self._load_index())
+            meta = index.get(market) or {"rows": 0, "first_ts": None, "last_ts": None}
+            rows = int(meta["rows"])
+            ts_path, close_path = self._files(market)
+            last = meta["last_ts"]
+            if last is not None:
+                same = ts == last
+                if same.any():
+                    with open(close_path, "r+b") as f:
+                        f.seek((rows - 1) * _DTYPE.itemsize)
+                        f.write(closes[same][-1:].astype(_DTYPE).tobytes())
+                newer = ts > last
+                ts, closes = ts[newer], closes[newer]
+            if len(ts):
+                for path, arr in ((ts_path, ts), (close_path, closes)):
+                    with open(path, "ab") as f:
+                        f.truncate(rows * _DTYPE.itemsize)   # descarta restos de un crash
+                        f.write(arr.astype(_DTYPE).tobytes())
+                index[market] = {
+                    "rows": rows + len(ts),
+                    "first_ts": meta["first_ts"] if meta["first_ts"] is not None else float(ts[0]),
+                    "last_ts": float(ts[-1]),
+                }
+            self._write_index(index)
+        return int(len(ts))
+
+    def write(self, market: str, ts, closes) -> int:
+        """
+        append() si nada es anterior a first_ts; merge() si llega historia más
+        vieja (backfill de una descarga de ventana completa). Devuelve el nº de
+        filas nuevas.
+        """
+        ts = np.asarray(ts, dtype=np.float64)
+        meta = self.info(market)
+        if meta is not None and len(ts) and ts.min() < meta["first_ts"]:
+            return self.merge(market, ts, closes)
+        return self.append(market, ts, closes)
+
+    def merge(self, market: str, ts, closes) -> int:
+        """
+        Funde velas en cualquier posición del histórico (las entrantes ganan)
+        reescribiendo los ficheros del mercado (tmp + os.replace: las vistas
+        ya entregadas siguen viendo los viejos). Devuelve el nº de timestamps
+        que no estaban.
+        """
+        ts, closes = _sorted_unique(ts, closes)
+        if not len(ts):
+            return 0
+        with self._locked():
+            old_ts, old_close = self.read(market)
+            all_ts, all_close = _sorted_unique(np.concatenate([old_ts, ts]),
+                                               np.concatenate([old_close, closes]))
+            ts_path, close_path = self._files(market)
+            for path, arr in ((ts_path, all_ts), (close_path, all_close)):
+                with open(path + ".tmp", "wb") as f:
+                    f.write(arr.astype(_DTYPE).tobytes())
+                os.replace(path + ".tmp", path)
+            index = dict(self._load_index())
+            index[market] = {"rows": int(len(all_ts)), "first_ts": float(all_ts[0]),
+                             "last_ts": float(all_ts[-1])}
+            self._write_index(index)
+        return int(len(all_ts) - len(old_ts))
+
+
+_STORES = {}
+
+
+def get_price_store(resolution: str = RESOLUTION, source: str = None) -> CandleStore:
+    """Almacén compartido por (indexer, resolución), creado al primer uso."""
+    key = (resolution, source or indexer_source(INDEXER))
+    store = _STORES.get(key)
+    if store is None:
+        store = _STORES[key] = CandleStore(resolution=resolution, source=key[1])
+    return store
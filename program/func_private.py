@@ -1,6 +1,4 @@
 import asyncio
-import json
-import os
 import random
 
 from dydx_v4_client import MAX_CLIENT_ID, OrderFlags
@@ -19,6 +17,10 @@ from constants import (
 )
 from func_logging import log_event
 from func_fill_audit import summarize_order_fills
+from func_tick import invalidate_subaccount as invalidate_tick_subaccount
+from func_orderbook import live_book
+from func_account import stream_order_result, stream_order_seen
+from func_markets import live_market_table
 
 
 # ---------------------------------------------------------------------------
@@ -85,8 +87,12 @@ def _extract_tx_result(tx):
 
 
 async def _get_market_obj_and_oracle(indexer, market: str):
-    m_data = await indexer.markets.get_perpetual_markets(market)
-    market_data = m_data["markets"][market]
+    # 2026-10-18: metadata + oráculo de la tabla del stream v4_markets si está viva.
+    table = live_market_table()
+    market_data = table.info(market) if table is not None else None
+    if market_data is None:
+        m_data = await indexer.markets.get_perpetual_markets(market)
+        market_data = m_data["markets"][market]
     oracle_price = _sf(market_data.get("oraclePrice"))
     market_obj = Market(market_data)
     return market_obj, oracle_price, market_data
@@ -320,6 +326,8 @@ async def place_market_order(
         }, print_terminal=False)
 
         tx = await node.place_order(wallet=wallet, order=placed_order)
+        # Posiciones/collateral del tick snapshot ya no son válidos.
+        invalidate_tick_subaccount()
 
         # 2026-06-02: extraer y loguear el resultado de chain (code + raw_log)
         tx_hash, tx_code, raw_log = _extract_tx_result(tx)
@@ -438,6 +446,8 @@ async def place_limit_order(
         }, print_terminal=False)
 
         tx = await node.place_order(wallet=wallet, order=placed_order)
+        # Posiciones/collateral del tick snapshot ya no son válidos.
+        invalidate_tick_subaccount()
 
         # 2026-06-02: extraer y loguear chain rejection (igual que market)
         tx_hash, tx_code, raw_log = _extract_tx_result(tx)
@@ -507,7 +517,15 @@ async def get_real_fill_details(indexer, client_id, market, max_fill_lookback=20
     We therefore fetch orders and fills, resolve clientId -> order id, and join
     on that id.  The old implementation attempted a direct fill/clientId match
     and then commonly mistook the IOC limit for its execution price.
+
+    2026-10-18: if the v4_subaccounts stream (func_account) already holds the
+    order in a terminal state with all its fills, that is returned directly —
+    no sleep, no REST.
     """
+    streamed = stream_order_result(client_id, market)
+    if streamed is not None:
+        return streamed
+
     await asyncio.sleep(1.2)
 
     fills_candidates = []
@@ -592,7 +610,6 @@ async def abort_all_positions(node, indexer, max_rounds=3, ignore_markets=None):
     Cierra posiciones, pero NO se queda bucleado.
     Si después de max_rounds siguen abiertas, las reporta y sigue.
     """
-    import json
     import asyncio
     from dydx_v4_client.wallet import Wallet
     from v4_proto.dydxprotocol.clob.order_pb2 import Order
@@ -618,6 +635,10 @@ async def abort_all_positions(node, indexer, max_rounds=3, ignore_markets=None):
 
     # Fetch oracle prices once per round for limit-price calculation.
     async def get_oracle_prices():
+        table = live_market_table()
+        if table is not None:
+            tickers, prices = table.oracle_prices()
+            return {m: float(px) for m, px in zip(tickers, prices) if px == px}
         try:
             resp = await indexer.markets.get_perpetual_markets()
             mdata = resp.get("markets", {}) or {}
@@ -699,12 +720,11 @@ async def abort_all_positions(node, indexer, max_rounds=3, ignore_markets=None):
             print(f"  - {m}: {s}")
 
     try:
-        _json_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot_agents.json")
-        with open(_json_path, "w") as f:
-            json.dump([], f, indent=2)
-        print("[ABORT] bot_agents.json cleared.")
+        from func_position_store import get_position_store
+        get_position_store().clear()
+        print("[ABORT] position store cleared.")
     except Exception as e:
-        print(f"[ABORT] Could not clear bot_agents.json: {e}")
+        print(f"[ABORT] Could not clear position store: {e}")
 
     print("[ABORT] Done. Continuing program.")
     return {
@@ -721,7 +741,11 @@ async def get_orderbook_best(indexer, market: str):
     """
     Return (best_bid, best_ask) float prices for market.
     Returns (None, None) on any error — callers must handle gracefully.
+    Served from the live v4_orderbook book when available, REST otherwise.
     """
+    book = live_book(market)
+    if book is not None:
+        return book.best()
     try:
         ob = await indexer.markets.get_perpetual_market_orderbook(market=market)
         bids = ob.get("bids", []) if isinstance(ob, dict) else []
@@ -954,6 +978,13 @@ async def wait_order_visible(indexer, client_id: str, max_wait_s=6.0):
     deadline = asyncio.get_event_loop().time() + float(max_wait_s)
 
     while asyncio.get_event_loop().time() < deadline:
+        # 2026-10-18: con el stream de cuenta vivo, se mira la memoria (sin REST).
+        seen = stream_order_seen(cid)
+        if seen is not None:
+            if seen:
+                return True
+            await asyncio.sleep(0.1)
+            continue
         try:
             resp = await indexer.account.get_subaccount_orders(
                 address=WALLET_ADDRESS.strip(),
@@ -4,10 +4,17 @@ import asyncio
 import time
 
 from func_utils import get_ISO_times
-from constants import RESOLUTION
+from constants import RESOLUTION, PRICE_HISTORY_BARS, PRICE_REFRESH_INCREMENTAL
+from func_tick import get_markets_map
+from func_orderbook import live_book
+from func_candles import get_candle_manager, candle_ts, RESOLUTION_SECONDS
+from func_price_store import get_price_store, ts_to_iso
 from pprint import pprint
 
 # Get relevant time periods for ISO from and to
+# 2026-10-18: sólo referencia; get_candles_historical recalcula los rangos en
+# cada llamada (con el valor del import, un bot con días de uptime
+# re-descargaba siempre la ventana del arranque).
 ISO_TIMES = get_ISO_times()
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -58,7 +65,18 @@ async def get_candles_recent(indexer, market):
     First call per market hits the API; subsequent calls within TTL window
     return cached array instantly. With RESOLUTION='1HOUR', cache validity
     matches the data update cycle.
+
+    2026-10-18: with the v4_candles stream (func_candles) the REST fetch only
+    seeds the market's ring buffer; after that the result is a read-only,
+    zero-copy view of the ring, including the live bar. The TTL cache below
+    is the fallback when the stream is down or the ring has a gap to refill.
     """
+    manager = get_candle_manager()
+    if manager is not None:
+        view = manager.closes(market)
+        if view is not None:
+            return view
+
     now = time.time()
 
     # Cache hit?
@@ -69,35 +87,21 @@ async def get_candles_recent(indexer, market):
             return arr  # serve from cache, zero API call
 
     # Cache miss — fetch from API
-    # 2026-07-01 v2: retry con exponential backoff en 429 Too Many Requests.
-    # publicnode.com rate-limitea agresivamente si hay picos concurrentes.
-    # 3 intentos con 0.5s, 1s, 2s de espera cubren la mayoría de casos.
-    await asyncio.sleep(0.05)
-
+    # 2026-10-18: sin sleep ni retry propios. El RateGovernor compartido del
+    # IndexerClient admite la request y reintenta 429/5xx con backoff AIMD.
     candles_resp = None
     last_err = None
-    for attempt in range(3):
-        try:
-            candles_resp = await indexer.markets.get_perpetual_market_candles(
-                market=market,
-                resolution=RESOLUTION,
-                limit=100
-            )
-            break  # success
-        except Exception as e:
-            last_err = e
-            err_str = str(e).lower()
-            if "429" in err_str or "too many" in err_str or "rate" in err_str:
-                # Rate limited — backoff and retry
-                backoff = 0.5 * (2 ** attempt)
-                await asyncio.sleep(backoff)
-                continue
-            else:
-                # Non-rate-limit error — don't retry
-                break
+    try:
+        candles_resp = await indexer.markets.get_perpetual_market_candles(
+            market=market,
+            resolution=RESOLUTION,
+            limit=100
+        )
+    except Exception as e:
+        last_err = e
 
     if candles_resp is None:
-        # All retries exhausted — silently return empty (cache will be filled next scan)
+        # Governor retries exhausted — silently return empty (cache will be filled next scan)
         # Only log once per market per session to avoid log spam on ongoing 429s
         if market not in _CANDLE_ERROR_LOGGED:
             print(f"[PUBLIC] get_candles_recent error for {market}: {last_err}", flush=True)
@@ -113,75 +117,65 @@ async def get_candles_recent(indexer, market):
         return np.array([], dtype=np.float64)
 
     close_prices = []
+    started = []
     for candle in raw:
         try:
-            close_prices.append(float(candle["close"]))
+            close = float(candle["close"])
+            started_ts = candle_ts(candle["startedAt"]) if manager is not None else 0.0
         except Exception:
             continue
+        close_prices.append(close)
+        started.append(started_ts)
 
     if not close_prices:
         return np.array([], dtype=np.float64)
 
     close_prices.reverse()  # chronological order
+    started.reverse()
     arr = np.array(close_prices, dtype=np.float64)
 
     # Store in cache for next call
     _CANDLE_CACHE[market] = (arr, now)
+    if manager is not None:
+        manager.seed(market, list(zip(started, close_prices)))
     return arr
 
 
 # Get Candles Historical
-async def get_candles_historical(indexer, market, sleep_between_tfs: float = 0.15):
+async def get_candles_historical(indexer, market):
     """
     Fetch historical candles across all timeframes in ISO_TIMES.
 
     2026-07-02 v3: retry con backoff + logging visible.
     v2 silenciaba TODOS los errors → 90% de markets fallaban invisibles
     (log solo mostraba 2 "429" pero había ~100 silent failures).
-    v3 hace retry 3x con backoff exponencial y loguea WARN si un timeframe
-    fracasa después de todos los retries.
 
-    Con secuencial + sleep 0.15s: cada market tarda ~600-800ms (base).
-    Con retries en 429: hasta 3-5s por market en peor caso.
+    2026-10-18: los 4 timeframes se piden concurrentemente; el ritmo y los
+    reintentos en 429/5xx los pone el RateGovernor del IndexerClient (AIMD),
+    compartido con el resto del bot. Aquí sólo se cuenta y loguea el fallo.
     """
-    import warnings as _w
-    close_prices = []
-    tf_errors = 0
+    async def _fetch_tf(tf_obj):
+        try:
+            return await indexer.markets.get_perpetual_market_candles(
+                market=market,
+                resolution=RESOLUTION,
+                from_iso=tf_obj["from_iso"],
+                to_iso=tf_obj["to_iso"],
+                limit=100,
+            ), None
+        except Exception as e:
+            return None, e
 
-    for tf_key in ISO_TIMES.keys():
-        tf_obj = ISO_TIMES[tf_key]
-        await asyncio.sleep(sleep_between_tfs)
-
-        # Retry loop with exponential backoff
-        candles_resp = None
-        last_err = None
-        for attempt in range(3):
-            try:
-                candles_resp = await indexer.markets.get_perpetual_market_candles(
-                    market=market,
-                    resolution=RESOLUTION,
-                    from_iso=tf_obj["from_iso"],
-                    to_iso=tf_obj["to_iso"],
-                    limit=100,
-                )
-                break  # success
-            except Exception as e:
-                last_err = e
-                err_str = str(e).lower()
-                if "429" in err_str or "too many" in err_str or "rate" in err_str:
-                    # 429 → aggressive backoff
-                    await asyncio.sleep(1.0 * (2 ** attempt))
-                    continue
-                elif "500" in err_str or "502" in err_str or "503" in err_str or "504" in err_str:
-                    # 5xx server error → shorter backoff
-                    await asyncio.sleep(0.5 * (2 ** attempt))
-                    continue
-                else:
-                    # Other errors — no retry
-                    break
+    iso_times = get_ISO_times()
+    responses = await asyncio.gather(*[_fetch_tf(iso_times[k]) for k in iso_times.keys()])
 
+    close_prices = []
+    tf_errors = 0
+    last_err = None
+    for candles_resp, err in responses:
         if candles_resp is None:
             tf_errors += 1
+            last_err = err
             continue  # skip this timeframe, try next
 
         candles_list = candles_resp.get("candles", []) if isinstance(candles_resp, dict) else []
@@ -189,7 +183,7 @@ async def get_candles_historical(indexer, market, sleep_between_tfs: float = 0.1
             close_prices.append({"datetime": candle["startedAt"], market: candle["close"]})
 
     # If all timeframes failed, log a summary (once per market per invocation)
-    if tf_errors >= len(ISO_TIMES):
+    if tf_errors >= len(iso_times):
         # Complete failure — log so we're not blind
         if market not in _CANDLE_ERROR_LOGGED:
             print(f"[PUBLIC] get_candles_historical({market}) FAILED all {tf_errors} timeframes. Last err: {last_err}", flush=True)
@@ -212,6 +206,9 @@ async def get_candles_historical(indexer, market, sleep_between_tfs: float = 0.1
 # func_bot_agent), so caching here doesn't compromise risk control.
 #
 # Impact: ~30s/scan → ~3-5s/scan on warm cache.
+#
+# 2026-10-18: with the v4_orderbook stream (func_orderbook) this cache only
+# backs the REST fallback (stream down, or a book still waiting for its snapshot).
 _SPREAD_CACHE = {}              # market → (spread_bps, fetch_ts)
 _SPREAD_CACHE_TTL_S = 60        # 60 seconds — spreads change slowly enough
 
@@ -238,11 +235,20 @@ async def get_market_spread_bps(indexer, market, *, force_fresh: bool = False):
     Returns None on any error so the caller can treat it as "proceed".
     A None result must never block a trade — it just means data unavailable.
 
-    Cached for _SPREAD_CACHE_TTL_S seconds. Pass force_fresh=True from any
+    2026-10-18: if the market's order book is kept live by the v4_orderbook
+    stream (func_orderbook), the spread is read from it — zero round trips
+    and always current, so neither the cache nor force_fresh apply.
+
+    Otherwise (no stream, book not synced yet) falls back to REST, cached
+    for _SPREAD_CACHE_TTL_S seconds. Pass force_fresh=True from any
     code path that uses the value to MAKE a trading decision (e.g. the
     pre-commit gate in func_bot_agent). Scoring callers (entry_pairs Phase 1)
     should let the cache hit.
     """
+    book = live_book(market)
+    if book is not None:
+        return book.spread_bps()
+
     now = time.time()
     if not force_fresh:
         cached = _SPREAD_CACHE.get(market)
@@ -284,8 +290,7 @@ async def get_funding_rates(indexer, markets_list: list) -> dict:
     the gate rather than blocking entries entirely.
     """
     try:
-        resp = await indexer.markets.get_perpetual_markets()
-        mdata = resp.get("markets", {}) if isinstance(resp, dict) else {}
+        mdata = await get_markets_map(indexer)
         result = {}
         for m in markets_list:
             md = mdata.get(m, {})
@@ -304,8 +309,56 @@ async def get_funding_rates(indexer, markets_list: list) -> dict:
         return {}
 
 
+def _store_history(results: dict, store) -> set:
+    """
+    2026-10-18: write-through al almacén columnar (func_price_store) de lo
+    descargado; backtests y diagnose_coint leen de ahí en vez del pickle.
+    merge() y no append(): una re-descarga completa puede rellenar huecos.
+    Devuelve los mercados guardados; un fallo de disco nunca rompe el refresh.
+    """
+    stored = set()
+    for market, close_prices in results.items():
+        try:
+            ts, closes = [], []
+            for row in close_prices:
+                ts.append(candle_ts(row["datetime"]))
+                closes.append(float(row[market]))
+            store.merge(market, ts, closes)
+            stored.add(market)
+        except Exception as e:
+            print(f"[PRICE_STORE] merge {market} failed: {e}", flush=True)
+    return stored
+
+
+async def _top_up_market(indexer, store, market, last_ts, res_s) -> bool:
+    """
+    Top-up incremental: UNA request con las velas desde la anterior a last_ts
+    (así last_ts vuelve seguro, sea fromISO inclusivo o no, y la vela que
+    estaba en curso al guardar se reescribe con su close final). False si la
+    respuesta no empalma sin hueco con lo guardado → descarga completa.
+    """
+    resp = await indexer.markets.get_perpetual_market_candles(
+        market=market,
+        resolution=RESOLUTION,
+        from_iso=ts_to_iso(last_ts - res_s),
+        limit=100,
+    )
+    raw = resp.get("candles") if isinstance(resp, dict) else None
+    rows = sorted(
+        (candle_ts(c["startedAt"]), float(c["close"])) for c in (raw or ())
+    )
+    rows = [(t, c) for t, c in rows if t >= last_ts]
+    ts = np.array([t for t, _ in rows], dtype=np.float64)
+    if not len(ts) or ts[0] != last_ts or not np.all(np.diff(ts) == res_s):
+        return False
+    if len(ts) > 1 and time.time() - ts[-1] > 2 * res_s:
+        return False            # página llena (limit) sin llegar a "ahora"
+    store.append(market, ts, [c for _, c in rows])
+    return True
+
+
 # Construct market prices
-async def construct_market_prices(node, indexer):
+async def construct_market_prices(node, indexer, incremental: bool = PRICE_REFRESH_INCREMENTAL):
     """
     Fetch historical candles for ALL active markets and merge into single DataFrame.
 
@@ -313,16 +366,24 @@ async def construct_market_prices(node, indexer):
     cada uno con ~800ms de latencia (4 timeframes × 200ms). Total: ~2 minutos
     solo en los sleeps, plus ~5-10 minutos en fetches reales = 10-20 min.
 
-    Ahora: procesa en batches de 15 markets concurrentes. Cada market internamente
-    también paraleliza sus 4 timeframes. Total: ~30-60 segundos.
+    2026-10-18: sin batches fijos — la concurrencia la regula el RateGovernor
+    del IndexerClient (AIMD sobre 429/5xx).
+
+    2026-10-18 (incremental): con el almacén columnar cada refresh pide sólo
+    las velas posteriores a la última guardada de cada mercado (~6 tras 6h,
+    una request en vez de 4). Se descargan enteros como antes: mercados
+    nuevos, los que no cubren la ventana, los que llevan más de una página
+    (100 velas) sin actualizar y los cuyo top-up no empalma sin hueco. La
+    tabla se reconstruye del almacén: últimas PRICE_HISTORY_BARS velas, sin
+    NaN y con std > 0 (mismos filtros que antes). Los mercados deslistados
+    (no ACTIVE) simplemente dejan de pedirse y no entran en la tabla.
     """
     import time as _t
     _t0 = _t.time()
 
     # Declare variables
     tradeable_markets = []
-    markets = await indexer.markets.get_perpetual_markets()
-    market_data = markets.get("markets", {})
+    market_data = await get_markets_map(indexer)
 
     # Find tradeable pairs
     for market_id in market_data.keys():
@@ -330,41 +391,89 @@ async def construct_market_prices(node, indexer):
         if market_info.get("status") == "ACTIVE":
             tradeable_markets.append(market_id)
 
-    print(f"{len(tradeable_markets)} active markets found. Fetching in parallel...", flush=True)
-
-    # ── Parallel fetch in batches (conservative to avoid 429) ──
-    # 2026-07-02 v3: BATCH=3 + SLEEP=1.5s. Data del log real:
-    #   BATCH=5+SLEEP=0.5: 15/119 OK (13% success) — indexer rate-limit brutal
-    # Con BATCH=3 (~12 concurrent requests peak) + sleep 1.5s entre batches:
-    #   Expected: 80-100/119 OK (~70-85% success)
-    #   Tarda ~3-4 min pero produce CSV completo
-    # Con get_candles_historical con retry+backoff, además recupera 429 fails.
-    BATCH_SIZE = 3
-    BATCH_SLEEP = 1.5   # pausa entre batches para no saturar indexer
+    try:
+        store = get_price_store()
+    except Exception as e:
+        print(f"[PRICE_STORE] unavailable, full refresh without store: {e}", flush=True)
+        store = None
+
+    res_s = RESOLUTION_SECONDS[RESOLUTION]
+    window_start = _t.time() - PRICE_HISTORY_BARS * res_s
+    topup = {}      # market -> last_ts guardado
+    if incremental and store is not None:
+        for market in tradeable_markets:
+            info = store.info(market)
+            if (info and info["first_ts"] <= window_start + res_s
+                    and _t.time() - info["last_ts"] < 99 * res_s):
+                topup[market] = info["last_ts"]
+
+    print(f"{len(tradeable_markets)} active markets found "
+          f"({len(topup)} incremental, {len(tradeable_markets) - len(topup)} full). "
+          f"Fetching in parallel...", flush=True)
+
+    # ── Parallel fetch, paced by the shared rate governor ──
+    # 2026-07-02 v3 usaba BATCH=3 + SLEEP=1.5s fijos (BATCH=5 daba 13% de
+    # éxito). 2026-10-18: todos los markets se lanzan a la vez y el
+    # RateGovernor del IndexerClient decide cuántos van en vuelo: sube la
+    # concurrencia mientras no hay 429 y la recorta a la mitad cuando aparecen.
     results = {}   # market -> list of {datetime, market: close}
+    topped_up = set()
     failures = []
+    refetched = []
+    done = 0
 
     async def _fetch_one(market):
-        try:
-            data = await get_candles_historical(indexer, market)
-            return market, data
-        except Exception as e:
-            return market, None
-
-    for i in range(0, len(tradeable_markets), BATCH_SIZE):
-        batch = tradeable_markets[i:i + BATCH_SIZE]
-        batch_results = await asyncio.gather(*[_fetch_one(m) for m in batch])
-        for m, data in batch_results:
+        nonlocal done
+        if market in topup:
+            try:
+                if await _top_up_market(indexer, store, market, topup[market], res_s):
+                    topped_up.add(market)
+                else:
+                    refetched.append(market)
+            except Exception:
+                refetched.append(market)
+        if market not in topped_up:
+            try:
+                data = await get_candles_historical(indexer, market)
+            except Exception:
+                data = None
             if data is not None and len(data) >= 10:
-                results[m] = data
+                results[market] = data
             else:
-                failures.append(m)
-        # Sleep between batches to give indexer breathing room
-        if i + BATCH_SIZE < len(tradeable_markets):
-            await asyncio.sleep(BATCH_SLEEP)
-        if (i + BATCH_SIZE) % (BATCH_SIZE * 5) == 0 or (i + BATCH_SIZE) >= len(tradeable_markets):
-            print(f"   Fetched {min(i + BATCH_SIZE, len(tradeable_markets))}/{len(tradeable_markets)} "
-                  f"markets ({_t.time() - _t0:.1f}s elapsed, {len(results)} OK, {len(failures)} failed)", flush=True)
+                failures.append(market)
+        done += 1
+        if done % 15 == 0 or done == len(tradeable_markets):
+            gov = getattr(indexer, "governor", None)
+            gov_str = ""
+            if gov is not None:
+                _g = gov.snapshot()
+                gov_str = f", governor rate={_g['rate']}/s conc={_g['concurrency']} throttled={_g['throttled']}"
+            print(f"   Fetched {done}/{len(tradeable_markets)} "
+                  f"markets ({_t.time() - _t0:.1f}s elapsed, {len(results) + len(topped_up)} OK, "
+                  f"{len(failures)} failed{gov_str})", flush=True)
+
+    await asyncio.gather(*[_fetch_one(m) for m in tradeable_markets])
+
+    if store is not None:
+        stored = _store_history(results, store) | topped_up
+        if refetched:
+            print(f"   {len(refetched)} markets re-downloaded in full (top-up gap)", flush=True)
+        if not stored:
+            print(f"❌ construct_market_prices: 0 markets fetched successfully")
+            return pd.DataFrame()
+        df = store.frame(
+            [m for m in tradeable_markets if m in stored],
+            start=window_start,
+        )
+        flat = df.columns[df.std() == 0].tolist()
+        df.drop(columns=flat, inplace=True)   # skip markets with no movement
+        nans = df.columns[df.isna().any()].tolist()
+        if len(nans) > 0:
+            df.drop(columns=nans, inplace=True)
+        _elapsed = _t.time() - _t0
+        print(f"✅ Tabla final lista con {len(df.columns)} mercados en {_elapsed:.1f}s "
+              f"({len(topped_up)} incremental, dropped {len(nans)} con NaN)", flush=True)
+        return df
 
     # ── Merge into single DataFrame ──
     if not results:
@@ -18,15 +18,12 @@ Guardrails:
   - Emergencia: abs_z >= RISK_OFF_EMERGENCY_ABS_Z OR age >= RISK_OFF_EMERGENCY_AGE_HOURS
 """
 
-import json
-import os
 import asyncio
 from datetime import datetime, timezone
 
 from func_messaging import send_message
 from func_logging import log_event
 from constants import (
-    WALLET_ADDRESS,
     RISK_SCORE_W_AGE,       # should be 0.0 — kept for config visibility
     RISK_SCORE_W_ABS_Z,
     RISK_SCORE_W_UNREAL_PNL,
@@ -35,12 +32,12 @@ from constants import (
     MARKET_MAX_SLIPPAGE_BPS_EXIT,
 )
 from func_public import get_candles_recent
+from func_tick import get_markets_map, get_subaccount_obj
 from func_cointegration import calculate_zscore
 from func_utils import format_number
 from func_private import place_market_order
 from v4_proto.dydxprotocol.clob.order_pb2 import Order
-
-JSON_PATH = os.path.join(os.path.dirname(__file__), "bot_agents.json")
+from func_position_store import get_position_store
 
 # ── Safety knobs ──────────────────────────────────────────────────────────────
 # Only close positive-PnL pairs under emergency conditions.
@@ -87,20 +84,11 @@ def _parse_opened_at(v):
 
 def _load_trades():
     try:
-        with open(JSON_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data if isinstance(data, list) else []
+        return get_position_store().all()
     except Exception:
         return []
 
 
-def _save_trades(trades):
-    tmp = JSON_PATH + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(trades, f, indent=2)
-    os.replace(tmp, JSON_PATH)
-
-
 async def risk_off_close_worst_pair(node, indexer, wallet):
     """
     Close the truly worst pair under portfolio stress.
@@ -116,11 +104,8 @@ async def risk_off_close_worst_pair(node, indexer, wallet):
     if not trades:
         return False
 
-    markets_resp = await indexer.markets.get_perpetual_markets()
-    markets = markets_resp.get("markets", {}) or {}
-
-    account_resp = await indexer.account.get_subaccount(WALLET_ADDRESS, 0)
-    sub = account_resp.get("subaccount", {}) or {}
+    markets = await get_markets_map(indexer)
+    sub = await get_subaccount_obj(indexer)
     positions = sub.get("openPerpetualPositions", {}) or sub.get("perpetualPositions", {}) or {}
 
     live_pos = {}
@@ -323,17 +308,8 @@ async def risk_off_close_worst_pair(node, indexer, wallet):
             max_slippage_bps=MARKET_MAX_SLIPPAGE_BPS_EXIT,
         )
 
-        # Remove closed pair from JSON (atomic)
-        remaining = []
-        removed = False
-        closed_record = None
-        for row in trades:
-            if row.get("market_1") == m1 and row.get("market_2") == m2 and not removed:
-                removed = True
-                closed_record = row
-                continue
-            remaining.append(row)
-        _save_trades(remaining)
+        # Remove closed pair from the position store (single-row delete)
+        closed_record = get_position_store().delete_pair(m1, m2)
 
         # ── Synthetic trade_closed event (Bug #2 fix) ─────────────────────
         # risk_off MUST emit a trade_closed so its PnL is counted in
@@ -414,7 +390,7 @@ async def risk_off_close_worst_pair(node, indexer, wallet):
             "market_2": m2,
             "unreal": unreal,
             "score": score,
-            "removed_from_json": removed,
+            "removed_from_json": closed_record is not None,
         })
 
         send_message(
@@ -0,0 +1,147 @@
+# func_stream.py
+"""
+Stream push del indexer compartido por todo el bot.
+
+Un único AsyncIndexerSocket (una conexión websocket) y una única tarea que lo
+consume. Cada mensaje se enruta por `channel` a los handlers registrados
+(order books, velas, subaccount, markets). Un mensaje "resync" (reconexión,
+hueco de message_id, consumidor atrasado) se reparte a TODOS los handlers:
+el estado construido desde el stream queda inválido hasta que lleguen los
+snapshots `subscribed` de la nueva conexión.
+
+Contrato de un handler:
+    on_message(message: dict)  — subscribed / channel_data / channel_batch_data / unsubscribed
+    on_resync(reason: str)
+
+Los consumidores nunca dependen del stream: si no está vivo (o el dato aún no
+está sincronizado) caen al REST de siempre.
+"""
+
+import asyncio
+from collections import OrderedDict
+
+from dydx_v4_client.indexer.socket.async_websocket import RESYNC
+from func_logging import log_event
+
+_DATA_TYPES = ("subscribed", "channel_data", "channel_batch_data", "unsubscribed")
+
+
+class IndexerStream:
+    def __init__(self, socket):
+        self.socket = socket
+        self._handlers = {}           # channel → [handler, ...]
+        self._task = None
+        self.stats = {"dispatched": 0, "resyncs": 0, "errors": 0, "handler_errors": 0}
+
+    def register(self, channel: str, handler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    @property
+    def is_live(self) -> bool:
+        return (
+            self._task is not None
+            and not self._task.done()
+            and self.socket.is_connected
+        )
+
+    async def start(self) -> "IndexerStream":
+        await self.socket.connect()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._pump())
+        return self
+
+    async def stop(self) -> None:
+        await self.socket.close()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            self._task = None
+
+    def snapshot(self) -> dict:
+        return {**self.stats, **{f"socket_{k}": v for k, v in self.socket.stats.items()
+                                 if k != "last_message_ts"}}
+
+    async def _pump(self) -> None:
+        async for message in self.socket:
+            mtype = message.get("type")
+            if mtype == RESYNC:
+                self.stats["resyncs"] += 1
+                log_event({"type": "indexer_stream_resync", "reason": message.get("reason")},
+                          print_terminal=False)
+                for handlers in self._handlers.values():
+                    for handler in handlers:
+                        self._call(handler.on_resync, message.get("reason"))
+            elif mtype in _DATA_TYPES:
+                self.stats["dispatched"] += 1
+                for handler in self._handlers.get(message.get("channel"), ()):
+                    self._call(handler.on_message, message)
+            elif mtype == "error":
+                self.stats["errors"] += 1
+                log_event({"type": "indexer_stream_error", "message": message.get("message"),
+                           "channel": message.get("channel"), "id": message.get("id")},
+                          print_terminal=False)
+
+    def _call(self, fn, arg) -> None:
+        # Un handler roto no puede tumbar el stream para los demás.
+        try:
+            fn(arg)
+        except Exception as e:
+            self.stats["handler_errors"] += 1
+            log_event({"type": "indexer_stream_handler_error",
+                       "handler": type(getattr(fn, "__self__", fn)).__name__,
+                       "error": str(e)}, print_terminal=False)
+
+
+class LruSubscriptions:
+    """
+    Estado por clave (mercado) con suscripción perezosa: la primera consulta
+    crea el estado y suscribe; por encima de max_keys se desuscribe el menos
+    usado. Compartido por los managers de order books y velas.
+    """
+
+    def __init__(self, max_keys: int, factory, subscribe, unsubscribe):
+        self.max_keys = int(max_keys)
+        self._factory = factory
+        self._subscribe = subscribe
+        self._unsubscribe = unsubscribe
+        self._items = OrderedDict()
+        self.subscribes = 0
+        self.evictions = 0
+
+    def want(self, key):
+        item = self._items.get(key)
+        if item is not None:
+            self._items.move_to_end(key)
+            return item
+        while len(self._items) >= self.max_keys:
+            old, _ = self._items.popitem(last=False)
+            self._unsubscribe(old)
+            self.evictions += 1
+        item = self._factory(key)
+        self._items[key] = item
+        self._subscribe(key)
+        self.subscribes += 1
+        return item
+
+    def get(self, key):
+        return self._items.get(key)
+
+    def values(self):
+        return self._items.values()
+
+    def __len__(self):
+        return len(self._items)
+
+
+_STREAM = None
+
+
+def set_stream(stream) -> None:
+    global _STREAM
+    _STREAM = stream
+
+
+def get_stream():
+    return _STREAM
@@ -0,0 +1,130 @@
+# func_tick.py
+"""
+Snapshot por tick del loop principal: perpetual markets + subaccount 0.
+
+Problema que resuelve:
+  En UNA iteración de main.py, get_perpetual_markets() y
+  get_subaccount(WALLET_ADDRESS, 0) se pedían por separado desde
+  manage_trade_exits, send_account_kpis, risk_off_close_worst_pair,
+  get_live_positions / reconcile, open_positions, get_funding_rates y el
+  propio cap-check de main → 8-10 round trips redundantes por ciclo.
+
+Diseño:
+  - main.py llama begin_tick(indexer) al inicio de cada iteración. Eso crea
+    un TickSnapshot nuevo (vacío) y lo deja como "tick actual".
+  - Los subsistemas piden get_markets_map(indexer) / get_subaccount_obj(indexer).
+    Con tick activo y dato más joven que max_age_s → se sirve el snapshot;
+    si no, se pide al indexer y se guarda. Así el ciclo hace ~2 requests.
+  - Frescura EXPLÍCITA: cada getter acepta max_age_s (0 = forzar lectura).
+  - Toda orden enviada (func_private.place_market_order) invalida el
+    subaccount, así las verificaciones post-commit nunca leen posiciones
+    anteriores a la orden.
+  - Sin tick activo (scripts, tests) los getters van directo al indexer.
+  - 2026-10-18: con la tabla de mercados del stream (func_markets) viva, el
+    markets map se sirve de ella (push, sin REST) salvo max_age_s=0.
+
+Los dicts devueltos son compartidos: tratarlos como sólo-lectura.
+"""
+
+import time
+
+from constants import WALLET_ADDRESS, TICK_SNAPSHOT_MAX_AGE_S
+from func_markets import live_market_table
+
+
+class TickSnapshot:
+    def __init__(self, indexer, max_age_s: float = TICK_SNAPSHOT_MAX_AGE_S):
+        self.indexer = indexer
+        self.max_age_s = float(max_age_s)
+        self.started_at = time.time()
+        self._markets = None          # (markets_map, fetch_ts)
+        self._subaccount = None       # (subaccount_dict, fetch_ts)
+        self.stats = {"markets_fetch": 0, "markets_hit": 0, "markets_stream": 0,
+                      "subaccount_fetch": 0, "subaccount_hit": 0}
+
+    def _fresh(self, entry, max_age_s):
+        if entry is None:
+            return False
+        bound = self.max_age_s if max_age_s is None else float(max_age_s)
+        return (time.time() - entry[1]) <= bound and bound > 0
+
+    async def markets(self, max_age_s: float = None) -> dict:
+        """{market: market_info} de /v4/perpetualMarkets."""
+        table = live_market_table() if max_age_s != 0 else None
+        if table is not None:
+            self.stats["markets_stream"] += 1
+            return table.markets_map()
+        if self._fresh(self._markets, max_age_s):
+            self.stats["markets_hit"] += 1
+            return self._markets[0]
+        resp = await self.indexer.markets.get_perpetual_markets()
+        markets = (resp.get("markets", {}) if isinstance(resp, dict) else {}) or {}
+        self._markets = (markets, time.time())
+        self.stats["markets_fetch"] += 1
+        return markets
+
+    async def subaccount(self, max_age_s: float = None) -> dict:
+        """El dict "subaccount" de /v4/addresses/{WALLET}/subaccountNumber/0."""
+        if self._fresh(self._subaccount, max_age_s):
+            self.stats["subaccount_hit"] += 1
+            return self._subaccount[0]
+        resp = await self.indexer.account.get_subaccount(WALLET_ADDRESS.strip(), 0)
+        sub = (resp.get("subaccount", {}) if isinstance(resp, dict) else {}) or {}
+        self._subaccount = (sub, time.time())
+        self.stats["subaccount_fetch"] += 1
+        return sub
+
+    def invalidate_subaccount(self):
+        self._subaccount = None
+
+    def invalidate(self):
+        self._markets = None
+        self._subaccount = None
+
+
+_CURRENT_TICK = None
+
+
+def begin_tick(indexer, max_age_s: float = TICK_SNAPSHOT_MAX_AGE_S) -> TickSnapshot:
+    """Start a new loop iteration: drop the previous snapshot and return the new one."""
+    global _CURRENT_TICK
+    _CURRENT_TICK = TickSnapshot(indexer, max_age_s=max_age_s)
+    return _CURRENT_TICK
+
+
+def current_tick():
+    return _CURRENT_TICK
+
+
+def _tick_for(indexer):
+    tick = _CURRENT_TICK
+    if tick is not None and tick.indexer is indexer:
+        return tick
+    return None
+
+
+async def get_markets_map(indexer, max_age_s: float = None) -> dict:
+    """Markets map from the current tick (or straight from the indexer if none)."""
+    tick = _tick_for(indexer)
+    if tick is not None:
+        return await tick.markets(max_age_s)
+    table = live_market_table() if max_age_s != 0 else None
+    if table is not None:
+        return table.markets_map()
+    resp = await indexer.markets.get_perpetual_markets()
+    return (resp.get("markets", {}) if isinstance(resp, dict) else {}) or {}
+
+
+async def get_subaccount_obj(indexer, max_age_s: float = None) -> dict:
+    """Subaccount 0 from the current tick (or straight from the indexer if none)."""
+    tick = _tick_for(indexer)
+    if tick is not None:
+        return await tick.subaccount(max_age_s)
+    resp = await indexer.account.get_subaccount(WALLET_ADDRESS.strip(), 0)
+    return (resp.get("subaccount", {}) if isinstance(resp, dict) else {}) or {}
+
+
+def invalidate_subaccount():
+    """Called after any order is sent: positions/collateral are now stale."""
+    if _CURRENT_TICK is not None:
+        _CURRENT_TICK.invalidate_subaccount()
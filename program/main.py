@@ -1,19 +1,32 @@
 import asyncio
 import os
+import signal
+import sys
 import time
 
 from func_connections import connect_dydx
 from func_private import abort_all_positions
 from func_public import construct_market_prices
 from func_entry_pairs import open_positions
-from func_cointegration import store_cointegration_results, CSV_PATH as COINT_CSV_PATH
+from func_cointegration import store_cointegration_results_async, CSV_PATH as COINT_CSV_PATH
+from func_coint_rls import refresh_incremental, seed_coint_state
+from func_kalman import update_hedges_from_csv
+from func_cooldowns import get_cooldown_registry
+from func_position_store import get_position_store
 from func_exit_pairs import manage_trade_exits
 from func_kpis import send_account_kpis, send_positions_status
 from func_risk_off import risk_off_close_worst_pair
 from func_messaging import send_message
-from func_logging import log_event
+from func_logging import log_event, shutdown_logging
 from func_position_guard import assert_safe_to_open, close_markets_actual, get_live_positions
 from func_kill_switch import evaluate as kill_switch_evaluate, is_halted as kill_switch_halted
+from func_tick import begin_tick, current_tick, get_markets_map, get_subaccount_obj
+from func_connections import make_indexer_socket
+from func_stream import IndexerStream, set_stream
+from func_orderbook import install_orderbook_manager, get_orderbook_manager
+from func_candles import install_candle_manager, get_candle_manager
+from func_account import install_account_state, get_account_state
+from func_markets import install_market_table, get_market_table
 
 from constants import (
     ABORT_ALL_POSITIONS,
@@ -31,8 +44,11 @@ from constants import (
     RISK_OFF_FREE_COLLATERAL_TRIGGER,
     RISK_OFF_FORCE_IF_OPEN_TRADES_GE,
     COINTEGRATION_REFRESH_HOURS,
+    COINT_RLS_ENABLED,
+    COINT_RLS_INTERVAL_MIN,
+    KALMAN_HEDGE_ENABLED,
     UNMANAGED_IGNORE_MARKETS,
-    WALLET_ADDRESS,
+    INDEXER_STREAM_ENABLED,
     # Dynamic sizing
     DYNAMIC_SIZING,
     DYNAMIC_SIZING_PCT,
@@ -57,19 +73,50 @@ def _csv_needs_refresh() -> bool:
 async def _run_cointegration(node, indexer):
     print("Fetching market prices for cointegration, please allow 3 minutes...", flush=True)
     send_message("🔄 Refreshing cointegrated pairs (this takes ~3 min)...")
+    # 2026-10-18: el histórico queda en el almacén columnar (func_price_store),
+    # que reemplaza a market_prices.pkl.
     df_market_prices = await construct_market_prices(node, indexer)
-    try:
-        _pkl = os.path.join(os.path.dirname(os.path.abspath(__file__)), "market_prices.pkl")
-        df_market_prices.to_pickle(_pkl)
-    except Exception:
-        pass
-    result = store_cointegration_results(df_market_prices)
+
+    # 2026-10-18: el cálculo va a un pool de procesos; el event loop sigue
+    # gestionando exits mientras tanto.
+    def _progress(stats, done, total):
+        print(f"[COINT] chunk {done}/{total}: coint_tested={stats['coint_tested']} "
+              f"coint_pass={stats['coint_pass']} kept={len(stats['half_lives'])}", flush=True)
+
+    result = await store_cointegration_results_async(df_market_prices, on_progress=_progress)
     if result != "saved":
         raise RuntimeError("store_cointegration_results did not return 'saved'")
+    if COINT_RLS_ENABLED:
+        try:
+            await asyncio.to_thread(seed_coint_state, df_market_prices)
+        except Exception as e:
+            print(f"[COINT-RLS] seed failed: {e}", flush=True)
+    if KALMAN_HEDGE_ENABLED:
+        try:
+            await asyncio.to_thread(update_hedges_from_csv, df_market_prices)
+        except Exception as e:
+            print(f"[KALMAN] update failed: {e}", flush=True)
     log_event({"type": "cointegration_refresh_done", "csv": COINT_CSV_PATH})
     send_message("✅ Cointegrated pairs refreshed.")
 
 
+async def _run_coint_incremental(node, indexer):
+    """
+    2026-10-18: entre refreshes completos, velas nuevas → estado RLS por par
+    (func_coint_rls) → re-test exacto sólo de los pares que cruzan el umbral.
+    Las mismas velas actualizan el hedge ratio dinámico (func_kalman).
+    """
+    df_market_prices = await construct_market_prices(node, indexer)
+    if COINT_RLS_ENABLED:
+        summary = await asyncio.to_thread(refresh_incremental, df_market_prices)
+        print(f"[COINT-RLS] {summary}", flush=True)
+        log_event({"type": "coint_incremental", **summary}, print_terminal=False)
+    if KALMAN_HEDGE_ENABLED:
+        hedges = await asyncio.to_thread(update_hedges_from_csv, df_market_prices)
+        print(f"[KALMAN] {hedges}", flush=True)
+        log_event({"type": "kalman_hedge_update", **hedges}, print_terminal=False)
+
+
 def _compute_dynamic_sizing(equity: float) -> tuple:
     """
     Compute (usd_per_trade, max_open_trades) from current equity.
@@ -110,8 +157,8 @@ def _compute_dynamic_sizing(equity: float) -> tuple:
 async def _kill_switch_close_all(node, indexer, wallet, reason: str):
     """
     Cierre de emergencia del kill-switch: cierra TODAS las posiciones live
-    (reduce_only, slippage de flatten para asegurar fill) y vacía
-    bot_agents.json. Reutiliza close_markets_actual (que ya usa el slippage
+    (reduce_only, slippage de flatten para asegurar fill) y vacía el
+    registro de pares (func_position_store). Reutiliza close_markets_actual (que ya usa el slippage
     de flatten acotado tras la corrección E2).
     """
     try:
@@ -129,10 +176,7 @@ async def _kill_switch_close_all(node, indexer, wallet, reason: str):
             )
         # Vaciar el tracking local (las posiciones ya no deben gestionarse).
         try:
-            import json as _json
-            _jp = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot_agents.json")
-            with open(_jp, "w") as _f:
-                _json.dump([], _f, indent=2)
+            get_position_store().clear()
         except Exception as _je:
             log_event({"type": "kill_switch_json_clear_error", "error": str(_je)}, print_terminal=False)
         send_message(
@@ -146,17 +190,43 @@ async def _kill_switch_close_all(node, indexer, wallet, reason: str):
         send_message(f"⚠️ Kill-switch: error cerrando posiciones: {e}")
 
 
+_INDEXER = None   # IndexerClient con pool HTTP compartido; se cierra en _run()
+
+
 async def main():
+    global _INDEXER
     send_message("Bot Launched Successfully")
 
     try:
         print("Connecting to client...", flush=True)
         node, indexer, wallet = await connect_dydx()
+        _INDEXER = indexer
     except Exception as e:
         print("Error connecting to client:", e, flush=True)
         send_message("Failed to connect to DYDX.")
         raise
 
+    # 2026-10-18: stream push del indexer (order books, ...). Si no conecta,
+    # cada consumidor sigue por REST.
+    stream = None
+    if INDEXER_STREAM_ENABLED:
+        try:
+            stream = IndexerStream(make_indexer_socket())
+            install_orderbook_manager(stream)
+            install_candle_manager(stream)
+            install_account_state(stream)
+            install_market_table(stream)
+            await stream.start()
+            set_stream(stream)
+        except Exception as e:
+            print(f"[STREAM] Indexer stream unavailable, REST only: {e}", flush=True)
+            stream = None
+
+    # 2026-10-18: reproduce el journal de cooldowns (y migra
+    # pair_fail_cooldowns.json la primera vez) antes del primer scan.
+    n_cd = len(get_cooldown_registry())
+    print(f"[COOLDOWN] {n_cd} active pair cooldowns loaded", flush=True)
+
     if ABORT_ALL_POSITIONS:
         try:
             print("Closing all positions...", flush=True)
@@ -185,6 +255,7 @@ async def main():
     opened_since_exit = 0
     last_kpi_ts = loop.time()
     last_coint_refresh_ts = loop.time()
+    last_coint_rls_ts = loop.time()
     last_summary_ts = loop.time()
     last_positions_status_ts = loop.time()
     session_start_wall = time.time()   # wall-clock start for session age display
@@ -208,6 +279,8 @@ async def main():
     while True:
         now = loop.time()
         print("[D1] loop top", flush=True)
+        # 2026-10-18: un snapshot markets/subaccount por iteración (func_tick).
+        begin_tick(indexer)
 
         # ── Periodic cointegration refresh (2026-07-01: NON-BLOCKING) ──────
         # ANTES: await _run_cointegration(...) bloqueaba el main loop 5-20 min.
@@ -222,8 +295,10 @@ async def main():
         print("[D2] coint check", flush=True)
         if COINTEGRATION_REFRESH_HOURS > 0:
             elapsed_coint = (now - last_coint_refresh_ts) / 3600.0
-            _existing = globals().get("_coint_task")
-            _in_progress = _existing is not None and not _existing.done()
+            # Tampoco mientras corre el incremental (_coint_rls_task): ambos
+            # reescriben el CSV de cointegración y el estado RLS.
+            _in_progress = any(t is not None and not t.done()
+                               for t in (globals().get("_coint_task"), globals().get("_coint_rls_task")))
 
             if elapsed_coint >= float(COINTEGRATION_REFRESH_HOURS) and not _in_progress:
                 print(f"[D2] launching coint refresh in background ({elapsed_coint:.1f}h old)", flush=True)
@@ -243,6 +318,21 @@ async def main():
                 # Task todavía corriendo — solo log, el loop sigue
                 print("[D2] coint refresh already running in background", flush=True)
 
+        # ── Incremental cointegration + Kalman hedges (2026-10-18) ─────────
+        # Single-flight como el refresh completo, y nunca a la vez que él.
+        if (COINT_RLS_ENABLED or KALMAN_HEDGE_ENABLED) and (now - last_coint_rls_ts) >= 60.0 * COINT_RLS_INTERVAL_MIN:
+            _busy = any(t is not None and not t.done()
+                        for t in (globals().get("_coint_task"), globals().get("_coint_rls_task")))
+            if not _busy:
+                async def _background_coint_rls():
+                    try:
+                        await _run_coint_incremental(node, indexer)
+                    except Exception as e_rls:
+                        print(f"[COINT-RLS] error: {e_rls}", flush=True)
+                        log_event({"type": "coint_incremental_error", "error": str(e_rls)})
+                globals()["_coint_rls_task"] = asyncio.create_task(_background_coint_rls())
+                last_coint_rls_ts = loop.time()
+
         # ── Manage exits ──────────────────────────────────────────────────
         print(f"[D3] MANAGE_EXITS={MANAGE_EXITS}", flush=True)
         if MANAGE_EXITS:
@@ -271,6 +361,22 @@ async def main():
                 snapshot = await send_account_kpis(indexer, send_telegram=False)
                 last_kpi_ts = now
 
+                # Latencia por endpoint del pool HTTP del indexer (ventana KPI).
+                try:
+                    log_event({
+                        "type": "indexer_http_stats",
+                        "endpoints": indexer.http_stats(reset=True),
+                        "governor": indexer.governor.snapshot(),
+                        "tick": (current_tick().stats if current_tick() else {}),
+                        "stream": (stream.snapshot() if stream else {}),
+                        "orderbooks": (get_orderbook_manager().snapshot() if get_orderbook_manager() else {}),
+                        "candles": (get_candle_manager().snapshot() if get_candle_manager() else {}),
+                        "account": (get_account_state().snapshot() if get_account_state() else {}),
+                        "markets": (get_market_table().snapshot() if get_market_table() else {}),
+                    }, print_terminal=False)
+                except Exception:
+                    pass
+
                 if snapshot:
                     current_equity = snapshot.get("equity", 0.0)
 
@@ -368,8 +474,7 @@ async def main():
                 if equity_session_start and equity_session_start > 0:
                     # Fetch current equity for live comparison
                     try:
-                        _sresp = await indexer.account.get_subaccount(WALLET_ADDRESS.strip(), 0)
-                        _ssub = _sresp.get("subaccount", {}) or {}
+                        _ssub = await get_subaccount_obj(indexer)
                         _cur_eq = float(_ssub.get("equity") or 0)
                     except Exception:
                         _cur_eq = 0.0
@@ -405,14 +510,10 @@ async def main():
         if PLACE_TRADES:
             print("[D5] entering PLACE_TRADES block", flush=True)
             try:
-                import json as _json
-                _json_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot_agents.json")
-                print(f"[D5] reading JSON from {_json_path}", flush=True)
-
                 # ── JSON-side count (what the bot thinks it has) ───────────
+                # 2026-10-18: registros de func_position_store (caché en memoria).
                 try:
-                    with open(_json_path) as _f:
-                        _records = _json.load(_f)
+                    _records = get_position_store().all()
                     json_pairs = len([r for r in _records if isinstance(r, dict)])
                     json_orphans = len([
                         r for r in _records
@@ -454,8 +555,7 @@ async def main():
                 _ignored_legs = 0
                 _dust_legs = 0
                 try:
-                    _resp = await indexer.account.get_subaccount(WALLET_ADDRESS.strip(), 0)
-                    _sub = _resp.get("subaccount", {}) or {}
+                    _sub = await get_subaccount_obj(indexer)
                     _equity = float(_sub.get("equity") or 0)
                     _positions = (
                         _sub.get("openPerpetualPositions", {})
@@ -464,8 +564,7 @@ async def main():
                     )
                     # Get oracle prices once to compute notional per leg
                     try:
-                        _mk_resp = await indexer.markets.get_perpetual_markets()
-                        _markets_map = _mk_resp.get("markets", {}) or {}
+                        _markets_map = await get_markets_map(indexer)
                     except Exception:
                         _markets_map = {}
 
@@ -622,5 +721,20 @@ async def main():
         await asyncio.sleep(EXIT_CHECK_SECONDS)
 
 
+async def _run():
+    try:
+        await main()
+    finally:
+        # Cierra el pool keep-alive del IndexerClient (conexiones abiertas).
+        if _INDEXER is not None:
+            await _INDEXER.aclose()
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    # 2026-10-18: SIGTERM → SystemExit para que corra el finally y se vacíe la
+    # cola del logger (func_logging escribe en un hilo aparte).
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(143))
+    try:
+        asyncio.run(_run())
+    finally:
+        shutdown_logging()
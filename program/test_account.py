@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Offline tests for the v4_subaccounts-fed account state (func_account)."""
+import asyncio
+import os
+
+os.environ.setdefault("API_KEY", "test")  # constants.py requires it
+
+import func_account
+from func_account import AccountState
+
+ADDR = "dydx1test"
+SUB_ID = f"{ADDR}/0"
+
+
+class _FakeStream:
+    def __init__(self):
+        self.is_live = True
+        self.subscribed = []
+        stream = self
+
+        class _Subaccounts:
+            def subscribe(self, address, number):
+                stream.subscribed.append((address, number))
+
+        self.socket = type("S", (), {"subaccounts": _Subaccounts()})()
+
+    def register(self, channel, handler):
+        self.handler = handler
+
+
+def _state():
+    stream = _FakeStream()
+    state = AccountState(stream, address=ADDR)
+    state.on_message({
+        "type": "subscribed", "channel": "v4_subaccounts", "id": SUB_ID,
+        "contents": {"subaccount": {"openPerpetualPositions": {
+            "ETH-USD": {"market": "ETH-USD", "size": "-2", "status": "OPEN"},
+        }}, "orders": []},
+    })
+    return stream, state
+
+
+def _update(**contents):
+    return {"type": "channel_data", "channel": "v4_subaccounts", "id": SUB_ID,
+            "contents": contents}
+
+
+def test_snapshot_and_position_updates():
+    stream, state = _state()
+    assert stream.subscribed == [(ADDR, 0)]
+    assert state.is_live and set(state.positions) == {"ETH-USD"}
+    state.on_message(_update(perpetualPositions=[
+        {"market": "BTC-USD", "size": "0.1", "status": "OPEN"},
+        {"market": "ETH-USD", "size": "0", "status": "CLOSED"},
+    ]))
+    assert set(state.positions) == {"BTC-USD"}
+    state.on_resync("gap")
+    assert not state.is_live
+
+
+def test_wait_for_order_resolves_on_pushed_fill():
+    stream, state = _state()
+
+    async def run():
+        waiter = asyncio.ensure_future(state.wait_for_order("777", "BTC-USD", timeout=2))
+        await asyncio.sleep(0)
+        state.on_message(_update(orders=[{"id": "o1", "clientId": "777", "ticker": "BTC-USD",
+                                          "status": "BEST_EFFORT_OPENED", "size": "0.2"}]))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        # Order turns FILLED in the block message that also carries its fills.
+        state.on_message(_update(
+            orders=[{"id": "o1", "status": "FILLED", "totalFilled": "0.2"}],
+            fills=[{"id": "f1", "orderId": "o1", "ticker": "BTC-USD", "size": "0.05",
+                    "price": "100", "fee": "0.01", "liquidity": "TAKER"},
+                   {"id": "f2", "orderId": "o1", "ticker": "BTC-USD", "size": "0.15",
+                    "price": "104", "fee": "0.02", "liquidity": "TAKER"}],
+        ))
+        return await waiter
+
+    result = asyncio.run(run())
+    assert result["status_label"] == "FILLED"
+    assert result["filled_size"] == 0.2
+    assert abs(result["avg_price"] - 103.0) < 1e-9
+    assert abs(result["fee_total"] - 0.03) < 1e-12
+    assert state.stats["resolved"] == 1
+
+
+def test_filled_order_waits_for_its_fill_rows_and_cancel_resolves():
+    stream, state = _state()
+    state.on_message(_update(orders=[{"id": "o2", "clientId": "9", "ticker": "SOL-USD",
+                                      "status": "FILLED", "totalFilled": "1"}]))
+    assert state.order_result("9", "SOL-USD") is None
+    state.on_message(_update(fills=[{"id": "f9", "orderId": "o2", "ticker": "SOL-USD",
+                                     "size": "1", "price": "20", "fee": "0.01"}]))
+    assert state.order_result("9", "SOL-USD")["avg_price"] == 20.0
+
+    state.on_message(_update(orders=[{"id": "o3", "clientId": "10", "ticker": "SOL-USD",
+                                      "status": "CANCELED", "totalFilled": "0", "size": "1"}]))
+    assert state.order_result("10", "SOL-USD")["status_label"] == "KILLED_BY_FOK"
+
+
+def test_module_helpers_fall_back_without_live_stream():
+    stream, state = _state()
+
+    async def run():
+        func_account._ACCOUNT = state
+        try:
+            stream.is_live = False
+            assert await func_account.wait_for_order("1", "BTC-USD", timeout=5) is None
+            assert func_account.stream_positions() is None
+            stream.is_live = True
+            assert await func_account.wait_for_order("1", "BTC-USD", timeout=0.01) is None
+            assert set(func_account.stream_positions()) == {"ETH-USD"}
+        finally:
+            func_account._ACCOUNT = None
+
+    asyncio.run(run())
+    assert state.stats["timeouts"] == 1
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} account tests passed")
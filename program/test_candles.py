@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Offline tests for the stream-fed candle ring buffers (func_candles)."""
+import asyncio
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+os.environ.setdefault("API_KEY", "test")  # constants.py requires it
+
+import func_candles
+from func_candles import CandleRing, CandleStreamManager
+
+H = 3600.0
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class _FakeChannel:
+    def __init__(self):
+        self.subscribed = []
+
+    def subscribe(self, id, resolution):
+        self.subscribed.append(f"{id}/{resolution.value}")
+
+    def unsubscribe(self, id, resolution):
+        pass
+
+
+class _FakeStream:
+    def __init__(self):
+        self.socket = type("S", (), {"candles": _FakeChannel()})()
+        self.is_live = True
+
+    def register(self, channel, handler):
+        self.handler = handler
+
+
+def test_ring_window_slides_and_views_are_zero_copy():
+    ring = CandleRing(capacity=4, resolution_s=H)
+    ring.seed([0, H, 2 * H], [1.0, 2.0, 3.0])
+    assert ring.closes().tolist() == [1.0, 2.0, 3.0]
+
+    assert ring.update(2 * H, 3.5)             # live bar rewritten in place
+    for i, c in enumerate([4.0, 5.0, 6.0], start=3):
+        assert ring.update(i * H, c)
+    view = ring.closes()
+    assert view.tolist() == [3.5, 4.0, 5.0, 6.0]
+    assert ring.timestamps().tolist() == [2 * H, 3 * H, 4 * H, 5 * H]
+    assert np.shares_memory(view, ring._close)
+    assert not view.flags.writeable
+
+    held = ring.closes()
+    for i in range(6, 10):                     # `capacity` new bars never touch a held view
+        assert ring.update(i * H, float(i + 1))
+    assert held.tolist() == [3.5, 4.0, 5.0, 6.0]
+    for i in range(10, 30):                    # crosses the compaction point twice
+        assert ring.update(i * H, float(i + 1))
+    assert ring.closes().tolist() == [27.0, 28.0, 29.0, 30.0]
+    assert ring.timestamps().tolist() == [26 * H, 27 * H, 28 * H, 29 * H]
+
+
+def test_ring_marks_gap_stale_and_merge_refills_it():
+    ring = CandleRing(capacity=5, resolution_s=H)
+    ring.seed([0, H], [1.0, 2.0])
+    assert not ring.update(4 * H, 5.0)
+    assert ring.stale and ring.closes().tolist() == [1.0, 2.0]
+
+    ring.merge([(5 * H, 6.0)])                 # does not reach the window
+    assert ring.stale
+    ring.merge([(H, 2.1), (2 * H, 3.0), (3 * H, 4.0), (4 * H, 5.0)])
+    assert not ring.stale
+    assert ring.closes().tolist() == [1.0, 2.1, 3.0, 4.0, 5.0]
+
+
+def test_get_candles_recent_seeds_once_then_serves_stream_view():
+    import func_public
+
+    base = 1_700_000_000 // 3600 * 3600
+    calls = []
+
+    class _Markets:
+        @staticmethod
+        async def get_perpetual_market_candles(market, resolution, limit):
+            calls.append(market)
+            return {"candles": [{"startedAt": _iso(base + i * H), "close": str(10 + i)}
+                                for i in reversed(range(3))]}
+
+    indexer = type("I", (), {"markets": _Markets})()
+    stream = _FakeStream()
+    func_candles._MANAGER = CandleStreamManager(stream, capacity=10)
+    func_public.candle_cache_clear()
+    try:
+        first = asyncio.run(func_public.get_candles_recent(indexer, "BTC-USD"))
+        assert stream.socket.candles.subscribed == ["BTC-USD/1HOUR"]
+        stream.handler.on_message({
+            "type": "channel_batch_data", "channel": "v4_candles", "id": "BTC-USD/1HOUR",
+            "contents": [{"startedAt": _iso(base + 2 * H), "close": "12.5"},
+                         {"startedAt": _iso(base + 3 * H), "close": "13"}],
+        })
+        second = asyncio.run(func_public.get_candles_recent(indexer, "BTC-USD"))
+        stream.handler.on_resync("disconnect")
+        func_public.candle_cache_clear()
+        third = asyncio.run(func_public.get_candles_recent(indexer, "BTC-USD"))
+    finally:
+        func_candles._MANAGER = None
+        func_public.candle_cache_clear()
+    assert first.tolist() == [10.0, 11.0, 12.0]
+    assert second.tolist() == [10.0, 11.0, 12.5, 13.0]     # seeded view, not a copy
+    assert third.tolist() == [10.0, 11.0, 12.0]        # re-seeded by REST after the resync
+    assert calls == ["BTC-USD", "BTC-USD"]
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} candle tests passed")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Batch Engle-Granger engine (func_coint_batch) vs the per-pair statsmodels reference."""
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("API_KEY", "test")  # constants.py requires it
+
+from func_coint_batch import batch_engle_granger, hurst_batch, mackinnonp_vec, zscore_batch
+from func_cointegration import calculate_cointegration, calculate_zscore
+
+
+def _universe(seed=7, T=400, N=14):
+    """Random walks plus a few mean-reverting spreads (so some pairs pass)."""
+    rng = np.random.default_rng(seed)
+    walks = 100 + np.cumsum(rng.normal(size=(T, N // 2)), axis=0)
+    cols = [walks]
+    for k in range(N - N // 2):
+        ar = np.zeros(T)
+        for t in range(1, T):
+            ar[t] = 0.8 * ar[t - 1] + rng.normal(scale=0.5)
+        cols.append((walks[:, k % walks.shape[1]] * rng.uniform(0.5, 2) + ar)[:, None])
+    return np.abs(np.hstack(cols)) + 1
+
+
+def test_batch_matches_calculate_cointegration():
+    prices = _universe()
+    res = batch_engle_granger(prices, block=16)       # several blocks
+    assert res["coint_flag"].sum() >= 3
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for n, (a, b) in enumerate(zip(res["i"], res["j"])):
+            flag, hr, hl, r2, p = calculate_cointegration(prices[:, a], prices[:, b])
+            assert flag == int(res["coint_flag"][n])
+            assert abs(hr - res["hedge_ratio"][n]) < 1e-9 * abs(hr)
+            assert abs(r2 - res["r_squared"][n]) < 1e-9
+            assert abs(p - res["p_value"][n]) < 1e-8
+            assert (np.isnan(hl) and np.isnan(res["half_life"][n])) or hl == res["half_life"][n]
+
+
+def test_degenerate_pairs_flat_and_collinear():
+    rng = np.random.default_rng(1)
+    x = 50 + np.cumsum(rng.normal(size=300))
+    prices = np.column_stack([x, 2 * x, np.full(300, 3.0)])
+    res = batch_engle_granger(prices)
+    flags = dict(zip(zip(res["i"].tolist(), res["j"].tolist()), res["coint_flag"].tolist()))
+    assert flags[(0, 1)] is True                      # collinear: t=-inf, p=0 (as statsmodels)
+    assert flags[(0, 2)] is False and flags[(1, 2)] is False
+    assert res["p_value"][res["j"] == 2].tolist() == [1.0, 1.0]
+
+
+def test_mackinnonp_vec_matches_statsmodels():
+    from statsmodels.tsa.adfvalues import mackinnonp
+    t = np.array([-30.0, -5.1, -3.34, -2.0, 0.5, 3.0])
+    assert np.allclose(mackinnonp_vec(t), [mackinnonp(v, regression="c", N=2) for v in t])
+
+
+def test_store_cointegration_results_uses_batch_engine(tmp_path=None):
+    import tempfile
+    import func_cointegration as fc
+
+    prices = _universe(seed=3)
+    df = pd.DataFrame(prices, columns=[f"M{k}-USD" for k in range(prices.shape[1])])
+    with tempfile.TemporaryDirectory() as d:
+        orig = fc.CSV_PATH
+        fc.CSV_PATH = os.path.join(d, "pairs.csv")
+        try:
+            assert fc.store_cointegration_results(df) == "saved"
+            out = pd.read_csv(fc.CSV_PATH)
+        finally:
+            fc.CSV_PATH = orig
+    assert list(out.columns[1:4]) == ["base_market", "quote_market", "hedge_ratio"]
+    for _, row in out.iterrows():
+        flag, hr, hl, _, _ = calculate_cointegration(df[row.base_market], df[row.quote_market])
+        assert flag == 1 and abs(hr - row.hedge_ratio) < 1e-9 * abs(hr) and hl == row.half_life
+
+
+def test_async_pool_refresh_matches_sync_csv():
+    import asyncio
+    import tempfile
+    import func_cointegration as fc
+
+    prices = _universe(seed=3)
+    df = pd.DataFrame(prices, columns=[f"M{k}-USD" for k in range(prices.shape[1])])
+    progress = []
+    with tempfile.TemporaryDirectory() as d:
+        orig = fc.CSV_PATH
+        try:
+            fc.CSV_PATH = os.path.join(d, "sync.csv")
+            fc.store_cointegration_results(df)
+            fc.CSV_PATH = os.path.join(d, "pool.csv")
+            result = asyncio.run(fc.store_cointegration_results_async(
+                df, workers=2, chunk_pairs=25,
+                on_progress=lambda stats, done, total: progress.append((done, total, stats["coint_tested"]))))
+            sync, pool = pd.read_csv(os.path.join(d, "sync.csv")), pd.read_csv(fc.CSV_PATH)
+            assert sorted(os.listdir(d)) == ["pool.csv", "sync.csv"]      # no .tmp left behind
+        finally:
+            fc.CSV_PATH = orig
+    n_pairs = len(fc._prefilter_pairs(prices)[0])
+    assert result == "saved" and len(progress) == -(-n_pairs // 25)
+    assert progress[-1] == (len(progress), len(progress), n_pairs)
+    assert len(sync) > 0 and sync.equals(pool)
+
+
+def test_stage1_prefilters_leave_stage2_results_unchanged():
+    import func_cointegration as fc
+
+    prices = _universe(seed=5, N=16)
+    prices[:, 3] *= 1e5                                    # extreme hedge / price ratios
+    markets = [f"M{k}-USD" for k in range(prices.shape[1])]
+    i, j, stats = fc._prefilter_pairs(prices)
+    n_all = prices.shape[1] * (prices.shape[1] - 1) // 2
+    assert stats["tested"] == n_all
+    assert stats["pre_hedge"] > 0 and stats["pre_corr"] + stats["pre_hedge"] + stats["pre_price_ratio"] == n_all - len(i)
+    assert list(zip(i, j)) == sorted(zip(i, j))            # triu order preserved
+
+    # Without stage 1, every surviving row must also pass the stage-1 checks.
+    staged, _ = fc._screen_pairs(prices, markets, (i, j))
+    full, _ = fc._screen_pairs(prices, markets)
+    kept = set(zip(i.tolist(), j.tolist()))
+    expected = [r for r in full
+                if (markets.index(r["base_market"]), markets.index(r["quote_market"])) in kept]
+    assert staged == expected and len(staged) > 0
+
+
+def test_hurst_batch_is_bit_identical_to_the_chunk_loop():
+    from bench_hurst import hurst_loop
+    from func_cointegration import calculate_hurst_exponent
+
+    rng = np.random.default_rng(9)
+    for n in (39, 40, 57, 100, 399):
+        X = rng.normal(size=(40, n)).cumsum(axis=1) * rng.uniform(1e-3, 1e3, size=(40, 1))
+        X[0, : n // 3] = 1.0                               # flat chunks are skipped
+        X[1] = 2.0                                         # all flat → nan
+        ref = np.array([hurst_loop(x) for x in X])
+        assert np.array_equal(hurst_batch(X), ref, equal_nan=True)
+        assert np.array_equal([calculate_hurst_exponent(x) for x in X], ref, equal_nan=True)
+
+
+def test_zscore_batch_matches_the_per_pair_reference():
+    from constants import WINDOW
+
+    prices = _universe(seed=5, T=60)
+    spreads = prices[:, 1:] - 0.8 * prices[:, :1]
+    spreads[-3, 2] = np.nan                            # NaN inside the window
+    spreads[:, 3] = 4.0                                # flat: std = 0
+    out = zscore_batch(spreads, WINDOW)
+    for k in range(spreads.shape[1]):
+        s = spreads[:, k]
+        ref_z = float(calculate_zscore(s).values.tolist()[-1])
+        ref_prev = float(pd.Series(s).rolling(WINDOW).mean().shift(1).iloc[-1])
+        assert np.isclose(out["z"][k], ref_z, rtol=1e-9, equal_nan=True)
+        assert np.isclose(out["mean_prev"][k], ref_prev, rtol=1e-12, equal_nan=True)
+        assert np.isclose(out["std"][k], np.std(s[-WINDOW:]), equal_nan=True)
+        assert np.isclose(out["mean"][k], np.mean(s[-WINDOW:]), equal_nan=True)
+        assert out["last"][k] == s[-1] or np.isnan(s[-1])
+    short = zscore_batch(spreads[-WINDOW:], WINDOW)    # no previous bar: mean_prev NaN
+    assert np.isfinite(short["z"][0]) and np.isnan(short["mean_prev"]).all()
+    assert np.isnan(zscore_batch(spreads[-5:], WINDOW)["z"]).all()
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} coint batch tests passed")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Incremental per-pair cointegration state (func_coint_rls) vs the batch reference."""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("API_KEY", "test")  # constants.py requires it
+
+from func_coint_batch import batch_engle_granger
+from func_coint_rls import PairRLS, refresh_incremental, seed_coint_state
+from func_price_store import ts_to_iso
+
+H = 3600.0
+
+
+def _prices(seed=11, T=300, N=6):
+    rng = np.random.default_rng(seed)
+    walk = 100 + np.cumsum(rng.normal(size=T))
+    cols = [walk]
+    for _ in range(N - 1):
+        ar = np.zeros(T)
+        for t in range(1, T):
+            ar[t] = 0.9 * ar[t - 1] + rng.normal(scale=0.8)
+        cols.append(walk * rng.uniform(0.5, 2) + ar + rng.uniform(-5, 5))
+    P = np.column_stack(cols)
+    P[:, -1] = 50 + np.cumsum(rng.normal(size=T))      # unrelated random walk
+    return P
+
+
+def test_incremental_updates_equal_block_build_and_match_batch():
+    P = _prices()
+    ts = np.arange(len(P)) * H
+    markets = [f"M{k}-USD" for k in range(P.shape[1])]
+
+    rec = PairRLS.from_prices(markets, ts[:200], P[:200], lam=1.0)
+    assert rec.update_many(ts, P) == 100                   # only bars after last_ts
+    block = PairRLS.from_prices(markets, ts, P, lam=1.0)
+    for a, b in ((rec.lvl, block.lvl), (rec.z1, block.z1), (rec.z2, block.z2)):
+        assert np.allclose(a, b, rtol=1e-10)
+
+    eg = batch_engle_granger(P)
+    assert np.allclose(rec.hedge_ratio(), eg["hedge_ratio"], rtol=1e-9)
+    assert np.array_equal(np.nan_to_num(rec.half_life(), nan=-1),
+                          np.nan_to_num(eg["half_life"], nan=-1))
+    # Lag-0 Dickey-Fuller: an approximation of the AIC-lag ADF statistic.
+    t = rec.df_tstat()
+    assert np.all(np.abs(t - eg["coint_t"]) < 1.5)
+    assert np.corrcoef(t, eg["coint_t"])[0, 1] > 0.9
+
+
+def test_forgetting_weights_and_missing_bars():
+    P = _prices(seed=2, T=120, N=3)
+    ts = np.arange(len(P)) * H
+    lam = 0.98
+    rec = PairRLS.from_prices(["A", "B", "C"], ts[:1], P[:1], lam=lam)
+    gap = P.copy()
+    gap[50, 1] = np.nan                                    # B's bar never arrived
+    rec.update_many(ts, gap)
+    w = lam ** np.arange(len(P) - 1, -1, -1)
+    # Pair (A, C) saw every bar with weight λ^age.
+    k = int(np.flatnonzero((rec.i == 0) & (rec.j == 2))[0])
+    assert np.isclose(rec.lvl[k, 0], w.sum()) and np.isclose(rec.lvl[k, 4], (w * P[:, 0] * P[:, 2]).sum())
+    # Pair (A, B) skipped bar 50 without decaying through it.
+    k = int(np.flatnonzero((rec.i == 0) & (rec.j == 1))[0])
+    assert rec.lvl[k, 0] < w.sum() and np.isfinite(rec.df_tstat()[k])
+    assert not np.isnan(rec.last_px).any() and rec.last_px[1] == P[-1, 1]
+
+
+def test_refresh_incremental_retests_only_crossing_pairs():
+    import func_cointegration as fc
+
+    P = _prices(seed=4, T=400, N=5)
+    markets = [f"M{k}-USD" for k in range(P.shape[1])]
+    idx = [ts_to_iso(k * H) for k in range(len(P))]
+    df = pd.DataFrame(P, columns=markets, index=idx)
+    with tempfile.TemporaryDirectory() as d:
+        orig = fc.CSV_PATH
+        fc.CSV_PATH = os.path.join(d, "pairs.csv")
+        state_path = os.path.join(d, "rls.npz")
+        try:
+            first = df.iloc[:300]
+            fc.store_cointegration_results(first)
+            before = pd.read_csv(fc.CSV_PATH, index_col=0)
+            assert (before.base_market == "M1-USD").any() or (before.quote_market == "M1-USD").any()
+            state = seed_coint_state(first, state_path)
+            assert len(state.flagged()) == 0
+
+            # Break the cointegration of M1 with everyone: it turns into a random walk.
+            rng = np.random.default_rng(0)
+            broken = df.copy()
+            broken.iloc[300:, 1] = broken.iloc[299, 1] + np.cumsum(rng.normal(scale=6, size=100))
+            summary = refresh_incremental(broken.iloc[-300:], state_path)
+            assert summary["new_bars"] == 100 and not summary["reseeded"]
+            assert 0 < summary["retested"] < len(state.i) and summary["removed"] > 0
+            out = pd.read_csv(fc.CSV_PATH, index_col=0)
+            assert not ((out.base_market == "M1-USD") | (out.quote_market == "M1-USD")).any()
+            assert len(out) == len(before) - summary["removed"] + summary["added"]
+            again = refresh_incremental(broken.iloc[-300:], state_path)
+            assert again["new_bars"] == 0 and again["retested"] == 0
+
+            # A new market means a different universe: re-seed, CSV untouched.
+            grown = broken.assign(**{"M9-USD": 10.0 + np.arange(len(broken))})
+            assert refresh_incremental(grown.iloc[-300:], state_path)["reseeded"]
+            assert pd.read_csv(fc.CSV_PATH, index_col=0).equals(out)
+        finally:
+            fc.CSV_PATH = orig
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} coint rls tests passed")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""In-memory TTL cooldown registry (func_cooldowns): expiry, journal replay, legacy migration."""
+import json
+import math
+import os
+import tempfile
+
+os.environ.setdefault("API_KEY", "test")  # constants.py requires it
+
+from constants import (
+    COOLDOWN_MINUTES_AFTER_BAD_OPEN, PAIR_FAIL_COOLDOWN_HOURS, PAIR_FAIL_COOLDOWN_THRESHOLD,
+)
+from func_cooldowns import CooldownRegistry, pair_key
+
+H = 3600.0
+
+
+def _paths(d):
+    return (os.path.join(d, "cooldowns.jsonl"), os.path.join(d, "legacy.json"),
+            os.path.join(d, "legacy_bad_open.json"))
+
+
+def test_entries_expire_and_rewrites_outlive_old_heap_items():
+    with tempfile.TemporaryDirectory() as d:
+        reg = CooldownRegistry(*_paths(d))
+        reg.put("sl", "A/B", 100.0, until="x")
+        reg.put("fails", "A/B", math.inf, count=1)
+        assert reg.get("sl", "A/B", now=50.0) == {"until": "x"}
+        assert reg.remaining("sl", "A/B", now=50.0) == 50.0
+        reg.put("sl", "A/B", 300.0)                          # extended: the 100.0 heap item is stale
+        assert reg.get("sl", "A/B", now=200.0) == {}
+        assert reg.get("sl", "A/B", now=300.0) is None
+        assert reg.get("fails", "A/B", now=1e12) == {"count": 1}
+        reg.delete("fails", "A/B")
+        assert reg.get("fails", "A/B", now=0.0) is None and len(reg) == 0
+        reg.close()
+
+
+def test_journal_replays_after_restart_and_ignores_a_torn_line():
+    with tempfile.TemporaryDirectory() as d:
+        paths = _paths(d)
+        reg = CooldownRegistry(*paths)
+        far = 4e9
+        reg.put("sl", "A/B", far, hours=2.0)
+        reg.put("bad_open", "C/D", far, reason="slip")
+        reg.put("bad_open", "E/F", far)
+        reg.delete("bad_open", "E/F")
+        reg.close()
+        with open(paths[0], "a", encoding="utf-8") as f:
+            f.write('{"op":"put","kind":"sl","ke')          # crash mid-write
+
+        again = CooldownRegistry(*paths)
+        assert again.get("sl", "A/B") == {"hours": 2.0}
+        assert again.get("bad_open", "C/D") == {"reason": "slip"}
+        assert again.get("bad_open", "E/F") is None
+        with open(paths[0], encoding="utf-8") as f:          # compacted on load
+            assert len(f.read().splitlines()) == 2
+        again.close()
+
+
+def test_legacy_pair_fail_file_is_migrated_once():
+    with tempfile.TemporaryDirectory() as d:
+        path, legacy, bad_open = _paths(d)
+        with open(legacy, "w", encoding="utf-8") as f:
+            json.dump({
+                "A-USD/B-USD": {"consecutive_fails": PAIR_FAIL_COOLDOWN_THRESHOLD,
+                                "last_fail_ts": "2099-01-01T00:00:00Z"},
+                "C-USD/D-USD": {"consecutive_fails": 1, "last_fail_ts": "2020-01-01T00:00:00Z",
+                                "sl_cooldown_until": "2099-01-01T06:00:00Z", "sl_cooldown_hours": 6.0},
+                "E-USD/F-USD": {"consecutive_fails": 5, "last_fail_ts": "2020-01-01T00:00:00Z"},
+            }, f)
+        reg = CooldownRegistry(path, legacy, bad_open)
+        fails = reg.get("fails", pair_key("B-USD", "A-USD"))
+        assert fails["count"] == PAIR_FAIL_COOLDOWN_THRESHOLD
+        assert reg.remaining("fails", "A-USD/B-USD", now=fails["last_fail_ts"]) == PAIR_FAIL_COOLDOWN_HOURS * H
+        assert reg.get("fails", "C-USD/D-USD") == {"count": 1, "last_fail_ts": 1577836800.0}
+        assert reg.get("sl", "C-USD/D-USD")["until"] == "2099-01-01T06:00:00Z"
+        assert reg.get("fails", "E-USD/F-USD") is None      # cooldown long over
+        reg.close()
+
+        os.remove(legacy)                                    # journal exists now: no re-import needed
+        assert CooldownRegistry(path, legacy, bad_open).get("sl", "C-USD/D-USD") is not None
+
+
+def test_legacy_guard_cooldowns_are_migrated_as_bad_open():
+    with tempfile.TemporaryDirectory() as d:
+        path, legacy, bad_open = _paths(d)
+        with open(bad_open, "w", encoding="utf-8") as f:
+            json.dump({
+                "A-USD/B-USD": {"ts": "2099-01-01T00:00:00Z", "reason": "slippage"},
+                "C-USD/D-USD": {"ts": "2020-01-01T00:00:00Z", "reason": "one leg"},
+                "E-USD/F-USD": {"reason": "no ts"},
+            }, f)
+        reg = CooldownRegistry(path, legacy, bad_open)
+        assert reg.get("bad_open", "A-USD/B-USD") == {"ts": "2099-01-01T00:00:00Z", "reason": "slippage"}
+        start = 4070908800.0                                 # 2099-01-01T00:00:00Z
+        assert reg.remaining("bad_open", "A-USD/B-USD", now=start) == COOLDOWN_MINUTES_AFTER_BAD_OPEN * 60.0
+        assert reg.get("bad_open", "C-USD/D-USD") is None   # long over
+        assert reg.get("bad_open", "E-USD/F-USD") is None and len(reg) == 1
+        reg.close()
+        assert CooldownRegistry(path, legacy, bad_open).get("bad_open", "A-USD/B-USD") is not None
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} cooldown tests passed")
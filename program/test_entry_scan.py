@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Phase-1 scan of open_positions: pair universe, concurrent prefetch and the stacked spread matrix."""
+import asyncio
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("API_KEY", "test")  # constants.py requires it
+
+import func_entry_pairs as fe
+from func_pair_universe import PairUniverse, get_pair_universe
+from func_position_store import PositionStore
+
+
+def _run_prefetch(candle_markets, spread_markets, fail=()):
+    calls = {"candles": [], "spread": [], "in_flight": 0, "peak": 0}
+
+    async def _enter():
+        calls["in_flight"] += 1
+        calls["peak"] = max(calls["peak"], calls["in_flight"])
+        await asyncio.sleep(0.01)
+        calls["in_flight"] -= 1
+
+    async def fake_candles(indexer, market):
+        calls["candles"].append(market)
+        await _enter()
+        if market in fail:
+            raise RuntimeError("boom")
+        return np.arange(5.0)
+
+    async def fake_spread(indexer, market):
+        calls["spread"].append(market)
+        await _enter()
+        return 3.0
+
+    orig = fe.get_candles_recent, fe.get_market_spread_bps, fe.ENTRY_PREFETCH_CONCURRENCY
+    fe.get_candles_recent, fe.get_market_spread_bps, fe.ENTRY_PREFETCH_CONCURRENCY = fake_candles, fake_spread, 4
+    try:
+        out = asyncio.run(fe._prefetch_scan_data(None, candle_markets, spread_markets))
+    finally:
+        fe.get_candles_recent, fe.get_market_spread_bps, fe.ENTRY_PREFETCH_CONCURRENCY = orig
+    return out, calls
+
+
+def test_prefetch_fetches_each_market_once_within_the_bound():
+    markets = {f"M{k}-USD" for k in range(20)}
+    (candles, spreads), calls = _run_prefetch(markets, {"M0-USD", "M1-USD"})
+    assert sorted(calls["candles"]) == sorted(markets) and len(calls["spread"]) == 2
+    assert set(candles) == markets and spreads == {"M0-USD": 3.0, "M1-USD": 3.0}
+    assert 1 < calls["peak"] <= 4
+
+
+def test_failed_market_is_missing_not_fatal():
+    (candles, _), _ = _run_prefetch({"A-USD", "B-USD"}, set(), fail={"B-USD"})
+    assert set(candles) == {"A-USD"}
+    assert len(candles.get("B-USD", fe._NO_CANDLES)) == 0
+
+
+def test_spread_tails_align_markets_by_their_last_bar():
+    candles = {"A-USD": np.arange(30.0), "B-USD": np.arange(100.0, 125.0), "C-USD": np.arange(3.0)}
+    S = fe._spread_tails(candles, ["A-USD", "A-USD", "B-USD"], ["B-USD", "C-USD", "D-USD"],
+                         [2.0, 1.0, 1.0], 22)
+    assert S.shape == (22, 3)
+    assert np.array_equal(S[:, 0], candles["A-USD"][-22:] - 2.0 * candles["B-USD"][-22:])
+    assert np.isnan(S[:19, 1]).all() and np.array_equal(S[19:, 1], candles["A-USD"][-3:] - candles["C-USD"])
+    assert np.isnan(S[:, 2]).all()                               # D-USD not prefetched
+
+
+def test_universe_quality_and_reload_on_mtime():
+    df = pd.DataFrame({
+        "base_market": ["A-USD", "B-USD", "C-USD", "A-USD"],
+        "quote_market": ["B-USD", "C-USD", "D-USD", "D-USD"],
+        "hedge_ratio": [1.0, 2.0, 0.5, 3.0],
+        "half_life": [6.0, 0.0, np.nan, 12.0],
+        "hurst": [0.3, 0.4, 0.0, np.nan],
+        "r_squared": [0.9, 0.8, 0.7, np.nan],
+    })
+
+    def row_quality(row):                                # the former df.apply(axis=1)
+        r2 = float(row.get("r_squared", 0) or 0)
+        hl = float(row.get("half_life", 24) or 24)
+        hr = float(row.get("hurst", 0.5) or 0.5)
+        return r2 * (24.0 / max(1.0, hl)) * (1.0 / max(0.1, hr))
+
+    u = PairUniverse(df)
+    assert np.array_equal(u.quality, df.apply(row_quality, axis=1).to_numpy(), equal_nan=True)
+    ref = df.assign(q=df.apply(row_quality, axis=1)).sort_values("q", ascending=False).index[:2]
+    assert list(u.top_n(2)) == list(ref)
+    assert [u.base(k) + "/" + u.quote(k) for k in range(4)] == [f"{b}/{q}" for b, q in zip(df.base_market, df.quote_market)]
+    assert list(u.pair_mask(u.market_mask({"D-USD"}))) == [False, False, True, True]
+    ids = {m: i for i, m in enumerate(u.markets)}
+    assert list(u.pairs_of([ids["A-USD"]])) == [0, 3] and list(u.pairs_of([ids["B-USD"], ids["D-USD"]])) == [0, 1, 2, 3]
+    assert len(u.pairs_of([])) == 0
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "pairs.csv")
+        df.to_csv(path)
+        first = get_pair_universe(path)
+        assert get_pair_universe(path) is first           # unchanged mtime: no re-read
+        df.iloc[:2].to_csv(path)
+        os.utime(path, (time.time() + 5, time.time() + 5))
+        assert len(get_pair_universe(path)) == 2
+        assert get_pair_universe(os.path.join(d, "missing.csv")) is None
+
+
+@contextmanager
+def _scan_env():
+    """open_positions over a fake exchange; yields the knobs the tests turn between scans."""
+    rng = np.random.default_rng(1)
+    T = 100
+    base = 20 + np.cumsum(rng.normal(scale=0.1, size=T))
+    closes = {
+        "A-USD": base * 2 + rng.normal(scale=0.05, size=T),
+        "B-USD": base.copy(),
+        "C-USD": base * 1.5 + rng.normal(scale=0.05, size=T),
+        "E-USD": 10 + np.cumsum(rng.normal(scale=0.1, size=T)),
+        "F-USD": base * 0.5 + rng.normal(scale=0.05, size=T),
+        "L-USD": base.copy(),
+    }
+    closes["A-USD"][-1] += 3.0                            # A/B spread jumps: |z| far above threshold
+    blk = sorted(fe.MARKET_BLACKLIST)[0]
+    closes[blk] = base.copy()
+    pairs = pd.DataFrame({
+        "base_market": ["A-USD", "C-USD", blk, "E-USD", "F-USD", "L-USD", "A-USD"],
+        "quote_market": ["B-USD", "B-USD", "B-USD", "B-USD", "B-USD", "B-USD", "X-USD"],
+        "hedge_ratio": [2.0, 1.5, 1.0, 1e6, 0.5, 1.0, 1.0],
+        "half_life": [5.0] * 7, "hurst": [0.3] * 7, "r_squared": [0.9] * 7,
+    })
+    markets = {m: {"oraclePrice": str(v[-1]), "stepSize": "0.001", "tickSize": "0.001",
+                   "minOrderSize": "0.001"} for m, v in closes.items()}
+    events, fetched, failing = [], [], set()
+    cooling = {("F-USD", "B-USD")}
+
+    async def _sub(indexer):
+        return {"freeCollateral": "1000", "openPerpetualPositions": {"L-USD": {"size": "1"}}}
+
+    async def _markets(indexer):
+        return markets
+
+    async def _funding(indexer, names):
+        return {}
+
+    async def _candles(indexer, m):
+        fetched.append(m)
+        if m in failing:
+            raise RuntimeError("boom")
+        return closes.get(m, fe._NO_CANDLES)
+
+    async def _spread(indexer, m):
+        return 2.0
+
+    def scan():
+        events.clear()
+        fetched.clear()
+        assert asyncio.run(fe.open_positions(None, None, None, max_new_trades=0)) == 0
+        by_type = {e["type"]: e for e in events}
+        return by_type["entry_candidates_scored"], by_type["scan_timing"]
+
+    def move(m, bps=20):
+        markets[m]["oraclePrice"] = str(float(markets[m]["oraclePrice"]) * (1 + bps / 1e4))
+
+    patched = {
+        "get_subaccount_obj": _sub, "get_markets_map": _markets, "get_funding_rates": _funding,
+        "get_candles_recent": _candles, "get_market_spread_bps": _spread,
+        "log_event": lambda e, **kw: events.append(e), "KALMAN_HEDGE_ENABLED": False,
+        "_is_pair_in_fail_cooldown": lambda b, q: (b, q) in cooling,
+    }
+    with tempfile.TemporaryDirectory() as d:
+        csv = os.path.join(d, "pairs.csv")
+        pairs.to_csv(csv)
+        store = PositionStore(os.path.join(d, "positions.db"), os.path.join(d, "agents.json"))
+        patched.update(COINT_CSV_PATH=csv, get_position_store=lambda: store)
+        orig = {k: getattr(fe, k) for k in patched}
+        for k, v in patched.items():
+            setattr(fe, k, v)
+        try:
+            yield SimpleNamespace(scan=scan, move=move, events=events, fetched=fetched,
+                                  cooling=cooling, failing=failing)
+        finally:
+            for k, v in orig.items():
+                setattr(fe, k, v)
+            store.close()
+
+
+def test_open_positions_scan_applies_the_filters_and_scores_in_memory():
+    with _scan_env() as env:
+        scored, timing = env.scan()
+        pre = next(e for e in env.events if e["type"] == "csv_prefiltered")
+        assert pre["csv_after_prefilter"] == 6 and pre["dropped_no_market"] == 1
+        assert (scored["skip_blacklist"], scored["skip_hedge_ratio"], scored["skip_live"],
+                scored["skip_cooldown"], scored["skip_low_z"]) == (1, 1, 1, 1, 1)
+        assert [c["pair"] for c in scored["top"]] == ["A-USD/B-USD"] and scored["top"][0]["z"] > 3
+        assert timing["candidates"] == 1 and timing["recomputed_pairs"] == 2
+
+        # Nothing moved: cached rows, no candle requests, same result.
+        again, timing = env.scan()
+        assert timing["recomputed_pairs"] == 0 and env.fetched == []
+        assert again["top"] == scored["top"] and again["skip_low_z"] == 1
+
+        # C-USD's oracle moves 20 bps: only the pair touching it is recomputed.
+        env.move("C-USD")
+        _, timing = env.scan()
+        assert timing["recomputed_pairs"] == 1 and sorted(env.fetched) == ["B-USD", "C-USD"]
+
+
+def test_a_shared_leg_drifting_slowly_is_measured_against_each_pair_row():
+    with _scan_env() as env:
+        env.scan()
+        recomputed = []
+        for _ in range(6):
+            env.move("B-USD", bps=4)                      # under ENTRY_DIRTY_ORACLE_BPS per scan...
+            env.move("C-USD", bps=20)                     # ...while C/B is recomputed every time
+            _, timing = env.scan()
+            recomputed.append((timing["recomputed_pairs"], "A-USD" in env.fetched))
+        # A/B's row was computed with the old B price: ~8 bps later it is stale.
+        assert recomputed == [(1, False), (2, True)] * 3
+
+
+def test_filtered_pairs_and_failed_fetches_do_not_reuse_old_rows():
+    with _scan_env() as env:
+        env.cooling.clear()
+        _, timing = env.scan()                            # F/B scored once: it has a row
+        assert timing["recomputed_pairs"] == 3
+
+        # F/B goes into cooldown while B-USD moves: its row is now stale...
+        env.cooling.add(("F-USD", "B-USD"))
+        env.move("B-USD")
+        _, timing = env.scan()
+        assert timing["recomputed_pairs"] == 2
+        # ...so once eligible again it is recomputed, not served from the cache.
+        env.cooling.clear()
+        _, timing = env.scan()
+        assert timing["recomputed_pairs"] == 1 and sorted(env.fetched) == ["B-USD", "F-USD"]
+
+        # C-USD's candles fail: C/B is skipped and retried on the next scan.
+        env.failing.add("C-USD")
+        env.move("C-USD")
+        _, timing = env.scan()
+        assert timing["recomputed_pairs"] == 1 and "C-USD" in env.fetched
+        env.failing.clear()
+        _, timing = env.scan()
+        assert timing["recomputed_pairs"] == 1 and sorted(env.fetched) == ["B-USD", "C-USD"]
+        _, timing = env.scan()
+        assert timing["recomputed_pairs"] == 0
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} entry scan tests passed")
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""Offline tests for the pooled indexer HTTP transport; no network."""
+import asyncio
+import json
+import os
+
+import httpx
+
+from dydx_v4_client.indexer.rest.indexer_client import IndexerClient
+from dydx_v4_client.indexer.rest.shared.governor import RateGovernor
+from dydx_v4_client.indexer.rest.shared.rest import endpoint_key
+from dydx_v4_client.indexer.socket.async_websocket import AsyncIndexerSocket
+
+
+def _mock_indexer(handler, governor=None):
+    indexer = IndexerClient("https://indexer.test/", governor=governor)
+    indexer._pool._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return indexer
+
+
+def test_endpoint_key_collapses_ids():
+    assert endpoint_key("/v4/candles/perpetualMarkets/BTC-USD") == "/v4/candles"
+    assert endpoint_key("/v4/perpetualMarkets?ticker=ETH-USD") == "/v4/perpetualMarkets"
+
+
+def test_modules_share_one_client_and_record_latency():
+    seen = []
+
+    def handler(request):
+        seen.append(str(request.url))
+        return httpx.Response(200, json={"ok": True})
+
+    async def run():
+        indexer = _mock_indexer(handler)
+        client = indexer._pool.client
+        await indexer.markets.get_perpetual_markets()
+        await indexer.account.get_subaccount("dydx1abc", 0)
+        await indexer.markets.get_perpetual_market_orderbook("BTC-USD")
+        assert indexer.markets.pool is indexer.account.pool
+        assert indexer._pool.client is client
+        stats = indexer.http_stats(reset=True)
+        await indexer.aclose()
+        return stats, indexer
+
+    stats, indexer = asyncio.run(run())
+    assert len(seen) == 3
+    assert seen[0] == "https://indexer.test/v4/perpetualMarkets"
+    assert stats["/v4/perpetualMarkets"]["count"] == 1
+    assert stats["/v4/addresses"]["count"] == 1
+    assert indexer.http_stats() == {}
+    assert indexer._pool.is_closed
+
+
+def test_http_errors_are_raised_and_counted():
+    def handler(request):
+        return httpx.Response(404, json={})
+
+    async def run():
+        indexer = _mock_indexer(handler)
+        try:
+            await indexer.markets.get_perpetual_markets()
+        except httpx.HTTPStatusError as e:
+            assert e.response.status_code == 404
+        else:
+            raise AssertionError("expected HTTPStatusError")
+        stats = indexer.http_stats()
+        await indexer.aclose()
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats["/v4/perpetualMarkets"]["errors"] == 1
+
+
+def test_governor_retries_throttled_get_and_cuts_limits():
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        if len(calls) <= 2:
+            return httpx.Response(429, headers={"Retry-After": "0"}, json={})
+        return httpx.Response(200, json={"markets": {}})
+
+    gov = RateGovernor(rate=100.0, burst=100.0, initial_concurrency=8, backoff_base=0.01)
+
+    async def run():
+        indexer = _mock_indexer(handler, governor=gov)
+        resp = await indexer.markets.get_perpetual_markets()
+        await indexer.aclose()
+        return resp
+
+    assert asyncio.run(run()) == {"markets": {}}
+    assert len(calls) == 3
+    assert gov.throttled == 2
+    assert gov.concurrency < 8
+    assert gov.snapshot()["in_flight"] == 0
+
+
+def test_governor_grows_additively_on_clean_responses():
+    gov = RateGovernor(rate=10.0, initial_concurrency=2, max_concurrency=4, increase_every=3)
+
+    async def run():
+        for _ in range(9):
+            await gov.acquire()
+            await gov.release(200)
+
+    asyncio.run(run())
+    assert gov.concurrency == 4
+    assert gov.rate > 10.0
+
+
+def test_governor_caps_in_flight_requests():
+    gov = RateGovernor(rate=1000.0, burst=1000.0, initial_concurrency=3, max_concurrency=3)
+    peak = 0
+
+    async def worker():
+        nonlocal peak
+        await gov.acquire()
+        peak = max(peak, gov.snapshot()["in_flight"])
+        await asyncio.sleep(0.01)
+        await gov.release(None)
+
+    async def run():
+        await asyncio.gather(*[worker() for _ in range(12)])
+
+    asyncio.run(run())
+    assert peak == 3
+
+
+def test_concurrent_identical_gets_share_one_request():
+    calls = []
+
+    async def handler(request):
+        calls.append(str(request.url))
+        await asyncio.sleep(0.02)
+        return httpx.Response(200, json={"markets": {"BTC-USD": {}}})
+
+    async def run():
+        indexer = _mock_indexer(handler)
+        results = await asyncio.gather(
+            *[indexer.markets.get_perpetual_markets() for _ in range(5)]
+        )
+        await indexer.markets.get_perpetual_markets()
+        stats = indexer.http_stats()
+        await indexer.aclose()
+        return results, stats
+
+    results, stats = asyncio.run(run())
+    assert len(calls) == 2
+    assert all(r is results[0] for r in results)
+    assert stats["/v4/perpetualMarkets"]["count"] == 2
+    assert stats["/v4/perpetualMarkets"]["coalesced"] == 4
+
+
+def test_tick_snapshot_serves_repeat_reads_and_invalidates_on_order():
+    os.environ.setdefault("API_KEY", "test")  # constants.py requires it
+    import func_tick
+
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if "perpetualMarkets" in request.url.path:
+            return httpx.Response(200, json={"markets": {"BTC-USD": {"oraclePrice": "1"}}})
+        return httpx.Response(200, json={"subaccount": {"equity": "100"}})
+
+    async def run():
+        indexer = _mock_indexer(handler)
+        tick = func_tick.begin_tick(indexer, max_age_s=60)
+        for _ in range(3):
+            assert "BTC-USD" in await func_tick.get_markets_map(indexer)
+            assert (await func_tick.get_subaccount_obj(indexer))["equity"] == "100"
+        func_tick.invalidate_subaccount()
+        await func_tick.get_subaccount_obj(indexer)
+        await func_tick.get_markets_map(indexer, max_age_s=0)
+        await indexer.aclose()
+        func_tick._CURRENT_TICK = None
+        return tick.stats
+
+    stats = asyncio.run(run())
+    assert stats == {"markets_fetch": 2, "markets_hit": 2, "markets_stream": 0,
+                     "subaccount_fetch": 2, "subaccount_hit": 2}
+    assert len(calls) == 4
+
+
+async def _ws_server(script):
+    """Local indexer stand-in; `script(ws, connection_no)` drives each connection."""
+    from websockets.asyncio.server import serve
+
+    received = []
+    connections = []
+
+    async def handler(ws):
+        connections.append(ws)
+        await ws.send(json.dumps({"type": "connected", "connection_id": "c", "message_id": 0}))
+        received.append(json.loads(await ws.recv()))
+        await script(ws, len(connections))
+
+    server = await serve(handler, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"ws://127.0.0.1:{port}", received
+
+
+def _ws_msg(mid, type_="channel_data", **kw):
+    return json.dumps({"type": type_, "message_id": mid, "channel": "v4_orderbook",
+                       "id": "BTC-USD", "contents": {}, **kw})
+
+
+async def _collect(socket, types, limit=20):
+    out = []
+    async for msg in socket:
+        out.append(msg)
+        if msg["type"] in types or len(out) >= limit:
+            break
+    return out
+
+
+def test_socket_resubscribes_after_server_disconnect():
+    async def script(ws, n):
+        await ws.send(_ws_msg(1, "subscribed"))
+        await ws.send(_ws_msg(2))
+        if n == 1:
+            await ws.close()
+        else:
+            await ws.wait_closed()
+
+    async def run():
+        server, url, received = await _ws_server(script)
+        socket = AsyncIndexerSocket(url, reconnect_base=0.01, ping_interval=None)
+        socket.order_book.subscribe(id="BTC-USD")
+        await socket.connect()
+        first = await _collect(socket, {"resync"})
+        second = await _collect(socket, {"channel_data"})
+        await socket.close()
+        server.close()
+        return first, second, received, socket.stats
+
+    first, second, received, stats = asyncio.run(run())
+    assert [m["type"] for m in first] == ["connected", "subscribed", "channel_data", "resync"]
+    assert [m["type"] for m in second] == ["connected", "subscribed", "channel_data"]
+    assert received == [{"type": "subscribe", "channel": "v4_orderbook",
+                         "id": "BTC-USD", "batched": True}] * 2
+    assert stats["connects"] == 2 and stats["reconnects"] == 1
+
+
+def test_socket_detects_message_id_gap():
+    async def script(ws, n):
+        await ws.send(_ws_msg(1, "subscribed"))
+        await ws.send(_ws_msg(3 if n == 1 else 2))
+        await ws.wait_closed()
+
+    async def run():
+        server, url, _ = await _ws_server(script)
+        socket = AsyncIndexerSocket(url, reconnect_base=0.01, ping_interval=None)
+        socket.order_book.subscribe(id="BTC-USD")
+        async with socket:
+            first = await _collect(socket, {"resync"})
+            second = await _collect(socket, {"channel_data"})
+        server.close()
+        return first, second, socket.stats
+
+    first, second, stats = asyncio.run(run())
+    assert first[-1]["type"] == "resync" and first[-1]["reason"].startswith("gap")
+    assert "channel_data" not in [m["type"] for m in first]
+    assert second[-1]["message_id"] == 2
+    assert stats["gaps"] == 1
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} transport tests passed")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Dynamic Kalman hedge ratio (func_kalman): tracking, incremental updates, persistence."""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("API_KEY", "test")  # constants.py requires it
+
+import func_kalman as fk
+from func_kalman import HedgeRegistry, KalmanHedge
+from func_price_store import ts_to_iso
+
+H = 3600.0
+
+
+def _drifting_pair(seed=3, T=600):
+    rng = np.random.default_rng(seed)
+    x = 50 + np.cumsum(rng.normal(scale=0.3, size=T))
+    beta = np.linspace(1.5, 2.1, T)                     # +40% drift over the window
+    y = beta * x + rng.normal(scale=0.5, size=T)
+    return y, x, beta
+
+
+def test_filter_tracks_a_drifting_ratio_that_the_static_one_misses():
+    y, x, beta = _drifting_pair()
+    k = KalmanHedge(beta=1.5)
+    for t in range(len(y)):
+        k.update(y[t], x[t])
+    assert k.is_warm and abs(k.beta - beta[-1]) / beta[-1] < 0.02
+
+
+def test_incremental_frames_equal_one_pass_and_survive_restart():
+    y, x, _ = _drifting_pair(seed=5, T=300)
+    idx = [ts_to_iso(t * H) for t in range(len(y))]
+    df = pd.DataFrame({"A-USD": y, "B-USD": x}, index=idx)
+    now = len(y) * H + 1                                 # every bar is closed
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "hedges.json")
+        reg = HedgeRegistry(path)
+        assert reg.update_from_frame(df.iloc[:200], [("A-USD", "B-USD", 1.5)], now=now)["bars"] == 200
+        out = HedgeRegistry(path).update_from_frame(df.iloc[-250:], [("A-USD", "B-USD", 9.9)], now=now)
+        assert out["bars"] == 100                        # only bars after last_ts; seed ignored
+
+        ref = KalmanHedge(beta=1.5)
+        for t in range(len(y)):
+            ref.update(y[t], x[t])
+        got = HedgeRegistry(path).get("A-USD", "B-USD")
+        assert got.n == 300 and got.beta == ref.beta and got.P == ref.P and got.R == ref.R
+        assert HedgeRegistry(path).current_hedge_ratio("A-USD", "B-USD") == ref.beta
+
+        # The bar still forming is skipped; pairs gone from the CSV are dropped.
+        reg = HedgeRegistry(path)
+        grown = pd.concat([df, pd.DataFrame({"A-USD": [1.0], "B-USD": [1.0]}, index=[ts_to_iso(300 * H)])])
+        assert reg.update_from_frame(grown, [("A-USD", "B-USD", 1.5)], now=300 * H + 60)["bars"] == 0
+        assert reg.update_from_frame(grown, [], now=now)["dropped"] == 1
+        assert HedgeRegistry(path).get("A-USD", "B-USD") is None
+
+
+def test_unreadable_csv_or_missing_column_keeps_the_states():
+    y, x, _ = _drifting_pair(seed=7, T=100)
+    df = pd.DataFrame({"A-USD": y, "B-USD": x}, index=[ts_to_iso(t * H) for t in range(len(y))])
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "hedges.json")
+        reg = HedgeRegistry(path)
+        reg.update_from_frame(df, [("A-USD", "B-USD", 1.5)], now=len(y) * H + 1)
+        before = open(path, encoding="utf-8").read()
+
+        orig = fk._REGISTRY
+        fk._REGISTRY = reg
+        try:
+            out = fk.update_hedges_from_csv(df, os.path.join(d, "missing.csv"))
+            assert out["dropped"] == 0 and "error" in out
+            with open(os.path.join(d, "torn.csv"), "w", encoding="utf-8") as f:
+                f.write(",base_market,quote\n0,A-USD,B")            # partial write
+            assert "error" in fk.update_hedges_from_csv(df, os.path.join(d, "torn.csv"))
+        finally:
+            fk._REGISTRY = orig
+        assert open(path, encoding="utf-8").read() == before and reg.get("A-USD", "B-USD") is not None
+
+        # B-USD dropped from this cycle's frame: the pair is still in the CSV, keep it.
+        out = reg.update_from_frame(df[["A-USD"]], [("A-USD", "B-USD", 1.5)], now=len(y) * H + 1)
+        assert out["dropped"] == 0 and HedgeRegistry(path).get("A-USD", "B-USD").n == 100
+
+
+def test_cold_or_out_of_range_state_falls_back_to_csv():
+    with tempfile.TemporaryDirectory() as d:
+        reg = HedgeRegistry(os.path.join(d, "hedges.json"))
+        assert reg.current_hedge_ratio("A-USD", "B-USD") is None
+        reg.states["A-USD|B-USD"] = KalmanHedge(beta=2.0, n=10)
+        assert reg.current_hedge_ratio("A-USD", "B-USD") is None      # not warm yet
+        reg.states["A-USD|B-USD"] = KalmanHedge(beta=1e6, n=500)
+        assert reg.current_hedge_ratio("A-USD", "B-USD") is None      # log10 > HEDGE_RATIO_LOG_MAX
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} kalman hedge tests passed")
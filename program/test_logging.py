@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Background JSONL writer (func_logging): batching, pressure policy, shutdown flush, rotation, segments."""
+import gzip
+import json
+import os
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault("API_KEY", "test")  # constants.py requires it
+
+import func_logging as fl
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_events_are_written_in_order_after_flush():
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "bot_run.log.jsonl"
+        w = fl._LogWriter(path)
+        w.start()
+        for i in range(2000):
+            assert w.submit({"type": "x", "i": i})
+        assert w.flush()
+        assert [e["i"] for e in _lines(path)] == list(range(2000))
+        w.close()
+
+
+def test_pressure_sheds_skip_events_first_and_reports_drops():
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "bot_run.log.jsonl"
+        w = fl._LogWriter(path, queue_max=10)                # not started: the queue fills up
+        for i in range(8):
+            assert w.submit({"type": "x", "i": i})
+        assert not w.submit({"type": "signal_skip"})         # shed above LOG_SHED_AT
+        assert w.submit({"type": "x", "i": 8}) and w.submit({"type": "x", "i": 9})
+        assert not w.submit({"type": "x", "i": 10})          # full: anything is dropped
+        w.start()
+        assert w.flush()
+        got = _lines(path)
+        assert [e["i"] for e in got[:10]] == list(range(10))
+        assert got[10]["type"] == "log_dropped" and got[10]["counts"] == {"signal_skip": 1, "x": 1}
+        w.close()
+
+
+def test_close_drains_the_queue_and_later_events_write_inline():
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "bot_run.log.jsonl"
+        w = fl._LogWriter(path)
+        w.start()
+        for i in range(500):
+            w.submit({"type": "x", "i": i})
+        w.close()
+        assert len(_lines(path)) == 500
+        w.submit({"type": "late"})                           # e.g. from another atexit handler
+        assert _lines(path)[-1]["type"] == "late"
+
+
+def test_size_rotation_happens_on_the_writer_thread():
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "bot_run.log.jsonl"
+        w = fl._LogWriter(path, max_bytes=4096)
+        for i in range(60):                                  # one ~5 KB batch crosses the limit
+            w.submit({"type": "x", "i": i, "pad": "p" * 60})
+        w.start()
+        assert w.flush()
+        for i in range(60, 70):
+            w.submit({"type": "x", "i": i})
+        assert w.flush() and fl._get_segment_worker().wait()
+        backups = list(Path(d).glob("bot_run_*.log.jsonl.gz"))
+        assert len(backups) == 1
+        with gzip.open(backups[0], "rt", encoding="utf-8") as f:
+            assert [json.loads(line)["i"] for line in f] == list(range(60))
+        assert [e["i"] for e in _lines(path)] == list(range(60, 70))
+        w.close()
+
+
+def test_size_threshold_counts_bytes_not_characters():
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "bot_run.log.jsonl"
+        w = fl._LogWriter(path, max_bytes=10 ** 9)
+        w.start()
+        w.submit({"type": "x", "msg": "señal ñ€" * 50})
+        assert w.flush()
+        assert w._size == path.stat().st_size
+        w.close()
+
+
+def test_rotation_by_another_process_reopens_the_log():
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "bot_run.log.jsonl"
+        w = fl._LogWriter(path, max_bytes=10 ** 9)
+        w.start()
+        w.submit({"type": "x", "i": 0})
+        assert w.flush()
+        rotated = Path(d) / "bot_run_other.log.jsonl"
+        path.rename(rotated)                                 # e.g. close_all.py rotating
+        w.submit({"type": "x", "i": 1})
+        assert w.flush()
+        assert [e["i"] for e in _lines(rotated)] == [0]
+        assert [e["i"] for e in _lines(path)] == [1]
+        w.close()
+
+
+def test_rotated_segments_are_indexed_and_pruned_off_thread():
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "bot_run.log.jsonl"
+        w = fl._LogWriter(path, max_bytes=10 ** 9)
+        w.start()
+        for day in range(2, 10):
+            w.submit({"type": "skip" if day % 2 else "trade", "ts": f"2026-01-0{day}T00:00:00Z"})
+            assert w.flush()
+            w._fh.close()
+            w._fh = None
+            assert fl._rotate_logs(path, w._segment) is not None  # hot path: rename only
+        assert fl._get_segment_worker().wait()
+
+        index = fl.read_segment_index(path)
+        assert len(index) == fl.MAX_BACKUPS                   # older segments pruned
+        assert len(list(Path(d).glob("bot_run_*.gz"))) == fl.MAX_BACKUPS
+        assert not list(Path(d).glob("bot_run_*.log.jsonl"))  # no uncompressed leftovers
+        last = index[-1]
+        assert last["types"] == {"skip": 1} and last["first_ts"] == last["last_ts"] == "2026-01-09T00:00:00Z"
+        got = fl.find_segments(since="2026-01-06", types=["skip"], log_file=path)
+        assert [p.name for p in got] == [e["file"] for e in index if "skip" in e["types"] and e["last_ts"] >= "2026-01-06"]
+        assert len(got) == 2
+        w.close()
+
+
+def test_seeded_and_orphaned_segments_are_scanned():
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "bot_run.log.jsonl"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "old", "ts": "2026-01-01T00:00:00Z"}) + "\n")
+        w = fl._LogWriter(path)
+        w.start()
+        w.submit({"type": "new", "ts": "2026-01-02T00:00:00Z"})
+        assert w.flush()
+        w._fh.close()
+        w._fh = None
+        fl._rotate_logs(path, w._segment)
+        orphan = Path(d) / "bot_run_20250101_000000.log.jsonl"  # crash before compression
+        with open(orphan, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "lost", "ts": "2025-01-01T00:00:00Z"}) + "\n")
+        fl._recover_segments(path)
+        assert fl._get_segment_worker().wait()
+        by_type = {tuple(e["types"]): e for e in fl.read_segment_index(path)}
+        assert by_type[("old", "new")]["first_ts"] == "2026-01-01T00:00:00Z"
+        assert by_type[("lost",)]["events"] == 1 and not orphan.exists()
+        w.close()
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} logging tests passed")
@@ -161,7 +161,7 @@ async def main():
     print(f"\n  Listo para arrancar el bot principal con MODE=PRODUCTION.")
     print(f"  Antes asegúrate de:")
     print(f"   1. Equity ≥ \$100 USDC (actual: \${equity:,.2f})")
-    print(f"   2. bot_agents.json vacío: echo \"[]\" > bot_agents.json")
+    print(f"   2. Registro de posiciones vacío: python -c \"from func_position_store import get_position_store; get_position_store().clear()\" (o borrar positions.db)")
     print(f"   3. PLACE_TRADES=True y MANAGE_EXITS=True en constants.py")
     print()
 
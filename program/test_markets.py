@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Offline tests for the v4_markets-fed oracle/metadata table (func_markets)."""
+import asyncio
+import os
+
+os.environ.setdefault("API_KEY", "test")  # constants.py requires it
+
+import func_markets
+import func_tick
+from func_markets import MarketTable
+
+BTC = {"ticker": "BTC-USD", "clobPairId": "0", "status": "ACTIVE", "oraclePrice": "60000",
+       "stepSize": "0.0001", "tickSize": "1", "atomicResolution": -10,
+       "stepBaseQuantums": 1000000, "subticksPerTick": 100000,
+       "quantumConversionExponent": -9, "nextFundingRate": "0.00001"}
+ETH = {"ticker": "ETH-USD", "clobPairId": "1", "status": "ACTIVE", "oraclePrice": "3000",
+       "stepSize": "0.001", "tickSize": "0.1", "atomicResolution": -9,
+       "stepBaseQuantums": 1000000, "subticksPerTick": 100000,
+       "quantumConversionExponent": -9, "nextFundingRate": "0"}
+
+
+class _FakeStream:
+    def __init__(self):
+        self.is_live = True
+        self.subscribed = 0
+        stream = self
+
+        class _Markets:
+            def subscribe(self):
+                stream.subscribed += 1
+
+        self.socket = type("S", (), {"markets": _Markets()})()
+
+    def register(self, channel, handler):
+        self.handler = handler
+
+
+def _table():
+    stream = _FakeStream()
+    table = MarketTable(stream)
+    table.on_message({"type": "subscribed", "channel": "v4_markets",
+                      "contents": {"markets": {"BTC-USD": BTC, "ETH-USD": ETH}}})
+    return stream, table
+
+
+def test_snapshot_then_oracle_and_trading_updates():
+    stream, table = _table()
+    assert stream.subscribed == 1 and table.is_live
+    assert table.oracle_price("BTC-USD") == 60000.0
+    table.on_message({"type": "channel_batch_data", "channel": "v4_markets", "contents": [
+        {"oraclePrices": {"BTC-USD": {"oraclePrice": "61000", "effectiveAt": "x"}}},
+        {"trading": {"ETH-USD": {"nextFundingRate": "0.0002", "status": "CANCEL_ONLY"}}},
+        {"oraclePrices": {"DOGE-USD": {"oraclePrice": "0.1"}}},     # unknown market: ignored
+    ]})
+    assert table.oracle_price("BTC-USD") == 61000.0
+    assert table.info("BTC-USD")["oraclePrice"] == "61000"
+    assert table.info("ETH-USD")["status"] == "CANCEL_ONLY"
+    assert table.meta("ETH-USD")["status"] == "ACTIVE"         # snapshot record is frozen
+    assert table.oracle_price("DOGE-USD") is None
+    tickers, prices = table.oracle_prices()
+    assert tickers == ["BTC-USD", "ETH-USD"] and prices.tolist() == [61000.0, 3000.0]
+    try:
+        table.meta("BTC-USD")["tickSize"] = "2"
+        raise AssertionError("meta must be read-only")
+    except TypeError:
+        pass
+
+
+def test_oracle_array_grows_past_initial_capacity():
+    stream = _FakeStream()
+    table = MarketTable(stream)
+    markets = {f"M{i}-USD": {"ticker": f"M{i}-USD", "oraclePrice": str(i)} for i in range(200)}
+    table.on_message({"type": "subscribed", "contents": {"markets": markets}})
+    tickers, prices = table.oracle_prices()
+    assert len(tickers) == 200 and prices[199] == 199.0
+    assert table.oracle_price("M63-USD") == 63.0
+
+
+def test_markets_map_served_from_stream_and_falls_back_after_resync():
+    stream, table = _table()
+    calls = []
+
+    class _Markets:
+        @staticmethod
+        async def get_perpetual_markets(market=None):
+            calls.append(market)
+            return {"markets": {"BTC-USD": dict(BTC, oraclePrice="1")}}
+
+    indexer = type("I", (), {"markets": _Markets})()
+    func_markets._TABLE = table
+    try:
+        live = asyncio.run(func_tick.get_markets_map(indexer))
+        assert live["BTC-USD"]["oraclePrice"] == "60000" and calls == []
+        forced = asyncio.run(func_tick.get_markets_map(indexer, max_age_s=0))
+        assert forced["BTC-USD"]["oraclePrice"] == "1" and calls == [None]
+        table.on_resync("gap")
+        asyncio.run(func_tick.get_markets_map(indexer))
+        assert calls == [None, None]
+    finally:
+        func_markets._TABLE = None
+    assert table.stats["hits"] == 1 and table.stats["misses"] == 1
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} market tests passed")
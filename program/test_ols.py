@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Closed-form regression kernels (func_ols) vs statsmodels, and the fx/ols.py copy."""
+import os
+import warnings
+
+import numpy as np
+
+os.environ.setdefault("API_KEY", "test")  # constants.py requires it
+
+from func_ols import ar1_beta, half_life, simple_ols
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _series(seed=0, n=300, B=8):
+    rng = np.random.default_rng(seed)
+    x = 100 + np.cumsum(rng.normal(size=(n, B)), axis=0)
+    y = x * rng.uniform(0.5, 2, size=B) + rng.normal(scale=3, size=(n, B)) + 5
+    return y, x
+
+
+def test_simple_ols_matches_statsmodels_with_and_without_intercept():
+    import statsmodels.api as sm
+
+    y, x = _series()
+    for k in range(y.shape[1]):
+        ref = sm.OLS(y[:, k], sm.add_constant(x[:, k])).fit()
+        fit = simple_ols(y[:, k], x[:, k])
+        assert np.allclose(fit.params, ref.params, rtol=1e-12)
+        assert np.isclose(fit.rsquared, ref.rsquared, rtol=1e-12)
+        assert np.isclose(fit.resid_std, np.sqrt(ref.scale), rtol=1e-12)
+
+        ref0 = sm.OLS(y[:, k], x[:, k]).fit()            # no constant: uncentered R²
+        fit0 = simple_ols(y[:, k], x[:, k], intercept=False)
+        assert np.isclose(fit0.params[0], ref0.params[0], rtol=1e-12)
+        assert np.isclose(fit0.rsquared, ref0.rsquared, rtol=1e-12)
+        assert np.isclose(fit0.resid_std, np.sqrt(ref0.scale), rtol=1e-12)
+
+
+def test_batched_columns_equal_single_series():
+    y, x = _series(seed=1)
+    batch = simple_ols(y, x)
+    for k in range(y.shape[1]):
+        one = simple_ols(y[:, k], x[:, k])
+        assert np.isclose(batch.params[1][k], one.params[1], rtol=1e-13)
+        assert np.isclose(batch.rsquared[k], one.rsquared, rtol=1e-13)
+    spread = y - 0.9 * x
+    assert np.array_equal(half_life(spread), [half_life(spread[:, k]) for k in range(y.shape[1])],
+                          equal_nan=True)
+
+
+def test_half_life_matches_the_statsmodels_ar1_fit():
+    import statsmodels.api as sm
+
+    rng = np.random.default_rng(2)
+    for phi in (0.5, 0.8, 0.95, 1.0, 1.02):
+        s = np.zeros(400)
+        for t in range(1, 400):
+            s[t] = phi * s[t - 1] + rng.normal()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            beta = sm.OLS(np.diff(s), sm.add_constant(s[:-1])).fit().params[1]
+        expected = round(-np.log(2) / beta, 0) if beta < 0 else np.nan
+        assert np.isclose(ar1_beta(s), beta, rtol=1e-10)
+        assert np.array_equal(half_life(s), expected, equal_nan=True)
+
+    gappy = np.cumsum(rng.normal(size=50))
+    gappy[10] = np.nan                                   # drops the two pairs touching it
+    lag, ret = gappy[:-1], np.diff(gappy)
+    ok = ~(np.isnan(lag) | np.isnan(ret))
+    beta = sm.OLS(ret[ok], sm.add_constant(lag[ok])).fit().params[1]
+    assert ok.sum() == 47 and np.isclose(ar1_beta(gappy), beta, rtol=1e-10)
+    assert np.isnan(half_life(np.arange(10.0)))           # < 10 observations
+
+
+def test_fx_copy_keeps_the_same_code():
+    def body(path):
+        with open(path, encoding="utf-8") as f:
+            return f.read().split("from collections import namedtuple", 1)[1]
+
+    assert body(os.path.join(HERE, "func_ols.py")) == body(os.path.join(HERE, "..", "fx", "ols.py"))
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} ols kernel tests passed")
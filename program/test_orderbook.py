@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Offline tests for the stream-fed L2 order books (func_orderbook)."""
+import asyncio
+import os
+
+os.environ.setdefault("API_KEY", "test")  # constants.py requires it
+
+import func_orderbook
+from func_orderbook import L2Book, OrderBookManager
+
+
+class _FakeChannel:
+    def __init__(self):
+        self.subscribed = []
+        self.unsubscribed = []
+
+    def subscribe(self, id):
+        self.subscribed.append(id)
+
+    def unsubscribe(self, id):
+        self.unsubscribed.append(id)
+
+
+class _FakeSocket:
+    def __init__(self):
+        self.order_book = _FakeChannel()
+
+
+class _FakeStream:
+    def __init__(self, live=True):
+        self.socket = _FakeSocket()
+        self.is_live = live
+        self.handlers = {}
+
+    def register(self, channel, handler):
+        self.handlers[channel] = handler
+
+
+def _snapshot(market, bids, asks):
+    return {
+        "type": "subscribed", "channel": "v4_orderbook", "id": market,
+        "contents": {
+            "bids": [{"price": p, "size": s} for p, s in bids],
+            "asks": [{"price": p, "size": s} for p, s in asks],
+        },
+    }
+
+
+def test_book_applies_snapshot_and_deltas():
+    book = L2Book("BTC-USD")
+    book.apply_delta({"bids": [["1", "1"]]})      # ignored before the snapshot
+    assert not book.synced and book.best() == (None, None)
+
+    book.apply_snapshot({"bids": [{"price": "99", "size": "2"}, {"price": "98", "size": "1"}],
+                         "asks": [{"price": "101", "size": "1"}, {"price": "103", "size": "4"}]})
+    assert book.best() == (99.0, 101.0)
+    assert round(book.spread_bps(), 6) == 200.0
+
+    book.apply_delta([{"bids": [["100", "3"]]}, {"asks": [["101", "0"]], "bids": [["98", "0"]]}])
+    assert book.best() == (100.0, 103.0)
+    assert book.bids.levels(5) == [(100.0, 3.0), (99.0, 2.0)]
+    assert book.asks.levels(5) == [(103.0, 4.0)]
+
+
+def test_book_depth_and_crossed_spread():
+    book = L2Book("ETH-USD")
+    book.apply_snapshot({"bids": [{"price": "99", "size": "1"}, {"price": "90", "size": "5"}],
+                         "asks": [{"price": "101", "size": "2"}, {"price": "110", "size": "5"}]})
+    # mid=100; 200 bps → asks ≤ 102, bids ≥ 98
+    assert book.depth_usd("BUY", 200) == 202.0
+    assert book.depth_usd("SELL", 200) == 99.0
+    book.apply_delta({"bids": [["105", "1"]]})
+    assert book.spread_bps() is None
+
+
+def test_manager_subscribes_lazily_and_falls_back_until_synced():
+    stream = _FakeStream()
+    mgr = OrderBookManager(stream, max_markets=2)
+    assert stream.handlers["v4_orderbook"] is mgr
+
+    assert mgr.book("BTC-USD") is None
+    assert stream.socket.order_book.subscribed == ["BTC-USD"]
+    mgr.on_message(_snapshot("BTC-USD", [("99", "1")], [("101", "1")]))
+    assert mgr.book("BTC-USD").best() == (99.0, 101.0)
+
+    mgr.on_resync("gap")
+    assert mgr.book("BTC-USD") is None
+    mgr.on_message(_snapshot("BTC-USD", [("98", "1")], [("102", "1")]))
+    stream.is_live = False
+    assert mgr.book("BTC-USD") is None
+
+
+def test_manager_evicts_least_recently_used_market():
+    stream = _FakeStream()
+    mgr = OrderBookManager(stream, max_markets=2)
+    mgr.book("A-USD")
+    mgr.book("B-USD")
+    mgr.book("A-USD")
+    mgr.book("C-USD")
+    assert stream.socket.order_book.unsubscribed == ["B-USD"]
+    assert mgr.snapshot()["books"] == 2
+
+
+def test_spread_and_top_of_book_use_live_book_without_rest():
+    import func_public
+    import func_private
+
+    class _NoRest:
+        class markets:
+            @staticmethod
+            async def get_perpetual_market_orderbook(market):
+                raise AssertionError("REST orderbook must not be called")
+
+    stream = _FakeStream()
+    func_orderbook._MANAGER = OrderBookManager(stream)
+    try:
+        func_orderbook._MANAGER.book("SOL-USD")
+        func_orderbook._MANAGER.on_message(_snapshot("SOL-USD", [("99", "1")], [("101", "1")]))
+        bps = asyncio.run(func_public.get_market_spread_bps(_NoRest, "SOL-USD", force_fresh=True))
+        best = asyncio.run(func_private.get_orderbook_best(_NoRest, "SOL-USD"))
+    finally:
+        func_orderbook._MANAGER = None
+    assert round(bps, 6) == 200.0
+    assert best == (99.0, 101.0)
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} orderbook tests passed")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""SQLite position store (func_position_store): row-level writes, read cache, JSON migration."""
+import json
+import os
+import tempfile
+
+os.environ.setdefault("API_KEY", "test")  # constants.py requires it
+
+from func_position_store import PositionStore
+
+
+def _rec(tid, m1, m2, status="LIVE", **kw):
+    return {"trace_id": tid, "market_1": m1, "market_2": m2, "pair_status": status, **kw}
+
+
+def _store(d, legacy=None):
+    return PositionStore(os.path.join(d, "positions.db"), legacy or os.path.join(d, "bot_agents.json"))
+
+
+def test_row_writes_keep_order_and_all_returns_copies():
+    with tempfile.TemporaryDirectory() as d:
+        s = _store(d)
+        s.insert(_rec("t1", "A-USD", "B-USD"))
+        s.insert(_rec("t2", "C-USD", "D-USD"))
+        s.upsert(_rec("t1", "A-USD", "B-USD", best_z=1.5))      # update in place, order kept
+        rows = s.all()
+        assert [r["trace_id"] for r in rows] == ["t1", "t2"] and rows[0]["best_z"] == 1.5
+        rows[0]["best_z"] = 99.0                                 # caller mutation does not leak
+        assert s.get("t1")["best_z"] == 1.5 and s.count() == 2
+        assert s.find_pair("C-USD", "D-USD")[0]["trace_id"] == "t2"
+        assert s.delete_pair("C-USD", "D-USD")["trace_id"] == "t2"
+        assert s.delete_pair("C-USD", "D-USD") is None and s.count() == 1
+        s.close()
+
+
+def test_apply_only_touches_the_snapshot_rows():
+    with tempfile.TemporaryDirectory() as d:
+        s = _store(d)
+        for i in range(3):
+            s.insert(_rec(f"t{i}", f"M{i}-USD", "N-USD"))
+        before = s.all()
+        s.insert(_rec("new", "X-USD", "Y-USD"))                 # written by someone else meanwhile
+        after = [dict(before[0], best_z=2.0), before[2]]        # t0 changed, t1 closed, t2 untouched
+        assert s.apply(before, after) == {"deleted": 1, "upserted": 1}
+        assert [r["trace_id"] for r in s.all()] == ["t0", "t2", "new"]
+        assert s.get("t0")["best_z"] == 2.0
+        s.close()
+
+
+def test_cache_sees_commits_from_another_connection():
+    with tempfile.TemporaryDirectory() as d:
+        a, b = _store(d), _store(d)
+        assert a.count() == 0
+        b.insert(_rec("t1", "A-USD", "B-USD"))
+        assert a.count() == 1                                    # PRAGMA data_version changed
+        b.clear()
+        assert a.all() == []
+        a.close()
+        b.close()
+
+
+def test_json_is_migrated_once():
+    with tempfile.TemporaryDirectory() as d:
+        legacy = os.path.join(d, "bot_agents.json")
+        with open(legacy, "w", encoding="utf-8") as f:
+            json.dump([_rec("t1", "A-USD", "B-USD"), {"market_1": "C-USD", "market_2": "D-USD"}], f)
+        s = _store(d, legacy)
+        rows = s.all()
+        assert [r["market_1"] for r in rows] == ["A-USD", "C-USD"]
+        assert rows[1]["trace_id"].startswith("legacy-")        # key assigned to records without one
+        assert not os.path.exists(legacy) and os.path.exists(legacy + ".migrated")
+        s.delete("t1")
+        s.close()
+
+        with open(legacy, "w", encoding="utf-8") as f:           # a stale JSON is not re-imported
+            json.dump([_rec("t9", "E-USD", "F-USD")], f)
+        s = _store(d, legacy)
+        assert [r["market_1"] for r in s.all()] == ["C-USD"]
+        s.close()
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} position store tests passed")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Offline tests for the memory-mapped columnar candle store (func_price_store)."""
+import asyncio
+import math
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+os.environ.setdefault("API_KEY", "test")  # constants.py requires it
+
+from func_price_store import CandleStore, ts_to_iso
+
+H = 3600.0
+
+
+def _store(root):
+    return CandleStore(root=root, resolution="1HOUR", source="indexer.test")
+
+
+def test_append_is_incremental_and_rewrites_the_live_bar():
+    with tempfile.TemporaryDirectory() as root:
+        store = _store(root)
+        assert store.append("BTC-USD", [2 * H, 0, H], [3.0, 1.0, 2.0]) == 3
+        assert store.append("BTC-USD", [H, 2 * H, 3 * H, 3 * H], [9.0, 3.5, 4.0, 4.5]) == 1
+        ts, close = store.read("BTC-USD")
+        assert ts.tolist() == [0, H, 2 * H, 3 * H]
+        assert close.tolist() == [1.0, 2.0, 3.5, 4.5]   # older bars immutable, last one rewritten
+        assert isinstance(close, np.memmap) and not close.flags.writeable
+        assert store.info("BTC-USD") == {"rows": 4, "first_ts": 0.0, "last_ts": 3 * H}
+
+        # A second handle (another process) sees the same data through index.json.
+        other = _store(root)
+        assert other.read("BTC-USD", start=H, end=2 * H)[1].tolist() == [2.0, 3.5]
+        assert other.read("BTC-USD", last_n=2)[0].tolist() == [2 * H, 3 * H]
+        assert other.read("ETH-USD")[0].size == 0
+
+
+def test_crash_leftovers_past_the_index_are_overwritten():
+    with tempfile.TemporaryDirectory() as root:
+        store = _store(root)
+        store.append("SOL-USD", [0, H], [1.0, 2.0])
+        ts_path, close_path = store._files("SOL-USD")
+        with open(ts_path, "ab") as f:                 # half-written append
+            f.write(np.array([5 * H], dtype="<f8").tobytes())
+        assert store.read("SOL-USD")[0].tolist() == [0, H]
+        store.append("SOL-USD", [2 * H], [3.0])
+        assert store.read("SOL-USD")[0].tolist() == [0, H, 2 * H]
+        assert os.path.getsize(ts_path) == os.path.getsize(close_path) == 3 * 8
+
+
+def test_aligned_matrix_outer_and_inner():
+    with tempfile.TemporaryDirectory() as root:
+        store = _store(root)
+        store.append("A-USD", [0, H, 2 * H, 3 * H], [1.0, 2.0, 3.0, 4.0])
+        store.append("B-USD", [H, 3 * H, 4 * H], [20.0, 40.0, 50.0])
+        grid, m = store.matrix(["A-USD", "B-USD"])
+        assert grid.tolist() == [0, H, 2 * H, 3 * H, 4 * H]
+        assert np.isnan(m[0, 1]) and np.isnan(m[4, 0]) and m[3].tolist() == [4.0, 40.0]
+        grid, m = store.matrix(["A-USD", "B-USD"], how="inner")
+        assert grid.tolist() == [H, 3 * H] and m.tolist() == [[2.0, 20.0], [4.0, 40.0]]
+        grid, m = store.matrix(["B-USD", "A-USD"], start=H, last_n=2)
+        assert grid.tolist() == [3 * H, 4 * H] and np.isnan(m[1, 1])
+
+        df = store.frame(["A-USD", "B-USD"], how="inner")
+        assert list(df.columns) == ["A-USD", "B-USD"]
+        assert df.index[0] == ts_to_iso(H) == "1970-01-01T01:00:00.000Z"
+
+
+class _FakeIndexer:
+    """Hourly candles up to `head` (the bar at `head` is still in progress)."""
+
+    def __init__(self, markets, head):
+        self.statuses = dict(markets)
+        self.head = head
+        self.calls = []
+        outer = self
+
+        class _Markets:
+            @staticmethod
+            async def get_perpetual_markets(market=None):
+                return {"markets": {m: {"status": s} for m, s in outer.statuses.items()}}
+
+            @staticmethod
+            async def get_perpetual_market_candles(market, resolution, from_iso=None,
+                                                   to_iso=None, limit=None):
+                outer.calls.append((market, "full" if to_iso else "topup"))
+                lo = outer._parse(from_iso)
+                hi = min(outer._parse(to_iso) if to_iso else outer.head, outer.head)
+                bars = [t for t in np.arange(lo // H * H, hi + 1, H) if lo <= t <= hi]
+                bars = bars[-limit:] if to_iso else bars[:limit]
+                return {"candles": [{"startedAt": ts_to_iso(t), "close": str(outer.close(market, t))}
+                                    for t in reversed(bars)]}
+
+        self.markets = _Markets
+
+    @staticmethod
+    def _parse(iso):
+        if iso.endswith("Z"):
+            return datetime.fromisoformat(iso.replace("Z", "+00:00")).timestamp()
+        return datetime.fromisoformat(iso).timestamp()   # get_ISO_times: naive local
+
+    def close(self, market, t):
+        k = 1 + sum(map(ord, market)) % 7
+        live = 0.5 if t == self.head else 0.0
+        return round(100 + 10 * math.sin(t / H / k) + live, 6)
+
+
+def test_construct_market_prices_tops_up_incrementally():
+    import func_public
+
+    now_bar = time.time() // H * H
+    indexer = _FakeIndexer({"A-USD": "ACTIVE", "B-USD": "ACTIVE"}, head=now_bar - 6 * H)
+    with tempfile.TemporaryDirectory() as root:
+        store = _store(root)
+        orig = func_public.get_price_store
+        func_public.get_price_store = lambda: store
+        try:
+            first = asyncio.run(func_public.construct_market_prices(None, indexer))
+            assert sorted(first.columns) == ["A-USD", "B-USD"]
+            assert all(kind == "full" for _, kind in indexer.calls)
+
+            # Six hours later: B delisted, C listed, the old live bar has closed.
+            indexer.head = now_bar
+            indexer.statuses = {"A-USD": "ACTIVE", "B-USD": "FINAL_SETTLEMENT", "C-USD": "ACTIVE"}
+            indexer.calls.clear()
+            second = asyncio.run(func_public.construct_market_prices(None, indexer))
+            assert sorted(indexer.calls) == [("A-USD", "topup")] + [("C-USD", "full")] * 4
+            assert sorted(second.columns) == ["A-USD", "C-USD"]
+
+            full = asyncio.run(func_public.construct_market_prices(None, indexer, incremental=False))
+        finally:
+            func_public.get_price_store = orig
+    assert second.index[-1] == ts_to_iso(now_bar)
+    assert second.loc[ts_to_iso(now_bar - 6 * H), "A-USD"] == indexer.close("A-USD", now_bar - 6 * H)   # final, not the live value
+    assert second.equals(full)
+
+
+class _FakeCandlesHTTP:
+    """GET /v4/candles: `limit` velas de 1h hasta toISO, más nueva primero (historia infinita)."""
+
+    status_code = 200
+
+    def __init__(self):
+        self.calls = 0
+        self._page = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        end = datetime.fromisoformat(params["toISO"].replace("Z", "+00:00")).timestamp() // H * H
+        self._page = [{"startedAt": ts_to_iso(end - k * H), "close": str(100.0 + (end - k * H) / H % 50)}
+                      for k in range(int(params["limit"]))]
+        return self
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"candles": self._page}
+
+
+def test_backtest_fetch_backfills_history_older_than_the_store():
+    import backtest
+    import backtest_wf
+
+    now_bar = time.time() // H * H
+    seed_ts = [now_bar - k * H for k in range(400)][::-1]
+    with tempfile.TemporaryDirectory() as root:
+        store = _store(root)
+        store.append("A-USD", seed_ts, [1.0] * 400)          # what the bot already stored
+        store.append("B-USD", seed_ts, [1.0] * 400)
+        http = _FakeCandlesHTTP()
+        orig = (backtest.requests.get, backtest._price_store, backtest_wf._SESSION, backtest_wf.get_price_store)
+        backtest.requests.get, backtest._price_store = http.get, lambda resolution: store
+        backtest_wf._SESSION, backtest_wf.get_price_store = http, lambda resolution: store
+        try:
+            assert len(backtest.fetch_candles("A-USD", n_bars=720)) == 720
+            assert store.info("A-USD")["rows"] >= 720 and store.read("A-USD")[0][-1] == now_bar
+            calls = http.calls
+            assert len(backtest.fetch_candles("A-USD", n_bars=720)) == 720
+            assert http.calls == calls                        # served from the store
+
+            assert len(backtest_wf.fetch_candles_ts("B-USD", n_bars=720)) >= 720
+            calls = http.calls
+            assert len(backtest_wf.fetch_candles_ts("B-USD", n_bars=720)) >= 720
+            assert http.calls == calls
+        finally:
+            (backtest.requests.get, backtest._price_store, backtest_wf._SESSION, backtest_wf.get_price_store) = orig
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in sorted(globals().items()) if k.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} price store tests passed")
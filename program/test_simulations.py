@@ -44,6 +44,8 @@ _stub_module("dydx_v4_client", {"MAX_CLIENT_ID": 2**32 - 1, "OrderFlags": MagicM
 _stub_module("dydx_v4_client.indexer", {})
 _stub_module("dydx_v4_client.indexer.rest", {})
 _stub_module("dydx_v4_client.indexer.rest.constants", {"OrderType": MagicMock()})
+_stub_module("dydx_v4_client.indexer.socket", {})
+_stub_module("dydx_v4_client.indexer.socket.async_websocket", {"RESYNC": "resync"})
 _stub_module("dydx_v4_client.node", {})
 _stub_module("dydx_v4_client.node.market", {"Market": MagicMock()})
 _stub_module("dydx_v4_client.wallet", {"Wallet": MagicMock()})